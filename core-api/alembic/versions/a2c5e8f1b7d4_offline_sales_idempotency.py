@@ -0,0 +1,34 @@
+"""offline_sales_idempotency
+
+Revision ID: a2c5e8f1b7d4
+Revises: f1a6d3c8b2e5
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2c5e8f1b7d4'
+down_revision = 'f1a6d3c8b2e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Clave de idempotencia para ventas sincronizadas desde el POS offline
+    - Índice único (tienda_id, idempotency_key): las ventas sin clave (NULL)
+      no colisionan entre sí
+    """
+    op.add_column('ventas', sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+    op.create_index(
+        'ix_ventas_tienda_idempotency_key', 'ventas',
+        ['tienda_id', 'idempotency_key'], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ventas_tienda_idempotency_key', table_name='ventas')
+    op.drop_column('ventas', 'idempotency_key')
@@ -0,0 +1,44 @@
+"""stock_snapshots
+
+Revision ID: a8c4f2e6d1b9
+Revises: e5a1c9f7b2d8
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c4f2e6d1b9'
+down_revision = 'e5a1c9f7b2d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Checkpoints de saldo del ledger para consultas de stock a una fecha
+    - PK (snapshot_at, variant_id, location_id): el INSERT ... ON CONFLICT
+      DO NOTHING hace idempotente reescribir un checkpoint
+    - (tienda_id, snapshot_at) para encontrar el checkpoint más cercano
+    """
+    op.create_table(
+        'stock_snapshots',
+        sa.Column('snapshot_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('variant_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('location_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('tienda_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['variant_id'], ['product_variants.variant_id']),
+        sa.ForeignKeyConstraint(['location_id'], ['locations.location_id']),
+        sa.ForeignKeyConstraint(['tienda_id'], ['tiendas.id']),
+        sa.PrimaryKeyConstraint('snapshot_at', 'variant_id', 'location_id')
+    )
+    op.create_index('ix_stock_snapshots_tienda_snapshot_at', 'stock_snapshots', ['tienda_id', 'snapshot_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stock_snapshots_tienda_snapshot_at', table_name='stock_snapshots')
+    op.drop_table('stock_snapshots')
@@ -0,0 +1,198 @@
+"""partition_ventas
+
+Revision ID: b3e7d5a9c2f4
+Revises: a8c4f2e6d1b9
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e7d5a9c2f4'
+down_revision = 'a8c4f2e6d1b9'
+branch_labels = None
+depends_on = None
+
+
+MONTHS_AHEAD = 3
+
+# Tablas con FK simple a ventas.id sin columna de fecha: pierden la FK
+# (una FK a una tabla particionada debe incluir la clave de partición)
+SIDE_REFERENCES = [
+    ('gift_cards', 'venta_origen_id'),
+    ('promocion_usos', 'venta_id'),
+    ('rfid_scan_sessions', 'venta_id'),
+    ('gift_card_usos', 'venta_id'),
+    ('rfid_tags', 'venta_id'),
+    ('wallet_transactions', 'venta_id'),
+]
+
+
+def _add_months(value, months: int):
+    total = value.year * 12 + value.month - 1 + months
+    return value.replace(year=total // 12, month=total % 12 + 1, day=1)
+
+
+def _partition(conn, table: str, pk: str, unique: dict) -> None:
+    """
+    Convierte `table` en particionada por RANGE(fecha), enganchando la tabla
+    actual entera como `{table}_p_historico` (mismo esquema que e5a1c9f7b2d8)
+
+    Los índices existentes se recrean en el padre con su misma definición
+    (btree de fecha -> BRIN). `unique`: índice único -> definición nueva,
+    con la clave de partición agregada.
+    """
+    legacy = f"{table}_p_historico"
+    mes_actual = datetime.now(timezone.utc).date().replace(day=1)
+
+    ultimo = conn.execute(sa.text(f"SELECT max(fecha) FROM {table}")).scalar()
+    limite = max(_add_months((ultimo.date() if ultimo else mes_actual), 1), mes_actual)
+
+    indexes = conn.execute(sa.text(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+        "AND tablename = :table AND indexname <> :pkey"
+    ), {"table": table, "pkey": f"{table}_pkey"}).all()
+    fks = conn.execute(sa.text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(:table) AND contype = 'f'"
+    ), {"table": table}).all()
+
+    # 1. La tabla actual pasa a ser la partición histórica
+    op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    for name, _ in indexes:
+        op.execute(f"DROP INDEX {name}")
+    for name, _ in fks:
+        op.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {name}")
+    op.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_pkey")
+
+    # 2. Padre particionado con PK, FKs e índices
+    op.execute(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (fecha)"
+    )
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({pk})")
+    for name, definition in fks:
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+    for name, definition in indexes:
+        if name in unique:
+            op.execute(unique[name])
+        elif name == f"ix_{table}_fecha":
+            op.execute(f"CREATE INDEX ix_{table}_fecha_brin ON {table} USING brin (fecha)")
+        else:
+            op.execute(definition)
+
+    # 3. Historia + meses nuevos
+    op.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+        f"FOR VALUES FROM (MINVALUE) TO ('{limite.isoformat()}')"
+    )
+    mes = limite
+    while mes <= _add_months(mes_actual, MONTHS_AHEAD):
+        op.execute(
+            f"CREATE TABLE {table}_p{mes:%Y_%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{_add_months(mes, 1).isoformat()}')"
+        )
+        mes = _add_months(mes, 1)
+
+
+def upgrade() -> None:
+    """
+    Particionado mensual por RANGE(fecha) de ventas y detalles_venta
+    - PK (id, fecha) y el índice de idempotencia (tienda_id,
+      idempotency_key, fecha): Postgres exige la clave de partición en toda
+      restricción única. Los reintentos offline traen la fecha original
+    - detalles_venta.fecha y facturas.venta_fecha: copia de la fecha de la
+      venta (backfill acá, la escriben sales_worker y offline_sales_service).
+      Las FKs pasan a (venta_id, fecha) -> ventas(id, fecha) y los joins
+      detalle-venta por ambas columnas podan las dos tablas con el rango
+      de fechas del reporte
+    - Las demás tablas con venta_id (SIDE_REFERENCES) quedan sin FK
+    - Reescribe detalles_venta para el backfill y valida los rangos al
+      enganchar: correr en ventana de mantenimiento
+    """
+    conn = op.get_bind()
+
+    # 1. Fecha de la venta en detalles y facturas
+    op.add_column('detalles_venta', sa.Column('fecha', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE detalles_venta d SET fecha = v.fecha FROM ventas v WHERE v.id = d.venta_id")
+    op.alter_column('detalles_venta', 'fecha', nullable=False)
+    op.add_column('facturas', sa.Column('venta_fecha', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE facturas f SET venta_fecha = v.fecha FROM ventas v WHERE v.id = f.venta_id")
+    op.alter_column('facturas', 'venta_fecha', nullable=False)
+
+    # 2. FKs a ventas.id (dejaría de ser única)
+    referencias = conn.execute(sa.text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE confrelid = 'ventas'::regclass AND contype = 'f'"
+    )).all()
+    for table, name in referencias:
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+
+    # 3. Particionado
+    _partition(conn, 'ventas', 'id, fecha', {
+        'ix_ventas_tienda_idempotency_key': (
+            "CREATE UNIQUE INDEX ix_ventas_tienda_idempotency_key "
+            "ON ventas (tienda_id, idempotency_key, fecha)"
+        ),
+    })
+    _partition(conn, 'detalles_venta', 'id, fecha', {})
+
+    # 4. FKs compuestas
+    op.create_foreign_key(
+        'detalles_venta_venta_id_fecha_fkey', 'detalles_venta', 'ventas',
+        ['venta_id', 'fecha'], ['id', 'fecha']
+    )
+    op.create_foreign_key(
+        'facturas_venta_id_venta_fecha_fkey', 'facturas', 'ventas',
+        ['venta_id', 'venta_fecha'], ['id', 'fecha']
+    )
+
+
+def downgrade() -> None:
+    """Vuelve a tablas planas copiando las filas (incluye solo particiones enganchadas)"""
+    conn = op.get_bind()
+
+    op.drop_constraint('facturas_venta_id_venta_fecha_fkey', 'facturas', type_='foreignkey')
+    op.drop_constraint('detalles_venta_venta_id_fecha_fkey', 'detalles_venta', type_='foreignkey')
+
+    for table in ('detalles_venta', 'ventas'):
+        indexes = conn.execute(sa.text(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+            "AND tablename = :table AND indexname <> :pkey"
+        ), {"table": table, "pkey": f"{table}_pkey"}).all()
+        fks = conn.execute(sa.text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(:table) AND contype = 'f'"
+        ), {"table": table}).all()
+
+        plain = f"{table}_plain"
+        op.execute(f"CREATE TABLE {plain} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        op.execute(f"INSERT INTO {plain} SELECT * FROM {table}")
+        op.execute(f"DROP TABLE {table} CASCADE")
+        op.execute(f"ALTER TABLE {plain} RENAME TO {table}")
+
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+        for name, definition in fks:
+            op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+        for name, definition in indexes:
+            if name == 'ix_ventas_tienda_idempotency_key':
+                op.execute(
+                    "CREATE UNIQUE INDEX ix_ventas_tienda_idempotency_key "
+                    "ON ventas (tienda_id, idempotency_key)"
+                )
+            elif name == f"ix_{table}_fecha_brin":
+                op.execute(f"CREATE INDEX ix_{table}_fecha ON {table} (fecha)")
+            else:
+                op.execute(definition.replace(" ONLY ", " "))
+
+    op.create_foreign_key(None, 'detalles_venta', 'ventas', ['venta_id'], ['id'])
+    op.create_foreign_key(None, 'facturas', 'ventas', ['venta_id'], ['id'])
+    for table, column in SIDE_REFERENCES:
+        op.create_foreign_key(None, table, 'ventas', [column], ['id'])
+
+    op.drop_column('facturas', 'venta_fecha')
+    op.drop_column('detalles_venta', 'fecha')
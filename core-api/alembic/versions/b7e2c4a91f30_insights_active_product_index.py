@@ -0,0 +1,33 @@
+"""insights_active_product_index
+
+Revision ID: b7e2c4a91f30
+Revises: 794d75ec6fed
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c4a91f30'
+down_revision = '794d75ec6fed'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Índice parcial para el anti-join de InsightService:
+    insights activos por (tienda, tipo, extra_data->>'producto_id')
+    """
+    op.create_index(
+        'ix_insights_active_producto',
+        'insights',
+        ['tienda_id', 'tipo', sa.text("(extra_data ->> 'producto_id')")],
+        postgresql_where=sa.text('is_active')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_insights_active_producto', table_name='insights')
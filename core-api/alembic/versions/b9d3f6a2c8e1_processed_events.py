@@ -0,0 +1,40 @@
+"""processed_events
+
+Revision ID: b9d3f6a2c8e1
+Revises: a2c5e8f1b7d4
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9d3f6a2c8e1'
+down_revision = 'a2c5e8f1b7d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Tabla de deduplicación de eventos para los consumers de RabbitMQ
+    - PK (consumer, event_id): el INSERT ... ON CONFLICT DO NOTHING del lote
+      hace a la vez el chequeo y el registro
+    - processed_at indexado para la purga por antigüedad
+    """
+    op.create_table(
+        'processed_events',
+        sa.Column('consumer', sa.String(length=100), nullable=False),
+        sa.Column('event_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('tienda_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('processed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('consumer', 'event_id')
+    )
+    op.create_index('ix_processed_events_processed_at', 'processed_events', ['processed_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_processed_events_processed_at', table_name='processed_events')
+    op.drop_table('processed_events')
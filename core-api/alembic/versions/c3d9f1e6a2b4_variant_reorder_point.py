@@ -0,0 +1,30 @@
+"""variant_reorder_point
+
+Revision ID: c3d9f1e6a2b4
+Revises: b7e2c4a91f30
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d9f1e6a2b4'
+down_revision = 'b7e2c4a91f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Punto de reorden configurable por variante (alertas de stock edge-triggered)
+    """
+    op.add_column(
+        'product_variants',
+        sa.Column('reorder_point', sa.Float(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('product_variants', 'reorder_point')
@@ -0,0 +1,45 @@
+"""ledger_keyset_indexes
+
+Revision ID: c7e2a9d4f1b3
+Revises: b9d3f6a2c8e1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2a9d4f1b3'
+down_revision = 'b9d3f6a2c8e1'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_inventory_ledger_tienda_occurred', ['tienda_id', 'occurred_at', 'transaction_id']),
+    ('ix_inventory_ledger_tienda_variant_occurred', ['tienda_id', 'variant_id', 'occurred_at', 'transaction_id']),
+    ('ix_inventory_ledger_tienda_location_occurred', ['tienda_id', 'location_id', 'occurred_at', 'transaction_id']),
+    ('ix_inventory_ledger_tienda_type_occurred', ['tienda_id', 'transaction_type', 'occurred_at', 'transaction_id']),
+]
+
+
+def upgrade() -> None:
+    """
+    Índices del historial del ledger paginado por keyset
+    - Uno por combinación de filtro, terminando en (occurred_at, transaction_id)
+    - CONCURRENTLY: el ledger es la tabla más grande y recibe escrituras
+      de cada venta; no se bloquea durante la creación
+    - ix_inventory_ledger_tienda_id queda cubierto por el prefijo de
+      ix_inventory_ledger_tienda_occurred
+    """
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'inventory_ledger', columns, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_inventory_ledger_tienda_id', table_name='inventory_ledger', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_inventory_ledger_tienda_id', 'inventory_ledger', ['tienda_id'], postgresql_concurrently=True, if_not_exists=True)
+        for name, _ in INDEXES:
+            op.drop_index(name, table_name='inventory_ledger', postgresql_concurrently=True, if_exists=True)
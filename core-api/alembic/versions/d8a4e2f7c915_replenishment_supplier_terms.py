@@ -0,0 +1,61 @@
+"""replenishment_supplier_terms
+
+Revision ID: d8a4e2f7c915
+Revises: c3d9f1e6a2b4
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a4e2f7c915'
+down_revision = 'c3d9f1e6a2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Condiciones de compra para reposición automática:
+    - Proveedor habitual, costo, MOQ y bulto por variante
+    - Lead time por proveedor
+    - Detalles de orden por variante (producto legacy pasa a opcional)
+    """
+    op.add_column('product_variants', sa.Column('proveedor_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('product_variants', sa.Column('cost_price', sa.Float(), nullable=True))
+    op.add_column('product_variants', sa.Column('min_order_qty', sa.Float(), nullable=True))
+    op.add_column('product_variants', sa.Column('pack_size', sa.Float(), nullable=True))
+    op.create_foreign_key(
+        'fk_product_variants_proveedor_id', 'product_variants', 'proveedores',
+        ['proveedor_id'], ['id']
+    )
+    op.create_index('ix_product_variants_proveedor_id', 'product_variants', ['proveedor_id'])
+
+    op.add_column('proveedores', sa.Column('lead_time_dias', sa.Integer(), nullable=True))
+
+    op.add_column('detalles_orden', sa.Column('variant_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key(
+        'fk_detalles_orden_variant_id', 'detalles_orden', 'product_variants',
+        ['variant_id'], ['variant_id']
+    )
+    op.create_index('ix_detalles_orden_variant_id', 'detalles_orden', ['variant_id'])
+    op.alter_column('detalles_orden', 'producto_id', existing_type=postgresql.UUID(as_uuid=True), nullable=True)
+
+
+def downgrade() -> None:
+    op.alter_column('detalles_orden', 'producto_id', existing_type=postgresql.UUID(as_uuid=True), nullable=False)
+    op.drop_index('ix_detalles_orden_variant_id', table_name='detalles_orden')
+    op.drop_constraint('fk_detalles_orden_variant_id', 'detalles_orden', type_='foreignkey')
+    op.drop_column('detalles_orden', 'variant_id')
+
+    op.drop_column('proveedores', 'lead_time_dias')
+
+    op.drop_index('ix_product_variants_proveedor_id', table_name='product_variants')
+    op.drop_constraint('fk_product_variants_proveedor_id', 'product_variants', type_='foreignkey')
+    op.drop_column('product_variants', 'pack_size')
+    op.drop_column('product_variants', 'min_order_qty')
+    op.drop_column('product_variants', 'cost_price')
+    op.drop_column('product_variants', 'proveedor_id')
@@ -0,0 +1,102 @@
+"""cash_session_running_totals
+
+Revision ID: e4b7c1d9a3f2
+Revises: d8a4e2f7c915
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c1d9a3f2'
+down_revision = 'd8a4e2f7c915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Totales acumulados por sesión de caja:
+    - Ventas (efectivo / otros), ingresos, egresos y cantidad de tickets
+    - Venta.sesion_caja_id para reconciliar contra las filas crudas
+    """
+    op.add_column('sesiones_caja', sa.Column('total_ventas_efectivo', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('sesiones_caja', sa.Column('total_ventas_otros', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('sesiones_caja', sa.Column('total_ingresos', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('sesiones_caja', sa.Column('total_egresos', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('sesiones_caja', sa.Column('cantidad_tickets', sa.Integer(), nullable=False, server_default='0'))
+
+    op.add_column('ventas', sa.Column('sesion_caja_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key(
+        'fk_ventas_sesion_caja_id', 'ventas', 'sesiones_caja',
+        ['sesion_caja_id'], ['id']
+    )
+    op.create_index('ix_ventas_sesion_caja_id', 'ventas', ['sesion_caja_id'])
+
+    # Ventas de las sesiones abiertas al migrar: su cierre se calculaba con
+    # las ventas de la tienda desde la apertura; se asocian a la sesión de la
+    # tienda abierta más recientemente antes de cada venta. Las ventas de
+    # sesiones ya cerradas quedan sin sesión (su cierre ya está calculado)
+    op.execute("""
+        UPDATE ventas v
+        SET sesion_caja_id = (
+            SELECT s.id FROM sesiones_caja s
+            WHERE s.estado = 'abierta'
+              AND s.tienda_id = v.tienda_id
+              AND s.fecha_apertura <= v.created_at
+            ORDER BY s.fecha_apertura DESC
+            LIMIT 1
+        )
+        WHERE EXISTS (
+            SELECT 1 FROM sesiones_caja s
+            WHERE s.estado = 'abierta'
+              AND s.tienda_id = v.tienda_id
+              AND s.fecha_apertura <= v.created_at
+        )
+    """)
+    op.execute("""
+        UPDATE sesiones_caja s
+        SET total_ventas_efectivo = t.efectivo,
+            total_ventas_otros = t.otros,
+            cantidad_tickets = t.tickets
+        FROM (
+            SELECT sesion_caja_id,
+                   COALESCE(SUM(total) FILTER (WHERE metodo_pago = 'efectivo'), 0) AS efectivo,
+                   COALESCE(SUM(total) FILTER (WHERE metodo_pago <> 'efectivo'), 0) AS otros,
+                   COUNT(*) AS tickets
+            FROM ventas
+            WHERE sesion_caja_id IS NOT NULL AND status_pago <> 'anulado'
+            GROUP BY sesion_caja_id
+        ) t
+        WHERE t.sesion_caja_id = s.id
+    """)
+
+    # Backfill de movimientos manuales
+    op.execute("""
+        UPDATE sesiones_caja s
+        SET total_ingresos = m.ingresos,
+            total_egresos = m.egresos
+        FROM (
+            SELECT sesion_id,
+                   COALESCE(SUM(monto) FILTER (WHERE tipo = 'INGRESO'), 0) AS ingresos,
+                   COALESCE(SUM(monto) FILTER (WHERE tipo = 'EGRESO'), 0) AS egresos
+            FROM movimientos_caja
+            GROUP BY sesion_id
+        ) m
+        WHERE m.sesion_id = s.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ventas_sesion_caja_id', table_name='ventas')
+    op.drop_constraint('fk_ventas_sesion_caja_id', 'ventas', type_='foreignkey')
+    op.drop_column('ventas', 'sesion_caja_id')
+
+    op.drop_column('sesiones_caja', 'cantidad_tickets')
+    op.drop_column('sesiones_caja', 'total_egresos')
+    op.drop_column('sesiones_caja', 'total_ingresos')
+    op.drop_column('sesiones_caja', 'total_ventas_otros')
+    op.drop_column('sesiones_caja', 'total_ventas_efectivo')
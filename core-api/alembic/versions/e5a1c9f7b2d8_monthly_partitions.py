@@ -0,0 +1,149 @@
+"""monthly_partitions
+
+Revision ID: e5a1c9f7b2d8
+Revises: c7e2a9d4f1b3
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1c9f7b2d8'
+down_revision = 'c7e2a9d4f1b3'
+branch_labels = None
+depends_on = None
+
+
+MONTHS_AHEAD = 3
+
+TABLES = {
+    'inventory_ledger': {
+        'column': 'occurred_at',
+        'pk': ['transaction_id'],
+        'fks': [
+            ('location_id', 'locations(location_id)'),
+            ('tienda_id', 'tiendas(id)'),
+            ('variant_id', 'product_variants(variant_id)'),
+        ],
+        'indexes': [
+            ('ix_inventory_ledger_location_id', 'btree', 'location_id'),
+            ('ix_inventory_ledger_variant_id', 'btree', 'variant_id'),
+            ('ix_inventory_ledger_transaction_type', 'btree', 'transaction_type'),
+            ('ix_inventory_ledger_tienda_occurred', 'btree', 'tienda_id, occurred_at, transaction_id'),
+            ('ix_inventory_ledger_tienda_variant_occurred', 'btree', 'tienda_id, variant_id, occurred_at, transaction_id'),
+            ('ix_inventory_ledger_tienda_location_occurred', 'btree', 'tienda_id, location_id, occurred_at, transaction_id'),
+            ('ix_inventory_ledger_tienda_type_occurred', 'btree', 'tienda_id, transaction_type, occurred_at, transaction_id'),
+        ],
+        'time_index': 'ix_inventory_ledger_occurred_at',
+    },
+    'audit_logs': {
+        'column': 'timestamp',
+        'pk': ['id'],
+        'fks': [
+            ('tienda_id', 'tiendas(id)'),
+            ('user_id', 'users(id)'),
+        ],
+        'indexes': [
+            ('idx_audit_action_sensitive', 'btree', 'action, is_sensitive'),
+            ('idx_audit_payload_after', 'gin', 'payload_after'),
+            ('idx_audit_payload_before', 'gin', 'payload_before'),
+            ('idx_audit_resource', 'btree', 'resource_type, resource_id'),
+            ('idx_audit_tienda_timestamp', 'btree', 'tienda_id, "timestamp"'),
+            ('idx_audit_user_timestamp', 'btree', 'user_id, "timestamp"'),
+            ('ix_audit_logs_action', 'btree', 'action'),
+            ('ix_audit_logs_id', 'btree', 'id'),
+            ('ix_audit_logs_request_id', 'btree', 'request_id'),
+            ('ix_audit_logs_resource_id', 'btree', 'resource_id'),
+            ('ix_audit_logs_resource_type', 'btree', 'resource_type'),
+            ('ix_audit_logs_tienda_id', 'btree', 'tienda_id'),
+            ('ix_audit_logs_user_id', 'btree', 'user_id'),
+        ],
+        'time_index': 'ix_audit_logs_timestamp',
+    },
+}
+
+
+def _add_months(value: date, months: int) -> date:
+    total = value.year * 12 + value.month - 1 + months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _create_indexes(table: str, spec: dict) -> None:
+    for name, using, columns in spec['indexes']:
+        op.execute(f"CREATE INDEX {name} ON {table} USING {using} ({columns})")
+
+
+def upgrade() -> None:
+    """
+    Particionado mensual por RANGE de inventory_ledger y audit_logs
+    - La tabla existente se engancha entera como `{tabla}_p_historico`
+      (MINVALUE hasta el mes siguiente al último registro): sin copiar datos.
+      El ATTACH valida el rango y construye en ella los índices del padre:
+      correr en ventana de mantenimiento
+    - PK (id, columna de tiempo): Postgres exige la clave de partición en
+      toda restricción única
+    - BRIN sobre la columna de tiempo en lugar del btree: el orden físico
+      sigue al tiempo (append-only) y el índice ocupa unos pocos KB
+    - Particiones del mes actual y MONTHS_AHEAD meses más; el resto las crea
+      workers/partition_maintenance.py
+    """
+    conn = op.get_bind()
+    mes_actual = datetime.now(timezone.utc).date().replace(day=1)
+
+    for table, spec in TABLES.items():
+        column = '"%s"' % spec['column']
+        legacy = f"{table}_p_historico"
+
+        ultimo = conn.execute(sa.text(f"SELECT max({column}) FROM {table}")).scalar()
+        limite = _add_months((ultimo.date() if ultimo else mes_actual).replace(day=1), 1)
+        limite = max(limite, mes_actual)
+
+        # 1. La tabla actual pasa a ser la partición histórica
+        op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        for name, _, _ in spec['indexes']:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        op.execute(f"DROP INDEX IF EXISTS {spec['time_index']}")
+        op.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_pkey")
+
+        # 2. Tabla padre particionada con PK, FKs e índices (vacía: instantáneo)
+        op.execute(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ({column})")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({', '.join(spec['pk'])}, {column})")
+        for fk_column, target in spec['fks']:
+            op.execute(f"ALTER TABLE {table} ADD FOREIGN KEY ({fk_column}) REFERENCES {target}")
+        _create_indexes(table, spec)
+        op.execute(f"CREATE INDEX {spec['time_index']}_brin ON {table} USING brin ({column})")
+
+        # 3. Historia + meses nuevos
+        op.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{limite.isoformat()}')"
+        )
+        mes = limite
+        while mes <= _add_months(mes_actual, MONTHS_AHEAD):
+            op.execute(
+                f"CREATE TABLE {table}_p{mes:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{_add_months(mes, 1).isoformat()}')"
+            )
+            mes = _add_months(mes, 1)
+
+
+def downgrade() -> None:
+    """Vuelve a tablas planas copiando las filas (incluye solo particiones enganchadas)"""
+    for table, spec in TABLES.items():
+        column = '"%s"' % spec['column']
+        plain = f"{table}_plain"
+
+        op.execute(f"CREATE TABLE {plain} (LIKE {table} INCLUDING DEFAULTS)")
+        op.execute(f"INSERT INTO {plain} SELECT * FROM {table}")
+        op.execute(f"DROP TABLE {table} CASCADE")
+        op.execute(f"ALTER TABLE {plain} RENAME TO {table}")
+
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({', '.join(spec['pk'])})")
+        for fk_column, target in spec['fks']:
+            op.execute(f"ALTER TABLE {table} ADD FOREIGN KEY ({fk_column}) REFERENCES {target}")
+        _create_indexes(table, spec)
+        op.execute(f"CREATE INDEX {spec['time_index']} ON {table} ({column})")
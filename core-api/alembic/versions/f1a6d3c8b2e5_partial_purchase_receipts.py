@@ -0,0 +1,34 @@
+"""partial_purchase_receipts
+
+Revision ID: f1a6d3c8b2e5
+Revises: e4b7c1d9a3f2
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a6d3c8b2e5'
+down_revision = 'e4b7c1d9a3f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Recepciones parciales de órdenes de compra:
+    - Cantidad recibida por detalle (las órdenes ya RECIBIDAS quedan completas)
+    """
+    op.add_column('detalles_orden', sa.Column('cantidad_recibida', sa.Float(), nullable=False, server_default='0'))
+    op.execute("""
+        UPDATE detalles_orden d
+        SET cantidad_recibida = d.cantidad
+        FROM ordenes_compra o
+        WHERE o.id = d.orden_id AND o.estado = 'RECIBIDA'
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('detalles_orden', 'cantidad_recibida')
@@ -2,7 +2,7 @@
 Rutas de Admin - Gestión de Tiendas y Usuarios
 Solo accesible para super_admin
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
@@ -10,7 +10,8 @@ from pydantic import BaseModel, EmailStr
 from core.db import get_session
 from api.deps import get_current_user
 from models import User, Tienda, Location, Size, Color
-from core.security import get_password_hash
+from core.security import get_password_hash_async
+from core.sql_instrumentation import ORDERS, get_route_stats, reset_route_stats
 import uuid
 
 router = APIRouter()
@@ -213,7 +214,7 @@ async def create_usuario(
     nuevo_usuario = User(
         id=uuid.uuid4(),
         email=usuario_data.email,
-        hashed_password=get_password_hash(usuario_data.password),
+        hashed_password=await get_password_hash_async(usuario_data.password),
         full_name=usuario_data.full_name,
         rol=usuario_data.rol,
         tienda_id=uuid.UUID(usuario_data.tienda_id),
@@ -354,7 +355,7 @@ async def onboarding_tienda(
         nuevo_usuario = User(
             id=uuid.uuid4(),
             email=data.email,
-            hashed_password=get_password_hash(data.password),
+            hashed_password=await get_password_hash_async(data.password),
             full_name=data.nombre_completo,
             rol=data.rol,
             tienda_id=nueva_tienda.id,
@@ -393,3 +394,30 @@ async def onboarding_tienda(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error en onboarding: {str(e)}"
         )
+
+
+@router.get("/sql-stats")
+async def sql_stats(
+    orden: str = Query("queries_promedio", description=f"Métrica: {', '.join(ORDERS)}"),
+    limit: int = Query(20, ge=1, le=200),
+    admin: User = Depends(require_super_admin)
+):
+    """
+    Rutas que más consultan la base (instrumentación SQL)
+    
+    Por ruta: requests, queries (total, promedio, máximo), ms de DB,
+    requests con N+1 probable y queries lentas. Acumulado del proceso
+    que atiende el request desde que arrancó.
+    """
+    if orden not in ORDERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"orden debe ser uno de: {', '.join(ORDERS)}"
+        )
+    return {"orden": orden, "rutas": get_route_stats(orden, limit)}
+
+
+@router.delete("/sql-stats", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_sql_stats(admin: User = Depends(require_super_admin)):
+    """Reiniciar el acumulado (p. ej. antes de medir un cambio)"""
+    reset_route_stats()
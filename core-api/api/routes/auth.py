@@ -8,7 +8,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 from core.db import get_session
-from core.security import verify_password, create_access_token
+from core.security import verify_and_update_password, create_access_token
 from models import User
 from schemas import Token, LoginRequest, RegisterRequest
 from api.deps import CurrentUser, CurrentTienda
@@ -17,6 +17,36 @@ from api.deps import CurrentUser, CurrentTienda
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
 
 
+async def _authenticate(session: AsyncSession, email: str, password: str) -> User:
+    """
+    Valida credenciales sin bloquear el event loop
+
+    bcrypt corre en el pool de hashing (core.security). Si el hash se
+    generó con otro costo, se regenera de forma transparente.
+    """
+    statement = select(User).where(User.email == email)
+    result = await session.execute(statement)
+    user = result.scalar_one_or_none()
+    
+    valido, nuevo_hash = (
+        await verify_and_update_password(password, user.hashed_password)
+        if user else (False, None)
+    )
+    if not valido:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Email o contraseña incorrectos",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    if nuevo_hash:
+        user.hashed_password = nuevo_hash
+        session.add(user)
+        await session.commit()
+    
+    return user
+
+
 @router.post("/login", response_model=Token)
 async def login(
     login_data: LoginRequest,
@@ -33,18 +63,8 @@ async def login(
     Returns:
         Token JWT con el user_id en el payload (sub)
     """
-    # Buscar usuario por email
-    statement = select(User).where(User.email == login_data.email)
-    result = await session.execute(statement)
-    user = result.scalar_one_or_none()
-    
-    # Validar existencia y password
-    if not user or not verify_password(login_data.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Email o contraseña incorrectos",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    # Buscar usuario por email y validar password
+    user = await _authenticate(session, login_data.email, login_data.password)
     
     # Validar que esté activo
     if not user.is_active:
@@ -98,7 +118,7 @@ async def register(
     - Cargar productos
     - Realizar ventas
     """
-    from core.security import get_password_hash
+    from core.security import get_password_hash_async
     from models import Tienda, Location, Size, Color
     from uuid import uuid4
     
@@ -138,7 +158,7 @@ async def register(
         user = User(
             id=uuid4(),
             email=registro.email,
-            hashed_password=get_password_hash(registro.password),
+            hashed_password=await get_password_hash_async(registro.password),
             full_name=registro.full_name,
             documento_tipo="DNI",
             documento_numero=registro.dni,  # Usar dni del schema
@@ -194,16 +214,7 @@ async def login_form(
     Útil para Swagger UI y herramientas OAuth2 estándar
     """
     # Buscar usuario por email (username en el form)
-    statement = select(User).where(User.email == form_data.username)
-    result = await session.execute(statement)
-    user = result.scalar_one_or_none()
-    
-    if not user or not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Email o contraseña incorrectos",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    user = await _authenticate(session, form_data.username, form_data.password)
     
     if not user.is_active:
         raise HTTPException(
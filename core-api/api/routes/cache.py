@@ -8,13 +8,12 @@ antes de comenzar operaciones de venta
 from typing import Annotated, List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 import redis.asyncio as redis
 from core.db import get_session
 from api.deps import CurrentTienda
-from models import Producto
-from core.redis_scripts import WARMUP_STOCK_SCRIPT, generate_stock_key
 from core.config import settings
+from services.stock_cache_service import warmup_tienda
+from services.stock_reconciliation_service import get_report
 from pydantic import BaseModel
 
 
@@ -52,12 +51,15 @@ async def warmup_cache(
     - Antes de eventos de alto tráfico (Black Friday, etc)
     
     GARANTÍAS:
-    - Usa script Lua para atomicidad
+    - Saldos en 1 query y SET NX EX en pipeline (miles de keys por round trip)
     - Solo cachea productos activos
-    - Sobrescribe valores existentes (idempotente)
+    - No pisa keys existentes (pueden tener reservas en curso): idempotente
+    
+    No es obligatorio antes de vender: el checkout carga las keys faltantes
+    desde la DB (read-through). Al arrancar, la API calienta todas las
+    tiendas en segundo plano (STOCK_WARMUP_ON_STARTUP).
     """
     redis_client = None
-    productos_cacheados = 0
     
     try:
         # Conectar a Redis
@@ -67,32 +69,7 @@ async def warmup_cache(
             decode_responses=True
         )
         
-        # Obtener todos los productos activos de la tienda
-        statement = select(Producto).where(
-            Producto.tienda_id == current_tienda.id,
-            Producto.is_active == True
-        )
-        
-        result = await session.execute(statement)
-        productos = result.scalars().all()
-        
-        # Cachear cada producto usando Lua script
-        for producto in productos:
-            stock_key = generate_stock_key(
-                str(current_tienda.id),
-                str(producto.id)
-            )
-            
-            # Ejecutar script Lua de warmup
-            result = await redis_client.eval(
-                WARMUP_STOCK_SCRIPT,
-                1,  # num_keys
-                stock_key,
-                float(producto.stock_actual)
-            )
-            
-            if result == 1:
-                productos_cacheados += 1
+        productos_cacheados = await warmup_tienda(redis_client, session, current_tienda.id)
         
         return WarmupResponse(
             productos_cacheados=productos_cacheados,
@@ -165,6 +142,26 @@ async def get_cache_stats() -> CacheStatsResponse:
             await redis_client.aclose()
 
 
+@router.get("/reconcile")
+async def get_reconcile_report(
+    current_tienda: CurrentTienda
+) -> dict:
+    """
+    🔍 ÚLTIMA RECONCILIACIÓN DE STOCK
+    
+    Reporte de la última pasada del reconciliador (workers/stock_reconciler.py)
+    para la tienda: keys revisadas, desvíos Redis vs DB confirmados y
+    corregidos, keys sin producto y ventas reservadas que nunca llegaron a la DB
+    """
+    reporte = await get_report(current_tienda.id)
+    if reporte is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Todavía no hay reconciliación para esta tienda"
+        )
+    return reporte
+
+
 @router.delete("/flush")
 async def flush_cache(
     current_tienda: CurrentTienda
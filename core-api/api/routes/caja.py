@@ -7,11 +7,12 @@ from uuid import UUID
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, and_
 from pydantic import BaseModel, Field
 from core.db import get_session
 from api.deps import CurrentUser, CurrentTienda
-from models import SesionCaja, MovimientoCaja, Venta
+from models import SesionCaja, MovimientoCaja
+from services.caja_service import CajaService, monto_esperado
 
 
 router = APIRouter(prefix="/caja", tags=["Caja"])
@@ -55,6 +56,12 @@ class SesionCajaRead(BaseModel):
     diferencia: Optional[float]
     estado: str
     usuario_id: UUID
+    total_ventas_efectivo: float = 0.0
+    total_ventas_otros: float = 0.0
+    total_ingresos: float = 0.0
+    total_egresos: float = 0.0
+    cantidad_tickets: int = 0
+    monto_esperado: float = 0.0
     movimientos: List[MovimientoCajaRead] = []
 
 
@@ -78,6 +85,87 @@ class CerrarCajaResponse(BaseModel):
     fecha_cierre: datetime
 
 
+class ReporteCajaResponse(BaseModel):
+    """Reporte X (sesión abierta, parcial) o Z (sesión cerrada, final)"""
+    tipo: str
+    sesion_id: UUID
+    usuario_id: UUID
+    estado: str
+    fecha_apertura: datetime
+    fecha_cierre: Optional[datetime]
+    monto_inicial: float
+    ventas_efectivo: float
+    ventas_otros: float
+    total_ventas: float
+    cantidad_tickets: int
+    total_ingresos: float
+    total_egresos: float
+    monto_esperado: float
+    monto_real: Optional[float]
+    diferencia: Optional[float]
+
+
+def _sesion_read(sesion: SesionCaja, movimientos: List[MovimientoCajaRead]) -> SesionCajaRead:
+    return SesionCajaRead(
+        id=sesion.id,
+        fecha_apertura=sesion.fecha_apertura,
+        fecha_cierre=sesion.fecha_cierre,
+        monto_inicial=sesion.monto_inicial,
+        monto_final=sesion.monto_final,
+        diferencia=sesion.diferencia,
+        estado=sesion.estado,
+        usuario_id=sesion.usuario_id,
+        total_ventas_efectivo=sesion.total_ventas_efectivo,
+        total_ventas_otros=sesion.total_ventas_otros,
+        total_ingresos=sesion.total_ingresos,
+        total_egresos=sesion.total_egresos,
+        cantidad_tickets=sesion.cantidad_tickets,
+        monto_esperado=monto_esperado(sesion),
+        movimientos=movimientos
+    )
+
+
+def _reporte(sesion: SesionCaja) -> ReporteCajaResponse:
+    """Arma el reporte X/Z desde los totales acumulados (sin agregaciones)"""
+    return ReporteCajaResponse(
+        tipo="X" if sesion.estado == "abierta" else "Z",
+        sesion_id=sesion.id,
+        usuario_id=sesion.usuario_id,
+        estado=sesion.estado,
+        fecha_apertura=sesion.fecha_apertura,
+        fecha_cierre=sesion.fecha_cierre,
+        monto_inicial=sesion.monto_inicial,
+        ventas_efectivo=sesion.total_ventas_efectivo,
+        ventas_otros=sesion.total_ventas_otros,
+        total_ventas=sesion.total_ventas_efectivo + sesion.total_ventas_otros,
+        cantidad_tickets=sesion.cantidad_tickets,
+        total_ingresos=sesion.total_ingresos,
+        total_egresos=sesion.total_egresos,
+        monto_esperado=monto_esperado(sesion),
+        monto_real=sesion.monto_final,
+        diferencia=sesion.diferencia
+    )
+
+
+async def _sesion_abierta(
+    session: AsyncSession,
+    usuario_id: UUID,
+    tienda_id: UUID,
+    for_update: bool = False
+) -> Optional[SesionCaja]:
+    statement = select(SesionCaja).where(
+        and_(
+            SesionCaja.usuario_id == usuario_id,
+            SesionCaja.tienda_id == tienda_id,
+            SesionCaja.estado == "abierta"
+        )
+    )
+    if for_update:
+        statement = statement.with_for_update()
+    result = await session.execute(statement)
+    return result.scalar_one_or_none()
+
+
 # ==================== ENDPOINTS ====================
 
 @router.post("/abrir", response_model=SesionCajaRead, status_code=status.HTTP_201_CREATED)
@@ -123,17 +211,7 @@ async def abrir_caja(
     await session.commit()
     await session.refresh(nueva_sesion)
     
-    return SesionCajaRead(
-        id=nueva_sesion.id,
-        fecha_apertura=nueva_sesion.fecha_apertura,
-        fecha_cierre=nueva_sesion.fecha_cierre,
-        monto_inicial=nueva_sesion.monto_inicial,
-        monto_final=nueva_sesion.monto_final,
-        diferencia=nueva_sesion.diferencia,
-        estado=nueva_sesion.estado,
-        usuario_id=nueva_sesion.usuario_id,
-        movimientos=[]
-    )
+    return _sesion_read(nueva_sesion, [])
 
 
 @router.get("/estado", response_model=EstadoCajaResponse)
@@ -150,15 +228,7 @@ async def obtener_estado_caja(
     - Si no tiene caja abierta, retorna tiene_caja_abierta=False
     """
     # Buscar sesión abierta del usuario
-    statement = select(SesionCaja).where(
-        and_(
-            SesionCaja.usuario_id == current_user.id,
-            SesionCaja.tienda_id == current_tienda.id,
-            SesionCaja.estado == "abierta"
-        )
-    )
-    result = await session.execute(statement)
-    sesion = result.scalar_one_or_none()
+    sesion = await _sesion_abierta(session, current_user.id, current_tienda.id)
     
     if not sesion:
         return EstadoCajaResponse(
@@ -187,17 +257,7 @@ async def obtener_estado_caja(
     
     return EstadoCajaResponse(
         tiene_caja_abierta=True,
-        sesion=SesionCajaRead(
-            id=sesion.id,
-            fecha_apertura=sesion.fecha_apertura,
-            fecha_cierre=sesion.fecha_cierre,
-            monto_inicial=sesion.monto_inicial,
-            monto_final=sesion.monto_final,
-            diferencia=sesion.diferencia,
-            estado=sesion.estado,
-            usuario_id=sesion.usuario_id,
-            movimientos=movimientos_read
-        )
+        sesion=_sesion_read(sesion, movimientos_read)
     )
 
 
@@ -217,15 +277,7 @@ async def registrar_movimiento(
     - El monto debe ser mayor a 0
     """
     # Buscar sesión abierta del usuario
-    statement = select(SesionCaja).where(
-        and_(
-            SesionCaja.usuario_id == current_user.id,
-            SesionCaja.tienda_id == current_tienda.id,
-            SesionCaja.estado == "abierta"
-        )
-    )
-    result = await session.execute(statement)
-    sesion = result.scalar_one_or_none()
+    sesion = await _sesion_abierta(session, current_user.id, current_tienda.id)
     
     if not sesion:
         raise HTTPException(
@@ -243,6 +295,8 @@ async def registrar_movimiento(
     )
     
     session.add(movimiento)
+    # ⚡ Acumular en la sesión (el cierre no vuelve a sumar movimientos)
+    await CajaService(session).registrar_movimiento(sesion.id, data.tipo, data.monto)
     await session.commit()
     await session.refresh(movimiento)
     
@@ -269,19 +323,13 @@ async def cerrar_caja(
     - Monto esperado = monto_inicial + ventas_efectivo + ingresos - egresos
     - Diferencia = monto_real - monto_esperado
     
+    ⚡ Lee los totales acumulados de la sesión (una fila, bloqueada para
+    que ninguna venta concurrente entre entre la lectura y el cierre)
+    
     Validaciones:
     - Debe existir una sesión de caja abierta
     """
-    # Buscar sesión abierta del usuario
-    statement = select(SesionCaja).where(
-        and_(
-            SesionCaja.usuario_id == current_user.id,
-            SesionCaja.tienda_id == current_tienda.id,
-            SesionCaja.estado == "abierta"
-        )
-    )
-    result = await session.execute(statement)
-    sesion = result.scalar_one_or_none()
+    sesion = await _sesion_abierta(session, current_user.id, current_tienda.id, for_update=True)
     
     if not sesion:
         raise HTTPException(
@@ -289,41 +337,9 @@ async def cerrar_caja(
             detail="No tienes una sesión de caja abierta."
         )
     
-    # Calcular ventas en efectivo desde la apertura de la sesión
-    statement_ventas = select(func.sum(Venta.total)).where(
-        and_(
-            Venta.tienda_id == current_tienda.id,
-            Venta.metodo_pago == "efectivo",
-            Venta.status_pago == "pagado",
-            Venta.created_at >= sesion.fecha_apertura
-        )
-    )
-    result_ventas = await session.execute(statement_ventas)
-    ventas_efectivo = result_ventas.scalar() or 0.0
-    
-    # Calcular total de ingresos manuales
-    statement_ingresos = select(func.sum(MovimientoCaja.monto)).where(
-        and_(
-            MovimientoCaja.sesion_id == sesion.id,
-            MovimientoCaja.tipo == "INGRESO"
-        )
-    )
-    result_ingresos = await session.execute(statement_ingresos)
-    total_ingresos = result_ingresos.scalar() or 0.0
-    
-    # Calcular total de egresos manuales
-    statement_egresos = select(func.sum(MovimientoCaja.monto)).where(
-        and_(
-            MovimientoCaja.sesion_id == sesion.id,
-            MovimientoCaja.tipo == "EGRESO"
-        )
-    )
-    result_egresos = await session.execute(statement_egresos)
-    total_egresos = result_egresos.scalar() or 0.0
-    
     # Calcular monto esperado y diferencia
-    monto_esperado = sesion.monto_inicial + ventas_efectivo + total_ingresos - total_egresos
-    diferencia = data.monto_real - monto_esperado
+    esperado = monto_esperado(sesion)
+    diferencia = data.monto_real - esperado
     
     # Actualizar la sesión
     sesion.fecha_cierre = datetime.utcnow()
@@ -338,12 +354,64 @@ async def cerrar_caja(
     return CerrarCajaResponse(
         sesion_id=sesion.id,
         monto_inicial=sesion.monto_inicial,
-        monto_esperado=monto_esperado,
+        monto_esperado=esperado,
         monto_real=data.monto_real,
         diferencia=diferencia,
-        ventas_efectivo=ventas_efectivo,
-        total_ingresos=total_ingresos,
-        total_egresos=total_egresos,
+        ventas_efectivo=sesion.total_ventas_efectivo,
+        total_ingresos=sesion.total_ingresos,
+        total_egresos=sesion.total_egresos,
         fecha_apertura=sesion.fecha_apertura,
         fecha_cierre=sesion.fecha_cierre
     )
+
+
+@router.get("/reporte-x", response_model=ReporteCajaResponse)
+async def reporte_x(
+    current_user: CurrentUser,
+    current_tienda: CurrentTienda,
+    session: Annotated[AsyncSession, Depends(get_session)]
+) -> ReporteCajaResponse:
+    """
+    Reporte X: corte parcial de la sesión abierta (no la cierra)
+    """
+    sesion = await _sesion_abierta(session, current_user.id, current_tienda.id)
+    
+    if not sesion:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No tienes una sesión de caja abierta."
+        )
+    
+    return _reporte(sesion)
+
+
+@router.get("/sesiones/{sesion_id}/reporte-z", response_model=ReporteCajaResponse)
+async def reporte_z(
+    sesion_id: UUID,
+    current_tienda: CurrentTienda,
+    session: Annotated[AsyncSession, Depends(get_session)]
+) -> ReporteCajaResponse:
+    """
+    Reporte Z: resumen final de una sesión cerrada
+    """
+    result = await session.execute(
+        select(SesionCaja).where(
+            SesionCaja.id == sesion_id,
+            SesionCaja.tienda_id == current_tienda.id
+        )
+    )
+    sesion = result.scalar_one_or_none()
+    
+    if not sesion:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sesión de caja no encontrada"
+        )
+    
+    if sesion.estado != "cerrada":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La sesión sigue abierta: usar el reporte X"
+        )
+    
+    return _reporte(sesion)
@@ -5,13 +5,15 @@ Gestión de órdenes de compra y actualización de inventario
 from typing import Annotated, List
 from uuid import UUID
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from pydantic import BaseModel, Field
 from core.db import get_session
 from api.deps import CurrentUser, CurrentTienda
-from models import Proveedor, OrdenCompra, DetalleOrden, Producto
+from models import Proveedor, OrdenCompra, DetalleOrden, Producto, ProductVariant
+from services.receiving_service import ReceivingService
+from services.replenishment_service import ReplenishmentService
 
 
 router = APIRouter(prefix="/compras", tags=["Compras"])
@@ -26,6 +28,7 @@ class ProveedorCreate(BaseModel):
     email: str | None = None
     telefono: str | None = None
     direccion: str | None = None
+    lead_time_dias: int | None = Field(None, ge=1, le=365)
 
 
 class ProveedorRead(BaseModel):
@@ -36,6 +39,7 @@ class ProveedorRead(BaseModel):
     email: str | None
     telefono: str | None
     direccion: str | None
+    lead_time_dias: int | None = None
     is_active: bool
     created_at: datetime
 
@@ -50,7 +54,8 @@ class DetalleOrdenCreate(BaseModel):
 class DetalleOrdenRead(BaseModel):
     """Response para detalle de orden"""
     id: UUID
-    producto_id: UUID
+    producto_id: UUID | None
+    variant_id: UUID | None = None
     cantidad: float
     precio_costo_unitario: float
     subtotal: float
@@ -76,14 +81,53 @@ class OrdenCompraRead(BaseModel):
     detalles: List[DetalleOrdenRead] = []
 
 
+class RecepcionItem(BaseModel):
+    """Cantidad a recibir de un detalle de la orden"""
+    detalle_id: UUID
+    cantidad: float = Field(..., ge=0)
+
+
+class RecibirOrdenRequest(BaseModel):
+    """Request para recepción (sin items = se recibe todo lo pendiente)"""
+    location_id: UUID | None = None
+    items: List[RecepcionItem] | None = None
+
+
 class RecibirOrdenResponse(BaseModel):
     """Response para recepción de orden"""
     orden_id: UUID
     estado: str
     productos_actualizados: int
+    unidades_recibidas: float = 0.0
     mensaje: str
 
 
+class CondicionesCompraUpdate(BaseModel):
+    """Request para configurar las condiciones de compra de una variante"""
+    proveedor_id: UUID | None = None
+    cost_price: float | None = Field(None, ge=0)
+    min_order_qty: float | None = Field(None, ge=0)
+    pack_size: float | None = Field(None, gt=0)
+
+
+class OrdenReposicionRead(BaseModel):
+    """Orden borrador generada por reposición automática"""
+    orden_id: UUID
+    proveedor_id: UUID
+    items: int
+    unidades: float
+    total: float
+
+
+class ReposicionResponse(BaseModel):
+    """Response del job de reposición automática"""
+    variantes_evaluadas: int
+    variantes_a_reponer: int
+    ordenes_creadas: int
+    dry_run: bool
+    ordenes: List[OrdenReposicionRead]
+
+
 # ==================== ENDPOINTS ====================
 
 @router.get("/proveedores", response_model=List[ProveedorRead])
@@ -112,6 +156,7 @@ async def listar_proveedores(
             email=p.email,
             telefono=p.telefono,
             direccion=p.direccion,
+            lead_time_dias=p.lead_time_dias,
             is_active=p.is_active,
             created_at=p.created_at
         )
@@ -134,6 +179,7 @@ async def crear_proveedor(
         email=data.email,
         telefono=data.telefono,
         direccion=data.direccion,
+        lead_time_dias=data.lead_time_dias,
         tienda_id=current_tienda.id
     )
     
@@ -148,6 +194,7 @@ async def crear_proveedor(
         email=nuevo_proveedor.email,
         telefono=nuevo_proveedor.telefono,
         direccion=nuevo_proveedor.direccion,
+        lead_time_dias=nuevo_proveedor.lead_time_dias,
         is_active=nuevo_proveedor.is_active,
         created_at=nuevo_proveedor.created_at
     )
@@ -194,6 +241,7 @@ async def listar_ordenes(
                     DetalleOrdenRead(
                         id=d.id,
                         producto_id=d.producto_id,
+                        variant_id=d.variant_id,
                         cantidad=d.cantidad,
                         precio_costo_unitario=d.precio_costo_unitario,
                         subtotal=d.subtotal
@@ -294,6 +342,7 @@ async def crear_orden(
             DetalleOrdenRead(
                 id=d.id,
                 producto_id=d.producto_id,
+                variant_id=d.variant_id,
                 cantidad=d.cantidad,
                 precio_costo_unitario=d.precio_costo_unitario,
                 subtotal=d.subtotal
@@ -303,97 +352,207 @@ async def crear_orden(
     )
 
 
+@router.put("/variantes/{variant_id}/condiciones")
+async def actualizar_condiciones_compra(
+    variant_id: UUID,
+    data: CondicionesCompraUpdate,
+    current_tienda: CurrentTienda,
+    session: Annotated[AsyncSession, Depends(get_session)]
+):
+    """
+    Configurar proveedor, costo, MOQ y bulto de una variante (reposición automática)
+    """
+    statement = select(ProductVariant).where(
+        and_(
+            ProductVariant.variant_id == variant_id,
+            ProductVariant.tienda_id == current_tienda.id
+        )
+    )
+    result = await session.execute(statement)
+    variant = result.scalar_one_or_none()
+    
+    if not variant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Variante no encontrada"
+        )
+    
+    if data.proveedor_id:
+        statement_proveedor = select(Proveedor.id).where(
+            and_(
+                Proveedor.id == data.proveedor_id,
+                Proveedor.tienda_id == current_tienda.id
+            )
+        )
+        if (await session.execute(statement_proveedor)).scalar_one_or_none() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Proveedor no encontrado"
+            )
+    
+    variant.proveedor_id = data.proveedor_id
+    variant.cost_price = data.cost_price
+    variant.min_order_qty = data.min_order_qty
+    variant.pack_size = data.pack_size
+    session.add(variant)
+    await session.commit()
+    
+    return {
+        "variant_id": str(variant.variant_id),
+        "proveedor_id": str(variant.proveedor_id) if variant.proveedor_id else None,
+        "cost_price": variant.cost_price,
+        "min_order_qty": variant.min_order_qty,
+        "pack_size": variant.pack_size
+    }
+
+
+@router.post("/reposicion/generar", response_model=ReposicionResponse)
+async def generar_reposicion(
+    current_tienda: CurrentTienda,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    days_lookback: int = Query(30, ge=7, le=90, description="Días de historia para el pronóstico"),
+    dry_run: bool = Query(False, description="Calcular sin crear las órdenes")
+) -> ReposicionResponse:
+    """
+    ⚡ Reposición automática
+    
+    Evalúa el punto de reorden de todas las variantes con proveedor asignado
+    y genera una orden BORRADOR por proveedor, respetando MOQ y tamaño de bulto.
+    La mercadería en órdenes abiertas se descuenta de lo que hay que pedir,
+    así que correr el job dos veces no duplica pedidos.
+    """
+    service = ReplenishmentService(session)
+    resumen = await service.generate_purchase_orders(
+        tienda_id=current_tienda.id,
+        days_lookback=days_lookback,
+        dry_run=dry_run
+    )
+    
+    if not dry_run:
+        await session.commit()
+    
+    return ReposicionResponse(**resumen)
+
+
+@router.patch("/ordenes/{orden_id}/confirmar", response_model=OrdenCompraRead)
+async def confirmar_orden(
+    orden_id: UUID,
+    current_tienda: CurrentTienda,
+    session: Annotated[AsyncSession, Depends(get_session)]
+) -> OrdenCompraRead:
+    """
+    Confirmar una orden BORRADOR (pasa a PENDIENTE de recepción)
+    """
+    statement = select(OrdenCompra).where(
+        and_(
+            OrdenCompra.id == orden_id,
+            OrdenCompra.tienda_id == current_tienda.id
+        )
+    )
+    result = await session.execute(statement)
+    orden = result.scalar_one_or_none()
+    
+    if not orden:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Orden no encontrada"
+        )
+    
+    if orden.estado != "BORRADOR":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Solo se pueden confirmar órdenes en borrador"
+        )
+    
+    orden.estado = "PENDIENTE"
+    session.add(orden)
+    await session.commit()
+    await session.refresh(orden)
+    
+    statement_proveedor = select(Proveedor).where(Proveedor.id == orden.proveedor_id)
+    result_proveedor = await session.execute(statement_proveedor)
+    proveedor = result_proveedor.scalar_one()
+    
+    return OrdenCompraRead(
+        id=orden.id,
+        proveedor_id=orden.proveedor_id,
+        proveedor_razon_social=proveedor.razon_social,
+        fecha_emision=orden.fecha_emision,
+        estado=orden.estado,
+        total=orden.total,
+        observaciones=orden.observaciones,
+        created_at=orden.created_at,
+        detalles=[]
+    )
+
+
 @router.post("/recibir/{orden_id}", response_model=RecibirOrdenResponse)
 async def recibir_orden(
     orden_id: UUID,
+    current_user: CurrentUser,
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(get_session)],
+    data: RecibirOrdenRequest | None = None
 ) -> RecibirOrdenResponse:
     """
     🔥 ENDPOINT CRÍTICO - Recepción de Mercadería
     
-    Procesa la recepción de una orden de compra:
-    1. Cambia el estado de la orden a RECIBIDA
-    2. Actualiza el stock de cada producto
-    3. Actualiza el precio de costo (último precio)
+    Procesa la recepción (total o parcial) de una orden de compra:
+    1. Registra entradas PURCHASE en el ledger (variantes)
+    2. Actualiza el precio de costo (último precio)
+    3. Cambia el estado de la orden a RECIBIDA o PARCIAL
+    
+    ⚡ Set-based: locks en orden determinístico, UPDATE ... FROM (VALUES ...)
+    y un INSERT multi-fila al ledger (ver services/receiving_service.py)
     
     ⚠️ Operación transaccional atómica
     """
+    data = data or RecibirOrdenRequest()
+    cantidades = None
+    if data.items is not None:
+        cantidades = {}
+        for item in data.items:
+            cantidades[item.detalle_id] = cantidades.get(item.detalle_id, 0.0) + item.cantidad
+    
     try:
-        # Buscar la orden y validar
-        statement = select(OrdenCompra).where(
-            and_(
-                OrdenCompra.id == orden_id,
-                OrdenCompra.tienda_id == current_tienda.id
-            )
+        resultado = await ReceivingService(session).receive(
+            orden_id,
+            current_tienda.id,
+            user_id=current_user.id,
+            cantidades=cantidades,
+            location_id=data.location_id
         )
-        result = await session.execute(statement)
-        orden = result.scalar_one_or_none()
         
-        if not orden:
+        if resultado is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Orden de compra no encontrada"
             )
         
-        if orden.estado != "PENDIENTE":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"La orden ya fue procesada. Estado actual: {orden.estado}"
-            )
-        
-        # Obtener detalles de la orden
-        statement_detalles = select(DetalleOrden).where(DetalleOrden.orden_id == orden_id)
-        result_detalles = await session.execute(statement_detalles)
-        detalles = result_detalles.scalars().all()
-        
-        productos_actualizados = 0
-        
-        # Procesar cada producto
-        for detalle in detalles:
-            # Buscar y bloquear el producto (SELECT FOR UPDATE)
-            statement_producto = select(Producto).where(
-                and_(
-                    Producto.id == detalle.producto_id,
-                    Producto.tienda_id == current_tienda.id
-                )
-            ).with_for_update()
-            
-            result_producto = await session.execute(statement_producto)
-            producto = result_producto.scalar_one_or_none()
-            
-            if not producto:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Producto {detalle.producto_id} no encontrado"
-                )
-            
-            # 🔥 ACTUALIZAR STOCK: Sumar la cantidad recibida
-            producto.stock_actual += detalle.cantidad
-            
-            # 🔥 ACTUALIZAR PRECIO DE COSTO: Lógica de "Último Precio"
-            producto.precio_costo = detalle.precio_costo_unitario
-            
-            session.add(producto)
-            productos_actualizados += 1
-        
-        # Cambiar estado de la orden a RECIBIDA
-        orden.estado = "RECIBIDA"
-        session.add(orden)
-        
         # ⚡ COMMIT ATÓMICO: Todo o nada
         await session.commit()
         
         return RecibirOrdenResponse(
-            orden_id=orden.id,
-            estado=orden.estado,
-            productos_actualizados=productos_actualizados,
-            mensaje=f"Orden recibida exitosamente. {productos_actualizados} productos actualizados."
+            orden_id=resultado["orden_id"],
+            estado=resultado["estado"],
+            productos_actualizados=resultado["lineas_recibidas"],
+            unidades_recibidas=resultado["unidades_recibidas"],
+            mensaje=(
+                f"Orden recibida exitosamente. {resultado['lineas_recibidas']} productos actualizados."
+                if resultado["estado"] == "RECIBIDA"
+                else f"Recepción parcial registrada. {resultado['lineas_recibidas']} productos actualizados."
+            )
         )
         
     except HTTPException:
         await session.rollback()
         raise
+    except ValueError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         await session.rollback()
         raise HTTPException(
@@ -426,10 +585,10 @@ async def cancelar_orden(
             detail="Orden no encontrada"
         )
     
-    if orden.estado != "PENDIENTE":
+    if orden.estado not in ("BORRADOR", "PENDIENTE"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Solo se pueden cancelar órdenes pendientes"
+            detail="Solo se pueden cancelar órdenes pendientes o en borrador"
         )
     
     orden.estado = "CANCELADA"
@@ -9,9 +9,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, desc
 from pydantic import BaseModel
 
-from core.db import get_session
+from core.db import get_read_session
 import logging
 from core.cache import cached
+from core.config import settings
 from models import Product, ProductVariant, InventoryLedger, Venta, DetalleVenta, Location
 from api.deps import CurrentTienda
 
@@ -65,7 +66,7 @@ class DashboardResumen(BaseModel):
 @cached(ttl_seconds=30, key_prefix="dashboard")  # Cache habilitado - 30 segundos
 async def obtener_dashboard_resumen(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(get_read_session)]
 ) -> DashboardResumen:
     """
     Endpoint principal del dashboard con todas las métricas consolidadas
@@ -176,7 +177,7 @@ async def obtener_dashboard_resumen(
     )
     productos_activos = (await session.execute(stmt_activos)).scalar() or 0
     
-    # Contar variantes bajo stock (con stock < 10)
+    # Contar variantes bajo stock (en o por debajo de su punto de reorden)
     # Primero obtenemos el stock actual por variante desde InventoryLedger
     stmt_bajo_stock = select(
         InventoryLedger.variant_id,
@@ -186,9 +187,11 @@ async def obtener_dashboard_resumen(
     ).where(
         ProductVariant.tienda_id == current_tienda.id
     ).group_by(
-        InventoryLedger.variant_id
+        InventoryLedger.variant_id, ProductVariant.reorder_point
     ).having(
-        func.sum(InventoryLedger.delta) <= 10
+        func.sum(InventoryLedger.delta) <= func.coalesce(
+            ProductVariant.reorder_point, settings.STOCK_REORDER_POINT_DEFAULT
+        )
     )
     result_bajo_stock = await session.execute(stmt_bajo_stock)
     productos_bajo_stock = len(result_bajo_stock.all())
@@ -263,7 +266,7 @@ async def obtener_dashboard_resumen(
 @router.get("/ventas-tiempo-real")
 async def obtener_ventas_tiempo_real(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(get_read_session)]
 ) -> dict:
     """
     Ventas de las últimas 24 horas agrupadas por hora (para gráfico en tiempo real)
@@ -11,7 +11,7 @@ from sqlalchemy import select, func, and_, desc
 import io
 import csv
 
-from core.db import get_session
+from core.db import get_read_session
 from models import Producto, Venta, DetalleVenta
 from api.deps import CurrentTienda
 
@@ -21,7 +21,7 @@ router = APIRouter(prefix="/exportar", tags=["Exportación"])
 @router.get("/productos/csv")
 async def exportar_productos_csv(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     solo_activos: bool = Query(True)
 ) -> StreamingResponse:
     """
@@ -73,7 +73,7 @@ async def exportar_productos_csv(
 @router.get("/ventas/csv")
 async def exportar_ventas_csv(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     fecha_desde: Optional[datetime] = None,
     fecha_hasta: Optional[datetime] = None
 ) -> StreamingResponse:
@@ -94,7 +94,7 @@ async def exportar_ventas_csv(
             Venta,
             func.count(DetalleVenta.id).label('cantidad_items')
         )
-        .outerjoin(DetalleVenta, Venta.id == DetalleVenta.venta_id)
+        .outerjoin(DetalleVenta, and_(Venta.id == DetalleVenta.venta_id, Venta.fecha == DetalleVenta.fecha))
         .where(
             and_(
                 Venta.tienda_id == current_tienda.id,
@@ -102,7 +102,7 @@ async def exportar_ventas_csv(
                 Venta.fecha <= fecha_hasta
             )
         )
-        .group_by(Venta.id)
+        .group_by(Venta.id, Venta.fecha)
         .order_by(Venta.fecha.desc())
     )
     
@@ -144,7 +144,7 @@ async def exportar_ventas_csv(
 @router.get("/reportes/rentabilidad/csv")
 async def exportar_rentabilidad_csv(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     fecha_desde: Optional[datetime] = None,
     fecha_hasta: Optional[datetime] = None
 ) -> StreamingResponse:
@@ -169,7 +169,7 @@ async def exportar_rentabilidad_csv(
     ).join(
         DetalleVenta, Producto.id == DetalleVenta.producto_id
     ).join(
-        Venta, DetalleVenta.venta_id == Venta.id
+        Venta, and_(DetalleVenta.venta_id == Venta.id, DetalleVenta.fecha == Venta.fecha)
     ).where(
         and_(
             Venta.tienda_id == current_tienda.id,
@@ -10,7 +10,7 @@ from fastapi import APIRouter, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from core.db import get_session, engine
+from core.db import get_session, engine, get_pool_stats, replica_router
 from core.config import settings
 from core.circuit_breaker import mercadopago_circuit, afip_circuit
 
@@ -169,6 +169,8 @@ async def system_metrics():
     return {
         "timestamp": datetime.utcnow().isoformat(),
         "database": db_check,
+        "db_pools": get_pool_stats(),
+        "read_replicas": replica_router.get_stats() if replica_router.replicas else None,
         "application": {
             "name": settings.PROJECT_NAME,
             "version": settings.VERSION,
@@ -177,6 +179,30 @@ async def system_metrics():
     }
 
 
+@router.get("/db-pools")
+async def db_pools_status():
+    """
+    Estado de los pools de conexiones por carga de trabajo
+    
+    Returns:
+        Por pool (oltp, reporting, background, réplicas): conexiones en uso,
+        saturación, esperas por un slot y timeouts. 503 si el pool OLTP
+        está saturado (los cajeros ya esperan conexión)
+    """
+    pools = get_pool_stats()
+    oltp = pools["oltp"]
+    saturado = oltp["saturacion"] is not None and oltp["saturacion"] >= 1
+    
+    return JSONResponse(
+        content={
+            "status": "saturated" if saturado else "healthy",
+            "timestamp": datetime.utcnow().isoformat(),
+            "pools": pools
+        },
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE if saturado else status.HTTP_200_OK
+    )
+
+
 @router.get("/circuits")
 async def circuit_breakers_status():
     """
@@ -7,9 +7,9 @@ from typing import Annotated, List
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, func, and_
 from sqlmodel import col
-from core.db import get_session
+from core.db import get_session, get_read_session, BackgroundSessionLocal
 from models import Insight
 from services.insight_service import insight_service
 from api.deps import CurrentTienda
@@ -49,7 +49,7 @@ class InsightRefreshResponse(BaseModel):
 @router.get("/", response_model=List[InsightRead])
 async def listar_insights(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     activos_solo: bool = Query(True, description="Mostrar solo insights activos"),
     nivel_urgencia: str = Query(None, description="Filtrar por urgencia: BAJA, MEDIA, ALTA, CRITICA"),
     tipo: str = Query(None, description="Filtrar por tipo: STOCK_BAJO, VENTAS_DIARIAS, etc."),
@@ -150,54 +150,63 @@ async def archivar_insight(
 async def refrescar_insights(
     current_tienda: CurrentTienda,
     session: Annotated[AsyncSession, Depends(get_session)],
-    force: bool = Query(False, description="Forzar generación aunque ya existan alertas recientes")
+    background_tasks: BackgroundTasks,
+    force: bool = Query(False, description="Archivar las alertas activas y regenerarlas en segundo plano")
 ) -> InsightRefreshResponse:
     """
-    Endpoint para forzar la generación de insights manualmente
+    Devuelve el estado actual de los insights de la tienda
     
-    Útil para:
-    - Demos y pruebas
-    - Refresh manual desde el dashboard
-    - Testing de la lógica de insights
+    ⚡ LECTURA BARATA: la generación corre en el job programado
+    (workers/insights_scheduler.py). Este endpoint solo cuenta los
+    insights activos por tipo con una consulta agregada.
     
     Args:
-        force: Si es True, genera insights aunque ya existan recientes
-               (útil para testing, pero puede crear duplicados)
+        force: Si es True, archiva los insights activos (UPDATE set-based)
+               y dispara la regeneración de esta tienda en segundo plano
     
     Returns:
-        Resumen de insights generados
+        Insights activos por tipo
     """
-    logger.info(f"Refrescando insights manualmente para tienda {current_tienda.id}")
+    logger.info(f"Refrescando insights para tienda {current_tienda.id} (force={force})")
     
     try:
-        # Si force=True, archivar insights antiguos para evitar duplicados
         if force:
-            statement = select(Insight).where(
-                and_(
-                    Insight.tienda_id == current_tienda.id,
-                    Insight.is_active == True
+            result = await session.execute(
+                update(Insight)
+                .where(
+                    and_(
+                        Insight.tienda_id == current_tienda.id,
+                        Insight.is_active == True
+                    )
                 )
+                .values(is_active=False)
             )
-            result = await session.execute(statement)
-            insights_antiguos = result.scalars().all()
-            
-            for insight in insights_antiguos:
-                insight.is_active = False
-                session.add(insight)
-            
             await session.commit()
-            logger.info(f"Archivados {len(insights_antiguos)} insights antiguos (force=True)")
+            logger.info(f"Archivados {result.rowcount} insights antiguos (force=True)")
+            
+            background_tasks.add_task(_generar_insights_tienda, current_tienda.id)
         
-        # Generar todos los insights
-        resultado = await insight_service.generate_all_insights(
-            tienda_id=current_tienda.id,
-            session=session
-        )
+        statement = select(
+            Insight.tipo,
+            func.count(Insight.id)
+        ).where(
+            and_(
+                Insight.tienda_id == current_tienda.id,
+                Insight.is_active == True
+            )
+        ).group_by(Insight.tipo)
+        
+        result = await session.execute(statement)
+        por_tipo = {tipo: count for tipo, count in result.all()}
+        total = sum(por_tipo.values())
         
         return InsightRefreshResponse(
-            mensaje="Insights actualizados exitosamente",
-            insights_generados=resultado,
-            total=resultado["total"]
+            mensaje=(
+                "Regeneración de insights iniciada en segundo plano"
+                if force else "Insights actualizados por el job programado"
+            ),
+            insights_generados=por_tipo,
+            total=total
         )
     
     except Exception as e:
@@ -208,10 +217,27 @@ async def refrescar_insights(
         )
 
 
+async def _generar_insights_tienda(tienda_id: UUID) -> None:
+    """
+    Tarea en segundo plano con su propia sesión
+    (la sesión del request ya está cerrada cuando corre la tarea)
+    """
+    logger.info(f"Iniciando generación de insights en background para tienda {tienda_id}")
+    async with BackgroundSessionLocal() as session:
+        try:
+            resultado = await insight_service.generate_all_insights(
+                tienda_id=tienda_id,
+                session=session
+            )
+            logger.info(f"Insights generados en background: {resultado}")
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Error en tarea de background: {str(e)}", exc_info=True)
+
+
 @router.post("/background-refresh", status_code=status.HTTP_202_ACCEPTED)
 async def refrescar_insights_background(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
     background_tasks: BackgroundTasks
 ) -> dict:
     """
@@ -221,20 +247,7 @@ async def refrescar_insights_background(
     
     Ideal para no bloquear la respuesta del API cuando hay muchos datos
     """
-    async def generar_insights_task():
-        """Tarea en segundo plano"""
-        logger.info(f"Iniciando generación de insights en background para tienda {current_tienda.id}")
-        try:
-            resultado = await insight_service.generate_all_insights(
-                tienda_id=current_tienda.id,
-                session=session
-            )
-            logger.info(f"Insights generados en background: {resultado}")
-        except Exception as e:
-            logger.error(f"Error en tarea de background: {str(e)}", exc_info=True)
-    
-    # Agregar tarea al background
-    background_tasks.add_task(generar_insights_task)
+    background_tasks.add_task(_generar_insights_tienda, current_tienda.id)
     
     return {
         "mensaje": "Generación de insights iniciada en segundo plano",
@@ -245,7 +258,7 @@ async def refrescar_insights_background(
 @router.get("/stats")
 async def estadisticas_insights(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(get_read_session)]
 ) -> dict:
     """
     Obtiene estadísticas de insights de la tienda
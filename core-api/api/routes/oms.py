@@ -5,7 +5,7 @@ Endpoints para gestión omnicanal de órdenes con smart routing
 from typing import Annotated, List, Optional
 from uuid import UUID
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
@@ -179,6 +179,74 @@ async def get_routing_decision(
     }
 
 
+@router.post("/ordenes/pending/re-route")
+async def re_route_pending_orders(
+    current_tienda: CurrentTienda,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    limit: int = Query(500, ge=1, le=5000, description="Máximo de órdenes por lote")
+):
+    """
+    ⚡ Re-routing en lote de órdenes pendientes
+    
+    Carga la matriz de stock (variante × ubicación) una sola vez, puntúa
+    todas las órdenes de forma vectorizada y asigna de la más antigua a la
+    más nueva, descontando las unidades asignadas para que dos órdenes no
+    reclamen el mismo stock.
+    
+    Las órdenes quedan bloqueadas (SKIP LOCKED) durante el lote: dos
+    ejecuciones concurrentes no procesan la misma orden.
+    """
+    result = await session.execute(
+        select(OrdenOmnicanal)
+        .where(
+            and_(
+                OrdenOmnicanal.tienda_id == current_tienda.id,
+                OrdenOmnicanal.fulfillment_status == "pending"
+            )
+        )
+        .order_by(OrdenOmnicanal.created_at.asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ordenes = result.scalars().all()
+    
+    routing_service = SmartRoutingService(session)
+    decisions = await routing_service.assign_batch(ordenes)
+    
+    asignadas = []
+    sin_ubicacion = []
+    assigned_at = datetime.utcnow()
+    
+    for orden in ordenes:
+        decision = decisions.get(orden.id)
+        if decision is None:
+            sin_ubicacion.append(str(orden.id))
+            continue
+        
+        location_id, decision_metadata = decision
+        orden.fulfillment_location_id = location_id
+        orden.routing_decision = decision_metadata
+        orden.fulfillment_status = "assigned"
+        orden.assigned_at = assigned_at
+        
+        asignadas.append({
+            "orden_id": orden.id,
+            "numero_orden": orden.numero_orden,
+            "fulfillment_location_id": location_id,
+            "location_name": decision_metadata["selected_name"]
+        })
+    
+    await session.commit()
+    
+    return {
+        "procesadas": len(ordenes),
+        "asignadas": len(asignadas),
+        "sin_ubicacion": len(sin_ubicacion),
+        "ordenes_asignadas": asignadas,
+        "ordenes_sin_ubicacion": sin_ubicacion
+    }
+
+
 @router.post("/ordenes/{orden_id}/re-route")
 async def re_route_order(
     orden_id: UUID,
@@ -230,7 +298,7 @@ async def get_pending_orders(
     Usa esto para monitorear órdenes que no pudieron
     ser asignadas automáticamente
     """
-    result = await session.exec(
+    result = await session.execute(
         select(OrdenOmnicanal)
         .where(
             and_(
@@ -241,7 +309,7 @@ async def get_pending_orders(
         .order_by(OrdenOmnicanal.created_at.desc())
     )
     
-    ordenes = result.all()
+    ordenes = result.scalars().all()
     
     return {
         "count": len(ordenes),
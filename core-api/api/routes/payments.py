@@ -9,10 +9,21 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 from core.db import get_session
-from models import Venta, DetalleVenta
-from services.payment_service import payment_service
+from core.event_bus import sync_event_publisher
+from models import Venta, DetalleVenta, Producto
+from schemas_models.ventas import VentaCreate
+from services.payment_service import item_mercadopago, payment_service
 from services.afip_service import afip_service
-from api.deps import CurrentTienda
+from services.cache_service import get_redis_client
+from services.reservation_service import (
+    CONFIRM_AFTER_RELEASE,
+    build_sale_event,
+    confirm_reservation,
+    create_reservation,
+    load_reservation,
+    release_reservation,
+)
+from api.deps import CurrentTienda, CurrentUser
 from datetime import datetime
 
 
@@ -70,22 +81,26 @@ async def generar_pago(
         
         # Obtener detalles de la venta para MercadoPago
         statement_detalles = select(DetalleVenta).where(
-            DetalleVenta.venta_id == venta_id
+            DetalleVenta.venta_id == venta_id,
+            DetalleVenta.fecha == venta.fecha
         )
         result_detalles = await session.execute(statement_detalles)
         detalles = result_detalles.scalars().all()
         
         # Preparar items en formato MercadoPago
-        items_mp = []
-        for detalle in detalles:
-            items_mp.append({
-                "title": f"Producto ID: {detalle.producto_id}",  # TODO: Cargar nombre real del producto
-                "quantity": int(detalle.cantidad),
-                "unit_price": float(detalle.precio_unitario),
-                "currency_id": "ARS"
-            })
+        items_mp = [
+            item_mercadopago(
+                f"Producto ID: {detalle.producto_id}",  # TODO: Cargar nombre real del producto
+                detalle.cantidad,
+                detalle.precio_unitario,
+                detalle.subtotal
+            )
+            for detalle in detalles
+        ]
         
-        # Crear preferencia en MercadoPago
+        # Crear preferencia en MercadoPago, sin transacción abierta: la API
+        # externa puede tardar más que idle_in_transaction_session_timeout
+        await session.commit()
         logger.info(f"Generando preferencia de pago para venta {venta_id}")
         
         preference_data = payment_service.create_preference(
@@ -121,6 +136,146 @@ async def generar_pago(
         )
 
 
+@router.post("/checkout")
+async def checkout_online(
+    venta_data: VentaCreate,
+    current_user: CurrentUser,
+    current_tienda: CurrentTienda,
+    session: Annotated[AsyncSession, Depends(get_session)]
+) -> Dict[str, Any]:
+    """
+    Checkout con pago online: reserva el stock y genera el link de pago
+    
+    Flujo:
+    1. Valida los productos (1 query)
+    2. Reserva el stock en Redis por RESERVATION_TTL_SECONDS
+    3. Crea la preferencia en Mercado Pago (external_reference = reserva)
+    4. El webhook confirma la venta o libera el stock; si el cliente
+       abandona el pago, el barrido de reservas lo libera al vencer
+    
+    Returns:
+        reserva_id: También será el ID de la venta al aprobarse el pago
+        init_point / qr_code_url: Para que el cliente pague
+        expira_en: Vencimiento de la reserva
+    """
+    producto_ids = {item.producto_id for item in venta_data.items}
+    productos = {
+        producto.id: producto for producto in (await session.execute(
+            select(Producto).where(Producto.id.in_(producto_ids), Producto.tienda_id == current_tienda.id)
+        )).scalars().all()
+    }
+    
+    items_validados = []
+    for item in venta_data.items:
+        producto = productos.get(item.producto_id)
+        if not producto:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Producto con ID {item.producto_id} no encontrado"
+            )
+        if not producto.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"El producto '{producto.nombre}' (SKU: {producto.sku}) está inactivo"
+            )
+        if producto.tipo != 'pesable' and item.cantidad != int(item.cantidad):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"El producto '{producto.nombre}' no permite cantidades decimales"
+            )
+        items_validados.append({
+            'producto_id': str(producto.id),
+            'producto_nombre': producto.nombre,
+            'producto_sku': producto.sku,
+            'cantidad': float(item.cantidad),
+            'precio_unitario': float(producto.precio_venta),
+            'subtotal': float(producto.precio_venta * item.cantidad)
+        })
+    
+    redis_client = await get_redis_client()
+    reserva_id, expira_en = await create_reservation(
+        redis_client,
+        session,
+        current_tienda.id,
+        current_user.id,
+        venta_data.metodo_pago,
+        items_validados
+    )
+    total = sum(item['subtotal'] for item in items_validados)
+    # Cerrar la transacción de lectura antes de llamar a Mercado Pago
+    await session.commit()
+    
+    try:
+        preference_data = payment_service.create_preference(
+            venta_id=UUID(reserva_id),
+            total=total,
+            items=[
+                item_mercadopago(
+                    item['producto_nombre'], item['cantidad'], item['precio_unitario'], item['subtotal']
+                )
+                for item in items_validados
+            ],
+            external_reference=reserva_id
+        )
+    except Exception as e:
+        # Sin link de pago la reserva no puede confirmarse: devolver el stock ya
+        await release_reservation(redis_client, reserva_id)
+        logger.error(f"Error al generar pago para reserva {reserva_id}: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Error al generar el pago: {str(e)}"
+        )
+    
+    return {
+        "reserva_id": reserva_id,
+        "preference_id": preference_data["preference_id"],
+        "init_point": preference_data["init_point"],
+        "sandbox_init_point": preference_data.get("sandbox_init_point"),
+        "qr_code_url": preference_data.get("qr_code_url"),
+        "total": total,
+        "expira_en": expira_en.isoformat(),
+        "mensaje": "Stock reservado hasta completar el pago"
+    }
+
+
+async def _resolver_reserva(reserva_id: str, status_pago_mp: str, payment_id: str) -> bool:
+    """
+    Confirma o libera la reserva de un checkout online
+    
+    Returns:
+        False si external_reference no es una reserva (venta generada con /generate)
+    
+    Raises:
+        HTTPException 503: No se pudo publicar la venta; Mercado Pago reintenta
+    """
+    redis_client = await get_redis_client()
+    if await load_reservation(redis_client, reserva_id) is None:
+        return False
+    
+    if status_pago_mp == "approved":
+        codigo, data = await confirm_reservation(redis_client, reserva_id)
+        if codigo == CONFIRM_AFTER_RELEASE:
+            logger.warning(f"Pago {payment_id} aprobado con la reserva {reserva_id} ya liberada: stock descontado de nuevo")
+        # Se publica también en webhooks repetidos: si el anterior falló al
+        # publicar, este lo completa; si no, el worker lo descarta por event_id
+        try:
+            with sync_event_publisher() as publisher:
+                publisher.publish_sale_created(build_sale_event(reserva_id, data, str(payment_id)))
+        except Exception as e:
+            logger.error(f"No se pudo publicar la venta de la reserva {reserva_id}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Venta no publicada, reintentar"
+            )
+        logger.info(f"Reserva {reserva_id} confirmada (pago {payment_id})")
+    
+    elif status_pago_mp in ("rejected", "cancelled"):
+        if await release_reservation(redis_client, reserva_id):
+            logger.info(f"Reserva {reserva_id} liberada (pago {payment_id} {status_pago_mp})")
+    
+    return True
+
+
 @router.post("/webhook", status_code=status.HTTP_200_OK)
 async def webhook_mercadopago(
     request: Request,
@@ -142,9 +297,10 @@ async def webhook_mercadopago(
     1. Recibe notificación de MercadoPago
     2. Valida firma (opcional pero recomendado)
     3. Consulta el estado del pago
-    4. Actualiza la venta en base de datos
-    5. Emite factura AFIP si corresponde
-    6. Responde 200 OK inmediatamente
+    4. Checkout online: confirma la reserva y publica la venta, o libera
+       el stock si el pago fue rechazado/cancelado
+    5. Si no: actualiza la venta en base de datos y emite factura AFIP
+    6. Responde 200 OK inmediatamente (503 solo si la venta no se publicó)
     
     Documentación:
     https://www.mercadopago.com.ar/developers/es/docs/your-integrations/notifications/webhooks
@@ -185,6 +341,10 @@ async def webhook_mercadopago(
             logger.info(f"Estado del pago: {status_pago_mp}")
             logger.info(f"Referencia externa (venta_id): {external_reference}")
             
+            # Checkout online: la referencia es una reserva de stock
+            if external_reference and await _resolver_reserva(external_reference, status_pago_mp, payment_id):
+                return {"status": "received", "message": "Reserva procesada"}
+            
             # Solo procesar si está aprobado
             if status_pago_mp == "approved" and external_reference:
                 try:
@@ -237,6 +397,10 @@ async def webhook_mercadopago(
         # SIEMPRE responder 200 OK para que MercadoPago no reintente
         return {"status": "received", "message": "Webhook procesado"}
     
+    except HTTPException:
+        # Solo errores en los que sí queremos el reintento (venta sin publicar)
+        raise
+    
     except Exception as e:
         logger.error(f"Error procesando webhook: {str(e)}", exc_info=True)
         
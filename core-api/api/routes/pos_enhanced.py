@@ -52,7 +52,7 @@ class VentaOfflineRequest(BaseModel):
 # =====================================================
 
 @router.get("/scan/{codigo}")
-async def escan eo_mejorado(
+async def escaneo_mejorado(
     codigo: str,
     current_tienda: CurrentTienda,
     session: Annotated[AsyncSession, Depends(get_session)]
@@ -259,6 +259,9 @@ async def registrar_venta_offline(
     """
     📴 Registra venta hecha sin conexión
     
+    Para sincronizar muchas ventas usar POST /ventas/offline/batch
+    (lotes con clave de idempotencia, seguro ante reintentos).
+    
     Flujo offline:
     1. POS pierde internet
     2. Cajero sigue vendiendo (guarda localmente)
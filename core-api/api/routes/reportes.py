@@ -9,7 +9,7 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, desc
-from core.db import get_session
+from core.db import get_read_session
 from models import Venta, DetalleVenta, Producto
 from api.deps import CurrentTienda
 from pydantic import BaseModel, Field
@@ -64,7 +64,7 @@ class RentabilidadProducto(BaseModel):
 @router.get("/ventas/resumen", response_model=ResumenVentas)
 async def obtener_resumen_ventas(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     fecha_desde: Optional[datetime] = Query(None, description="Fecha inicial (default: hace 30 días)"),
     fecha_hasta: Optional[datetime] = Query(None, description="Fecha final (default: hoy)")
 ) -> ResumenVentas:
@@ -127,7 +127,7 @@ async def obtener_resumen_ventas(
     ).join(
         DetalleVenta, Producto.id == DetalleVenta.producto_id
     ).join(
-        Venta, DetalleVenta.venta_id == Venta.id
+        Venta, and_(DetalleVenta.venta_id == Venta.id, DetalleVenta.fecha == Venta.fecha)
     ).where(
         and_(
             Venta.tienda_id == current_tienda.id,
@@ -155,7 +155,7 @@ async def obtener_resumen_ventas(
 @router.get("/productos/mas-vendidos", response_model=List[ProductoMasVendido])
 async def obtener_productos_mas_vendidos(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     limite: int = Query(10, ge=1, le=100, description="Cantidad de productos a retornar"),
     fecha_desde: Optional[datetime] = Query(None),
     fecha_hasta: Optional[datetime] = Query(None)
@@ -184,7 +184,7 @@ async def obtener_productos_mas_vendidos(
     ).join(
         DetalleVenta, Producto.id == DetalleVenta.producto_id
     ).join(
-        Venta, DetalleVenta.venta_id == Venta.id
+        Venta, and_(DetalleVenta.venta_id == Venta.id, DetalleVenta.fecha == Venta.fecha)
     ).where(
         and_(
             Venta.tienda_id == current_tienda.id,
@@ -217,7 +217,7 @@ async def obtener_productos_mas_vendidos(
 @router.get("/productos/rentabilidad", response_model=List[RentabilidadProducto])
 async def analizar_rentabilidad_productos(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     limite: int = Query(20, ge=1, le=100),
     orden: str = Query("utilidad", regex="^(utilidad|margen|cantidad)$")
 ) -> List[RentabilidadProducto]:
@@ -246,7 +246,7 @@ async def analizar_rentabilidad_productos(
     ).join(
         DetalleVenta, Producto.id == DetalleVenta.producto_id
     ).join(
-        Venta, DetalleVenta.venta_id == Venta.id
+        Venta, and_(DetalleVenta.venta_id == Venta.id, DetalleVenta.fecha == Venta.fecha)
     ).where(
         and_(
             Venta.tienda_id == current_tienda.id,
@@ -296,7 +296,7 @@ async def analizar_rentabilidad_productos(
 @router.get("/ventas/tendencia-diaria", response_model=List[VentasPorPeriodo])
 async def obtener_tendencia_ventas_diaria(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     dias: int = Query(30, ge=7, le=365, description="Cantidad de días a analizar")
 ) -> List[VentasPorPeriodo]:
     """
@@ -382,7 +382,7 @@ class VentaDetalle(BaseModel):
 @router.get("/por-categoria", response_model=List[VentasPorCategoria])
 async def ventas_por_categoria(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     dias: int = Query(30, ge=1, le=365)
 ) -> List[VentasPorCategoria]:
     """
@@ -439,7 +439,7 @@ async def ventas_por_categoria(
 @router.get("/por-metodo-pago", response_model=List[VentasPorMetodoPago])
 async def ventas_por_metodo_pago(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     dias: int = Query(30, ge=1, le=365)
 ) -> List[VentasPorMetodoPago]:
     """
@@ -494,7 +494,7 @@ async def ventas_por_metodo_pago(
 @router.get("/ventas-detalle", response_model=List[VentaDetalle])
 async def ventas_detalle(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     fecha_inicio: Optional[datetime] = Query(None),
     fecha_fin: Optional[datetime] = Query(None),
     limit: int = Query(100, ge=1, le=500),
@@ -575,7 +575,7 @@ async def ventas_detalle(
 @router.get("/export/csv")
 async def exportar_csv(
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     tipo: str = Query(..., description="Tipo de reporte: 'ventas', 'productos', 'inventario'"),
     dias: int = Query(30, ge=1, le=365)
 ):
@@ -8,7 +8,7 @@ from datetime import datetime, timedelta
 from uuid import UUID
 from typing import Optional
 
-from core.db import get_session
+from core.db import get_read_session
 from api.deps import get_current_user_id
 from services.retail_analytics_service import RetailAnalyticsService
 
@@ -22,7 +22,7 @@ async def get_top_products_by_category(
     days: int = Query(30, ge=1, le=365, description="Días hacia atrás"),
     limit: int = Query(10, ge=1, le=100),
     user_id: UUID = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_session)
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
     Top productos más vendidos por categoría
@@ -52,7 +52,7 @@ async def get_seasonality_analysis(
     tienda_id: UUID,
     year: int = Query(2025, ge=2020, le=2030),
     user_id: UUID = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_session)
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
     Análisis de estacionalidad por temporada
@@ -75,7 +75,7 @@ async def get_brand_performance(
     tienda_id: UUID,
     days: int = Query(30, ge=1, le=365),
     user_id: UUID = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_session)
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
     Análisis de performance por marca
@@ -102,7 +102,7 @@ async def get_size_distribution(
     tienda_id: UUID,
     product_id: Optional[UUID] = None,
     user_id: UUID = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_session)
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
     Distribución de ventas por talle
@@ -125,7 +125,7 @@ async def get_color_preferences(
     tienda_id: UUID,
     product_id: Optional[UUID] = None,
     user_id: UUID = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_session)
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
     Análisis de preferencias por color
@@ -148,18 +148,20 @@ async def get_restock_suggestions(
     tienda_id: UUID,
     days_lookback: int = Query(30, ge=7, le=90),
     min_sales_velocity: int = Query(5, ge=1, le=100),
+    lead_time_days: Optional[int] = Query(None, ge=1, le=120, description="Lead time del proveedor"),
     user_id: UUID = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_session)
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
-    Sugerencias de restock basadas en velocidad de ventas
+    Sugerencias de restock basadas en pronóstico de demanda
     """
     service = RetailAnalyticsService(db)
     
     suggestions = await service.get_restock_suggestions(
         tienda_id=tienda_id,
         days_lookback=days_lookback,
-        min_sales_velocity=min_sales_velocity
+        min_sales_velocity=min_sales_velocity,
+        lead_time_days=lead_time_days
     )
     
     return {
@@ -174,7 +176,7 @@ async def get_restock_suggestions(
 async def get_inventory_health(
     tienda_id: UUID,
     user_id: UUID = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_session)
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
     Salud general del inventario
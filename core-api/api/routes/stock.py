@@ -4,7 +4,7 @@ Endpoints para gestión de stock e inventory ledger
 """
 from typing import List, Optional, Annotated
 from uuid import UUID
-from datetime import datetime
+from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, Query, status, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, text
@@ -13,6 +13,11 @@ from pydantic import BaseModel, Field
 from core.db import get_session
 from models import InventoryLedger, ProductVariant, Product, Location
 from api.deps import CurrentTienda
+from core.config import settings
+from services.ledger_history_service import ledger_page
+from services.stock_alert_service import stock_alert_service
+from services.stock_snapshot_service import stock_as_of
+from utils.pagination import CursorPage
 
 router = APIRouter(prefix="/stock", tags=["Stock"])
 
@@ -50,7 +55,7 @@ class InventoryTransactionRead(BaseModel):
     reference_id: Optional[str] = None
     notes: Optional[str] = None
     created_at: datetime
-    created_by: str
+    created_by: Optional[str] = None
     
     # Info adicional
     product_name: Optional[str] = None
@@ -58,6 +63,20 @@ class InventoryTransactionRead(BaseModel):
     location_name: Optional[str] = None
 
 
+class StockAsOfItem(BaseModel):
+    """Saldo de una variante en una ubicación a una fecha"""
+    variant_id: str
+    location_id: str
+    stock: float
+
+
+class StockAsOfResponse(BaseModel):
+    """Stock a una fecha (snapshot más cercano + movimientos posteriores)"""
+    at: datetime
+    snapshot_at: Optional[datetime] = None
+    items: List[StockAsOfItem]
+
+
 class StockAdjustmentRequest(BaseModel):
     """Request para ajuste de inventario"""
     variant_id: UUID
@@ -75,6 +94,13 @@ class StockTransferRequest(BaseModel):
     notes: Optional[str] = Field(None, max_length=500)
 
 
+class ReorderPointUpdate(BaseModel):
+    """Request para configurar el punto de reorden de una variante"""
+    reorder_point: Optional[float] = Field(
+        None, ge=0, description="NULL = usar el punto de reorden por defecto"
+    )
+
+
 class LocationRead(BaseModel):
     """Ubicación/Almacén"""
     location_id: str
@@ -217,78 +243,134 @@ async def stock_by_variant(
     )
 
 
-@router.get("/transactions", response_model=List[InventoryTransactionRead])
-async def stock_transactions(
+@router.get("/as-of", response_model=StockAsOfResponse)
+async def stock_at_date(
     current_tienda: CurrentTienda,
     session: Annotated[AsyncSession, Depends(get_session)],
+    at: datetime = Query(..., description="Instante a consultar (sin zona horaria = UTC)"),
     variant_id: Optional[UUID] = Query(None),
     location_id: Optional[UUID] = Query(None),
-    reference_type: Optional[str] = Query(None),
-    limit: int = Query(100, ge=1, le=500),
-    offset: int = Query(0, ge=0),
-) -> List[InventoryTransactionRead]:
-    """
-    Historial de transacciones de inventario
-    """
-    sql = """
-        SELECT 
-            il.transaction_id,
-            il.variant_id,
-            il.location_id,
-            il.delta,
-            il.reference_type,
-            il.reference_id,
-            il.notes,
-            il.created_at,
-            il.created_by,
-            p.name as product_name,
-            pv.sku,
-            l.name as location_name
-        FROM inventory_ledger il
-        INNER JOIN product_variants pv ON il.variant_id = pv.variant_id
-        INNER JOIN products p ON pv.product_id = p.product_id
-        LEFT JOIN locations l ON il.location_id = l.location_id
-        WHERE p.tienda_id = :tienda_id
+) -> StockAsOfResponse:
     """
+    Stock por variante y ubicación a una fecha (cierres, valorización, mermas)
     
-    params = {"tienda_id": str(current_tienda.id)}
-    
-    if variant_id:
-        sql += " AND il.variant_id = :variant_id"
-        params["variant_id"] = str(variant_id)
+    Parte del snapshot más cercano anterior a `at` y suma solo los
+    movimientos posteriores: el costo no crece con el historial.
+    """
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    
+    snapshot_at, rows = await stock_as_of(
+        session,
+        current_tienda.id,
+        at,
+        variant_id=variant_id,
+        location_id=location_id
+    )
     
-    if location_id:
-        sql += " AND il.location_id = :location_id"
-        params["location_id"] = str(location_id)
+    return StockAsOfResponse(
+        at=at,
+        snapshot_at=snapshot_at,
+        items=[
+            StockAsOfItem(
+                variant_id=str(row.variant_id),
+                location_id=str(row.location_id),
+                stock=float(row.quantity)
+            )
+            for row in rows
+        ]
+    )
+
+
+@router.put("/variant/{variant_id}/reorder-point")
+async def update_reorder_point(
+    variant_id: UUID,
+    data: ReorderPointUpdate,
+    current_tienda: CurrentTienda,
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    """
+    Configurar el punto de reorden de una variante (alertas de stock bajo)
+    """
+    query = select(ProductVariant).join(Product).where(
+        ProductVariant.variant_id == variant_id,
+        Product.tienda_id == current_tienda.id
+    )
+    result = await session.execute(query)
+    variant = result.scalar_one_or_none()
     
-    if reference_type:
-        sql += " AND il.reference_type = :reference_type"
-        params["reference_type"] = reference_type
+    if not variant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Variante no encontrada"
+        )
     
-    sql += " ORDER BY il.created_at DESC LIMIT :limit OFFSET :offset"
-    params["limit"] = limit
-    params["offset"] = offset
+    variant.reorder_point = data.reorder_point
+    session.add(variant)
+    await session.commit()
     
-    result = await session.execute(text(sql), params)
-    rows = result.fetchall()
+    return {
+        "variant_id": str(variant.variant_id),
+        "reorder_point": variant.reorder_point,
+        "effective_reorder_point": (
+            variant.reorder_point
+            if variant.reorder_point is not None
+            else settings.STOCK_REORDER_POINT_DEFAULT
+        )
+    }
+
+
+@router.get("/transactions", response_model=CursorPage[InventoryTransactionRead])
+async def stock_transactions(
+    current_tienda: CurrentTienda,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    variant_id: Optional[UUID] = Query(None),
+    location_id: Optional[UUID] = Query(None),
+    reference_type: Optional[str] = Query(None, description="Tipo de transacción (SALE, PURCHASE, ADJUSTMENT...)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    limit: int = Query(100, ge=1, le=500),
+) -> CursorPage[InventoryTransactionRead]:
+    """
+    Historial de transacciones de inventario
     
-    return [
-        InventoryTransactionRead(
-            transaction_id=str(row[0]),
-            variant_id=str(row[1]),
-            location_id=str(row[2]),
-            delta=float(row[3]),
-            reference_type=row[4],
-            reference_id=str(row[5]) if row[5] else None,
-            notes=row[6],
-            created_at=row[7],
-            created_by=str(row[8]),
-            product_name=row[9],
-            sku=row[10],
-            location_name=row[11]
+    Paginación por keyset: pasar `next_cursor` como `cursor` para la página
+    siguiente. El costo por página es constante sin importar la profundidad.
+    """
+    try:
+        rows, next_cursor = await ledger_page(
+            session,
+            current_tienda.id,
+            variant_id=variant_id,
+            location_id=location_id,
+            transaction_type=reference_type,
+            cursor=cursor,
+            limit=limit
         )
-        for row in rows
-    ]
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return CursorPage(
+        items=[
+            InventoryTransactionRead(
+                transaction_id=str(row.InventoryLedger.transaction_id),
+                variant_id=str(row.InventoryLedger.variant_id),
+                location_id=str(row.InventoryLedger.location_id),
+                delta=float(row.InventoryLedger.delta),
+                reference_type=row.InventoryLedger.transaction_type,
+                reference_id=row.InventoryLedger.reference_doc,
+                notes=row.InventoryLedger.notes,
+                created_at=row.InventoryLedger.occurred_at,
+                created_by=str(row.InventoryLedger.created_by) if row.InventoryLedger.created_by else None,
+                product_name=row.product_name,
+                sku=row.sku,
+                location_name=row.location_name
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor,
+        has_next=next_cursor is not None,
+        has_prev=cursor is not None
+    )
 
 
 @router.post("/adjustment", response_model=InventoryTransactionRead, status_code=status.HTTP_201_CREATED)
@@ -330,18 +412,28 @@ async def create_adjustment(
     
     # Crear transacción
     transaction = InventoryLedger(
+        tienda_id=current_tienda.id,
         variant_id=data.variant_id,
         location_id=data.location_id,
         delta=data.delta,
-        reference_type="adjustment",
+        transaction_type="ADJUSTMENT",
         notes=data.notes,
-        created_by=current_tienda.id  # TODO: usar user_id del usuario actual
+        created_by=None  # TODO: usar user_id del usuario actual
     )
     
     session.add(transaction)
+    await session.flush()
+    
+    # ⚡ Alerta edge-triggered si el ajuste cruza el punto de reorden
+    alertas = await stock_alert_service.detect_crossings(
+        session, current_tienda.id, [(data.variant_id, data.location_id, data.delta)]
+    )
+    
     await session.commit()
     await session.refresh(transaction)
     
+    await stock_alert_service.emit(current_tienda.id, alertas)
+    
     # Obtener info adicional para respuesta
     sql = text("""
         SELECT p.name, pv.sku, l.name
@@ -360,10 +452,10 @@ async def create_adjustment(
         variant_id=str(transaction.variant_id),
         location_id=str(transaction.location_id),
         delta=transaction.delta,
-        reference_type=transaction.reference_type,
-        reference_id=str(transaction.reference_id) if transaction.reference_id else None,
+        reference_type=transaction.transaction_type,
+        reference_id=transaction.reference_doc,
         notes=transaction.notes,
-        created_at=transaction.created_at,
+        created_at=transaction.occurred_at,
         created_by=str(transaction.created_by),
         product_name=info_row[0] if info_row else None,
         sku=info_row[1] if info_row else None,
@@ -435,33 +527,44 @@ async def transfer_stock(
     
     # Crear transacciones (salida y entrada)
     transaction_from = InventoryLedger(
+        tienda_id=current_tienda.id,
         variant_id=data.variant_id,
         location_id=data.from_location_id,
         delta=-data.quantity,
-        reference_type="transfer",
+        transaction_type="TRANSFER",
         notes=f"Transferencia a otra ubicación. {data.notes or ''}".strip(),
-        created_by=current_tienda.id
     )
     
     transaction_to = InventoryLedger(
+        tienda_id=current_tienda.id,
         variant_id=data.variant_id,
         location_id=data.to_location_id,
         delta=data.quantity,
-        reference_type="transfer",
+        transaction_type="TRANSFER",
         notes=f"Transferencia desde otra ubicación. {data.notes or ''}".strip(),
-        created_by=current_tienda.id
     )
     
-    # Vincular transacciones
-    session.add(transaction_from)
+    # Vincular transacciones (cada una referencia a su contraparte)
+    transaction_to.reference_doc = str(transaction_from.transaction_id)
+    transaction_from.reference_doc = str(transaction_to.transaction_id)
+    
+    session.add_all([transaction_from, transaction_to])
     await session.flush()
     
-    transaction_to.reference_id = transaction_from.transaction_id
-    transaction_from.reference_id = transaction_to.transaction_id
+    # ⚡ Solo la salida puede cruzar el punto de reorden hacia abajo
+    alertas = await stock_alert_service.detect_crossings(
+        session,
+        current_tienda.id,
+        [
+            (data.variant_id, data.from_location_id, -data.quantity),
+            (data.variant_id, data.to_location_id, data.quantity),
+        ]
+    )
     
-    session.add(transaction_to)
     await session.commit()
     
+    await stock_alert_service.emit(current_tienda.id, alertas)
+    
     return {
         "message": "Transferencia completada exitosamente",
         "from_transaction_id": str(transaction_from.transaction_id),
@@ -506,7 +609,9 @@ async def get_locations(
 async def low_stock_products(
     current_tienda: CurrentTienda,
     session: Annotated[AsyncSession, Depends(get_session)],
-    threshold: int = Query(10, ge=0, description="Umbral de stock bajo")
+    threshold: Optional[int] = Query(
+        None, ge=0, description="Umbral de stock bajo (por defecto: punto de reorden de cada variante)"
+    )
 ) -> List[ProductVariantStock]:
     """
     Productos con stock bajo (alerta)
@@ -536,8 +641,10 @@ async def low_stock_products(
             LEFT JOIN inventory_ledger il ON pv.variant_id = il.variant_id
             LEFT JOIN locations l ON il.location_id = l.location_id AND l.is_active = true
             WHERE p.tienda_id = :tienda_id AND pv.is_active = true
-            GROUP BY pv.variant_id, pv.product_id, p.name, pv.sku, s.name, c.name, pv.price
-            HAVING COALESCE(SUM(il.delta), 0) <= :threshold
+            GROUP BY pv.variant_id, pv.product_id, p.name, pv.sku, s.name, c.name, pv.price, pv.reorder_point
+            HAVING COALESCE(SUM(il.delta), 0) <= COALESCE(
+                CAST(:threshold AS double precision), pv.reorder_point, :default_reorder_point
+            )
         )
         SELECT * FROM stock_data
         ORDER BY stock_total ASC, product_name
@@ -545,7 +652,8 @@ async def low_stock_products(
     
     result = await session.execute(sql, {
         "tienda_id": str(current_tienda.id),
-        "threshold": threshold
+        "threshold": threshold,
+        "default_reorder_point": settings.STOCK_REORDER_POINT_DEFAULT
     })
     rows = result.fetchall()
     
@@ -10,7 +10,7 @@ from pydantic import BaseModel, EmailStr
 from core.db import get_session
 from api.deps import CurrentUser
 from models import User
-from core.security import get_password_hash
+from core.security import get_password_hash_async
 from uuid import uuid4
 
 router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
@@ -127,7 +127,7 @@ async def invitar_empleado(
     nuevo_usuario = User(
         id=uuid4(),
         email=invitacion.email,
-        hashed_password=get_password_hash(invitacion.password),
+        hashed_password=await get_password_hash_async(invitacion.password),
         full_name=invitacion.full_name,
         rol=invitacion.rol,
         tienda_id=current_user.tienda_id,  # Misma tienda que el que invita
@@ -6,12 +6,12 @@ from typing import Annotated, List, Optional
 from uuid import UUID, uuid4
 from datetime import datetime
 from decimal import Decimal
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from sqlmodel import col
 from core.db import get_session
-from core.event_bus import publish_event, sync_event_publisher
+from core.event_bus import event_id_for, publish_event, sync_event_publisher
 from core.permissions import Permission, require_permission
 from core.redis_scripts import RESERVE_STOCK_SCRIPT, ROLLBACK_STOCK_SCRIPT, generate_stock_key
 import redis.asyncio as redis
@@ -31,10 +31,21 @@ from schemas_models.ventas import (
     VentaListRead,
     VentaResumen,
     DetalleVentaRead,
-    FacturaRead
+    FacturaRead,
+    VentaOfflineBatch,
+    VentaOfflineBatchResponse
 )
 from api.deps import CurrentTienda
 from services.afip_service import AfipService
+from services.caja_service import CajaService
+from services.idempotency_service import checkout_idempotency, request_fingerprint
+from services.stock_cache_service import clear_inflight, fill_missing, track_inflight
+from services.offline_sales_service import (
+    OfflineSalesService,
+    STATUS_CREATED,
+    STATUS_DUPLICATE,
+    STATUS_REJECTED
+)
 from pydantic import BaseModel
 
 
@@ -99,8 +110,11 @@ async def scan_producto(
 @router.post("/checkout", response_model=VentaResumen, status_code=status.HTTP_201_CREATED)
 async def procesar_venta(
     venta_data: VentaCreate,
+    current_user: CurrentUser,
     current_tienda: CurrentTienda,
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(get_session)],
+    response: Response,
+    idempotency_key: Annotated[Optional[str], Header(alias="Idempotency-Key", max_length=255)] = None
 ) -> VentaResumen:
     """
     🚀 MÓDULO 3: CHECKOUT CON REDIS + RABBITMQ
@@ -116,9 +130,26 @@ async def procesar_venta(
     - Sin SELECT FOR UPDATE (mejor performance)
     - Respuesta ultra rápida al POS
     - Escritura en DB desacoplada (worker)
+    
+    IDEMPOTENCIA:
+    Con header `Idempotency-Key`, un reintento del POS devuelve la respuesta
+    original (header `Idempotent-Replayed: true`) sin reservar stock ni
+    publicar otra venta. Un duplicado concurrente espera al original.
     """
+    claim = None
+    if idempotency_key:
+        claim, replay = await checkout_idempotency.begin(
+            f"{current_tienda.id}:{current_user.id}",
+            idempotency_key,
+            request_fingerprint(venta_data.model_dump(mode="json"))
+        )
+        if replay is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return VentaResumen(**replay)
+    
     redis_client = None
     reserved_keys = []  # Para rollback si falla
+    inflight_event_id = None
     
     try:
         # ============================================================
@@ -179,6 +210,7 @@ async def procesar_venta(
         # ============================================================
         # PASO 3: RESERVA ATÓMICA EN REDIS (LUA SCRIPT)
         # ============================================================
+        cache_cargado = False
         for item_data in items_validados:
             stock_key = generate_stock_key(
                 str(current_tienda.id),
@@ -190,11 +222,30 @@ async def procesar_venta(
                 RESERVE_STOCK_SCRIPT,
                 1,  # num_keys
                 stock_key,
-                item_data['cantidad']
+                item_data['cantidad'],
+                settings.STOCK_CACHE_TTL
             )
             
+            if result == -2 and not cache_cargado:
+                # Cache miss: read-through de todos los items de la venta
+                # (1 query + 1 pipeline SET NX) y reintento
+                await fill_missing(
+                    redis_client,
+                    session,
+                    current_tienda.id,
+                    [UUID(item['producto_id']) for item in items_validados]
+                )
+                cache_cargado = True
+                result = await redis_client.eval(
+                    RESERVE_STOCK_SCRIPT,
+                    1,
+                    stock_key,
+                    item_data['cantidad'],
+                    settings.STOCK_CACHE_TTL
+                )
+            
             if result == -2:
-                # Cache miss - necesita warmup
+                # Sigue sin key tras cargarla (ej: Redis sin memoria)
                 raise HTTPException(
                     status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                     detail=f"Stock no cacheado para SKU {item_data['producto_sku']}. Reintente."
@@ -216,21 +267,37 @@ async def procesar_venta(
         # ============================================================
         # PASO 4: PUBLICAR EVENTO A RABBITMQ (SYNC)
         # ============================================================
+        # La sesión de caja se fija al cobrar: el worker puede procesar la
+        # venta después de que el cajero cierre y abra otra
+        sesion_caja_id = await CajaService(session).sesion_abierta_id(current_tienda.id, current_user.id)
         sale_event = {
             'tienda_id': str(current_tienda.id),
+            'usuario_id': str(current_user.id),
+            'sesion_caja_id': str(sesion_caja_id) if sesion_caja_id else None,
             'total': total_venta,
             'metodo_pago': venta_data.metodo_pago,
             'items': items_validados,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': datetime.utcnow().isoformat(),
+            'idempotency_key': idempotency_key
         }
+        sale_event['event_id'] = event_id_for(sale_event)
+        
+        # Reserva "en vuelo" hasta que el worker la escriba en la DB: la
+        # reconciliación de stock no la confunde con un desvío
+        en_vuelo: dict = {}
+        for item_data in items_validados:
+            en_vuelo[item_data['producto_id']] = en_vuelo.get(item_data['producto_id'], 0.0) + item_data['cantidad']
+        await track_inflight(redis_client, current_tienda.id, sale_event['event_id'], en_vuelo)
+        inflight_event_id = sale_event['event_id']
         
         with sync_event_publisher() as publisher:
             publisher.publish_sale_created(sale_event)
+        inflight_event_id = None  # Publicado: el worker la quita al escribir
         
         # ============================================================
         # PASO 5: RESPUESTA INMEDIATA (Worker escribirá en DB)
         # ============================================================
-        return VentaResumen(
+        resumen = VentaResumen(
             venta_id=None,  # Se generará en el worker
             fecha=datetime.utcnow(),
             total=total_venta,
@@ -238,6 +305,10 @@ async def procesar_venta(
             cantidad_items=len(items_validados),
             mensaje="✅ Venta reservada - procesando en segundo plano"
         )
+        if claim:
+            # El evento ya salió: a partir de acá un reintento debe ser replay
+            await checkout_idempotency.complete(claim, resumen.model_dump(mode="json"))
+        return resumen
     
     except HTTPException:
         # Rollback de reservas en Redis si hubo error
@@ -252,7 +323,8 @@ async def procesar_venta(
                     ROLLBACK_STOCK_SCRIPT,
                     1,
                     stock_key,
-                    cantidad_reservada
+                    cantidad_reservada,
+                    settings.STOCK_CACHE_TTL
                 )
         raise
     
@@ -269,7 +341,8 @@ async def procesar_venta(
                     ROLLBACK_STOCK_SCRIPT,
                     1,
                     stock_key,
-                    cantidad_reservada
+                    cantidad_reservada,
+                    settings.STOCK_CACHE_TTL
                 )
         
         raise HTTPException(
@@ -278,10 +351,48 @@ async def procesar_venta(
         )
     
     finally:
+        await checkout_idempotency.release(claim)
         if redis_client:
+            if inflight_event_id:
+                await clear_inflight(redis_client, {str(current_tienda.id): [inflight_event_id]})
             await redis_client.aclose()
 
 
+@router.post("/offline/batch", response_model=VentaOfflineBatchResponse)
+async def sincronizar_ventas_offline(
+    lote: VentaOfflineBatch,
+    current_user: CurrentUser,
+    current_tienda: CurrentTienda,
+    session: Annotated[AsyncSession, Depends(get_session)]
+) -> VentaOfflineBatchResponse:
+    """
+    📴 Sincroniza un lote de ventas hechas sin conexión
+
+    Cada venta trae una `idempotency_key` generada en el POS: el lote se
+    puede reenviar completo tras un corte (o un timeout) sin duplicar ventas.
+    Ventas, detalles y stock se escriben con INSERT/UPDATE por lote, y se
+    devuelve un resultado por venta en el mismo orden.
+    """
+    if len(lote.ventas) > settings.OFFLINE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Máximo {settings.OFFLINE_BATCH_MAX_SIZE} ventas por lote"
+        )
+
+    resultados = await OfflineSalesService(session).ingest(
+        current_tienda.id, current_user.id, lote.ventas
+    )
+    await session.commit()
+
+    return VentaOfflineBatchResponse(
+        recibidas=len(resultados),
+        creadas=sum(1 for r in resultados if r["status"] == STATUS_CREATED),
+        duplicadas=sum(1 for r in resultados if r["status"] == STATUS_DUPLICATE),
+        rechazadas=sum(1 for r in resultados if r["status"] == STATUS_REJECTED),
+        resultados=resultados
+    )
+
+
 @router.get("/", response_model=List[VentaListRead])
 async def listar_ventas(
     current_tienda: CurrentTienda,
@@ -326,7 +437,9 @@ async def listar_ventas(
     
     ventas_response = []
     for venta in ventas:
-        count_statement = select(DetalleVenta).where(DetalleVenta.venta_id == venta.id)
+        count_statement = select(DetalleVenta).where(
+            DetalleVenta.venta_id == venta.id, DetalleVenta.fecha == venta.fecha
+        )
         count_result = await session.execute(count_statement)
         cantidad_items = len(count_result.scalars().all())
         
@@ -371,7 +484,8 @@ async def obtener_venta(
         )
     
     statement_detalles = select(DetalleVenta, Producto).where(
-        DetalleVenta.venta_id == venta_id
+        DetalleVenta.venta_id == venta_id,
+        DetalleVenta.fecha == venta.fecha
     ).join(Producto, DetalleVenta.producto_id == Producto.id)
     
     result_detalles = await session.execute(statement_detalles)
@@ -446,7 +560,8 @@ async def anular_venta(
     
     # Obtener detalles de la venta para devolver stock
     statement_detalles = select(DetalleVenta).where(
-        DetalleVenta.venta_id == venta_id
+        DetalleVenta.venta_id == venta_id,
+        DetalleVenta.fecha == venta.fecha
     )
     result_detalles = await session.execute(statement_detalles)
     detalles = result_detalles.scalars().all()
@@ -467,6 +582,12 @@ async def anular_venta(
     venta.status_pago = 'anulado'
     session.add(venta)
     
+    # Descontarla de los totales de la sesión de caja en la que se registró
+    if venta.sesion_caja_id:
+        await CajaService(session).revertir_venta(
+            venta.sesion_caja_id, venta.total, venta.metodo_pago
+        )
+    
     await session.commit()
     await session.refresh(venta)
     
@@ -554,6 +675,10 @@ async def facturar_venta(
     monto_iva = round(monto_total - monto_neto, 2)
     
     # PASO 5: Llamar al servicio AFIP
+    # Cerrar la transacción de lectura antes: WSAA/WSFE pueden tardar más que
+    # idle_in_transaction_session_timeout y Postgres cortaría la conexión con
+    # el CAE ya emitido. El INSERT de la factura abre una transacción nueva.
+    await session.commit()
     afip_service = AfipService()
     
     try:
@@ -578,6 +703,7 @@ async def facturar_venta(
     # PASO 6: Crear registro de Factura
     nueva_factura = Factura(
         venta_id=venta_id,
+        venta_fecha=venta.fecha,
         tienda_id=current_tienda.id,
         tipo_factura=factura_request.tipo_factura,
         punto_venta=afip_response.get("punto_venta", 1),
@@ -12,6 +12,7 @@ from decimal import Decimal
 from core.db import get_session
 from api.deps import CurrentUser, CurrentTienda
 from models import Product, ProductVariant, InventoryLedger, User, Tienda, Location
+from services.stock_alert_service import stock_alert_service
 from pydantic import BaseModel
 
 
@@ -83,6 +84,7 @@ async def procesar_venta_simple(
         )
     
     items_procesados = []
+    movimientos = []
     total_venta = Decimal("0")
     
     # Procesar cada item
@@ -137,6 +139,7 @@ async def procesar_venta_simple(
             location_id=default_location.location_id
         )
         session.add(ledger_entry)
+        movimientos.append((variant.variant_id, default_location.location_id, -item.cantidad))
         
         items_procesados.append(VentaItemResponse(
             variant_id=variant.variant_id,
@@ -147,9 +150,17 @@ async def procesar_venta_simple(
             subtotal=float(subtotal)
         ))
     
+    # ⚡ Detectar cruces del punto de reorden solo para los items tocados
+    await session.flush()
+    alertas = await stock_alert_service.detect_crossings(
+        session, current_tienda.id, movimientos
+    )
+    
     # Commit transaction
     await session.commit()
     
+    await stock_alert_service.emit(current_tienda.id, alertas)
+    
     return VentaResponse(
         mensaje=f"Venta procesada exitosamente - {venta_data.metodo_pago}",
         total=float(total_venta),
@@ -176,10 +187,10 @@ async def obtener_historial_ventas(
         .join(ProductVariant, InventoryLedger.variant_id == ProductVariant.variant_id)
         .join(Product, ProductVariant.product_id == Product.product_id)
         .where(
-            InventoryLedger.transaction_type == "SALE",
-            Product.tienda_id == current_tienda.id
+            InventoryLedger.tienda_id == current_tienda.id,  # ix_inventory_ledger_tienda_type_occurred
+            InventoryLedger.transaction_type == "SALE"
         )
-        .order_by(InventoryLedger.occurred_at.desc())
+        .order_by(InventoryLedger.occurred_at.desc(), InventoryLedger.transaction_id.desc())
         .limit(limit)
     )
     
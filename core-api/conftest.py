@@ -268,6 +268,7 @@ async def venta_completada(
     detalle = DetalleVenta(
         id=uuid4(),
         venta_id=venta.id,
+        fecha=venta.fecha,
         producto_id=producto_general.id,
         cantidad=2.0,
         precio_unitario=1500.0,
@@ -1,42 +1,77 @@
 """
 Configuración de Base de Datos - PostgreSQL Async
-Engine y Session Factory para SQLModel
+Engines y Session Factories para SQLModel
+
+Pools aislados por carga de trabajo:
+- get_session             -> oltp (checkout, escaneo, auth)
+- get_read_session        -> réplica sana o reporting (reportes, exportaciones)
+- BackgroundSessionLocal  -> background (schedulers y tareas en segundo plano)
 """
 from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlmodel import SQLModel
 from core.config import settings
+from core.db_pools import WORKLOADS, create_workload_engine, pool_stats
+from core.read_routing import ReplicaRouter, must_read_primary
+from core.sql_instrumentation import install_sql_instrumentation
 
 
-# Motor asíncrono de SQLAlchemy
+# Motores asíncronos de SQLAlchemy, uno por clase de carga (ver core/db_pools.py)
 # 🔥 CONFIGURACIÓN OPTIMIZADA PARA SUPABASE PGBOUNCER
-engine = create_async_engine(
-    settings.get_database_url(),
-    echo=False,  # ⚡ OPTIMIZACIÓN: Desactivado para producción (reduce overhead 30%)
-    future=True,
-    pool_pre_ping=True,  # ✅ VITAL para conexiones cloud: verifica si están vivas
-    pool_size=5,  # ⚡ Reducido porque Supabase ya tiene su propio pool
-    max_overflow=5,  # ⚡ Reducido porque PgBouncer maneja la concurrencia
-    pool_recycle=300,  # ⚡ Reciclar conexiones cada 5 minutos
-    pool_timeout=30,  # ⚡ Timeout de 30s para obtener conexión del pool
-    # 🚨 CRÍTICO PARA PGBOUNCER: Desactivar prepared statements
-    connect_args={
-        "server_settings": {
-            "jit": "off"  # Desactiva Just-In-Time compilation en serverless
-        },
-        "statement_cache_size": 0,  # ⚠️ OBLIGATORIO: PgBouncer en modo transacción rota conexiones
-        "prepared_statement_cache_size": 0  # ⚠️ Alternativa para versiones más nuevas
-    }
-)
-
-# Session Factory asíncrona
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False
-)
+engines = {
+    workload: create_workload_engine(settings.get_database_url(), workload)
+    for workload in WORKLOADS
+}
+
+# OLTP: checkout, escaneo, auth (get_session)
+engine = engines["oltp"]
+
+
+def _sessionmaker(bind) -> async_sessionmaker:
+    return async_sessionmaker(
+        bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False
+    )
+
+
+# Session Factories asíncronas
+AsyncSessionLocal = _sessionmaker(engine)
+ReportingSessionLocal = _sessionmaker(engines["reporting"])  # Lecturas pesadas sin réplica sana
+BackgroundSessionLocal = _sessionmaker(engines["background"])  # Schedulers, warmups, tareas en segundo plano
+
+
+# Réplicas de lectura: un engine (y pool) por réplica, ver core/read_routing.py
+replica_engines = [
+    create_workload_engine(
+        url,
+        "reporting",
+        name=f"replica-{i}",
+        pool_size=settings.REPLICA_POOL_SIZE,
+        max_overflow=settings.REPLICA_MAX_OVERFLOW
+    )
+    for i, url in enumerate(settings.get_replica_urls())
+]
+
+if settings.SQL_INSTRUMENTATION:
+    for instrumented in [*engines.values(), *replica_engines]:
+        install_sql_instrumentation(instrumented)
+
+replica_router = ReplicaRouter([
+    (replica.url.host or f"replica-{i}", _sessionmaker(replica))
+    for i, replica in enumerate(replica_engines)
+])
+
+
+def get_pool_stats() -> dict:
+    """Saturación y esperas de cada pool (primario por carga y réplicas)"""
+    stats = {workload: pool_stats(pool_engine) for workload, pool_engine in engines.items()}
+    for replica in replica_engines:
+        stats[replica.pool.metrics.name] = pool_stats(replica)
+    return stats
 
 
 async def init_db() -> None:
@@ -58,3 +93,24 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
             yield session
         finally:
             await session.close()
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependencia para rutas de solo lectura pesadas (reportes, dashboards, exportaciones)
+    Réplica sana si hay; primario si no hay réplicas, están atrasadas o el
+    cliente acaba de escribir (read-your-writes)
+    Uso: session: AsyncSession = Depends(get_read_session)
+    """
+    sessionmaker = None
+    if replica_router.replicas:
+        if await must_read_primary(request):
+            replica_router.stats["lecturas_primario_forzadas"] += 1
+        else:
+            sessionmaker = await replica_router.pick()
+
+    async with (sessionmaker or ReportingSessionLocal)() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
@@ -0,0 +1,179 @@
+"""
+Pools por Carga de Trabajo - Nexus POS
+Engines separados para OLTP, reportes y jobs, con métricas de saturación
+
+Antes un único pool chico (5 + 5, timeout 30s) atendía todo: una
+exportación larga retenía conexiones durante minutos y los cajeros
+esperaban hasta 30s un slot libre.
+
+⚡ Cada clase de carga tiene su pool, con su tamaño y sus timeouts de
+Postgres (statement_timeout, idle_in_transaction_session_timeout, con
+SET LOCAL al comenzar cada transacción):
+- oltp: checkout, escaneo, auth (get_session). Timeouts cortos y
+  pool_timeout de pocos segundos: ninguna otra carga puede quitarle slots
+- reporting: reportes, dashboards, exportaciones (get_read_session cuando
+  no hay réplica sana)
+- background: schedulers, warmups, tareas en segundo plano
+
+Métricas (get_pool_stats, expuestas en /health/db-pools): conexiones en
+uso, saturación, esperas por un slot y timeouts del pool.
+"""
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import event, exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core.config import settings
+
+
+WORKLOADS = ("oltp", "reporting", "background")
+
+# Una espera mayor a esto cuenta como "esperó un slot" (no solo el checkout)
+WAIT_THRESHOLD_SECONDS = 0.005
+
+# Equivale a SET LOCAL de ambos timeouts en un solo round-trip (parametrizable)
+_SET_LOCAL_TIMEOUTS = text(
+    "SELECT set_config('statement_timeout', :statement_timeout, true), "
+    "set_config('idle_in_transaction_session_timeout', :idle_timeout, true)"
+)
+
+
+class PoolMetrics:
+    """Contadores de un pool desde que arrancó el proceso"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.esperas = 0
+        self.espera_total_s = 0.0
+        self.espera_max_s = 0.0
+        self.timeouts = 0
+
+    def record(self, elapsed: float) -> None:
+        self.checkouts += 1
+        if elapsed >= WAIT_THRESHOLD_SECONDS:
+            self.esperas += 1
+            self.espera_total_s += elapsed
+            self.espera_max_s = max(self.espera_max_s, elapsed)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool que mide cuánto tarda cada checkout"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            if self.metrics:
+                self.metrics.timeouts += 1
+            raise
+        if self.metrics:
+            self.metrics.record(time.perf_counter() - inicio)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() recrea el pool: conservar los contadores
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def workload_settings(workload: str) -> Dict[str, float]:
+    """Tamaño y timeouts de una clase de carga (oltp, reporting, background)"""
+    prefix = f"DB_{workload.upper()}_"
+    return {
+        "pool_size": getattr(settings, prefix + "POOL_SIZE"),
+        "max_overflow": getattr(settings, prefix + "MAX_OVERFLOW"),
+        "pool_timeout": getattr(settings, prefix + "POOL_TIMEOUT"),
+        "statement_timeout_ms": getattr(settings, prefix + "STATEMENT_TIMEOUT_MS"),
+        "idle_in_transaction_timeout_ms": getattr(settings, prefix + "IDLE_IN_TX_TIMEOUT_MS"),
+    }
+
+
+def workload_connect_args(workload: str, name: Optional[str] = None) -> dict:
+    """
+    connect_args de asyncpg de la clase de carga
+
+    Los timeouts no van acá: PgBouncer en modo transacción comparte las
+    conexiones del servidor entre clientes y no aplica parámetros de
+    arranque por cliente. Se fijan por transacción (set_local_timeouts).
+    """
+    return {
+        "server_settings": {
+            "jit": "off",  # Desactiva Just-In-Time compilation en serverless
+            "application_name": f"nexus-pos:{name or workload}",
+        },
+        # 🚨 CRÍTICO PARA PGBOUNCER: Desactivar prepared statements
+        "statement_cache_size": 0,  # ⚠️ OBLIGATORIO: PgBouncer en modo transacción rota conexiones
+        "prepared_statement_cache_size": 0  # ⚠️ Alternativa para versiones más nuevas
+    }
+
+
+def set_local_timeouts(engine: AsyncEngine, workload: str) -> None:
+    """
+    Fija los timeouts de Postgres de la clase de carga al comenzar cada
+    transacción (SET LOCAL): valen solo para esa transacción, así que
+    funcionan igual con conexión directa o detrás de PgBouncer en modo
+    transacción, donde la conexión del servidor cambia entre transacciones.
+    """
+    config = workload_settings(workload)
+    params = {
+        "statement_timeout": str(config["statement_timeout_ms"]),
+        "idle_timeout": str(config["idle_in_transaction_timeout_ms"]),
+    }
+
+    def _on_begin(conn):
+        conn.execute(_SET_LOCAL_TIMEOUTS, params)
+
+    event.listen(engine.sync_engine, "begin", _on_begin)
+
+
+def create_workload_engine(
+    url: str,
+    workload: str,
+    name: Optional[str] = None,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None
+) -> AsyncEngine:
+    """Engine con pool propio, tamaño y timeouts de la clase de carga"""
+    config = workload_settings(workload)
+    engine = create_async_engine(
+        url,
+        echo=False,  # ⚡ OPTIMIZACIÓN: Desactivado para producción (reduce overhead 30%)
+        future=True,
+        poolclass=MeteredQueuePool,
+        pool_pre_ping=True,  # ✅ VITAL para conexiones cloud: verifica si están vivas
+        pool_size=config["pool_size"] if pool_size is None else pool_size,
+        max_overflow=config["max_overflow"] if max_overflow is None else max_overflow,
+        pool_recycle=300,  # ⚡ Reciclar conexiones cada 5 minutos
+        pool_timeout=config["pool_timeout"],
+        connect_args=workload_connect_args(workload, name)
+    )
+    engine.pool.metrics = PoolMetrics(name or workload)
+    set_local_timeouts(engine, workload)
+    return engine
+
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    """Estado actual y contadores de un pool"""
+    pool = engine.pool
+    metrics = pool.metrics
+    capacidad = pool.size() + max(pool._max_overflow, 0)
+    en_uso = pool.checkedout()
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "en_uso": en_uso,
+        "libres": pool.checkedin(),
+        "saturacion": round(en_uso / capacidad, 3) if capacidad else None,
+        "checkouts": metrics.checkouts,
+        "esperas": metrics.esperas,
+        "espera_promedio_ms": round(metrics.espera_total_s / metrics.esperas * 1000, 2) if metrics.esperas else 0.0,
+        "espera_max_ms": round(metrics.espera_max_s * 1000, 2),
+        "timeouts": metrics.timeouts,
+    }
@@ -2,7 +2,9 @@ import aio_pika
 import pika
 import json
 import logging
-from typing import Optional, Dict, Any, Callable
+import zlib
+from typing import Optional, Dict, Any, Callable, List
+from uuid import NAMESPACE_URL, uuid4, uuid5
 from contextvars import ContextVar
 from contextlib import contextmanager
 from core.config import settings
@@ -82,6 +84,48 @@ async def publish_event(routing_key: str, data: dict, request_id: Optional[str]
         )
 
 
+# =====================================================
+# PARTICIONADO POR TIENDA
+# =====================================================
+
+SALES_CREATED = 'sales.created'
+
+
+def partition_for(tienda_id: Any, partitions: Optional[int] = None) -> int:
+    """
+    Partición estable de una tienda (CRC32, igual en todos los procesos)
+
+    Todos los eventos de una tienda van a la misma cola, y cada cola tiene
+    un solo consumer activo: las ventas de una tienda se procesan en orden
+    aunque haya varios workers.
+    """
+    partitions = partitions or settings.SALES_EVENT_PARTITIONS
+    return zlib.crc32(str(tienda_id).encode()) % partitions
+
+
+def partitioned_key(event_type: str, partition: int) -> str:
+    """Routing key de una partición: 'sales.created.3'"""
+    return f"{event_type}.{partition}"
+
+
+def event_id_for(payload: Dict[str, Any]) -> str:
+    """
+    ID del evento: derivado de la Idempotency-Key si la hay (un reintento
+    del POS que escape a la caché de idempotencia sigue siendo el mismo
+    evento), o aleatorio
+
+    La clave se interpreta con el mismo scope que la caché de idempotencia
+    (tienda:usuario): dos cajeros que generen la misma clave no comparten
+    event_id, y el worker no descarta la segunda venta como reentrega.
+    """
+    if payload.get('idempotency_key'):
+        scope = payload['tienda_id']
+        if payload.get('usuario_id'):
+            scope = f"{scope}:{payload['usuario_id']}"
+        return str(uuid5(NAMESPACE_URL, f"{scope}:{payload['idempotency_key']}"))
+    return str(uuid4())
+
+
 # =====================================================
 # SYNC EVENT PUBLISHER (Para Módulo 3 - Event-Driven)
 # =====================================================
@@ -144,8 +188,11 @@ class SyncEventPublisher:
             raise
     
     def publish_sale_created(self, sale_data: Dict[str, Any]):
-        """Publica evento de venta creada"""
-        self.publish('sales.created', sale_data)
+        """
+        Publica evento de venta creada con event_id, en la partición de su tienda
+        """
+        payload = {**sale_data, 'event_id': sale_data.get('event_id') or event_id_for(sale_data)}
+        self.publish(partitioned_key(SALES_CREATED, partition_for(payload['tienda_id'])), payload)
     
     def close(self):
         """Cierra la conexión"""
@@ -175,8 +222,9 @@ class EventConsumer:
     Soporta ACK manual y reintento automático
     """
     
-    def __init__(self, rabbitmq_url: str = None):
+    def __init__(self, rabbitmq_url: str = None, prefetch_count: int = 1):
         self.rabbitmq_url = rabbitmq_url or settings.RABBITMQ_URL
+        self.prefetch_count = prefetch_count
         self.connection = None
         self.channel = None
         self.subscriptions = []
@@ -198,8 +246,8 @@ class EventConsumer:
                 durable=True
             )
             
-            # Configurar QoS para procesar 1 mensaje a la vez
-            self.channel.basic_qos(prefetch_count=1)
+            # QoS: mensajes sin ACK por consumer (1 = de a uno; >1 para micro-lotes)
+            self.channel.basic_qos(prefetch_count=self.prefetch_count)
             
             logger.info("✅ EventConsumer conectado a RabbitMQ")
             
@@ -207,7 +255,13 @@ class EventConsumer:
             logger.error(f"❌ Error conectando EventConsumer: {e}")
             raise
     
-    def subscribe(self, event_type: str, callback: Callable, exchange: str = 'blend_events'):
+    def subscribe(
+        self,
+        event_type: str,
+        callback: Callable,
+        exchange: str = 'blend_events',
+        single_active: bool = False
+    ):
         """
         Suscribe a un tipo de evento
         
@@ -215,18 +269,23 @@ class EventConsumer:
             event_type: Routing key del evento (ej: 'sales.created')
             callback: Función que procesa el mensaje
             exchange: Exchange de RabbitMQ
+            single_active: Un solo consumer activo por cola (los demás quedan
+                de respaldo). Garantiza el orden con varios workers.
         """
         # Crear cola única para este evento
         queue_name = f"queue.{event_type}"
         
         # Declarar cola durable con DLQ
+        arguments = {
+            'x-dead-letter-exchange': f'{exchange}.dlx',
+            'x-message-ttl': 86400000  # 24 horas
+        }
+        if single_active:
+            arguments['x-single-active-consumer'] = True
         self.channel.queue_declare(
             queue=queue_name,
             durable=True,
-            arguments={
-                'x-dead-letter-exchange': f'{exchange}.dlx',
-                'x-message-ttl': 86400000  # 24 horas
-            }
+            arguments=arguments
         )
         
         # Bind cola al exchange con routing key
@@ -246,6 +305,30 @@ class EventConsumer:
         self.subscriptions.append(event_type)
         logger.info(f"✅ Suscrito a eventos: {event_type}")
     
+    def subscribe_partitions(
+        self,
+        event_type: str,
+        callback: Callable,
+        partitions: Optional[List[int]] = None,
+        exchange: str = 'blend_events'
+    ):
+        """
+        Suscribe a las colas particionadas de un evento (todas por defecto)
+        
+        Cada partición es una cola con un solo consumer activo: se pueden
+        levantar varios workers con las mismas particiones (failover) o
+        repartirlas entre workers (escala horizontal) sin reordenar eventos.
+        """
+        if partitions is None:
+            partitions = list(range(settings.SALES_EVENT_PARTITIONS))
+        for partition in partitions:
+            self.subscribe(
+                partitioned_key(event_type, partition),
+                callback,
+                exchange=exchange,
+                single_active=True
+            )
+    
     def start(self):
         """Inicia el consumo de mensajes (blocking)"""
         try:
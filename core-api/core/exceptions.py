@@ -7,7 +7,7 @@ from typing import Union, Dict, Any
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError, HTTPException
-from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.exc import DBAPIError, IntegrityError, SQLAlchemyError, TimeoutError as PoolTimeoutError
 from pydantic import ValidationError
 
 
@@ -59,6 +59,15 @@ class VentaInvalidaException(NexusPOSException):
     pass
 
 
+class IdempotencyConflictException(NexusPOSException):
+    """
+    Excepción para Idempotency-Key en conflicto:
+    409 si el request original sigue en curso, 422 si se reusó con otro cuerpo
+    """
+    def __init__(self, message: str, status_code: int = status.HTTP_409_CONFLICT):
+        super().__init__(message=message, status_code=status_code)
+
+
 async def nexus_exception_handler(
     request: Request,
     exc: NexusPOSException
@@ -165,6 +174,13 @@ async def validation_exception_handler(
     )
 
 
+def _is_statement_timeout(exc: SQLAlchemyError) -> bool:
+    """Consulta cancelada por statement_timeout (SQLSTATE 57014)"""
+    if not isinstance(exc, DBAPIError):
+        return False
+    return getattr(exc.orig, "sqlstate", None) == "57014" or getattr(exc.orig, "pgcode", None) == "57014"
+
+
 async def sqlalchemy_exception_handler(
     request: Request,
     exc: SQLAlchemyError
@@ -185,6 +201,15 @@ async def sqlalchemy_exception_handler(
         
         message = "Error de integridad de datos. Posiblemente un valor duplicado o referencia inválida."
         status_code = status.HTTP_409_CONFLICT
+    elif isinstance(exc, PoolTimeoutError) or _is_statement_timeout(exc):
+        # Pool de la carga saturado o statement_timeout (core/db_pools.py): reintentable
+        logger.warning(
+            f"Database Saturated: {str(exc)}",
+            extra={"request_id": request_id}
+        )
+        
+        message = "La base de datos está saturada. Reintentar en unos segundos."
+        status_code = status.HTTP_503_SERVICE_UNAVAILABLE
     else:
         # Otros errores de base de datos
         logger.error(
@@ -205,7 +230,8 @@ async def sqlalchemy_exception_handler(
                 "code": status_code
             },
             "request_id": request_id
-        }
+        },
+        headers={"Retry-After": "2"} if status_code == status.HTTP_503_SERVICE_UNAVAILABLE else None
     )
 
 
@@ -0,0 +1,175 @@
+"""
+Ruteo de Lecturas - Nexus POS
+Réplicas de lectura con control de lag y read-your-writes
+
+⚡ Los reportes, dashboards, exportaciones y analytics son lecturas pesadas
+que competían por el mismo pool que el checkout y el login. Con réplicas
+configuradas (DATABASE_REPLICA_URLS) esas rutas usan `get_read_session`:
+
+- Cada réplica tiene su propio engine y pool
+- El lag de cada réplica se mide cada REPLICA_LAG_CHECK_SECONDS; si supera
+  REPLICA_MAX_LAG_SECONDS (o no responde) se saltea. Sin réplicas sanas
+  la lectura va al primario, nunca falla por eso
+- Read-your-writes: tras una escritura exitosa, el mismo token lee del
+  primario durante READ_YOUR_WRITES_SECONDS (marca en Redis, vale entre
+  workers). El header `X-Read-Primary: 1` fuerza el primario siempre
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Segundos de atraso de la réplica (0 si ya aplicó todo lo recibido)
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class _Replica:
+    """Estado de una réplica: su session factory y el último lag medido"""
+
+    def __init__(self, name: str, sessionmaker: async_sessionmaker):
+        self.name = name
+        self.sessionmaker = sessionmaker
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.lock = asyncio.Lock()
+
+
+class ReplicaRouter:
+    """
+    Elige réplica para cada lectura (round robin entre las sanas)
+    """
+
+    def __init__(
+        self,
+        replicas: List[Tuple[str, async_sessionmaker]],
+        max_lag: Optional[float] = None,
+        check_interval: Optional[float] = None
+    ):
+        self.replicas = [_Replica(name, sessionmaker) for name, sessionmaker in replicas]
+        self.max_lag = settings.REPLICA_MAX_LAG_SECONDS if max_lag is None else max_lag
+        self.check_interval = settings.REPLICA_LAG_CHECK_SECONDS if check_interval is None else check_interval
+        self._next = 0
+        self.stats = {
+            "lecturas_replica": 0,
+            "lecturas_primario_forzadas": 0,  # read-your-writes / header
+            "lecturas_primario_fallback": 0,  # ninguna réplica sana
+        }
+
+    async def _lag(self, replica: _Replica) -> float:
+        """Lag de la réplica, re-medido si la medición venció (inf si no responde)"""
+        if time.monotonic() - replica.checked_at < self.check_interval:
+            return replica.lag
+
+        async with replica.lock:
+            # Otra corrutina pudo medirlo mientras esperábamos el lock
+            if time.monotonic() - replica.checked_at >= self.check_interval:
+                try:
+                    async with replica.sessionmaker() as session:
+                        replica.lag = float((await session.execute(LAG_SQL)).scalar() or 0)
+                except Exception as e:
+                    logger.warning(f"⚠️ Réplica {replica.name} no responde: {e}")
+                    replica.lag = math.inf
+                replica.checked_at = time.monotonic()
+        return replica.lag
+
+    async def pick(self) -> Optional[async_sessionmaker]:
+        """Session factory de una réplica sana, None = usar el primario"""
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(self._next + offset) % len(self.replicas)]
+            if await self._lag(replica) <= self.max_lag:
+                self._next = (self._next + offset + 1) % len(self.replicas)
+                self.stats["lecturas_replica"] += 1
+                return replica.sessionmaker
+
+        if self.replicas:
+            self.stats["lecturas_primario_fallback"] += 1
+        return None
+
+    def get_stats(self) -> dict:
+        """Lag por réplica y contadores desde que arrancó el proceso"""
+        return {
+            **self.stats,
+            "replicas": {
+                replica.name: {
+                    "lag_s": None if replica.lag is None or math.isinf(replica.lag) else round(replica.lag, 3),
+                    "sana": replica.lag is not None and replica.lag <= self.max_lag,
+                }
+                for replica in self.replicas
+            },
+        }
+
+
+# =====================================================
+# READ-YOUR-WRITES
+# =====================================================
+
+def _write_key(request: Request) -> Optional[str]:
+    """Marca por credencial (hash del header Authorization, nunca el token)"""
+    authorization = request.headers.get("Authorization")
+    if not authorization:
+        return None
+    return f"db:rw:{hashlib.sha256(authorization.encode()).hexdigest()[:32]}"
+
+
+async def mark_write(request: Request) -> None:
+    """Registra que esta credencial acaba de escribir"""
+    key = _write_key(request)
+    if not key:
+        return
+    from services.cache_service import get_redis_client
+
+    try:
+        client = await get_redis_client()
+        await client.set(key, "1", ex=settings.READ_YOUR_WRITES_SECONDS)
+    except Exception as e:
+        logger.warning(f"No se pudo registrar la escritura para read-your-writes: {e}")
+
+
+async def must_read_primary(request: Request) -> bool:
+    """True si la lectura debe ver las escrituras propias recientes"""
+    if request.headers.get("X-Read-Primary", "").lower() in ("1", "true"):
+        return True
+    key = _write_key(request)
+    if not key:
+        return False
+    from services.cache_service import get_redis_client
+
+    try:
+        client = await get_redis_client()
+        return bool(await client.exists(key))
+    except Exception:
+        # Sin Redis no sabemos si escribió: el primario siempre es consistente
+        return True
+
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    """
+    Marca las credenciales que escribieron con éxito (POST/PUT/PATCH/DELETE < 400)
+    Solo se registra si hay réplicas configuradas
+    """
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        response = await call_next(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            await mark_write(request)
+        return response
@@ -7,6 +7,7 @@ Scripts atómicos para operaciones críticas de stock
 - Velocidad: Se ejecuta EN MEMORIA, dentro de Redis
 - Sin Race Conditions: Evita overselling en hot sales
 """
+from typing import Optional
 
 # =====================================================
 # SCRIPT 1: RESERVE_STOCK
@@ -15,27 +16,29 @@ Scripts atómicos para operaciones críticas de stock
 
 RESERVE_STOCK_SCRIPT = """
 -- KEYS[1]: La key del stock (ej: "stock:tienda_uuid:variant_uuid:location_uuid")
--- ARGV[1]: Cantidad a descontar (ej: 1)
+-- ARGV[1]: Cantidad a descontar (ej: 1, o 0.75 para pesables)
+-- ARGV[2]: TTL en segundos (opcional, default 3600)
 
 local stock_key = KEYS[1]
 local qty_required = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2]) or 3600
 
 -- 1. Ver si existe el stock en caché
 local current_stock = tonumber(redis.call('GET', stock_key))
 
 -- Si no existe, devolvemos -2 (Cache Miss)
--- La app debe cargar desde PostgreSQL y reintentar
+-- La app carga desde PostgreSQL (SET NX) y reintenta en el mismo request
 if current_stock == nil then
     return -2
 end
 
 -- 2. Ver si alcanza
 if current_stock >= qty_required then
-    -- 3. Descontar (DECRBY es atómico)
-    local new_stock = redis.call('DECRBY', stock_key, qty_required)
+    -- 3. Descontar (INCRBYFLOAT es atómico y acepta cantidades decimales)
+    redis.call('INCRBYFLOAT', stock_key, -qty_required)
     
-    -- 4. Setear TTL de 1 hora (Para que no se quede viejo el cache)
-    redis.call('EXPIRE', stock_key, 3600)
+    -- 4. Renovar TTL (las keys con movimiento no vencen)
+    redis.call('EXPIRE', stock_key, ttl)
     
     return 1  -- Éxito (Stock reservado)
 else
@@ -53,25 +56,26 @@ end
 ROLLBACK_STOCK_SCRIPT = """
 -- KEYS[1]: La key del stock
 -- ARGV[1]: Cantidad a devolver (ej: 1)
+-- ARGV[2]: TTL en segundos (opcional, default 3600)
 
 local stock_key = KEYS[1]
 local qty_to_return = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2]) or 3600
 
 -- Verificar que la key existe
 local current_stock = tonumber(redis.call('GET', stock_key))
 
 if current_stock == nil then
-    -- Si no existe, crear con la cantidad a devolver
-    redis.call('SET', stock_key, qty_to_return)
-    redis.call('EXPIRE', stock_key, 3600)
-    return 1
+    -- Si venció no se recrea: crearla con solo la cantidad devuelta dejaría
+    -- un saldo falso. La próxima lectura la carga desde PostgreSQL.
+    return 0
 end
 
 -- Incrementar el stock
-local new_stock = redis.call('INCRBY', stock_key, qty_to_return)
-redis.call('EXPIRE', stock_key, 3600)
+redis.call('INCRBYFLOAT', stock_key, qty_to_return)
+redis.call('EXPIRE', stock_key, ttl)
 
-return new_stock
+return 1
 """
 
 
@@ -83,16 +87,19 @@ return new_stock
 WARMUP_STOCK_SCRIPT = """
 -- KEYS[1]: La key del stock
 -- ARGV[1]: Stock inicial desde DB
+-- ARGV[2]: TTL en segundos (opcional, default 3600)
+-- Para muchas keys usar SET NX EX en pipeline (services/stock_cache_service.py)
 
 local stock_key = KEYS[1]
 local initial_stock = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2]) or 3600
 
 -- Solo setear si no existe (para no sobrescribir reservas en progreso)
 local exists = redis.call('EXISTS', stock_key)
 
 if exists == 0 then
     redis.call('SET', stock_key, initial_stock)
-    redis.call('EXPIRE', stock_key, 3600)
+    redis.call('EXPIRE', stock_key, ttl)
     return 1  -- Warmup exitoso
 else
     return 0  -- Ya existía, no se sobrescribe
@@ -150,7 +157,7 @@ end
 for i = 1, num_items do
     local stock_key = KEYS[i]
     local qty_required = tonumber(ARGV[i])
-    redis.call('DECRBY', stock_key, qty_required)
+    redis.call('INCRBYFLOAT', stock_key, -qty_required)
     redis.call('EXPIRE', stock_key, 3600)
 end
 
@@ -158,16 +165,113 @@ return 1  -- Éxito total
 """
 
 
+# =====================================================
+# SCRIPTS 6-8: RESERVAS CON VENCIMIENTO (pagos online)
+# La reserva descuenta stock igual que MULTI_RESERVE y además guarda sus
+# retenciones en `reservation:{id}`, con el vencimiento en el ZSET
+# RESERVATION_EXPIRY_KEY y la venta como "en vuelo" para la reconciliación.
+# Estados: held → confirmed (pago aprobado) | released (rechazo/vencimiento)
+# =====================================================
+
+CREATE_RESERVATION_SCRIPT = """
+-- KEYS[1]: reservation key, KEYS[2]: ZSET de vencimientos,
+-- KEYS[3]: hash de reservas en vuelo, KEYS[4..]: stock keys
+-- ARGV[1]: reservation id, ARGV[2]: vencimiento (epoch), ARGV[3]: TTL de la reserva,
+-- ARGV[4]: TTL de stock, ARGV[5]: datos de la reserva (JSON),
+-- ARGV[6]: entrada en vuelo (JSON), ARGV[7..]: cantidades (orden de KEYS[4..])
+
+local offset = 3
+
+for i = offset + 1, #KEYS do
+    local current_stock = tonumber(redis.call('GET', KEYS[i]))
+    if current_stock == nil then
+        return {-2, i - offset}  -- Cache Miss en el item i
+    end
+    if current_stock < tonumber(ARGV[i + 3]) then
+        return {-1, i - offset}  -- Stock insuficiente en el item i
+    end
+end
+
+for i = offset + 1, #KEYS do
+    redis.call('INCRBYFLOAT', KEYS[i], -tonumber(ARGV[i + 3]))
+    redis.call('EXPIRE', KEYS[i], ARGV[4])
+end
+
+redis.call('HSET', KEYS[1], 'state', 'held', 'data', ARGV[5])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[6])
+
+return {1, 0}
+"""
+
+RELEASE_RESERVATION_SCRIPT = """
+-- KEYS: iguales a CREATE_RESERVATION_SCRIPT
+-- ARGV[1]: reservation id, ARGV[2]: TTL de stock, ARGV[3..]: cantidades retenidas
+
+redis.call('ZREM', KEYS[2], ARGV[1])
+if redis.call('HGET', KEYS[1], 'state') ~= 'held' then
+    return 0  -- Ya confirmada, liberada o vencida del todo
+end
+
+for i = 4, #KEYS do
+    -- Key expirada: el próximo read-through la carga de la DB (no inventar saldo)
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('INCRBYFLOAT', KEYS[i], tonumber(ARGV[i - 1]))
+        redis.call('EXPIRE', KEYS[i], ARGV[2])
+    end
+end
+
+redis.call('HSET', KEYS[1], 'state', 'released')
+redis.call('HDEL', KEYS[3], ARGV[1])
+return 1
+"""
+
+CONFIRM_RESERVATION_SCRIPT = """
+-- KEYS: iguales a CREATE_RESERVATION_SCRIPT
+-- ARGV[1]: reservation id, ARGV[2]: TTL de stock, ARGV[3]: entrada en vuelo (JSON),
+-- ARGV[4..]: cantidades retenidas
+
+local state = redis.call('HGET', KEYS[1], 'state')
+if not state then
+    return -1  -- No existe (o venció hace más que su TTL)
+end
+if state == 'confirmed' then
+    return 0  -- Webhook repetido
+end
+
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HSET', KEYS[1], 'state', 'confirmed')
+
+if state == 'released' then
+    -- Pago aprobado después de liberar: la venta ocurrió, se vuelve a descontar
+    for i = 4, #KEYS do
+        if redis.call('EXISTS', KEYS[i]) == 1 then
+            redis.call('INCRBYFLOAT', KEYS[i], -tonumber(ARGV[i]))
+            redis.call('EXPIRE', KEYS[i], ARGV[2])
+        end
+    end
+    redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+    return 2
+end
+
+return 1
+"""
+
+
 # =====================================================
 # HELPER: Stock Key Generator
 # =====================================================
 
-def generate_stock_key(tienda_id: str, variant_id: str, location_id: str) -> str:
+def generate_stock_key(tienda_id: str, variant_id: str, location_id: Optional[str] = None) -> str:
     """
     Genera la key de Redis para el stock de una variante en una ubicación
     
     Formato: stock:{tienda_id}:{variant_id}:{location_id}
+    Productos legacy (sin ubicación): stock:{tienda_id}:{producto_id}
     """
+    if location_id is None:
+        return f"stock:{tienda_id}:{variant_id}"
     return f"stock:{tienda_id}:{variant_id}:{location_id}"
 
 
@@ -177,11 +281,16 @@ def generate_reservation_key(transaction_id: str) -> str:
     
     Formato: reservation:{transaction_id}
     
-    Se usa para guardar la reserva por 10 minutos mientras se procesa el pago
+    Guarda las retenciones de stock mientras se procesa el pago online
+    (ver services/reservation_service.py)
     """
     return f"reservation:{transaction_id}"
 
 
+# ZSET de reservas pendientes ordenado por vencimiento (epoch)
+RESERVATION_EXPIRY_KEY = "reservations:expiry"
+
+
 # =====================================================
 # EJEMPLO DE USO
 # =====================================================
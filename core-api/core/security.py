@@ -1,37 +1,130 @@
 """
 Seguridad y Autenticación - Nexus POS
 Hashing de passwords y generación de tokens JWT
+
+⚡ bcrypt tarda 100-250ms de CPU por llamada. Desde rutas async se usan
+las variantes `*_async`, que corren en un pool de threads acotado (bcrypt
+libera el GIL) detrás de un semáforo: un aluvión de logins en el cambio
+de turno no congela los checkouts del mismo worker.
 """
+import asyncio
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import jwt
 import bcrypt
 from core.config import settings
 
 
+logger = logging.getLogger(__name__)
+
+_hash_executor: Optional[ThreadPoolExecutor] = None
+# Un semáforo por event loop (asyncio.Semaphore queda atado a su loop)
+_hash_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verifica que un password en texto plano coincida con el hash
+
+    ⚠️ Bloqueante: desde código async usar `verify_password_async`
     """
     try:
         password_bytes = plain_password.encode('utf-8')
         hashed_bytes = hashed_password.encode('utf-8')
         return bcrypt.checkpw(password_bytes, hashed_bytes)
     except Exception as e:
-        print(f"Error verifying password: {e}")
+        logger.warning(f"Error verifying password: {e}")
         return False
 
 
 def get_password_hash(password: str) -> str:
     """
     Genera un hash bcrypt de un password en texto plano
+
+    ⚠️ Bloqueante: desde código async usar `get_password_hash_async`
     """
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    True si el hash fue generado con parámetros distintos a los actuales
+
+    Formato bcrypt: $2b$<cost>$<salt+hash>
+    """
+    try:
+        _, prefix, cost, _ = hashed_password.split("$", 3)
+        return prefix != "2b" or int(cost) != settings.BCRYPT_ROUNDS
+    except ValueError:
+        return True
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_CONCURRENCY,
+            thread_name_prefix="bcrypt"
+        )
+    return _hash_executor
+
+
+def _get_hash_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _hash_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_CONCURRENCY)
+        _hash_semaphores[loop] = semaphore
+    return semaphore
+
+
+async def _run_hashing(func, *args):
+    """
+    Ejecuta una función de bcrypt fuera del event loop
+
+    El semáforo acota los hashes en vuelo: los excedentes esperan en el
+    loop (cancelables, sin consumir CPU) en lugar de encolarse en el pool.
+    """
+    async with _get_hash_semaphore():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), func, *args)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Versión no bloqueante de `verify_password`"""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Versión no bloqueante de `get_password_hash`"""
+    return await _run_hashing(get_password_hash, password)
+
+
+async def verify_and_update_password(
+    plain_password: str,
+    hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica el password y, si el hash quedó con parámetros viejos, lo regenera
+
+    Returns:
+        (válido, nuevo_hash): nuevo_hash es None si no hace falta rehashear
+    """
+    if not await verify_password_async(plain_password, hashed_password):
+        return False, None
+    if password_needs_rehash(hashed_password):
+        return True, await get_password_hash_async(plain_password)
+    return True, None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Crea un token JWT con payload personalizado
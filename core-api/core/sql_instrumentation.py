@@ -0,0 +1,193 @@
+"""
+Instrumentación SQL - Nexus POS
+Queries y tiempo de DB por request, detector de N+1 y log de queries lentas
+
+Hooks de eventos del engine (before/after_cursor_execute) en todos los
+pools de core/db.py. El middleware abre un contador por request y, al
+terminar, lo suma al agregado de la ruta:
+
+- Queries y ms de DB por request, en el log con el X-Request-ID
+- N+1 probable: la misma forma de statement (SQL normalizado, sin
+  literales ni parámetros) repetida SQL_N_PLUS_ONE_THRESHOLD veces en un request
+- Queries más lentas que SQL_SLOW_QUERY_MS, con su SQL normalizado
+  (también fuera de requests: workers y schedulers)
+- Header `Server-Timing: db;dur=...` opcional (SQL_SERVER_TIMING)
+
+El agregado por ruta es por proceso (como los get_stats de los workers):
+GET /admin/sql-stats lista las rutas que más consultan.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Set
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from core.config import settings
+from core.event_bus import get_request_id
+
+
+logger = logging.getLogger(__name__)
+
+_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),  # Literales de texto
+    (re.compile(r"\$\d+|%\(\w+\)s|(?<!:):\w+"), "?"),  # Parámetros (asyncpg, psycopg, nombrados)
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),  # Números
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?, ...)"),  # Listas IN de largo variable
+    (re.compile(r"\s+"), " "),
+]
+
+ORDERS = ("queries_promedio", "db_ms_promedio", "queries_max", "n_plus_one", "lentas")
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(statement: str) -> str:
+    """Forma del statement: mismo texto para la misma query con distintos valores"""
+    for pattern, replacement in _PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class RequestQueryStats:
+    """Contadores de un request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.lentas = 0
+        self.shapes: Counter = Counter()
+        self.n_plus_one: Set[str] = set()
+
+    def record(self, shape: str, elapsed_ms: float, slow: bool) -> None:
+        self.queries += 1
+        self.db_ms += elapsed_ms
+        self.lentas += int(slow)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == settings.SQL_N_PLUS_ONE_THRESHOLD:
+            self.n_plus_one.add(shape)
+            logger.warning(
+                f"🔁 N+1 probable [Request-ID: {get_request_id()}]: "
+                f"{settings.SQL_N_PLUS_ONE_THRESHOLD}+ ejecuciones de: {shape[:500]}"
+            )
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar("sql_request_stats", default=None)
+
+# "GET /api/v1/ventas/" -> acumulados de la ruta
+_route_stats: Dict[str, Dict[str, float]] = {}
+
+
+# =====================================================
+# HOOKS DEL ENGINE
+# =====================================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info["sql_query_start"].pop()
+    elapsed_ms = (time.perf_counter() - inicio) * 1000
+    shape = normalize_sql(statement)
+    slow = elapsed_ms >= settings.SQL_SLOW_QUERY_MS
+
+    if slow:
+        logger.warning(
+            f"🐢 Query lenta {elapsed_ms:.1f}ms [Request-ID: {get_request_id()}]: {shape[:1000]}"
+        )
+
+    stats = _current.get()
+    if stats is not None:
+        stats.record(shape, elapsed_ms, slow)
+
+
+def _handle_error(exception_context):
+    # La query falló: descartar su marca de inicio
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("sql_query_start"):
+        conn.info["sql_query_start"].pop()
+
+
+def install_sql_instrumentation(engine: AsyncEngine) -> None:
+    """Registra los hooks en el engine (idempotente)"""
+    sync_engine = engine.sync_engine
+    if getattr(sync_engine, "_sql_instrumented", False):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+    sync_engine._sql_instrumented = True
+
+
+# =====================================================
+# MIDDLEWARE Y AGREGADO POR RUTA
+# =====================================================
+
+def _record_route(route: str, stats: RequestQueryStats) -> None:
+    acumulado = _route_stats.setdefault(route, {
+        "requests": 0, "queries": 0, "queries_max": 0, "db_ms": 0.0, "n_plus_one": 0, "lentas": 0,
+    })
+    acumulado["requests"] += 1
+    acumulado["queries"] += stats.queries
+    acumulado["queries_max"] = max(acumulado["queries_max"], stats.queries)
+    acumulado["db_ms"] += stats.db_ms
+    acumulado["n_plus_one"] += int(bool(stats.n_plus_one))
+    acumulado["lentas"] += stats.lentas
+
+
+class SQLInstrumentationMiddleware(BaseHTTPMiddleware):
+    """
+    Abre el contador de queries del request y lo agrega a su ruta
+    Va dentro de RequestIDMiddleware para heredar el X-Request-ID
+    """
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        stats = RequestQueryStats()
+        token = _current.set(stats)
+        try:
+            response = await call_next(request)
+        finally:
+            _current.reset(token)
+
+        # Solo rutas existentes: los 404 de scanners no crean entradas
+        route = request.scope.get("route")
+        if route is not None and stats.queries:
+            _record_route(f"{request.method} {route.path}", stats)
+
+        if stats.queries >= settings.SQL_REQUEST_QUERY_BUDGET:
+            logger.warning(
+                f"📈 {request.method} {request.url.path}: {stats.queries} queries, "
+                f"{stats.db_ms:.1f}ms de DB [Request-ID: {get_request_id()}]"
+            )
+
+        if settings.SQL_SERVER_TIMING:
+            response.headers.append(
+                "Server-Timing", f'db;dur={stats.db_ms:.1f};desc="{stats.queries} queries"'
+            )
+        return response
+
+
+def get_route_stats(orden: str = "queries_promedio", limit: int = 20) -> List[dict]:
+    """Rutas ordenadas por la métrica pedida (mayor primero)"""
+    filas = [
+        {
+            "ruta": ruta,
+            **acumulado,
+            "db_ms": round(acumulado["db_ms"], 1),
+            "queries_promedio": round(acumulado["queries"] / acumulado["requests"], 1),
+            "db_ms_promedio": round(acumulado["db_ms"] / acumulado["requests"], 1),
+        }
+        for ruta, acumulado in _route_stats.items()
+    ]
+    filas.sort(key=lambda fila: fila[orden], reverse=True)
+    return filas[:limit]
+
+
+def reset_route_stats() -> None:
+    _route_stats.clear()
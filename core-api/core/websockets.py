@@ -3,80 +3,361 @@ WebSocket Connection Manager - Enterprise Edition
 Gestiona conexiones WebSocket bidireccionales para notificaciones en tiempo real
 
 @module core/websockets
-@description Sistema de pub/sub con auto-reconnect y broadcasting por tienda
+@description Sistema de pub/sub con fan-out multi-worker (Redis) y colas por conexión
 @author Tech Lead - Real-time Infrastructure
-@version 1.0.0
+@version 2.0.0
+
+ARQUITECTURA:
+- Cada evento se publica en un canal Redis por tienda: ws:tienda:{tienda_id}
+- Cada worker de uvicorn se suscribe UNA vez (PSUBSCRIBE ws:tienda:*)
+- El mensaje se serializa UNA vez en el publicador; los workers reenvían el texto tal cual
+- Cada conexión tiene su propia cola acotada + tarea escritora:
+  un cliente lento nunca frena al resto de la tienda
+- Clientes lentos: se descartan los mensajes más viejos (coalescing) y,
+  si siguen sin drenar, se desconectan
+- Si se corta Redis el suscriptor se re-suscribe con backoff; mientras
+  tanto el worker entrega localmente además de publicar
 """
 
+import asyncio
+import itertools
+import uuid
 from typing import Dict, Set, Optional
 from fastapi import WebSocket, WebSocketDisconnect
 import logging
 import json
 from datetime import datetime
+from core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+# Canales Redis
+CHANNEL_PREFIX = "ws:tienda:"
+BROADCAST_CHANNEL = "ws:all"
+
+# Separador entre el origen (conexión excluida) y el payload JSON.
+# json.dumps escapa los saltos de línea, así que el primer "\n" siempre es el separador.
+_ENVELOPE_SEP = "\n"
+
+
+def tienda_channel(tienda_id: str) -> str:
+    """Nombre del canal Redis de una tienda"""
+    return f"{CHANNEL_PREFIX}{tienda_id}"
+
+
+class ClientConnection:
+    """
+    Conexión individual con cola de salida acotada y tarea escritora propia.
+
+    Attributes:
+        websocket: WebSocket de FastAPI
+        tienda_id: Tienda a la que pertenece el cliente
+        conn_id: ID único de la conexión (para exclusiones cross-worker)
+        queue: Cola acotada de payloads ya serializados
+        dropped: Mensajes descartados por lentitud (acumulado)
+        dropped_streak: Descartes desde el último envío exitoso
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        tienda_id: str,
+        conn_id: str,
+        queue_size: int,
+        send_timeout: float,
+        max_dropped: int
+    ):
+        self.websocket = websocket
+        self.tienda_id = tienda_id
+        self.conn_id = conn_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.send_timeout = send_timeout
+        self.max_dropped = max_dropped
+        self.dropped = 0
+        self.dropped_streak = 0
+        self.closed = False
+        self.writer_task: Optional[asyncio.Task] = None
+
+    def enqueue(self, payload: str) -> bool:
+        """
+        Encola un payload sin bloquear.
+
+        Si la cola está llena se descarta el mensaje más viejo (coalescing:
+        el cliente recibe siempre lo más reciente).
+
+        Returns:
+            False si el cliente acumuló demasiados descartes sin drenar y debe desconectarse
+        """
+        if self.closed:
+            return False
+
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.dropped += 1
+            self.dropped_streak += 1
+            if self.dropped_streak > self.max_dropped:
+                return False
+
+        self.queue.put_nowait(payload)
+        return True
+
+    async def writer(self, on_error) -> None:
+        """Drena la cola enviando cada payload con timeout"""
+        try:
+            while True:
+                payload = await self.queue.get()
+                async with asyncio.timeout(self.send_timeout):
+                    await self.websocket.send_text(payload)
+                self.dropped_streak = 0
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            logger.warning(f"Slow WebSocket consumer timed out - tienda_id={self.tienda_id}")
+            on_error(self)
+        except WebSocketDisconnect:
+            on_error(self)
+        except Exception as e:
+            logger.error(f"Error sending message to WebSocket: {e}")
+            on_error(self)
+
+
 class ConnectionManager:
     """
     Gestor centralizado de conexiones WebSocket con soporte para broadcasting por tienda.
-    
+
     Features:
     - Conexiones organizadas por tienda_id
-    - Broadcasting selectivo a tiendas específicas
-    - Manejo automático de desconexiones
-    - Logging detallado de eventos
-    - Soporte para múltiples clientes por tienda
-    
+    - Fan-out entre workers vía Redis Pub/Sub (un suscriptor por proceso)
+    - Serialización única por mensaje
+    - Cola acotada + tarea escritora por conexión (sin head-of-line blocking)
+    - Descarte/desconexión de consumidores lentos
+    - Fallback a entrega local si Redis no está disponible
+
     Attributes:
         active_connections: Dict[tienda_id, Set[WebSocket]] - Mapeo de tiendas a conexiones activas
     """
-    
-    def __init__(self):
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        queue_size: Optional[int] = None,
+        send_timeout: Optional[float] = None,
+        max_dropped: Optional[int] = None
+    ):
         # Estructura: {tienda_id: {websocket1, websocket2, ...}}
         self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self._clients: Dict[WebSocket, ClientConnection] = {}
+
+        self.redis_url = redis_url
+        self.queue_size = queue_size or settings.WS_SEND_QUEUE_SIZE
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT
+        self.max_dropped = max_dropped or settings.WS_MAX_DROPPED
+
+        self._redis = None
+        self._pubsub = None
+        self._subscribed = False
+        self._listener_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()  # Escritoras y cierres en curso
+        self._conn_seq = itertools.count(1)
+        # Único entre procesos: id(self) del singleton se repite entre workers
+        self._worker_id = uuid.uuid4().hex
+
+        # Métricas
+        self.messages_published = 0
+        self.messages_delivered = 0
+        self.slow_consumers_dropped = 0
+        self.redis_reconnects = 0
+
         logger.info("WebSocket ConnectionManager initialized")
-    
+
+    # ------------------------------------------------------------------
+    # CICLO DE VIDA (Redis Pub/Sub)
+    # ------------------------------------------------------------------
+
+    @property
+    def fanout_enabled(self) -> bool:
+        """True si el manager está suscripto a Redis (recibe lo que publica)"""
+        return self._subscribed and self._listener_alive
+
+    @property
+    def _listener_alive(self) -> bool:
+        return self._listener_task is not None and not self._listener_task.done()
+
+    async def start(self, redis_client=None):
+        """
+        Conecta a Redis y lanza el suscriptor único de este worker.
+
+        Args:
+            redis_client: Cliente redis.asyncio ya creado (opcional, útil en tests)
+        """
+        if self._listener_alive:
+            return
+
+        try:
+            if redis_client is None:
+                import redis.asyncio as redis
+                redis_client = redis.Redis.from_url(
+                    self.redis_url or settings.REDIS_URL,
+                    encoding="utf-8",
+                    decode_responses=True
+                )
+
+            self._redis = redis_client
+            await self._subscribe()
+            self._listener_task = asyncio.create_task(self._listen())
+            logger.info("WebSocket Redis fan-out started")
+        except Exception as e:
+            logger.warning(f"WebSocket Redis fan-out unavailable, using local delivery: {e}")
+            self._redis = None
+            await self._close_pubsub()
+
+    async def stop(self):
+        """Detiene el suscriptor y cierra las tareas escritoras"""
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener_task = None
+
+        await self._close_pubsub()
+
+        for client in list(self._clients.values()):
+            self._remove(client)
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        logger.info("WebSocket ConnectionManager stopped")
+
+    async def _subscribe(self):
+        """Crea el pubsub y se suscribe a los canales de tiendas y broadcast"""
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+        await self._pubsub.subscribe(BROADCAST_CHANNEL)
+        self._subscribed = True
+
+    async def _close_pubsub(self):
+        self._subscribed = False
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+
+    async def _listen(self):
+        """
+        Loop del suscriptor: reenvía cada mensaje a las conexiones locales.
+
+        Si la conexión a Redis se cae (o el stream termina) se re-suscribe con
+        backoff exponencial. Mientras está desconectado fanout_enabled es False
+        y los envíos de este worker se entregan también localmente.
+        """
+        delay = settings.WS_REDIS_RECONNECT_MIN_DELAY
+        while True:
+            try:
+                if not self._subscribed:
+                    await self._subscribe()
+                    self.redis_reconnects += 1
+                    delay = settings.WS_REDIS_RECONNECT_MIN_DELAY
+                    logger.info("WebSocket Redis fan-out re-subscribed")
+
+                async for raw in self._pubsub.listen():
+                    self._dispatch(raw)
+                raise ConnectionError("Redis pubsub stream ended")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._subscribed:
+                    logger.warning(f"WebSocket Redis fan-out lost, delivering locally until reconnect: {e}")
+                await self._close_pubsub()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, settings.WS_REDIS_RECONNECT_MAX_DELAY)
+
+    def _dispatch(self, raw: dict):
+        """Entrega un mensaje recibido de Redis a las conexiones locales"""
+        if raw.get("type") not in ("message", "pmessage"):
+            return
+
+        channel = raw["channel"]
+        data = raw["data"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        exclude_id, _, payload = data.partition(_ENVELOPE_SEP)
+
+        if channel == BROADCAST_CHANNEL:
+            for tienda_id in list(self.active_connections.keys()):
+                self._deliver_local(tienda_id, payload, exclude_id or None)
+        elif channel.startswith(CHANNEL_PREFIX):
+            self._deliver_local(channel[len(CHANNEL_PREFIX):], payload, exclude_id or None)
+
+    # ------------------------------------------------------------------
+    # CONEXIONES
+    # ------------------------------------------------------------------
+
     async def connect(self, websocket: WebSocket, tienda_id: str):
         """
         Acepta una nueva conexión WebSocket y la asocia a una tienda.
-        
+
         Args:
             websocket: Instancia de WebSocket de FastAPI
             tienda_id: ID de la tienda a la que pertenece el cliente
         """
         await websocket.accept()
-        
-        if tienda_id not in self.active_connections:
-            self.active_connections[tienda_id] = set()
-        
-        self.active_connections[tienda_id].add(websocket)
-        
+
+        client = ClientConnection(
+            websocket,
+            tienda_id,
+            conn_id=f"{self._worker_id}:{next(self._conn_seq)}",
+            queue_size=self.queue_size,
+            send_timeout=self.send_timeout,
+            max_dropped=self.max_dropped
+        )
+        client.writer_task = self._spawn(client.writer(self._on_writer_error))
+
+        self._clients[websocket] = client
+        self.active_connections.setdefault(tienda_id, set()).add(websocket)
+
         connection_count = len(self.active_connections[tienda_id])
         logger.info(
             f"WebSocket connected - tienda_id={tienda_id}, "
             f"total_connections={connection_count}"
         )
-        
-        # Enviar mensaje de bienvenida
-        await websocket.send_json({
+
+        # Enviar mensaje de bienvenida (por la cola, como cualquier otro)
+        client.enqueue(json.dumps({
             "type": "connection_established",
             "tienda_id": tienda_id,
             "timestamp": datetime.utcnow().isoformat(),
             "message": "Conectado al sistema de notificaciones en tiempo real"
-        })
-    
+        }))
+
     def disconnect(self, websocket: WebSocket, tienda_id: str):
         """
         Desconecta un WebSocket y limpia la estructura de datos.
-        
+
         Args:
             websocket: Instancia de WebSocket a desconectar
             tienda_id: ID de la tienda asociada
         """
+        client = self._clients.pop(websocket, None)
+        if client:
+            client.closed = True
+            if client.writer_task and client.writer_task is not asyncio.current_task():
+                client.writer_task.cancel()
+
         if tienda_id in self.active_connections:
             self.active_connections[tienda_id].discard(websocket)
-            
+
             # Limpiar si no quedan conexiones
             if not self.active_connections[tienda_id]:
                 del self.active_connections[tienda_id]
@@ -86,7 +367,83 @@ class ConnectionManager:
                     f"WebSocket disconnected - tienda_id={tienda_id}, "
                     f"remaining={len(self.active_connections[tienda_id])}"
                 )
-    
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """Crea una tarea y la registra para poder esperarla en stop()"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _remove(self, client: ClientConnection):
+        """Quita una conexión del registro (sin esperar al socket)"""
+        self.disconnect(client.websocket, client.tienda_id)
+
+    def _on_writer_error(self, client: ClientConnection):
+        """Callback de la tarea escritora cuando el socket falla o se cuelga"""
+        self._remove(client)
+        self._spawn(self._close_quietly(client.websocket))
+
+    async def _close_quietly(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # Try Again Later
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # ENVÍO
+    # ------------------------------------------------------------------
+
+    def _deliver_local(self, tienda_id: str, payload: str, exclude_id: Optional[str] = None) -> int:
+        """
+        Encola un payload ya serializado en todas las conexiones locales de la tienda.
+        Nunca espera a los sockets: O(conexiones) operaciones de cola.
+
+        Returns:
+            Cantidad de conexiones a las que se encoló el mensaje
+        """
+        sockets = self.active_connections.get(tienda_id)
+        if not sockets:
+            return 0
+
+        delivered = 0
+        slow = []
+        for websocket in sockets:
+            client = self._clients.get(websocket)
+            if client is None or client.conn_id == exclude_id:
+                continue
+            if client.enqueue(payload):
+                delivered += 1
+            else:
+                slow.append(client)
+
+        for client in slow:
+            self.slow_consumers_dropped += 1
+            logger.warning(
+                f"Dropping slow WebSocket consumer - tienda_id={tienda_id}, "
+                f"dropped_messages={client.dropped}"
+            )
+            self._on_writer_error(client)
+
+        self.messages_delivered += delivered
+        return delivered
+
+    async def _publish(self, channel: str, payload: str, exclude_id: Optional[str]) -> bool:
+        """
+        Publica en Redis para los demás workers. Retorna False si no hay
+        fan-out disponible. Se publica aunque este worker esté re-suscribiéndose:
+        los demás siguen escuchando.
+        """
+        if self._redis is None or not self._listener_alive:
+            return False
+        try:
+            await self._redis.publish(channel, f"{exclude_id or ''}{_ENVELOPE_SEP}{payload}")
+            self.messages_published += 1
+            return True
+        except Exception as e:
+            logger.error(f"Error publishing WebSocket event to Redis, delivering locally: {e}")
+            return False
+
     async def send_to_tienda(
         self,
         tienda_id: str,
@@ -94,80 +451,86 @@ class ConnectionManager:
         exclude: Optional[WebSocket] = None
     ):
         """
-        Envía un mensaje a todas las conexiones de una tienda específica.
-        
+        Envía un mensaje a todas las conexiones de una tienda específica,
+        en todos los workers.
+
         Args:
             tienda_id: ID de la tienda objetivo
             message: Dict con el payload del mensaje
             exclude: WebSocket a excluir del broadcast (opcional)
         """
-        if tienda_id not in self.active_connections:
-            logger.warning(f"No active connections for tienda_id={tienda_id}")
-            return
-        
         # Agregar metadata
         message["tienda_id"] = tienda_id
         message["timestamp"] = datetime.utcnow().isoformat()
-        
-        disconnected = set()
-        
-        for connection in self.active_connections[tienda_id]:
-            if exclude and connection == exclude:
-                continue
-            
-            try:
-                await connection.send_json(message)
-            except WebSocketDisconnect:
-                logger.warning(f"Connection closed during broadcast - tienda_id={tienda_id}")
-                disconnected.add(connection)
-            except Exception as e:
-                logger.error(f"Error sending message to WebSocket: {e}")
-                disconnected.add(connection)
-        
-        # Limpiar conexiones muertas
-        for conn in disconnected:
-            self.disconnect(conn, tienda_id)
-        
+
+        # Serialización única
+        payload = json.dumps(message, default=str)
+
+        exclude_client = self._clients.get(exclude) if exclude is not None else None
+        exclude_id = exclude_client.conn_id if exclude_client else None
+
+        published = await self._publish(tienda_channel(tienda_id), payload, exclude_id)
+        if published and self.fanout_enabled:
+            logger.debug(
+                f"Broadcast published - tienda_id={tienda_id}, "
+                f"type={message.get('type', 'unknown')}"
+            )
+            return
+
+        recipients = self._deliver_local(tienda_id, payload, exclude_id)
         logger.info(
             f"Broadcast sent - tienda_id={tienda_id}, "
-            f"recipients={len(self.active_connections.get(tienda_id, set()))}, "
+            f"recipients={recipients}, "
             f"type={message.get('type', 'unknown')}"
         )
-    
+
     async def broadcast_all(self, message: dict):
         """
         Envía un mensaje a TODAS las conexiones activas (todas las tiendas).
-        
+
         Args:
             message: Dict con el payload del mensaje
         """
         message["timestamp"] = datetime.utcnow().isoformat()
-        
+        payload = json.dumps(message, default=str)
+
+        published = await self._publish(BROADCAST_CHANNEL, payload, None)
+        if published and self.fanout_enabled:
+            return
+
         total_sent = 0
         for tienda_id in list(self.active_connections.keys()):
-            await self.send_to_tienda(tienda_id, message.copy())
-            total_sent += len(self.active_connections.get(tienda_id, set()))
-        
+            total_sent += self._deliver_local(tienda_id, payload)
+
         logger.info(f"Global broadcast sent - total_recipients={total_sent}")
-    
+
     def get_stats(self) -> dict:
         """
         Retorna estadísticas de conexiones activas.
-        
+
         Returns:
-            Dict con stats: total_connections, connections_by_tienda
+            Dict con stats: total_connections, connections_by_tienda, métricas de fan-out
         """
         total = sum(len(connections) for connections in self.active_connections.values())
-        
+
         return {
             "total_connections": total,
             "total_tiendas": len(self.active_connections),
             "connections_by_tienda": {
                 tienda_id: len(connections)
                 for tienda_id, connections in self.active_connections.items()
-            }
+            },
+            "redis_fanout": self.fanout_enabled,
+            "redis_reconnects": self.redis_reconnects,
+            "messages_published": self.messages_published,
+            "messages_delivered": self.messages_delivered,
+            "slow_consumers_dropped": self.slow_consumers_dropped,
+            "max_queue_depth": max(
+                (client.queue.qsize() for client in self._clients.values()),
+                default=0
+            )
         }
 
 
-# Instancia global del ConnectionManager (singleton)
+# Instancia global del ConnectionManager (singleton por worker)
 manager = ConnectionManager()
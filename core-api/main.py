@@ -2,6 +2,7 @@
 Aplicación Principal - Nexus POS
 FastAPI App con configuración Multi-Tenant
 """
+import asyncio
 import logging
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,8 +14,11 @@ from core.config import settings
 from core.db import init_db
 from core.logging_config import setup_logging
 from core.middleware import RequestIDMiddleware, RequestLoggingMiddleware
+from core.read_routing import ReadYourWritesMiddleware
+from core.sql_instrumentation import SQLInstrumentationMiddleware
 from core.audit_middleware import AuditMiddleware
 from core.websockets import manager as ws_manager  # ⭐ WebSocket Manager
+from services.stock_cache_service import warmup_all_tiendas
 from core.exceptions import (
     NexusPOSException,
     nexus_exception_handler,
@@ -55,10 +59,30 @@ async def lifespan(app: FastAPI):
     # except Exception as e:
     #     logger.warning(f"No se pudieron crear tablas (puede ser normal): {e}")
     
+    # WebSockets: suscriptor Redis único por worker para fan-out entre procesos
+    if settings.WS_REDIS_FANOUT:
+        await ws_manager.start()
+    
+    # Caché de stock: warmup de todas las tiendas en segundo plano (no demora el arranque)
+    warmup_task = None
+    if settings.STOCK_WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(_warmup_stock())
+    
     yield
     
     # Shutdown: Limpiar recursos si es necesario
     logger.info("Cerrando aplicación...")
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await ws_manager.stop()
+
+
+async def _warmup_stock():
+    """Warmup de stock de arranque; un error no debe tirar la API (hay read-through)"""
+    try:
+        await warmup_all_tiendas()
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Warmup de stock de arranque falló: {e}")
 
 
 # Instancia de FastAPI
@@ -84,9 +108,13 @@ app.add_middleware(
 )
 
 # Middleware de Request ID, Logging y Auditoría
+if settings.SQL_INSTRUMENTATION:
+    app.add_middleware(SQLInstrumentationMiddleware)  # Queries por request (dentro del Request ID)
 app.add_middleware(RequestIDMiddleware)
 app.add_middleware(RequestLoggingMiddleware, log_body=False)
 app.add_middleware(AuditMiddleware)  # ⭐ ENTERPRISE: Audit trails inmutables
+if settings.get_replica_urls():
+    app.add_middleware(ReadYourWritesMiddleware)  # Lecturas propias recientes van al primario
 
 # Registrar handlers de excepciones
 app.add_exception_handler(NexusPOSException, nexus_exception_handler)
@@ -6,7 +6,7 @@ from datetime import datetime
 from typing import Optional, List, Dict, Any
 from uuid import UUID, uuid4
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, DateTime, func
+from sqlalchemy import Column, DateTime, ForeignKeyConstraint, Index, func
 from sqlalchemy.dialects.postgresql import JSONB
 
 # Importar modelos de auditoría
@@ -417,6 +417,35 @@ class ProductVariant(SQLModel, table=True):
         index=True,
         description="Código de barras EAN13 para escáner"
     )
+    reorder_point: Optional[float] = Field(
+        default=None,
+        nullable=True,
+        description="Punto de reorden por ubicación (NULL = usar STOCK_REORDER_POINT_DEFAULT)"
+    )
+    
+    # Condiciones de compra (reposición automática)
+    proveedor_id: Optional[UUID] = Field(
+        default=None,
+        foreign_key="proveedores.id",
+        nullable=True,
+        index=True,
+        description="Proveedor habitual de esta variante"
+    )
+    cost_price: Optional[float] = Field(
+        default=None,
+        nullable=True,
+        description="Precio de costo de referencia para órdenes de compra"
+    )
+    min_order_qty: Optional[float] = Field(
+        default=None,
+        nullable=True,
+        description="Cantidad mínima de compra (MOQ) del proveedor"
+    )
+    pack_size: Optional[float] = Field(
+        default=None,
+        nullable=True,
+        description="Unidades por bulto: se compra en múltiplos de este valor"
+    )
     is_active: bool = Field(
         default=True,
         nullable=False,
@@ -442,8 +471,21 @@ class InventoryLedger(SQLModel, table=True):
     Modelo de Libro Mayor de Inventario - APPEND ONLY
     NUNCA se actualiza, solo se insertan transacciones
     Stock actual = SUM(delta) WHERE variant_id = X AND location_id = Y
+
+    En producción está particionada por mes sobre occurred_at (migración
+    e5a1c9f7b2d8, services/partition_service.py): occurred_at integra la PK
     """
     __tablename__ = "inventory_ledger"
+    __table_args__ = (
+        # Historial paginado por keyset: uno por combinación de filtro
+        # (ver services/ledger_history_service.py)
+        Index("ix_inventory_ledger_tienda_occurred", "tienda_id", "occurred_at", "transaction_id"),
+        Index("ix_inventory_ledger_tienda_variant_occurred", "tienda_id", "variant_id", "occurred_at", "transaction_id"),
+        Index("ix_inventory_ledger_tienda_location_occurred", "tienda_id", "location_id", "occurred_at", "transaction_id"),
+        Index("ix_inventory_ledger_tienda_type_occurred", "tienda_id", "transaction_type", "occurred_at", "transaction_id"),
+        # ⚡ BRIN: append-only, el orden físico sigue al tiempo (pocos KB vs btree)
+        Index("ix_inventory_ledger_occurred_at_brin", "occurred_at", postgresql_using="brin"),
+    )
     
     transaction_id: UUID = Field(
         default_factory=uuid4,
@@ -454,7 +496,6 @@ class InventoryLedger(SQLModel, table=True):
     tienda_id: UUID = Field(
         foreign_key="tiendas.id",
         nullable=False,
-        index=True,
         description="ID de la tienda (para particionamiento)"
     )
     variant_id: UUID = Field(
@@ -492,8 +533,8 @@ class InventoryLedger(SQLModel, table=True):
     )
     occurred_at: datetime = Field(
         default_factory=datetime.utcnow,
-        sa_column=Column(DateTime(timezone=True), nullable=False, index=True, server_default=func.now()),
-        description="Cuándo ocurrió la transacción"
+        sa_column=Column(DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now()),
+        description="Cuándo ocurrió la transacción (clave de partición)"
     )
     created_by: Optional[UUID] = Field(
         default=None,
@@ -506,6 +547,42 @@ class InventoryLedger(SQLModel, table=True):
     location: Optional["Location"] = Relationship(back_populates="inventory_transactions")
 
 
+class StockSnapshot(SQLModel, table=True):
+    """
+    Modelo de Snapshot de Stock - Checkpoint del ledger
+    Saldo por (variante, ubicación) al cierre de un checkpoint:
+    stock a la fecha T = snapshot más cercano <= T + deltas del ledger desde él
+    (ver services/stock_snapshot_service.py)
+    """
+    __tablename__ = "stock_snapshots"
+    __table_args__ = (
+        Index("ix_stock_snapshots_tienda_snapshot_at", "tienda_id", "snapshot_at"),
+    )
+
+    snapshot_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), primary_key=True, nullable=False),
+        description="Instante del checkpoint (incluye los movimientos con occurred_at <= snapshot_at)"
+    )
+    variant_id: UUID = Field(
+        foreign_key="product_variants.variant_id",
+        primary_key=True,
+        nullable=False
+    )
+    location_id: UUID = Field(
+        foreign_key="locations.location_id",
+        primary_key=True,
+        nullable=False
+    )
+    tienda_id: UUID = Field(
+        foreign_key="tiendas.id",
+        nullable=False
+    )
+    quantity: float = Field(
+        nullable=False,
+        description="SUM(delta) del ledger hasta snapshot_at"
+    )
+
+
 # =====================================================
 # FIN NUEVOS MODELOS - INVENTORY LEDGER
 # =====================================================
@@ -759,6 +836,11 @@ class Venta(SQLModel, table=True):
     Cabecera de la venta con totales y método de pago
     """
     __tablename__ = "ventas"
+    __table_args__ = (
+        # ⚡ Deduplicación de reintentos offline: ON CONFLICT DO NOTHING sobre este índice
+        # (incluye fecha, la clave de partición: el reintento trae la fecha original)
+        Index("ix_ventas_tienda_idempotency_key", "tienda_id", "idempotency_key", "fecha", unique=True),
+    )
     
     id: UUID = Field(
         default_factory=uuid4,
@@ -766,9 +848,10 @@ class Venta(SQLModel, table=True):
         index=True,
         nullable=False
     )
+    # Particionada por mes sobre fecha: la PK es (id, fecha)
     fecha: datetime = Field(
         default_factory=datetime.utcnow,
-        sa_column=Column(DateTime(timezone=True), nullable=False, index=True, server_default=func.now())
+        sa_column=Column(DateTime(timezone=True), primary_key=True, nullable=False, index=True, server_default=func.now())
     )
     total: float = Field(
         nullable=False,
@@ -818,6 +901,19 @@ class Venta(SQLModel, table=True):
         index=True,
         description="ID de la tienda a la que pertenece la venta"
     )
+    sesion_caja_id: Optional[UUID] = Field(
+        default=None,
+        foreign_key="sesiones_caja.id",
+        nullable=True,
+        index=True,
+        description="Sesión de caja abierta en la que se registró la venta"
+    )
+    idempotency_key: Optional[str] = Field(
+        default=None,
+        max_length=64,
+        nullable=True,
+        description="Clave generada por el POS para ventas offline (única por tienda)"
+    )
     
     # Relaciones
     tienda: Optional[Tienda] = Relationship(back_populates="ventas")
@@ -831,6 +927,9 @@ class DetalleVenta(SQLModel, table=True):
     Snapshot de precios al momento de la transacción
     """
     __tablename__ = "detalles_venta"
+    __table_args__ = (
+        ForeignKeyConstraint(["venta_id", "fecha"], ["ventas.id", "ventas.fecha"]),
+    )
     
     id: UUID = Field(
         default_factory=uuid4,
@@ -851,12 +950,15 @@ class DetalleVenta(SQLModel, table=True):
         description="Subtotal calculado: cantidad * precio_unitario"
     )
     
-    # Foreign Keys
+    # Foreign Keys (venta_id, fecha) -> ventas
     venta_id: UUID = Field(
-        foreign_key="ventas.id",
         nullable=False,
         index=True
     )
+    fecha: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), primary_key=True, nullable=False),
+        description="Fecha de la venta (copia): clave de partición, como en ventas"
+    )
     producto_id: UUID = Field(
         foreign_key="productos.id",
         nullable=False,
@@ -969,6 +1071,34 @@ class SesionCaja(SQLModel, table=True):
         index=True,
         description="Estado de la sesión: abierta, cerrada"
     )
+    
+    # ⚡ Totales acumulados (se actualizan al registrar ventas y movimientos)
+    # Cierre y reportes X/Z leen una sola fila; ver services/caja_service.py
+    total_ventas_efectivo: float = Field(
+        default=0.0,
+        nullable=False,
+        description="Ventas en efectivo registradas en la sesión"
+    )
+    total_ventas_otros: float = Field(
+        default=0.0,
+        nullable=False,
+        description="Ventas con otros medios de pago registradas en la sesión"
+    )
+    total_ingresos: float = Field(
+        default=0.0,
+        nullable=False,
+        description="Ingresos manuales de efectivo"
+    )
+    total_egresos: float = Field(
+        default=0.0,
+        nullable=False,
+        description="Egresos manuales de efectivo"
+    )
+    cantidad_tickets: int = Field(
+        default=0,
+        nullable=False,
+        description="Cantidad de ventas registradas en la sesión"
+    )
     created_at: datetime = Field(
         default_factory=datetime.utcnow,
         sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -1087,6 +1217,11 @@ class Proveedor(SQLModel, table=True):
         nullable=True,
         description="Dirección física del proveedor"
     )
+    lead_time_dias: Optional[int] = Field(
+        default=None,
+        nullable=True,
+        description="Días de entrega del proveedor (NULL = usar RESTOCK_LEAD_TIME_DAYS)"
+    )
     is_active: bool = Field(
         default=True,
         nullable=False,
@@ -1134,7 +1269,7 @@ class OrdenCompra(SQLModel, table=True):
         max_length=50,
         nullable=False,
         index=True,
-        description="Estado de la orden: PENDIENTE, RECIBIDA, CANCELADA"
+        description="Estado de la orden: BORRADOR, PENDIENTE, PARCIAL, RECIBIDA, CANCELADA"
     )
     total: float = Field(
         nullable=False,
@@ -1195,6 +1330,11 @@ class DetalleOrden(SQLModel, table=True):
         nullable=False,
         description="Subtotal calculado: cantidad * precio_costo_unitario"
     )
+    cantidad_recibida: float = Field(
+        default=0.0,
+        nullable=False,
+        description="Cantidad ya recibida (recepciones parciales)"
+    )
     
     # Foreign Keys
     orden_id: UUID = Field(
@@ -1203,11 +1343,19 @@ class DetalleOrden(SQLModel, table=True):
         index=True,
         description="ID de la orden de compra"
     )
-    producto_id: UUID = Field(
+    producto_id: Optional[UUID] = Field(
+        default=None,
         foreign_key="productos.id",
-        nullable=False,
+        nullable=True,
         index=True,
-        description="ID del producto"
+        description="ID del producto (legacy)"
+    )
+    variant_id: Optional[UUID] = Field(
+        default=None,
+        foreign_key="product_variants.variant_id",
+        nullable=True,
+        index=True,
+        description="ID de la variante (órdenes generadas por reposición)"
     )
     
     # Relaciones
@@ -1221,6 +1369,9 @@ class Factura(SQLModel, table=True):
     Registro de facturas emitidas con autorización electrónica
     """
     __tablename__ = "facturas"
+    __table_args__ = (
+        ForeignKeyConstraint(["venta_id", "venta_fecha"], ["ventas.id", "ventas.fecha"]),
+    )
     
     id: UUID = Field(
         default_factory=uuid4,
@@ -1294,12 +1445,15 @@ class Factura(SQLModel, table=True):
     
     # Foreign Keys
     venta_id: UUID = Field(
-        foreign_key="ventas.id",
         nullable=False,
         unique=True,  # Relación 1 a 1
         index=True,
         description="ID de la venta asociada a esta factura"
     )
+    venta_fecha: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+        description="Fecha de la venta (parte de la FK a ventas particionada)"
+    )
     tienda_id: UUID = Field(
         foreign_key="tiendas.id",
         nullable=False,
@@ -1312,3 +1466,33 @@ class Factura(SQLModel, table=True):
     tienda: Optional[Tienda] = Relationship(back_populates="facturas")
 
 
+
+
+class ProcessedEvent(SQLModel, table=True):
+    """
+    Modelo de Evento Procesado - Deduplicación en los consumers
+    Un evento se registra en la misma transacción que sus efectos:
+    si RabbitMQ lo reentrega, el INSERT ... ON CONFLICT lo descarta
+    """
+    __tablename__ = "processed_events"
+    
+    consumer: str = Field(
+        max_length=100,
+        primary_key=True,
+        nullable=False,
+        description="Consumer que procesó el evento (ej: sales_worker)"
+    )
+    event_id: UUID = Field(
+        primary_key=True,
+        nullable=False,
+        description="ID único del evento"
+    )
+    tienda_id: Optional[UUID] = Field(
+        default=None,
+        nullable=True,
+        description="Tienda del evento (sin FK: solo para diagnóstico)"
+    )
+    processed_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=True), nullable=False, index=True, server_default=func.now())
+    )
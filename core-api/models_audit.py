@@ -76,8 +76,8 @@ class AuditLog(SQLModel, table=True):
     # When (Cuándo)
     timestamp: datetime = Field(
         default_factory=datetime.utcnow,
-        sa_column=Column(DateTime(timezone=True), nullable=False, index=True, server_default=func.now()),
-        description="Timestamp UTC de la acción"
+        sa_column=Column(DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now()),
+        description="Timestamp UTC de la acción (clave de partición mensual)"
     )
     
     # Where (Desde dónde)
@@ -153,6 +153,8 @@ class AuditLog(SQLModel, table=True):
         # Índice GIN para búsqueda en JSON
         Index('idx_audit_payload_before', 'payload_before', postgresql_using='gin'),
         Index('idx_audit_payload_after', 'payload_after', postgresql_using='gin'),
+        # ⚡ BRIN sobre la clave de partición (ver migración e5a1c9f7b2d8)
+        Index('ix_audit_logs_timestamp_brin', 'timestamp', postgresql_using='brin'),
     )
 
 
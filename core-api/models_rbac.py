@@ -75,7 +75,7 @@ class Role(SQLModel, table=True):
     
     # Relaciones
     permissions: List[RolePermission] = Relationship(back_populates="role")
-    users: List["Usuario"] = Relationship(back_populates="role")
+    # Los usuarios referencian el rol por código (users.rol, ver USER_ROL_ALIASES), sin FK
 
 
 # Permisos predefinidos del sistema
@@ -178,3 +178,18 @@ SYSTEM_ROLES = {
         ]
     },
 }
+
+
+# users.rol guarda códigos: los de SYSTEM_ROLES y los históricos de
+# core/permissions ("owner", "admin"), que se resuelven a un rol del sistema
+USER_ROL_ALIASES = {
+    "owner": "admin_tienda",
+    "admin": "admin_tienda",
+}
+
+
+def system_role_names() -> List[tuple]:
+    """(código de users.rol, Role.name) de cada rol del sistema y alias"""
+    codigos = {code: code for code in SYSTEM_ROLES}
+    codigos.update(USER_ROL_ALIASES)
+    return [(rol, SYSTEM_ROLES[code]["name"]) for rol, code in codigos.items()]
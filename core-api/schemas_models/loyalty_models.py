@@ -93,8 +93,8 @@ class WalletTransaction(SQLModel, table=True):
         description="+ ganados, - gastados"
     )
     
-    # Referencia a la venta que generó/usó puntos
-    venta_id: Optional[UUID] = Field(default=None, foreign_key="ventas.id")
+    # Referencia a la venta que generó/usó puntos (sin FK: ventas está particionada)
+    venta_id: Optional[UUID] = Field(default=None)
     
     # Canal donde ocurrió
     canal: str = Field(
@@ -176,8 +176,7 @@ class GiftCard(SQLModel, table=True):
     )
     venta_origen_id: Optional[UUID] = Field(
         default=None,
-        foreign_key="ventas.id",
-        description="Venta donde se compró la GC"
+        description="Venta donde se compró la GC (sin FK: ventas está particionada)"
     )
     
     # Metadata
@@ -201,7 +200,7 @@ class GiftCardUso(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     gift_card_id: UUID = Field(foreign_key="gift_cards.id", nullable=False, index=True)
     
-    venta_id: UUID = Field(foreign_key="ventas.id", nullable=False)
+    venta_id: UUID = Field(nullable=False)  # Sin FK: ventas está particionada
     
     monto_usado: float = Field(nullable=False)
     monto_restante: float = Field(nullable=False, description="Después de este uso")
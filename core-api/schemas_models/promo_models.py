@@ -185,7 +185,7 @@ class PromocionUso(SQLModel, table=True):
     
     promocion_id: UUID = Field(foreign_key="promociones.id", nullable=False, index=True)
     cliente_id: Optional[UUID] = Field(default=None, foreign_key="clientes.id", index=True)
-    venta_id: UUID = Field(foreign_key="ventas.id", nullable=False)
+    venta_id: UUID = Field(nullable=False)  # Sin FK: ventas está particionada
     
     descuento_aplicado: float = Field(nullable=False)
     
@@ -67,10 +67,9 @@ class RFIDTag(SQLModel, table=True):
         description="Metadata adicional del tag"
     )
     
-    # Venta (si fue vendido)
+    # Venta (si fue vendido). Sin FK: ventas está particionada (PK id, fecha)
     venta_id: Optional[UUID] = Field(
         default=None,
-        foreign_key="ventas.id",
         description="Venta donde se vendió este tag"
     )
     fecha_venta: Optional[datetime] = None
@@ -127,10 +126,9 @@ class RFIDScanSession(SQLModel, table=True):
     fin: Optional[datetime] = None
     duracion_segundos: Optional[float] = None
     
-    # Si es checkout, referencia a la venta
+    # Si es checkout, referencia a la venta (sin FK: ventas está particionada)
     venta_id: Optional[UUID] = Field(
-        default=None,
-        foreign_key="ventas.id"
+        default=None
     )
     
     # Items detectados
@@ -154,3 +154,52 @@ class VentaResumen(BaseModel):
     metodo_pago: str
     cantidad_items: int
     mensaje: str = "Venta procesada exitosamente"
+
+
+# ==================== VENTAS OFFLINE (SINCRONIZACIÓN POR LOTES) ====================
+
+class ItemVentaOfflineInput(ItemVentaInput):
+    """
+    Item de una venta hecha sin conexión
+    precio_unitario es el que cobró el POS; si no viene se usa el precio actual
+    """
+    precio_unitario: Optional[float] = Field(None, ge=0, description="Precio cobrado offline")
+
+
+class VentaOfflineInput(BaseModel):
+    """Venta registrada offline, identificada por una clave generada en el POS"""
+    idempotency_key: str = Field(
+        ..., min_length=8, max_length=64,
+        description="Clave única por venta generada en el POS (ej: UUID)"
+    )
+    fecha: datetime = Field(..., description="Momento en que se hizo la venta en el POS")
+    items: List[ItemVentaOfflineInput] = Field(..., min_length=1)
+    metodo_pago: str = Field(
+        ...,
+        pattern="^(EFECTIVO|MERCADOPAGO|TARJETA|efectivo|tarjeta_debito|tarjeta_credito|transferencia)$"
+    )
+
+
+class VentaOfflineBatch(BaseModel):
+    """Lote ordenado de ventas offline (se puede reenviar completo sin duplicar)"""
+    ventas: List[VentaOfflineInput] = Field(..., min_length=1)
+
+
+class VentaOfflineResultado(BaseModel):
+    """
+    Resultado por venta del lote
+    status: created (ingresada ahora), duplicate (ya estaba), rejected (no válida)
+    """
+    idempotency_key: str
+    status: str
+    venta_id: Optional[UUID] = None
+    detalle: Optional[str] = None
+
+
+class VentaOfflineBatchResponse(BaseModel):
+    """Resumen de la sincronización de un lote offline"""
+    recibidas: int
+    creadas: int
+    duplicadas: int
+    rechazadas: int
+    resultados: List[VentaOfflineResultado]
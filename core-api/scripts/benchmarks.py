@@ -0,0 +1,169 @@
+"""
+Micro-benchmarks: corrida, baseline y detección de regresiones
+Corre tests/benchmarks con pytest-benchmark y compara la mediana de cada
+benchmark contra la baseline versionada (tests/benchmarks/baseline.json)
+
+Uso:
+    python scripts/benchmarks.py run [--threshold 15] [--output resultado.json]
+    python scripts/benchmarks.py compare resultado.json [--baseline otra.json] [--threshold 15]
+    python scripts/benchmarks.py update [--from resultado.json]
+
+Sale con código 1 si algún benchmark es más lento que la baseline por
+encima del umbral (en %). Las baselines dependen de la máquina: regenerarla
+(`update`) en la misma máquina/runner donde se compara.
+"""
+import json
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).parent.parent
+SUITE = ROOT / "tests" / "benchmarks"
+BASELINE = SUITE / "baseline.json"
+DEFAULT_THRESHOLD = 15.0
+
+
+def run_suite(output: Path, pytest_args: Optional[List[str]] = None) -> int:
+    """Corre la suite y deja el JSON completo de pytest-benchmark en `output`"""
+    cmd = [
+        sys.executable, "-m", "pytest", str(SUITE),
+        "--benchmark-only",
+        f"--benchmark-json={output}",
+        "-p", "no:cacheprovider",
+        "-q",
+        *(pytest_args or []),
+    ]
+    return subprocess.call(cmd, cwd=ROOT)
+
+
+def load(path: Path) -> Tuple[Dict[str, dict], dict]:
+    """
+    Lee una baseline o un JSON de pytest-benchmark
+
+    Returns:
+        ({nombre: {median, mean, stddev, rounds}}, datos de la máquina)
+    """
+    data = json.loads(path.read_text())
+    if "benchmarks" in data and isinstance(data["benchmarks"], dict):
+        return data["benchmarks"], data.get("machine", {})
+
+    machine = data.get("machine_info", {})
+    benchmarks = {
+        bench["fullname"]: {
+            "median": bench["stats"]["median"],
+            "mean": bench["stats"]["mean"],
+            "stddev": bench["stats"]["stddev"],
+            "rounds": bench["stats"]["rounds"],
+        }
+        for bench in data["benchmarks"]
+    }
+    return benchmarks, {
+        "cpu": machine.get("cpu", {}).get("brand_raw"),
+        "python": machine.get("python_version"),
+        "system": machine.get("system"),
+    }
+
+
+def write_baseline(source: Path, target: Path = BASELINE) -> None:
+    """Guarda la baseline resumida (solo estadísticas, sin datos de la corrida)"""
+    benchmarks, machine = load(source)
+    target.write_text(json.dumps({
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": machine,
+        "benchmarks": dict(sorted(benchmarks.items())),
+    }, indent=2, ensure_ascii=False) + "\n")
+    print(f"✅ Baseline actualizada: {target} ({len(benchmarks)} benchmarks)")
+
+
+def compare(current: Path, baseline: Path = BASELINE, threshold: float = DEFAULT_THRESHOLD) -> int:
+    """
+    Compara medianas contra la baseline
+
+    Returns:
+        Cantidad de regresiones (benchmarks más lentos que baseline + threshold %)
+    """
+    base, base_machine = load(baseline)
+    actual, actual_machine = load(current)
+
+    if base_machine.get("cpu") != actual_machine.get("cpu"):
+        print(
+            f"⚠️  Baseline tomada en otra máquina ({base_machine.get('cpu')} vs "
+            f"{actual_machine.get('cpu')}): las diferencias incluyen el hardware"
+        )
+
+    regresiones = 0
+    ancho = max(len(name) for name in {**base, **actual})
+    print(f"{'benchmark'.ljust(ancho)}  {'baseline':>11}  {'actual':>11}  {'cambio':>8}")
+    for name in sorted(set(base) | set(actual)):
+        if name not in actual:
+            print(f"{name.ljust(ancho)}  {'':>11}  {'-':>11}  (no corrió)")
+            continue
+        if name not in base:
+            print(f"{name.ljust(ancho)}  {'-':>11}  {actual[name]['median'] * 1000:>9.3f}ms  (nuevo)")
+            continue
+
+        antes, ahora = base[name]["median"], actual[name]["median"]
+        cambio = (ahora - antes) / antes * 100
+        marca = ""
+        if cambio > threshold:
+            regresiones += 1
+            marca = "  🐢 REGRESIÓN"
+        elif cambio < -threshold:
+            marca = "  ⚡"
+        print(f"{name.ljust(ancho)}  {antes * 1000:>9.3f}ms  {ahora * 1000:>9.3f}ms  {cambio:>+7.1f}%{marca}")
+
+    if regresiones:
+        print(f"\n❌ {regresiones} benchmark(s) más lentos que la baseline por más de {threshold:.0f}%")
+    else:
+        print(f"\n✅ Sin regresiones mayores a {threshold:.0f}%")
+    return regresiones
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Micro-benchmarks con baseline")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_run = sub.add_parser("run", help="Correr la suite y comparar contra la baseline")
+    p_run.add_argument("--output", type=Path, help="Guardar el JSON de pytest-benchmark")
+    p_run.add_argument("--baseline", type=Path, default=BASELINE)
+    p_run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Regresión tolerada en %%")
+
+    p_compare = sub.add_parser("compare", help="Comparar un resultado contra la baseline")
+    p_compare.add_argument("actual", type=Path)
+    p_compare.add_argument("--baseline", type=Path, default=BASELINE)
+    p_compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Regresión tolerada en %%")
+
+    p_update = sub.add_parser("update", help="Regenerar la baseline")
+    p_update.add_argument("--from", dest="origen", type=Path, help="Usar un resultado existente en vez de correr")
+    p_update.add_argument("--baseline", type=Path, default=BASELINE)
+
+    args, pytest_args = parser.parse_known_args()
+
+    if args.comando == "compare":
+        sys.exit(1 if compare(args.actual, args.baseline, args.threshold) else 0)
+
+    if args.comando == "update" and args.origen:
+        write_baseline(args.origen, args.baseline)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = getattr(args, "output", None) or Path(tmp) / "benchmarks.json"
+        code = run_suite(output, pytest_args)
+        if code != 0:
+            sys.exit(code)
+
+        if args.comando == "update":
+            write_baseline(output, args.baseline)
+        elif not args.baseline.exists():
+            print(f"⚠️  No hay baseline en {args.baseline}: generarla con `update`")
+        else:
+            sys.exit(1 if compare(output, args.baseline, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
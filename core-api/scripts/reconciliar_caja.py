@@ -0,0 +1,76 @@
+"""
+Reconciliación de Caja
+Verifica los totales acumulados de las sesiones de caja contra las filas
+crudas (ventas y movimientos) y opcionalmente los corrige
+
+Uso:
+    python scripts/reconciliar_caja.py --tienda <uuid> [--dias 7] [--corregir]
+    python scripts/reconciliar_caja.py --sesion <uuid> [--corregir]
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from uuid import UUID
+
+# Agregar path del core-api para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+
+from core.db import get_session
+from models import SesionCaja
+from services.caja_service import CajaService
+
+
+async def main():
+    """
+    Recorre las sesiones pedidas y reporta las descuadradas
+    """
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Reconciliar totales de sesiones de caja")
+    parser.add_argument("--tienda", help="UUID de la tienda (todas sus sesiones recientes)")
+    parser.add_argument("--sesion", help="UUID de una sesión puntual")
+    parser.add_argument("--dias", type=int, default=7, help="Sesiones abiertas en los últimos N días")
+    parser.add_argument("--corregir", action="store_true", help="Sobrescribir totales descuadrados")
+    
+    args = parser.parse_args()
+    if not args.tienda and not args.sesion:
+        parser.error("Indicar --tienda o --sesion")
+    
+    statement = select(SesionCaja)
+    if args.sesion:
+        statement = statement.where(SesionCaja.id == UUID(args.sesion))
+    else:
+        desde = datetime.utcnow() - timedelta(days=args.dias)
+        statement = statement.where(
+            SesionCaja.tienda_id == UUID(args.tienda),
+            SesionCaja.fecha_apertura >= desde
+        )
+    
+    async for session in get_session():
+        sesiones = (await session.execute(statement.order_by(SesionCaja.fecha_apertura))).scalars().all()
+        service = CajaService(session)
+        
+        descuadradas = 0
+        for sesion in sesiones:
+            resultado = await service.reconciliar(sesion, corregir=args.corregir)
+            if resultado["ok"]:
+                continue
+            descuadradas += 1
+            print(f"⚠️  Sesión {resultado['sesion_id']} ({sesion.estado}):")
+            for campo, valores in resultado["diferencias"].items():
+                print(f"   {campo}: acumulado={valores['acumulado']} real={valores['real']}")
+        
+        if args.corregir and descuadradas:
+            await session.commit()
+        
+        print(f"\n✅ {len(sesiones)} sesiones verificadas, {descuadradas} descuadradas"
+              + (" (corregidas)" if args.corregir and descuadradas else ""))
+        
+        break  # Solo usar primera sesión
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,192 @@
+"""
+Servicio de Caja - Nexus POS
+Totales acumulados por sesión de caja y reconciliación contra filas crudas
+
+⚡ Cada venta y cada movimiento incrementa los totales de su sesión con un
+UPDATE atómico (sin leer-modificar-escribir). El cierre y los reportes X/Z
+leen una sola fila en lugar de agregar ventas y movimientos.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import MovimientoCaja, SesionCaja, Venta
+
+
+logger = logging.getLogger(__name__)
+
+METODO_EFECTIVO = "efectivo"
+ESTADO_ANULADA = "anulado"
+
+# Totales que se reconcilian (columna de SesionCaja)
+TOTALES = (
+    "total_ventas_efectivo",
+    "total_ventas_otros",
+    "total_ingresos",
+    "total_egresos",
+    "cantidad_tickets",
+)
+
+# Diferencia máxima tolerada por redondeo de floats
+TOLERANCIA = 0.005
+
+
+def monto_esperado(sesion: SesionCaja) -> float:
+    """Efectivo que debería haber en la caja: inicial + ventas efectivo + ingresos - egresos"""
+    return (
+        sesion.monto_inicial
+        + sesion.total_ventas_efectivo
+        + sesion.total_ingresos
+        - sesion.total_egresos
+    )
+
+
+def _venta_totals(total: float, metodo_pago: str, signo: int) -> Dict[str, Any]:
+    """Valores del UPDATE incremental para una venta (signo -1 = anulación)"""
+    columna = (
+        SesionCaja.total_ventas_efectivo
+        if metodo_pago == METODO_EFECTIVO
+        else SesionCaja.total_ventas_otros
+    )
+    return {
+        columna.key: columna + signo * total,
+        "cantidad_tickets": SesionCaja.cantidad_tickets + signo,
+    }
+
+
+class CajaService:
+    """Mantiene y verifica los totales acumulados de las sesiones de caja"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def registrar_venta(self, sesion_id: UUID, total: float, metodo_pago: str) -> None:
+        """
+        Suma una venta a la sesión en la que se cobró (no hace commit)
+
+        La sesión se resuelve en el checkout y viaja en el evento: el worker
+        no debe usar la sesión abierta al procesar (puede ser otra).
+        """
+        await self.db.execute(
+            update(SesionCaja)
+            .where(SesionCaja.id == sesion_id)
+            .values(**_venta_totals(total, metodo_pago, 1))
+        )
+
+    async def sesion_abierta_id(self, tienda_id: UUID, usuario_id: UUID) -> Optional[UUID]:
+        """ID de la sesión abierta del usuario, o None"""
+        result = await self.db.execute(
+            select(SesionCaja.id).where(
+                SesionCaja.tienda_id == tienda_id,
+                SesionCaja.usuario_id == usuario_id,
+                SesionCaja.estado == "abierta"
+            )
+        )
+        return result.scalar_one_or_none()
+
+    async def registrar_ventas(self, sesion_id: UUID, ventas: List[Tuple[float, str]]) -> None:
+        """
+        Suma un lote de ventas (total, metodo_pago) a la sesión en un solo UPDATE
+        (no hace commit)
+        """
+        if not ventas:
+            return
+        efectivo = sum(total for total, metodo in ventas if metodo == METODO_EFECTIVO)
+        otros = sum(total for total, metodo in ventas if metodo != METODO_EFECTIVO)
+        await self.db.execute(
+            update(SesionCaja)
+            .where(SesionCaja.id == sesion_id)
+            .values(
+                total_ventas_efectivo=SesionCaja.total_ventas_efectivo + efectivo,
+                total_ventas_otros=SesionCaja.total_ventas_otros + otros,
+                cantidad_tickets=SesionCaja.cantidad_tickets + len(ventas)
+            )
+        )
+
+    async def revertir_venta(self, sesion_id: UUID, total: float, metodo_pago: str) -> None:
+        """Resta una venta anulada de los totales de su sesión (no hace commit)"""
+        await self.db.execute(
+            update(SesionCaja)
+            .where(SesionCaja.id == sesion_id)
+            .values(**_venta_totals(total, metodo_pago, -1))
+        )
+
+    async def registrar_movimiento(self, sesion_id: UUID, tipo: str, monto: float) -> None:
+        """Suma un ingreso/egreso manual a los totales de la sesión (no hace commit)"""
+        columna = SesionCaja.total_ingresos if tipo == "INGRESO" else SesionCaja.total_egresos
+        await self.db.execute(
+            update(SesionCaja)
+            .where(SesionCaja.id == sesion_id)
+            .values({columna.key: columna + monto})
+        )
+
+    async def calcular_totales(self, sesion_id: UUID) -> Dict[str, float]:
+        """
+        Recalcula los totales de una sesión desde las filas crudas (2 queries)
+
+        Es el cálculo que antes se hacía en cada cierre; ahora solo lo usa
+        la reconciliación.
+        """
+        es_efectivo = Venta.metodo_pago == METODO_EFECTIVO
+        ventas = (await self.db.execute(
+            select(
+                func.coalesce(func.sum(case((es_efectivo, Venta.total), else_=0.0)), 0.0),
+                func.coalesce(func.sum(case((es_efectivo, 0.0), else_=Venta.total)), 0.0),
+                func.count(Venta.id)
+            )
+            .where(
+                Venta.sesion_caja_id == sesion_id,
+                Venta.status_pago != ESTADO_ANULADA
+            )
+        )).one()
+
+        movimientos = (await self.db.execute(
+            select(
+                func.coalesce(func.sum(case((MovimientoCaja.tipo == "INGRESO", MovimientoCaja.monto), else_=0.0)), 0.0),
+                func.coalesce(func.sum(case((MovimientoCaja.tipo == "EGRESO", MovimientoCaja.monto), else_=0.0)), 0.0)
+            )
+            .where(MovimientoCaja.sesion_id == sesion_id)
+        )).one()
+
+        return {
+            "total_ventas_efectivo": float(ventas[0]),
+            "total_ventas_otros": float(ventas[1]),
+            "cantidad_tickets": int(ventas[2]),
+            "total_ingresos": float(movimientos[0]),
+            "total_egresos": float(movimientos[1]),
+        }
+
+    async def reconciliar(self, sesion: SesionCaja, corregir: bool = False) -> Dict[str, Any]:
+        """
+        Compara los totales acumulados de una sesión con las filas crudas
+
+        Args:
+            sesion: Sesión a verificar
+            corregir: Si hay diferencias, sobrescribe los totales con los
+                recalculados (no hace commit)
+
+        Returns:
+            {"sesion_id", "ok", "diferencias": {campo: {"acumulado", "real"}}}
+        """
+        reales = await self.calcular_totales(sesion.id)
+        diferencias = {}
+        for campo in TOTALES:
+            acumulado = getattr(sesion, campo)
+            if abs(acumulado - reales[campo]) > TOLERANCIA:
+                diferencias[campo] = {"acumulado": acumulado, "real": reales[campo]}
+
+        if diferencias:
+            logger.warning(f"Sesión de caja {sesion.id} descuadrada: {diferencias}")
+            if corregir:
+                await self.db.execute(
+                    update(SesionCaja).where(SesionCaja.id == sesion.id).values(**reales)
+                )
+
+        return {
+            "sesion_id": str(sesion.id),
+            "ok": not diferencias,
+            "diferencias": diferencias,
+        }
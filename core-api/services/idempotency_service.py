@@ -0,0 +1,176 @@
+"""
+Servicio de Idempotencia - Nexus POS
+Respuestas guardadas en Redis por Idempotency-Key para reintentos del POS
+
+⚡ Un reintento de un request ya completado cuesta 1 GET a Redis: se
+devuelve la respuesta guardada sin volver a reservar stock ni publicar
+eventos. Los duplicados concurrentes (el POS reintenta mientras el
+original sigue en curso) esperan al primero y reciben su respuesta.
+
+Estados de la clave `idem:{namespace}:{scope}:{key}`:
+- pending: el request original está en curso (TTL corto, por si el worker muere)
+- done: respuesta final guardada (TTL largo, para replays)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import uuid4
+
+from fastapi import status
+
+from core.config import settings
+from core.exceptions import IdempotencyConflictException
+from services.cache_service import get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+STATE_PENDING = "pending"
+STATE_DONE = "done"
+
+# Borra el marcador pending solo si sigue siendo el nuestro
+RELEASE_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return 0
+end
+local entry = cjson.decode(raw)
+if entry['state'] == 'pending' and entry['token'] == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Backoff del sondeo mientras el request original sigue en curso
+POLL_INITIAL = 0.025
+POLL_MAX = 0.2
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Hash estable del cuerpo del request (claves ordenadas)"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class IdempotencyClaim:
+    """Reserva de una Idempotency-Key por el request que la procesa"""
+
+    __slots__ = ("redis_key", "fingerprint", "token", "completed")
+
+    def __init__(self, redis_key: str, fingerprint: str, token: str):
+        self.redis_key = redis_key
+        self.fingerprint = fingerprint
+        self.token = token
+        self.completed = False
+
+
+class IdempotencyStore:
+    """
+    Guarda y reproduce respuestas por Idempotency-Key
+
+    Uso:
+        claim, replay = await store.begin(scope, key, fingerprint)
+        if replay is not None:
+            return replay
+        try:
+            ...
+            await store.complete(claim, respuesta)
+        finally:
+            await store.release(claim)  # no-op si se completó
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def _key(self, scope: str, key: str) -> str:
+        return f"idem:{self.namespace}:{scope}:{key}"
+
+    async def begin(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: str
+    ) -> Tuple[Optional[IdempotencyClaim], Optional[Dict[str, Any]]]:
+        """
+        Reserva la clave o devuelve la respuesta guardada
+
+        Returns:
+            (claim, None) si este request debe procesarse, o
+            (None, respuesta) si es un replay
+
+        Raises:
+            IdempotencyConflictException: clave reusada con otro cuerpo (422)
+                o request original todavía en curso tras la espera (409)
+        """
+        client = await get_redis_client()
+        redis_key = self._key(scope, key)
+        token = uuid4().hex
+        pending = json.dumps({"state": STATE_PENDING, "fingerprint": fingerprint, "token": token})
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        delay = POLL_INITIAL
+        while True:
+            raw = await client.get(redis_key)
+            if raw is None:
+                if await client.set(redis_key, pending, nx=True, ex=settings.IDEMPOTENCY_LOCK_TTL):
+                    return IdempotencyClaim(redis_key, fingerprint, token), None
+                continue  # Otro request la tomó entre el GET y el SET: volver a leer
+
+            entry = json.loads(raw)
+            if entry["fingerprint"] != fingerprint:
+                raise IdempotencyConflictException(
+                    "Idempotency-Key ya usada con un cuerpo distinto",
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if entry["state"] == STATE_DONE:
+                return None, entry["response"]
+
+            if time.monotonic() >= deadline:
+                raise IdempotencyConflictException(
+                    "El request original con esta Idempotency-Key sigue en curso. Reintente."
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, POLL_MAX)
+
+    async def complete(self, claim: IdempotencyClaim, response: Dict[str, Any]) -> None:
+        """
+        Guarda la respuesta final para los replays
+
+        No propaga errores: el request ya tuvo efecto y su respuesta debe
+        llegar al POS aunque Redis falle (se pierde solo el replay).
+        """
+        try:
+            client = await get_redis_client()
+            await client.set(
+                claim.redis_key,
+                json.dumps(
+                    {"state": STATE_DONE, "fingerprint": claim.fingerprint, "response": response},
+                    default=str
+                ),
+                ex=settings.IDEMPOTENCY_TTL
+            )
+            claim.completed = True
+        except Exception as e:
+            logger.error(f"No se pudo guardar la respuesta de {claim.redis_key}: {e}")
+
+    async def release(self, claim: Optional[IdempotencyClaim]) -> None:
+        """
+        Libera la clave si el request falló, para que un reintento la procese
+
+        Los errores no se guardan: un checkout rechazado (ej: stock
+        insuficiente) puede reintentarse con la misma clave.
+        """
+        if claim is None or claim.completed:
+            return
+        try:
+            client = await get_redis_client()
+            await client.eval(RELEASE_SCRIPT, 1, claim.redis_key, claim.token)
+        except Exception as e:
+            # El marcador expira solo (IDEMPOTENCY_LOCK_TTL)
+            logger.warning(f"No se pudo liberar {claim.redis_key}: {e}")
+
+
+checkout_idempotency = IdempotencyStore("checkout")
@@ -2,14 +2,15 @@
 Servicio de Insights - Nexus POS
 Motor de análisis y generación de alertas inteligentes
 """
+import asyncio
 import logging
 from typing import List, Optional
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, insert, func, and_, exists, cast, String
 from sqlmodel import col
-from models import Insight, Producto, Venta
+from models import Insight, Producto, Venta, Tienda
 
 
 logger = logging.getLogger(__name__)
@@ -47,42 +48,25 @@ class InsightService:
         Returns:
             Lista de insights creados
         
-        Lógica anti-duplicación:
-        - Verifica si ya existe una alerta activa para el mismo producto
-        - Solo crea si no hay alerta previa
+        ⚡ SET-BASED (2 round-trips sin importar el tamaño del catálogo):
+        1. Candidatos calculados en SQL con anti-join contra alertas activas
+        2. Un único INSERT multi-fila para todas las alertas nuevas
         """
         umbral_stock = umbral or self.STOCK_UMBRAL_BAJO
-        insights_creados = []
         
         logger.info(f"Generando alertas de stock para tienda {tienda_id}")
         
-        # Buscar productos con stock bajo
-        statement = select(Producto).where(
-            and_(
-                Producto.tienda_id == tienda_id,
-                Producto.stock_actual <= umbral_stock,
-                Producto.is_active == True
-            )
+        candidatos = await self._fetch_product_candidates(
+            session=session,
+            tienda_id=tienda_id,
+            tipo="STOCK_BAJO",
+            condicion=Producto.stock_actual <= umbral_stock
         )
         
-        result = await session.execute(statement)
-        productos_bajo_stock = result.scalars().all()
+        logger.info(f"Encontrados {len(candidatos)} productos con stock bajo sin alerta activa")
         
-        logger.info(f"Encontrados {len(productos_bajo_stock)} productos con stock bajo")
-        
-        for producto in productos_bajo_stock:
-            # Verificar si ya existe una alerta activa para este producto
-            existing_alert = await self._check_existing_insight(
-                session=session,
-                tienda_id=tienda_id,
-                tipo="STOCK_BAJO",
-                producto_id=producto.id
-            )
-            
-            if existing_alert:
-                logger.debug(f"Alerta de stock ya existe para producto {producto.nombre}")
-                continue
-            
+        rows = []
+        for producto in candidatos:
             # Determinar nivel de urgencia
             if producto.stock_actual <= self.STOCK_UMBRAL_CRITICO:
                 urgencia = "CRITICA"
@@ -94,13 +78,12 @@ class InsightService:
                 urgencia = "MEDIA"
                 emoji = "📊"
             
-            # Crear insight
             mensaje = (
                 f"{emoji} Te quedan pocas unidades de '{producto.nombre}' (SKU: {producto.sku}). "
                 f"Stock actual: {int(producto.stock_actual)} unidades. ¡Reponé pronto!"
             )
             
-            nuevo_insight = Insight(
+            rows.append(self._insight_row(
                 tienda_id=tienda_id,
                 tipo="STOCK_BAJO",
                 mensaje=mensaje,
@@ -112,17 +95,9 @@ class InsightService:
                     "stock_actual": producto.stock_actual,
                     "umbral": umbral_stock
                 }
-            )
-            
-            session.add(nuevo_insight)
-            insights_creados.append(nuevo_insight)
-            
-            logger.info(f"Creada alerta de stock para {producto.nombre} (Urgencia: {urgencia})")
-        
-        if insights_creados:
-            await session.commit()
+            ))
         
-        return insights_creados
+        return await self._bulk_insert(session, rows)
     
     async def generate_sales_summary(
         self,
@@ -140,16 +115,29 @@ class InsightService:
         
         Returns:
             Insight creado o None si no hay ventas
+        
+        ⚡ Una sola consulta: agregado de ventas + existencia de resumen reciente
         """
         logger.info(f"Generando resumen de ventas de últimas {horas}h para tienda {tienda_id}")
         
         # Calcular fecha límite
         fecha_desde = datetime.utcnow() - timedelta(hours=horas)
         
+        # Resumen activo reciente (últimas 6 horas)
+        resumen_reciente = exists().where(
+            and_(
+                Insight.tienda_id == tienda_id,
+                Insight.tipo == "VENTAS_DIARIAS",
+                Insight.is_active == True,
+                Insight.created_at >= datetime.utcnow() - timedelta(hours=6)
+            )
+        )
+        
         # Consulta agregada: total vendido y cantidad de ventas
         statement = select(
             func.sum(Venta.total).label('total_vendido'),
-            func.count(Venta.id).label('cantidad_ventas')
+            func.count(Venta.id).label('cantidad_ventas'),
+            resumen_reciente.label('ya_existe')
         ).where(
             and_(
                 Venta.tienda_id == tienda_id,
@@ -171,15 +159,7 @@ class InsightService:
             logger.info("No hay ventas en el período")
             return None
         
-        # Verificar si ya existe un resumen activo reciente (últimas 6 horas)
-        existing_summary = await self._check_existing_insight(
-            session=session,
-            tienda_id=tienda_id,
-            tipo="VENTAS_DIARIAS",
-            hours_back=6
-        )
-        
-        if existing_summary:
+        if row.ya_existe:
             logger.debug("Ya existe un resumen de ventas reciente")
             return None
         
@@ -208,8 +188,7 @@ class InsightService:
             f"en {cantidad_ventas} {'venta' if cantidad_ventas == 1 else 'ventas'}."
         )
         
-        # Crear insight
-        nuevo_insight = Insight(
+        creados = await self._bulk_insert(session, [self._insight_row(
             tienda_id=tienda_id,
             tipo="VENTAS_DIARIAS",
             mensaje=mensaje,
@@ -220,14 +199,11 @@ class InsightService:
                 "periodo_horas": horas,
                 "fecha_desde": fecha_desde.isoformat()
             }
-        )
-        
-        session.add(nuevo_insight)
-        await session.commit()
+        )])
         
         logger.info(f"Creado resumen de ventas: ${total_vendido}")
         
-        return nuevo_insight
+        return creados[0]
     
     async def generate_out_of_stock_alerts(
         self,
@@ -241,43 +217,23 @@ class InsightService:
         """
         logger.info(f"Generando alertas de productos sin stock para tienda {tienda_id}")
         
-        insights_creados = []
-        
-        # Buscar productos sin stock
-        statement = select(Producto).where(
-            and_(
-                Producto.tienda_id == tienda_id,
-                Producto.stock_actual == 0,
-                Producto.is_active == True
-            )
+        candidatos = await self._fetch_product_candidates(
+            session=session,
+            tienda_id=tienda_id,
+            tipo="PRODUCTO_SIN_STOCK",
+            condicion=Producto.stock_actual == 0
         )
         
-        result = await session.execute(statement)
-        productos_sin_stock = result.scalars().all()
-        
-        logger.info(f"Encontrados {len(productos_sin_stock)} productos sin stock")
+        logger.info(f"Encontrados {len(candidatos)} productos sin stock sin alerta activa")
         
-        for producto in productos_sin_stock:
-            # Verificar alerta existente
-            existing_alert = await self._check_existing_insight(
-                session=session,
+        rows = [
+            self._insight_row(
                 tienda_id=tienda_id,
                 tipo="PRODUCTO_SIN_STOCK",
-                producto_id=producto.id
-            )
-            
-            if existing_alert:
-                continue
-            
-            mensaje = (
-                f"🔴 ¡'{producto.nombre}' (SKU: {producto.sku}) está AGOTADO! "
-                f"Stock: 0 unidades. Reponé urgente para no perder ventas."
-            )
-            
-            nuevo_insight = Insight(
-                tienda_id=tienda_id,
-                tipo="PRODUCTO_SIN_STOCK",
-                mensaje=mensaje,
+                mensaje=(
+                    f"🔴 ¡'{producto.nombre}' (SKU: {producto.sku}) está AGOTADO! "
+                    f"Stock: 0 unidades. Reponé urgente para no perder ventas."
+                ),
                 nivel_urgencia="ALTA",
                 extra_data={
                     "producto_id": str(producto.id),
@@ -285,14 +241,10 @@ class InsightService:
                     "producto_sku": producto.sku
                 }
             )
-            
-            session.add(nuevo_insight)
-            insights_creados.append(nuevo_insight)
-        
-        if insights_creados:
-            await session.commit()
+            for producto in candidatos
+        ]
         
-        return insights_creados
+        return await self._bulk_insert(session, rows)
     
     async def generate_all_insights(
         self,
@@ -316,6 +268,8 @@ class InsightService:
         # Generar resumen de ventas
         sales_summary = await self.generate_sales_summary(tienda_id, session)
         
+        await session.commit()
+        
         resultado = {
             "stock_bajo": len(stock_alerts),
             "sin_stock": len(out_of_stock),
@@ -327,47 +281,117 @@ class InsightService:
         
         return resultado
     
-    async def _check_existing_insight(
+    async def generate_for_all_tenants(
+        self,
+        max_concurrency: int = 4
+    ) -> dict:
+        """
+        Genera insights para todas las tiendas activas (job programado)
+        
+        Cada tienda usa su propia sesión; el semáforo limita cuántas
+        conexiones del pool se ocupan a la vez.
+        
+        Args:
+            max_concurrency: Tiendas procesadas en paralelo como máximo
+        
+        Returns:
+            Diccionario {tienda_id: resultado | None si falló}
+        """
+        from core.db import BackgroundSessionLocal
+        
+        async with BackgroundSessionLocal() as session:
+            result = await session.execute(
+                select(Tienda.id).where(Tienda.is_active == True)
+            )
+            tienda_ids = result.scalars().all()
+        
+        semaforo = asyncio.Semaphore(max_concurrency)
+        
+        async def _procesar(tienda_id: UUID):
+            async with semaforo:
+                async with BackgroundSessionLocal() as session:
+                    try:
+                        return tienda_id, await self.generate_all_insights(tienda_id, session)
+                    except Exception as e:
+                        await session.rollback()
+                        logger.error(f"Error generando insights para tienda {tienda_id}: {e}")
+                        return tienda_id, None
+        
+        resultados = await asyncio.gather(*(_procesar(t) for t in tienda_ids))
+        
+        logger.info(f"Insights generados para {len(tienda_ids)} tiendas")
+        
+        return {str(tienda_id): resultado for tienda_id, resultado in resultados}
+    
+    async def _fetch_product_candidates(
         self,
         session: AsyncSession,
         tienda_id: UUID,
         tipo: str,
-        producto_id: Optional[UUID] = None,
+        condicion,
         hours_back: int = 24
-    ) -> Optional[Insight]:
+    ) -> list:
         """
-        Verifica si existe un insight activo del mismo tipo
+        Productos que cumplen `condicion` y NO tienen un insight activo del mismo tipo
         
-        Args:
-            session: Sesión de base de datos
-            tienda_id: ID de la tienda
-            tipo: Tipo de insight
-            producto_id: ID del producto (opcional, para alertas de stock)
-            hours_back: Ventana de tiempo para considerar (horas)
-        
-        Returns:
-            Insight existente o None
+        Anti-join (NOT EXISTS) sobre extra_data->>'producto_id', resuelto
+        completamente en PostgreSQL en una sola consulta.
         """
         fecha_limite = datetime.utcnow() - timedelta(hours=hours_back)
         
-        statement = select(Insight).where(
+        alerta_activa = exists().where(
             and_(
                 Insight.tienda_id == tienda_id,
                 Insight.tipo == tipo,
                 Insight.is_active == True,
-                Insight.created_at >= fecha_limite
+                Insight.created_at >= fecha_limite,
+                col(Insight.extra_data)["producto_id"].astext == cast(Producto.id, String)
             )
         )
         
-        # Si es alerta de producto específico, filtrar por extra_data
-        if producto_id:
-            # Filtrar por producto_id en el JSON extra_data
-            statement = statement.where(
-                col(Insight.extra_data)["producto_id"].astext == str(producto_id)
+        statement = select(
+            Producto.id,
+            Producto.nombre,
+            Producto.sku,
+            Producto.stock_actual
+        ).where(
+            and_(
+                Producto.tienda_id == tienda_id,
+                Producto.is_active == True,
+                condicion,
+                ~alerta_activa
             )
+        )
         
         result = await session.execute(statement)
-        return result.scalar_one_or_none()
+        return result.all()
+    
+    @staticmethod
+    def _insight_row(
+        tienda_id: UUID,
+        tipo: str,
+        mensaje: str,
+        nivel_urgencia: str,
+        extra_data: dict
+    ) -> dict:
+        """Fila lista para INSERT (los defaults de Python no aplican en inserts Core)"""
+        return {
+            "id": uuid4(),
+            "tienda_id": tienda_id,
+            "tipo": tipo,
+            "mensaje": mensaje,
+            "nivel_urgencia": nivel_urgencia,
+            "is_active": True,
+            "extra_data": extra_data
+        }
+    
+    async def _bulk_insert(self, session: AsyncSession, rows: List[dict]) -> List[Insight]:
+        """INSERT multi-fila con RETURNING; no hace commit"""
+        if not rows:
+            return []
+        
+        result = await session.scalars(insert(Insight).returning(Insight), rows)
+        return list(result.all())
 
 
 # Instancia singleton del servicio
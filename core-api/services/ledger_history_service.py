@@ -0,0 +1,89 @@
+"""
+Servicio de Historial del Ledger - Nexus POS
+Movimientos de inventario paginados por keyset
+
+⚡ Keyset en lugar de OFFSET: cada página arranca donde terminó la anterior
+con `(occurred_at, transaction_id) < (cursor)`, un rango sobre el índice
+compuesto del filtro. La página 1.000 cuesta lo mismo que la 1; con OFFSET
+Postgres leía y descartaba todas las filas anteriores.
+
+Índices (tienda_id, [filtro,] occurred_at, transaction_id):
+- sin filtro:              ix_inventory_ledger_tienda_occurred
+- variant_id:              ix_inventory_ledger_tienda_variant_occurred
+- location_id:             ix_inventory_ledger_tienda_location_occurred
+- transaction_type:        ix_inventory_ledger_tienda_type_occurred
+
+El filtro por tienda usa la columna del ledger: sin joins antes del LIMIT.
+"""
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import InventoryLedger, Location, Product, ProductVariant
+from utils.pagination import decode_cursor, encode_cursor
+
+
+async def ledger_page(
+    db: AsyncSession,
+    tienda_id: UUID,
+    variant_id: Optional[UUID] = None,
+    location_id: Optional[UUID] = None,
+    transaction_type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Una página del historial, de más reciente a más antiguo
+
+    Args:
+        cursor: next_cursor de la página anterior (None = primera página)
+
+    Returns:
+        (filas, next_cursor | None si es la última página)
+
+    Raises:
+        ValueError: Cursor inválido
+    """
+    statement = (
+        select(
+            InventoryLedger,
+            Product.name.label("product_name"),
+            ProductVariant.sku,
+            Location.name.label("location_name"),
+        )
+        .join(ProductVariant, InventoryLedger.variant_id == ProductVariant.variant_id)
+        .join(Product, ProductVariant.product_id == Product.product_id)
+        .outerjoin(Location, InventoryLedger.location_id == Location.location_id)
+        .where(InventoryLedger.tienda_id == tienda_id)
+    )
+
+    if variant_id:
+        statement = statement.where(InventoryLedger.variant_id == variant_id)
+    if location_id:
+        statement = statement.where(InventoryLedger.location_id == location_id)
+    if transaction_type:
+        statement = statement.where(InventoryLedger.transaction_type == transaction_type.upper())
+    if cursor:
+        occurred_at, transaction_id = decode_cursor(cursor)
+        statement = statement.where(
+            tuple_(InventoryLedger.occurred_at, InventoryLedger.transaction_id)
+            < tuple_(occurred_at, transaction_id),
+            # Redundante, pero el planner no poda particiones con la
+            # comparación de tuplas: esta sí descarta los meses posteriores
+            InventoryLedger.occurred_at <= occurred_at
+        )
+
+    # limit + 1: la fila extra solo indica si hay otra página
+    rows = (await db.execute(
+        statement
+        .order_by(InventoryLedger.occurred_at.desc(), InventoryLedger.transaction_id.desc())
+        .limit(limit + 1)
+    )).all()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    ultimo = rows[-1].InventoryLedger
+    return rows, encode_cursor(ultimo.occurred_at, ultimo.transaction_id)
@@ -0,0 +1,220 @@
+"""
+Servicio de Ventas Offline - Nexus POS
+Ingesta por lotes de ventas hechas sin conexión, segura ante reintentos
+
+⚡ Un lote de N ventas se escribe en un número fijo de sentencias:
+1. 1 SELECT de claves de idempotencia ya ingresadas
+2. 1 SELECT de los productos referenciados + 1 de la sesión de caja
+3. 1 INSERT multi-fila de ventas (ON CONFLICT DO NOTHING sobre la clave)
+4. 1 INSERT multi-fila de detalles
+5. Lock ordenado de productos + 1 UPDATE ... FROM (VALUES ...) de stock
+6. 1 UPDATE de los totales de la sesión de caja
+
+Reenviar el mismo lote (o uno que se solapa) no duplica ventas: las claves
+ya ingresadas se devuelven como `duplicate` con su venta_id original.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from models import DetalleVenta, Producto, Venta
+from schemas_models.ventas import VentaOfflineInput
+from services.caja_service import CajaService
+from services.sales_writer import cantidades_por_producto, descontar_stock
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_CREATED = "created"
+STATUS_DUPLICATE = "duplicate"
+STATUS_REJECTED = "rejected"
+
+# Las ventas offline ya fueron cobradas en el POS
+ESTADO_PAGADO = "pagado"
+
+
+def _as_utc(fecha: datetime) -> datetime:
+    """Las fechas sin zona horaria que manda el POS se toman como UTC"""
+    return fecha if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+
+
+class OfflineSalesService:
+    """Sincroniza lotes de ventas offline con deduplicación por clave"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def ingest(
+        self,
+        tienda_id: UUID,
+        usuario_id: Optional[UUID],
+        ventas: List[VentaOfflineInput]
+    ) -> List[Dict[str, Any]]:
+        """
+        Ingresa un lote ordenado de ventas offline (no hace commit)
+
+        Las ventas inválidas se rechazan individualmente sin abortar el lote.
+        El stock se descuenta aunque quede negativo: la venta ya ocurrió.
+
+        Returns:
+            Un resultado por venta, en el mismo orden del lote:
+            {"idempotency_key", "status", "venta_id", "detalle"}
+        """
+        claves = {venta.idempotency_key for venta in ventas}
+
+        # 1. Claves ya ingresadas (1 query)
+        existentes: Dict[str, UUID] = dict((await self.db.execute(
+            select(Venta.idempotency_key, Venta.id)
+            .where(Venta.tienda_id == tienda_id, Venta.idempotency_key.in_(claves))
+        )).all())
+
+        # 2. Productos referenciados por las ventas nuevas (1 query)
+        producto_ids = {
+            item.producto_id
+            for venta in ventas if venta.idempotency_key not in existentes
+            for item in venta.items
+        }
+        productos = {}
+        if producto_ids:
+            productos = {
+                row.id: row for row in (await self.db.execute(
+                    select(Producto.id, Producto.nombre, Producto.precio_venta, Producto.tipo)
+                    .where(Producto.id.in_(producto_ids), Producto.tienda_id == tienda_id)
+                )).all()
+            }
+
+        # 3. Validación y armado de filas (en memoria)
+        limite = datetime.now(timezone.utc) - timedelta(days=settings.OFFLINE_SALE_MAX_AGE_DAYS)
+        resultados: List[Dict[str, Any]] = []
+        filas_venta: List[Dict[str, Any]] = []
+        filas_detalle: Dict[str, List[Dict[str, Any]]] = {}
+        en_lote: Dict[str, UUID] = {}
+
+        for venta in ventas:
+            clave = venta.idempotency_key
+            resultado = {"idempotency_key": clave, "status": STATUS_DUPLICATE, "venta_id": None, "detalle": None}
+            resultados.append(resultado)
+
+            if clave in existentes or clave in en_lote:
+                resultado["venta_id"] = existentes.get(clave) or en_lote[clave]
+                continue
+
+            error = self._validar(venta, productos, limite)
+            if error:
+                resultado.update(status=STATUS_REJECTED, detalle=error)
+                continue
+
+            venta_id = uuid4()
+            fecha = _as_utc(venta.fecha)
+            detalles = []
+            for item in venta.items:
+                precio = (
+                    item.precio_unitario
+                    if item.precio_unitario is not None
+                    else productos[item.producto_id].precio_venta
+                )
+                detalles.append({
+                    "id": uuid4(),
+                    "venta_id": venta_id,
+                    "fecha": fecha,
+                    "producto_id": item.producto_id,
+                    "cantidad": item.cantidad,
+                    "precio_unitario": precio,
+                    "subtotal": precio * item.cantidad,
+                })
+
+            filas_venta.append({
+                "id": venta_id,
+                "tienda_id": tienda_id,
+                "fecha": fecha,
+                "total": sum(d["subtotal"] for d in detalles),
+                "metodo_pago": venta.metodo_pago,
+                "status_pago": ESTADO_PAGADO,
+                "idempotency_key": clave,
+            })
+            filas_detalle[clave] = detalles
+            en_lote[clave] = venta_id
+            resultado.update(status=STATUS_CREATED, venta_id=venta_id)
+
+        if not filas_venta:
+            return resultados
+
+        await self._escribir(tienda_id, usuario_id, filas_venta, filas_detalle, resultados)
+        return resultados
+
+    def _validar(
+        self,
+        venta: VentaOfflineInput,
+        productos: Dict[UUID, Any],
+        limite: datetime
+    ) -> Optional[str]:
+        """Motivo de rechazo de la venta, o None si es válida"""
+        if _as_utc(venta.fecha) < limite:
+            return f"Venta muy antigua (>{settings.OFFLINE_SALE_MAX_AGE_DAYS} días)"
+        for item in venta.items:
+            producto = productos.get(item.producto_id)
+            if producto is None:
+                return f"Producto con ID {item.producto_id} no encontrado"
+            if producto.tipo != 'pesable' and item.cantidad != int(item.cantidad):
+                return f"El producto '{producto.nombre}' no permite cantidades decimales"
+        return None
+
+    async def _escribir(
+        self,
+        tienda_id: UUID,
+        usuario_id: Optional[UUID],
+        filas_venta: List[Dict[str, Any]],
+        filas_detalle: Dict[str, List[Dict[str, Any]]],
+        resultados: List[Dict[str, Any]]
+    ) -> None:
+        """Escribe ventas, detalles, stock y caja para las ventas nuevas del lote"""
+        caja = CajaService(self.db)
+        sesion_id = await caja.sesion_abierta_id(tienda_id, usuario_id) if usuario_id else None
+        for fila in filas_venta:
+            fila["sesion_caja_id"] = sesion_id
+
+        # Un reintento concurrente del mismo lote puede haber ganado la carrera:
+        # ON CONFLICT descarta esas filas y RETURNING dice cuáles entraron
+        # (el índice incluye fecha, la clave de partición: el reintento trae la misma)
+        insertadas = set((await self.db.execute(
+            pg_insert(Venta)
+            .values(filas_venta)
+            .on_conflict_do_nothing(index_elements=["tienda_id", "idempotency_key", "fecha"])
+            .returning(Venta.idempotency_key)
+        )).scalars().all())
+
+        perdidas = [fila["idempotency_key"] for fila in filas_venta if fila["idempotency_key"] not in insertadas]
+        if perdidas:
+            ganadoras = dict((await self.db.execute(
+                select(Venta.idempotency_key, Venta.id)
+                .where(Venta.tienda_id == tienda_id, Venta.idempotency_key.in_(perdidas))
+            )).all())
+            for resultado in resultados:
+                if resultado["status"] == STATUS_CREATED and resultado["idempotency_key"] in ganadoras:
+                    resultado.update(status=STATUS_DUPLICATE, venta_id=ganadoras[resultado["idempotency_key"]])
+            filas_venta = [fila for fila in filas_venta if fila["idempotency_key"] in insertadas]
+            if not filas_venta:
+                return
+
+        detalles = [d for fila in filas_venta for d in filas_detalle[fila["idempotency_key"]]]
+        await self.db.execute(insert(DetalleVenta), detalles)
+
+        # Stock: un lock en orden de PK y un UPDATE con las cantidades agregadas
+        cantidades = cantidades_por_producto(detalles)
+        await descontar_stock(self.db, cantidades)
+
+        if sesion_id:
+            await caja.registrar_ventas(
+                sesion_id, [(fila["total"], fila["metodo_pago"]) for fila in filas_venta]
+            )
+
+        logger.info(
+            f"Lote offline tienda {tienda_id}: {len(filas_venta)} ventas, "
+            f"{len(detalles)} detalles, {len(cantidades)} productos"
+        )
@@ -1,363 +1,359 @@
 """
 OMS Service - Smart Routing Algorithm
 Algoritmo de routing inteligente para decidir desde dónde despachar una orden
+
+⚡ Motor batch: la matriz de disponibilidad (variante × ubicación) y las
+capacidades de las ubicaciones se cargan UNA vez por lote. Todas las órdenes
+se puntúan con operaciones vectorizadas (NumPy) y se asignan de forma greedy
+descontando la disponibilidad en memoria, así dos órdenes del mismo lote no
+reclaman las mismas unidades.
 """
-import math
+from collections import defaultdict
+from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 from uuid import UUID
-from sqlmodel import select
+
+import numpy as np
+from sqlalchemy import select, and_, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_, func
 
 from schemas_models.oms_models import (
     OrdenOmnicanal,
     OrdenItem,
     LocationCapability,
-    ShippingZone
 )
-from models import Location, ProductVariant, InventoryLedger
+from models import Location, InventoryLedger
+
+
+EARTH_RADIUS_KM = 6371.0
+
+# Distancias de fallback (mismas reglas que el algoritmo v1)
+DISTANCE_NO_LOCATION_COORDS = 999.0  # Penalización si la ubicación no tiene coordenadas
+DISTANCE_NO_CLIENT_COORDS = 50.0  # Valor default si el cliente no tiene coordenadas
+
+# Costo de envío: base + por km, ajustado por método
+SHIPPING_BASE_COST = 1000.0
+SHIPPING_COST_PER_KM = 50.0
+SHIPPING_METHOD_MULTIPLIER = {"express": 1.5, "same_day": 2.0}
+
+# Pesos (configurables según estrategia del negocio)
+WEIGHTS = {
+    "distance": 0.30,
+    "cost": 0.35,
+    "stock": 0.15,
+    "priority": 0.10,
+    "operational": 0.10
+}
+
+# Órdenes asignadas que todavía no salieron: su stock está comprometido
+COMMITTED_STATUSES = ("assigned", "preparing")
+
+
+def haversine_km(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Distancia Haversine en km (vectorizada, acepta broadcasting)"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = np.radians(lat2 - lat1)
+    delta_lambda = np.radians(lon2 - lon1)
+
+    a = (np.sin(delta_phi / 2) ** 2 +
+         np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2)
+
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def normalize_distance_score(distance_km: np.ndarray) -> np.ndarray:
+    """
+    Normaliza distancia a score 0-100 (menor distancia = mayor score)
+
+    0-5km   → 100 puntos
+    10km    → 91 puntos
+    50km    → 55 puntos
+    100km+  → 0 puntos
+    """
+    score = 100 - (distance_km * 0.9)
+    score = np.where(distance_km <= 5, 100.0, score)
+    return np.where(distance_km >= 100, 0.0, score)
+
+
+def normalize_cost_score(cost: np.ndarray) -> np.ndarray:
+    """
+    Normaliza costo a score 0-100 (menor costo = mayor score)
+
+    $0-1000     → 100 puntos
+    $5500       → 50 puntos
+    $10000+     → 0 puntos
+    """
+    score = 100 - ((cost - 1000) / 90)
+    score = np.where(cost <= 1000, 100.0, score)
+    return np.where(cost >= 10000, 0.0, score)
 
 
 class SmartRoutingService:
     """
     Motor de decisión para fulfillment inteligente
-    
+
     Decide desde qué ubicación despachar una orden basándose en:
     1. Disponibilidad de stock
     2. Distancia al cliente
     3. Costo de envío
     4. Capacidades de la ubicación
     5. Prioridad del negocio
+
+    Queries por lote (independiente de órdenes × items × ubicaciones):
+    1. Ubicaciones con capacidades
+    2. Items de todas las órdenes
+    3. Stock por (variante, ubicación) de las variantes involucradas
+    4. Stock comprometido por órdenes ya asignadas
     """
-    
+
     def __init__(self, session: AsyncSession):
         self.session = session
-    
+
     async def assign_fulfillment_location(
         self,
         orden: OrdenOmnicanal
     ) -> Tuple[UUID, Dict]:
         """
         Asigna la mejor ubicación para despachar una orden
-        
+
         Returns:
             (location_id, decision_metadata)
         """
-        # 1. Obtener ubicaciones candidatas
-        candidates = await self._get_candidate_locations(orden)
-        
-        if not candidates:
+        decisions = await self.assign_batch([orden])
+        decision = decisions.get(orden.id)
+
+        if decision is None:
             raise ValueError("No hay ubicaciones disponibles para esta orden")
-        
-        # 2. Calcular score para cada candidato
-        scored_candidates = []
-        for candidate in candidates:
-            score = await self._calculate_location_score(
-                location=candidate,
-                orden=orden
-            )
-            scored_candidates.append({
-                "location_id": str(candidate.location_id),
-                "location_name": candidate.name,
-                "score": score["total_score"],
-                "shipping_cost": score["shipping_cost"],
-                "distance_km": score["distance_km"],
-                "stock_availability": score["stock_availability"],
-                "operational_cost": score["operational_cost"],
-                "breakdown": score
-            })
-        
-        # 3. Ordenar por score (mayor es mejor)
-        scored_candidates.sort(key=lambda x: x["score"], reverse=True)
-        
-        # 4. Seleccionar el mejor
-        best = scored_candidates[0]
-        
-        # 5. Crear metadata de decisión
-        decision_metadata = {
-            "algorithm_version": "v1.0",
-            "timestamp": datetime.utcnow().isoformat(),
-            "candidates": scored_candidates,
-            "selected": best["location_id"],
-            "selected_name": best["location_name"],
-            "reason": self._get_selection_reason(scored_candidates)
-        }
-        
-        return UUID(best["location_id"]), decision_metadata
-    
-    async def _get_candidate_locations(
+
+        return decision
+
+    async def assign_batch(
         self,
-        orden: OrdenOmnicanal
-    ) -> List[Location]:
+        ordenes: List[OrdenOmnicanal]
+    ) -> Dict[UUID, Optional[Tuple[UUID, Dict]]]:
         """
-        Obtiene ubicaciones que pueden cumplir la orden
-        
-        Filtra por:
-        - Ubicación activa
-        - Puede despachar
-        - Tiene stock de TODOS los items
-        - Soporta el método de envío solicitado
+        Asigna ubicaciones a un lote de órdenes de la misma tienda
+
+        Las órdenes se procesan en orden de llegada (más antigua primero):
+        cada asignación descuenta las unidades de la ubicación elegida antes
+        de evaluar la siguiente orden.
+
+        Returns:
+            {orden_id: (location_id, decision_metadata) | None si no hay ubicación}
         """
-        # Obtener todas las ubicaciones de la tienda
-        result = await self.session.exec(
-            select(Location)
-            .join(LocationCapability)
+        if not ordenes:
+            return {}
+
+        tienda_id = ordenes[0].tienda_id
+        ordenes = sorted(ordenes, key=lambda o: o.created_at or datetime.min)
+        orden_ids = [o.id for o in ordenes]
+
+        # 1. Ubicaciones que pueden despachar + capacidades
+        loc_result = await self.session.execute(
+            select(Location.location_id, Location.name, LocationCapability)
+            .join(LocationCapability, LocationCapability.location_id == Location.location_id)
             .where(
                 and_(
-                    Location.tienda_id == orden.tienda_id,
+                    Location.tienda_id == tienda_id,
                     LocationCapability.puede_despachar == True
                 )
             )
         )
-        locations = result.all()
-        
-        # Filtrar por disponibilidad de stock
-        candidates = []
-        for location in locations:
-            if await self._has_full_stock(location, orden.items):
-                candidates.append(location)
-        
-        return candidates
-    
-    async def _has_full_stock(
-        self,
-        location: Location,
-        items: List[OrdenItem]
-    ) -> bool:
-        """
-        Verifica si una ubicación tiene stock de todos los items
-        """
-        for item in items:
-            stock = await self._get_stock_in_location(
-                item.variant_id,
-                location.location_id
+        locations = loc_result.all()
+        if not locations:
+            return {orden_id: None for orden_id in orden_ids}
+
+        location_ids = [row[0] for row in locations]
+        location_names = [row[1] for row in locations]
+        caps = [row[2] for row in locations]
+        loc_index = {location_id: j for j, location_id in enumerate(location_ids)}
+
+        # 2. Items de todas las órdenes (cantidades agrupadas por variante)
+        items_result = await self.session.execute(
+            select(OrdenItem.orden_id, OrdenItem.variant_id, func.sum(OrdenItem.cantidad))
+            .where(OrdenItem.orden_id.in_(orden_ids))
+            .group_by(OrdenItem.orden_id, OrdenItem.variant_id)
+        )
+        items_by_orden: Dict[UUID, List[Tuple[UUID, float]]] = defaultdict(list)
+        for orden_id, variant_id, cantidad in items_result.all():
+            items_by_orden[orden_id].append((variant_id, float(cantidad)))
+
+        variant_ids = sorted({v for items in items_by_orden.values() for v, _ in items}, key=str)
+        var_index = {variant_id: i for i, variant_id in enumerate(variant_ids)}
+
+        # 3-4. Matriz de disponibilidad (variante × ubicación)
+        available = await self._load_availability(
+            tienda_id, variant_ids, var_index, loc_index, exclude_orden_ids=orden_ids
+        )
+
+        # Capacidades como vectores por ubicación
+        lat_loc = np.array([c.latitud if c.latitud else np.nan for c in caps], dtype=np.float64)
+        lon_loc = np.array([c.longitud if c.longitud else np.nan for c in caps], dtype=np.float64)
+        priority_score = np.array([c.prioridad * 10 for c in caps], dtype=np.float64)
+        operational_cost = np.array([c.costo_picking + c.costo_packing for c in caps], dtype=np.float64)
+        operational_score = normalize_cost_score(operational_cost)
+        supports = {
+            "standard": np.array([c.soporta_standard for c in caps], dtype=bool),
+            "express": np.array([c.soporta_express for c in caps], dtype=bool),
+            "same_day": np.array([c.soporta_same_day for c in caps], dtype=bool),
+            "pickup": np.array([c.puede_recibir_pickup for c in caps], dtype=bool),
+        }
+
+        # Matrices (órdenes × ubicaciones): distancia, costo y score total
+        lat_ord = np.array([_coord(o.shipping_address, "lat") for o in ordenes], dtype=np.float64)
+        lon_ord = np.array([_coord(o.shipping_address, "lng") for o in ordenes], dtype=np.float64)
+        distance = haversine_km(lat_loc[None, :], lon_loc[None, :], lat_ord[:, None], lon_ord[:, None])
+        distance = np.where(np.isnan(lat_ord)[:, None], DISTANCE_NO_CLIENT_COORDS, distance)
+        distance = np.where(np.isnan(lat_loc)[None, :], DISTANCE_NO_LOCATION_COORDS, distance)
+
+        multiplier = np.array(
+            [SHIPPING_METHOD_MULTIPLIER.get(o.shipping_method, 1.0) for o in ordenes], dtype=np.float64
+        )
+        shipping_cost = (SHIPPING_BASE_COST + distance * SHIPPING_COST_PER_KM) * multiplier[:, None]
+
+        distance_score = normalize_distance_score(distance)
+        cost_score = normalize_cost_score(shipping_cost)
+        stock_score = 100.0  # Solo se consideran ubicaciones con todo el stock
+        total_score = (
+            WEIGHTS["distance"] * distance_score +
+            WEIGHTS["cost"] * cost_score +
+            WEIGHTS["stock"] * stock_score +
+            WEIGHTS["priority"] * priority_score[None, :] +
+            WEIGHTS["operational"] * operational_score[None, :]
+        )
+
+        # 5. Asignación greedy con disponibilidad en memoria
+        decisions: Dict[UUID, Optional[Tuple[UUID, Dict]]] = {}
+        for o, orden in enumerate(ordenes):
+            items = items_by_orden.get(orden.id)
+            if not items:
+                decisions[orden.id] = None
+                continue
+
+            rows = np.array([var_index[v] for v, _ in items], dtype=np.int64)
+            qty = np.array([q for _, q in items], dtype=np.float64)
+
+            feasible = np.all(available[rows, :] >= qty[:, None], axis=0)
+            feasible &= supports.get(orden.shipping_method, supports["standard"])
+
+            candidates = np.flatnonzero(feasible)
+            if candidates.size == 0:
+                decisions[orden.id] = None
+                continue
+
+            ranked = candidates[np.argsort(-total_score[o, candidates], kind="stable")]
+            best = int(ranked[0])
+            available[rows, best] -= qty
+
+            scored_candidates = [
+                {
+                    "location_id": str(location_ids[j]),
+                    "location_name": location_names[j],
+                    "score": round(float(total_score[o, j]), 2),
+                    "shipping_cost": round(float(shipping_cost[o, j]), 2),
+                    "distance_km": round(float(distance[o, j]), 2),
+                    "stock_availability": 100.0,
+                    "operational_cost": float(operational_cost[j]),
+                    "breakdown": {
+                        "total_score": round(float(total_score[o, j]), 2),
+                        "distance_score": round(float(distance_score[o, j]), 2),
+                        "cost_score": round(float(cost_score[o, j]), 2),
+                        "stock_score": stock_score,
+                        "priority_score": float(priority_score[j]),
+                        "operational_score": round(float(operational_score[j]), 2),
+                        "weights": WEIGHTS
+                    }
+                }
+                for j in ranked
+            ]
+
+            decisions[orden.id] = (
+                location_ids[best],
+                {
+                    "algorithm_version": "v2.0-batch",
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "candidates": scored_candidates,
+                    "selected": str(location_ids[best]),
+                    "selected_name": location_names[best],
+                    "reason": self._get_selection_reason(scored_candidates)
+                }
             )
-            if stock < item.cantidad:
-                return False
-        return True
-    
-    async def _get_stock_in_location(
+
+        return decisions
+
+    async def _load_availability(
         self,
-        variant_id: UUID,
-        location_id: UUID
-    ) -> float:
+        tienda_id: UUID,
+        variant_ids: List[UUID],
+        var_index: Dict[UUID, int],
+        loc_index: Dict[UUID, int],
+        exclude_orden_ids: List[UUID]
+    ) -> np.ndarray:
         """
-        Calcula stock disponible de una variante en una ubicación
+        Stock disponible (variante × ubicación) = ledger − comprometido por órdenes asignadas
+
+        Las órdenes del lote no cuentan como comprometidas (re-route de una orden ya asignada).
         """
-        result = await self.session.exec(
-            select(func.sum(InventoryLedger.delta))
+        available = np.zeros((len(variant_ids), len(loc_index)), dtype=np.float64)
+        if not variant_ids:
+            return available
+
+        stock_result = await self.session.execute(
+            select(
+                InventoryLedger.variant_id,
+                InventoryLedger.location_id,
+                func.sum(InventoryLedger.delta)
+            )
             .where(
                 and_(
-                    InventoryLedger.variant_id == variant_id,
-                    InventoryLedger.location_id == location_id
+                    InventoryLedger.tienda_id == tienda_id,
+                    InventoryLedger.variant_id.in_(variant_ids),
+                    InventoryLedger.location_id.in_(list(loc_index))
                 )
             )
+            .group_by(InventoryLedger.variant_id, InventoryLedger.location_id)
         )
-        stock = result.first()
-        return stock if stock else 0.0
-    
-    async def _calculate_location_score(
-        self,
-        location: Location,
-        orden: OrdenOmnicanal
-    ) -> Dict:
-        """
-        Calcula el score de una ubicación para una orden
-        
-        Fórmula:
-        Score = (Stock_Weight * Stock_Score) +
-                (Distance_Weight * Distance_Score) +
-                (Cost_Weight * Cost_Score) +
-                (Priority_Weight * Priority_Score)
-        
-        Pesos configurables según estrategia del negocio
-        """
-        # Obtener capability
-        capability = await self._get_location_capability(location.location_id)
-        
-        # 1. Score de distancia (menor distancia = mejor)
-        distance_km = self._calculate_distance(
-            location,
-            orden.shipping_address
-        )
-        distance_score = self._normalize_distance_score(distance_km)
-        
-        # 2. Score de costo de envío (menor costo = mejor)
-        shipping_cost = await self._calculate_shipping_cost(
-            location,
-            orden,
-            distance_km
-        )
-        cost_score = self._normalize_cost_score(shipping_cost)
-        
-        # 3. Score de disponibilidad de stock (100% = mejor)
-        stock_score = 100.0  # Ya sabemos que tiene todo
-        
-        # 4. Score de prioridad del negocio
-        priority_score = capability.prioridad * 10 if capability else 50
-        
-        # 5. Costo operativo
-        operational_cost = (
-            capability.costo_picking + capability.costo_packing
-            if capability else 1000.0
-        )
-        operational_score = self._normalize_cost_score(operational_cost)
-        
-        # Pesos (configurables por tienda)
-        weights = {
-            "distance": 0.30,
-            "cost": 0.35,
-            "stock": 0.15,
-            "priority": 0.10,
-            "operational": 0.10
-        }
-        
-        # Cálculo final
-        total_score = (
-            weights["distance"] * distance_score +
-            weights["cost"] * cost_score +
-            weights["stock"] * stock_score +
-            weights["priority"] * priority_score +
-            weights["operational"] * operational_score
-        )
-        
-        return {
-            "total_score": round(total_score, 2),
-            "distance_km": round(distance_km, 2),
-            "distance_score": round(distance_score, 2),
-            "shipping_cost": round(shipping_cost, 2),
-            "cost_score": round(cost_score, 2),
-            "stock_availability": 100.0,
-            "stock_score": stock_score,
-            "priority_score": priority_score,
-            "operational_cost": operational_cost,
-            "operational_score": round(operational_score, 2),
-            "weights": weights
-        }
-    
-    def _calculate_distance(
-        self,
-        location: Location,
-        shipping_address: Dict
-    ) -> float:
-        """
-        Calcula distancia en km usando fórmula de Haversine
-        """
-        if not location.latitud or not location.longitud:
-            return 999.0  # Penalización si no tiene coordenadas
-        
-        lat1 = location.latitud
-        lon1 = location.longitud
-        lat2 = shipping_address.get("lat")
-        lon2 = shipping_address.get("lng")
-        
-        if not lat2 or not lon2:
-            return 50.0  # Valor default si cliente no tiene coords
-        
-        # Fórmula de Haversine
-        R = 6371  # Radio de la Tierra en km
-        
-        phi1 = math.radians(lat1)
-        phi2 = math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lon2 - lon1)
-        
-        a = (math.sin(delta_phi / 2) ** 2 +
-             math.cos(phi1) * math.cos(phi2) *
-             math.sin(delta_lambda / 2) ** 2)
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        
-        return R * c
-    
-    def _normalize_distance_score(self, distance_km: float) -> float:
-        """
-        Normaliza distancia a score 0-100 (menor distancia = mayor score)
-        
-        0-5km   → 100 puntos
-        10km    → 90 puntos
-        20km    → 80 puntos
-        50km    → 50 puntos
-        100km+  → 0 puntos
-        """
-        if distance_km <= 5:
-            return 100.0
-        elif distance_km >= 100:
-            return 0.0
-        else:
-            return 100 - (distance_km * 0.9)
-    
-    async def _calculate_shipping_cost(
-        self,
-        location: Location,
-        orden: OrdenOmnicanal,
-        distance_km: float
-    ) -> float:
-        """
-        Calcula costo de envío desde una ubicación
-        
-        Puede usar:
-        - ShippingZones configuradas
-        - Integración con Andreani/OCA/Correo Argentino
-        - Fórmula simple basada en distancia
-        """
-        # Implementación simple basada en distancia
-        # TODO: Integrar con APIs de courriers reales
-        
-        base_cost = 1000.0  # $1000 base
-        per_km = 50.0  # $50 por km
-        
-        cost = base_cost + (distance_km * per_km)
-        
-        # Ajustar por método de envío
-        if orden.shipping_method == "express":
-            cost *= 1.5
-        elif orden.shipping_method == "same_day":
-            cost *= 2.0
-        
-        return cost
-    
-    def _normalize_cost_score(self, cost: float) -> float:
-        """
-        Normaliza costo a score 0-100 (menor costo = mayor score)
-        
-        $0-1000     → 100 puntos
-        $5000       → 50 puntos
-        $10000+     → 0 puntos
-        """
-        if cost <= 1000:
-            return 100.0
-        elif cost >= 10000:
-            return 0.0
-        else:
-            return 100 - ((cost - 1000) / 90)
-    
-    async def _get_location_capability(
-        self,
-        location_id: UUID
-    ) -> Optional[LocationCapability]:
-        """
-        Obtiene capacidades de una ubicación
-        """
-        result = await self.session.exec(
-            select(LocationCapability)
-            .where(LocationCapability.location_id == location_id)
+        for variant_id, location_id, stock in stock_result.all():
+            available[var_index[variant_id], loc_index[location_id]] += float(stock or 0)
+
+        committed_result = await self.session.execute(
+            select(
+                OrdenItem.variant_id,
+                OrdenOmnicanal.fulfillment_location_id,
+                func.sum(OrdenItem.cantidad)
+            )
+            .join(OrdenOmnicanal, OrdenOmnicanal.id == OrdenItem.orden_id)
+            .where(
+                and_(
+                    OrdenOmnicanal.tienda_id == tienda_id,
+                    OrdenOmnicanal.fulfillment_status.in_(COMMITTED_STATUSES),
+                    OrdenOmnicanal.id.not_in(exclude_orden_ids),
+                    OrdenItem.variant_id.in_(variant_ids)
+                )
+            )
+            .group_by(OrdenItem.variant_id, OrdenOmnicanal.fulfillment_location_id)
         )
-        return result.first()
-    
+        for variant_id, location_id, cantidad in committed_result.all():
+            j = loc_index.get(location_id)
+            if j is not None:
+                available[var_index[variant_id], j] -= float(cantidad or 0)
+
+        return available
+
     def _get_selection_reason(self, candidates: List[Dict]) -> str:
         """
         Genera razón human-readable de por qué se eligió esta ubicación
         """
         if len(candidates) == 1:
             return "única ubicación con stock disponible"
-        
+
         best = candidates[0]
         second = candidates[1] if len(candidates) > 1 else None
-        
+
         if not second:
             return "mejor opción general"
-        
+
         # Comparar scores
         if best["shipping_cost"] < second["shipping_cost"] * 0.8:
             return "costo de envío significativamente menor"
@@ -369,4 +365,7 @@ class SmartRoutingService:
             return "mejor puntuación general"
 
 
-from datetime import datetime
+def _coord(shipping_address: Optional[Dict], key: str) -> float:
+    """Coordenada del cliente o NaN si no la informó"""
+    value = (shipping_address or {}).get(key)
+    return float(value) if value else np.nan
@@ -0,0 +1,161 @@
+"""
+Servicio de Particiones - Nexus POS
+Mantenimiento del particionado mensual de las tablas append-only
+
+Tablas particionadas por RANGE sobre su columna de tiempo (ver migraciones
+e5a1c9f7b2d8 y b3e7d5a9c2f4): una partición por mes, `{tabla}_pYYYY_MM`,
+más `{tabla}_p_historico` con todo lo anterior a la migración.
+
+⚡ Inserciones y consultas planas a medida que crece el historial: cada
+INSERT cae en la partición del mes (índices chicos y calientes) y las
+consultas con rango de fechas solo leen las particiones del rango.
+
+- ensure_future_partitions: crea los próximos PARTITION_MONTHS_AHEAD meses
+  (sin partición para su fecha, un INSERT falla: no hay partición DEFAULT,
+  que bloquearía crear las siguientes)
+- archive_partitions: DETACH CONCURRENTLY de los meses viejos y los mueve
+  al schema de archivo (siguen consultables, fuera de los planes diarios).
+  Solo ARCHIVABLE_TABLES: el stock es SUM(delta) sobre todo el ledger,
+  desenganchar meses de inventory_ledger cambiaría los saldos; las ventas
+  son el historial de reportes, devoluciones y facturación
+"""
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Tabla -> columna de partición
+PARTITIONED_TABLES: Dict[str, str] = {
+    "inventory_ledger": "occurred_at",
+    "audit_logs": "timestamp",
+    "ventas": "fecha",
+    "detalles_venta": "fecha",  # Copia de ventas.fecha (FK compuesta)
+}
+
+# Tablas cuyas particiones viejas se pueden archivar
+ARCHIVABLE_TABLES = ("audit_logs",)
+
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    total = value.year * 12 + value.month - 1 + months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def create_partition_sql(table: str, month: date) -> str:
+    """DDL de la partición del mes (idempotente)"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+async def is_partitioned(conn: AsyncConnection, table: str) -> bool:
+    """False en bases creadas con create_all (desarrollo/tests): no hay nada que mantener"""
+    return bool((await conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"
+    ), {"table": table})).scalar())
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> List[Tuple[str, Optional[date]]]:
+    """
+    Particiones de la tabla con su límite superior (exclusivo)
+
+    Returns:
+        [(nombre, límite superior | None si es MAXVALUE)], ordenadas por nombre
+    """
+    rows = (await conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table)
+        ORDER BY c.relname
+    """), {"table": table})).all()
+
+    particiones = []
+    for nombre, bound in rows:
+        match = _UPPER_BOUND.search(bound or "")
+        particiones.append((nombre, date.fromisoformat(match.group(1)[:10]) if match else None))
+    return particiones
+
+
+async def ensure_future_partitions(
+    conn: AsyncConnection,
+    months_ahead: Optional[int] = None,
+    today: Optional[date] = None
+) -> List[str]:
+    """
+    Crea las particiones del mes actual y los próximos N meses
+
+    Returns:
+        Nombres de las particiones creadas
+    """
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    actual = month_start(today or datetime.now(timezone.utc).date())
+    creadas = []
+
+    for table in PARTITIONED_TABLES:
+        if not await is_partitioned(conn, table):
+            continue
+        existentes = {nombre for nombre, _ in await list_partitions(conn, table)}
+        for offset in range(months_ahead + 1):
+            mes = add_months(actual, offset)
+            if partition_name(table, mes) in existentes:
+                continue
+            await conn.execute(text(create_partition_sql(table, mes)))
+            creadas.append(partition_name(table, mes))
+
+    if creadas:
+        logger.info(f"Particiones creadas: {', '.join(creadas)}")
+    return creadas
+
+
+async def archive_partitions(
+    conn: AsyncConnection,
+    older_than_months: Optional[int] = None,
+    today: Optional[date] = None
+) -> List[str]:
+    """
+    Desengancha y archiva las particiones enteramente anteriores al corte
+
+    Requiere una conexión en AUTOCOMMIT (DETACH ... CONCURRENTLY no corre
+    dentro de una transacción). No toma locks que bloqueen INSERTs.
+
+    Returns:
+        Nombres de las particiones archivadas
+    """
+    older_than_months = older_than_months or settings.PARTITION_RETENTION_MONTHS
+    corte = add_months(month_start(today or datetime.now(timezone.utc).date()), -older_than_months)
+    schema = settings.PARTITION_ARCHIVE_SCHEMA
+    archivadas = []
+
+    await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    for table in ARCHIVABLE_TABLES:
+        if not await is_partitioned(conn, table):
+            continue
+        for nombre, limite in await list_partitions(conn, table):
+            if limite is None or limite > corte:
+                continue
+            await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {nombre} CONCURRENTLY"))
+            await conn.execute(text(f"ALTER TABLE {nombre} SET SCHEMA {schema}"))
+            archivadas.append(nombre)
+            logger.info(f"Partición {nombre} archivada en {schema} (< {limite})")
+
+    return archivadas
@@ -15,6 +15,26 @@ from core.circuit_breaker import mercadopago_circuit, CircuitBreakerOpenExceptio
 logger = logging.getLogger(__name__)
 
 
+def item_mercadopago(title: str, cantidad: float, precio_unitario: float, subtotal: float) -> Dict[str, Any]:
+    """
+    Línea de venta en formato de item de Mercado Pago
+
+    MP solo acepta `quantity` entera: una línea fraccionaria (pesable,
+    ej: 0.75 kg) va como 1 unidad a precio = subtotal, así el total de la
+    preferencia coincide con el de la venta.
+    """
+    if float(cantidad).is_integer():
+        quantity, unit_price = int(cantidad), float(precio_unitario)
+    else:
+        quantity, unit_price = 1, float(subtotal)
+    return {
+        "title": title,
+        "quantity": quantity,
+        "unit_price": unit_price,
+        "currency_id": "ARS"
+    }
+
+
 class PaymentService:
     """
     Servicio para integración con Mercado Pago
@@ -1,12 +1,124 @@
 """
 Servicio de gestión de permisos RBAC
+
+⚡ El set efectivo de permisos de cada rol (herencia + denegaciones ya
+resueltas) se calcula una vez y se guarda como frozenset, cacheado por
+(role_id, versión). Cualquier edición de roles/permisos incrementa la
+versión en Redis y todos los workers descartan su cache.
 """
-from typing import List, Set, Optional
+import logging
+import time
+from typing import Dict, FrozenSet, Set, Optional
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from models_rbac import Permission, Role, RolePermission, SYSTEM_PERMISSIONS, SYSTEM_ROLES
-from models import Usuario
+from sqlalchemy import String, select, and_, or_
+from models_rbac import (
+    Permission,
+    Role,
+    RolePermission,
+    SYSTEM_PERMISSIONS,
+    SYSTEM_ROLES,
+    system_role_names,
+)
+from models import User
+from utils.sql import values_table
+from core.config import settings
+from services.cache_service import get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+RBAC_VERSION_KEY = "rbac:version"
+
+
+def resolve_role_permissions(
+    parents: Dict[UUID, Optional[UUID]],
+    grants: Dict[UUID, Set[str]],
+    denies: Dict[UUID, Set[str]]
+) -> Dict[UUID, FrozenSet[str]]:
+    """
+    Resuelve el set efectivo de TODOS los roles de una vez
+
+    efectivo(rol) = efectivo(padre) ∪ otorgados(rol) − denegados(rol)
+
+    Memoizado: cada rol se resuelve una sola vez aunque lo hereden muchos.
+    Un ciclo en la jerarquía corta la herencia en el rol repetido.
+    """
+    resolved: Dict[UUID, FrozenSet[str]] = {}
+
+    def _resolve(role_id: UUID, visiting: Set[UUID]) -> FrozenSet[str]:
+        if role_id in resolved:
+            return resolved[role_id]
+        if role_id in visiting or role_id not in parents:
+            return frozenset()
+
+        visiting.add(role_id)
+        parent_id = parents[role_id]
+        inherited = _resolve(parent_id, visiting) if parent_id else frozenset()
+        visiting.discard(role_id)
+
+        effective = frozenset(
+            (inherited | grants.get(role_id, set())) - denies.get(role_id, set())
+        )
+        resolved[role_id] = effective
+        return effective
+
+    for role_id in parents:
+        _resolve(role_id, set())
+    return resolved
+
+
+class RolePermissionCache:
+    """
+    Cache en proceso de permisos efectivos por rol
+
+    La versión se lee de Redis como mucho cada RBAC_VERSION_CHECK_SECONDS,
+    así un chequeo de permiso con cache caliente no sale del proceso.
+    """
+
+    def __init__(self):
+        self._sets: Dict[UUID, FrozenSet[str]] = {}
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+
+    async def version(self) -> Optional[str]:
+        """Versión vigente; si cambió en Redis, descarta los sets cacheados"""
+        now = time.monotonic()
+        if now - self._checked_at < settings.RBAC_VERSION_CHECK_SECONDS:
+            return self._version
+
+        try:
+            client = await get_redis_client()
+            version = await client.get(RBAC_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Versión RBAC no disponible en Redis: {e}")
+            version = self._version
+
+        self._checked_at = now
+        if version != self._version:
+            self._sets.clear()
+            self._version = version
+        return self._version
+
+    def get(self, role_id: UUID) -> Optional[FrozenSet[str]]:
+        return self._sets.get(role_id)
+
+    def update(self, sets: Dict[UUID, FrozenSet[str]]) -> None:
+        self._sets.update(sets)
+
+    async def bump(self) -> None:
+        """Publica una nueva versión: todos los workers recalculan"""
+        self._sets.clear()
+        self._checked_at = 0.0
+        try:
+            client = await get_redis_client()
+            await client.incr(RBAC_VERSION_KEY)
+        except Exception as e:
+            # Sin Redis solo se invalida este proceso
+            logger.warning(f"No se pudo publicar la versión RBAC: {e}")
+
+
+role_permission_cache = RolePermissionCache()
 
 
 class PermissionService:
@@ -21,21 +133,10 @@ class PermissionService:
         """
         Verifica si un usuario tiene un permiso específico
         Considera herencia de roles
+
+        ⚡ 1 query (rol del usuario) + pertenencia O(1) en el set cacheado
         """
-        # Obtener usuario con su rol
-        result = await db.execute(
-            select(Usuario).where(Usuario.id == user_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user or not user.role_id:
-            return False
-        
-        # Obtener permisos del rol (incluyendo heredados)
-        permissions = await PermissionService.get_role_permissions(
-            db, user.role_id
-        )
-        
+        permissions = await PermissionService.get_user_permissions(db, user_id)
         return permission_code in permissions
     
     @staticmethod
@@ -43,72 +144,136 @@ class PermissionService:
         db: AsyncSession,
         role_id: UUID,
         include_inherited: bool = True
-    ) -> Set[str]:
+    ) -> FrozenSet[str]:
         """
         Obtiene todos los permisos de un rol
         Incluye permisos heredados del rol padre si corresponde
         """
-        permissions = set()
+        if not include_inherited:
+            sets = await PermissionService._load_role_permissions(db, role_id)
+            return sets.get(role_id, frozenset())
         
-        # Obtener rol
-        result = await db.execute(
-            select(Role).where(Role.id == role_id)
-        )
-        role = result.scalar_one_or_none()
+        await role_permission_cache.version()
+        cached = role_permission_cache.get(role_id)
+        if cached is not None:
+            return cached
         
-        if not role:
-            return permissions
+        sets = await PermissionService._load_role_permissions(db)
+        role_permission_cache.update(sets)
+        return sets.get(role_id, frozenset())
+    
+    @staticmethod
+    async def _load_role_permissions(
+        db: AsyncSession,
+        only_role_id: Optional[UUID] = None
+    ) -> Dict[UUID, FrozenSet[str]]:
+        """
+        Calcula los sets efectivos de todos los roles en 2 queries
+
+        La tabla de roles es chica: traer la jerarquía completa cuesta lo
+        mismo que recorrerla nivel por nivel, y deja resueltos todos los
+        roles para los próximos chequeos.
+
+        Args:
+            only_role_id: Si se indica, solo los permisos directos de ese rol
+                (sin herencia)
+        """
+        roles_stmt = select(Role.id, Role.parent_role_id)
+        perms_stmt = (
+            select(RolePermission.role_id, Permission.code, RolePermission.granted)
+            .join(Permission, Permission.id == RolePermission.permission_id)
+        )
+        if only_role_id is not None:
+            roles_stmt = roles_stmt.where(Role.id == only_role_id)
+            perms_stmt = perms_stmt.where(RolePermission.role_id == only_role_id)
         
-        # Si tiene rol padre, obtener permisos heredados
-        if include_inherited and role.parent_role_id:
-            parent_permissions = await PermissionService.get_role_permissions(
-                db, role.parent_role_id, include_inherited=True
-            )
-            permissions.update(parent_permissions)
+        parents: Dict[UUID, Optional[UUID]] = {
+            role_id: None if only_role_id is not None else parent_id
+            for role_id, parent_id in (await db.execute(roles_stmt)).all()
+        }
+        grants: Dict[UUID, Set[str]] = {}
+        denies: Dict[UUID, Set[str]] = {}
+        for role_id, code, granted in (await db.execute(perms_stmt)).all():
+            (grants if granted else denies).setdefault(role_id, set()).add(code)
         
-        # Obtener permisos directos del rol
+        return resolve_role_permissions(parents, grants, denies)
+    
+    @staticmethod
+    async def get_user_permissions(
+        db: AsyncSession,
+        user_id: UUID
+    ) -> FrozenSet[str]:
+        """
+        Obtiene todos los permisos de un usuario
+
+        users.rol guarda el código del rol ("cajero", "owner"...) y los roles
+        se guardan con su nombre visible: el código se traduce con la tabla
+        de SYSTEM_ROLES (y sus alias) en la misma query. Un rol propio de la
+        tienda tiene prioridad sobre el global (tienda_id NULL).
+        """
+        nombres = values_table("rol_nombres", system_role_names(), rol=String(), nombre=String())
         result = await db.execute(
-            select(Permission).join(RolePermission).where(
-                and_(
-                    RolePermission.role_id == role_id,
-                    RolePermission.granted == True
-                )
-            )
+            select(Role.id)
+            .select_from(User)
+            .join(nombres, nombres.c.rol == User.rol)
+            .join(Role, and_(
+                Role.name == nombres.c.nombre,
+                or_(Role.tienda_id == User.tienda_id, Role.tienda_id.is_(None))
+            ))
+            .where(User.id == user_id, Role.is_active == True)
+            .order_by(Role.tienda_id.is_(None))
+            .limit(1)
         )
+        role_id = result.scalar_one_or_none()
         
-        for perm in result.scalars().all():
-            permissions.add(perm.code)
+        if not role_id:
+            return frozenset()
         
-        # Remover permisos explícitamente denegados
-        result = await db.execute(
-            select(Permission).join(RolePermission).where(
+        return await PermissionService.get_role_permissions(db, role_id)
+    
+    @staticmethod
+    async def set_role_permission(
+        db: AsyncSession,
+        role_id: UUID,
+        permission_code: str,
+        granted: bool = True
+    ) -> None:
+        """
+        Otorga o deniega explícitamente un permiso a un rol
+
+        Hace commit e invalida el cache de permisos en todos los workers.
+        """
+        permission_id = (await db.execute(
+            select(Permission.id).where(Permission.code == permission_code)
+        )).scalar_one_or_none()
+        if permission_id is None:
+            raise ValueError(f"Permiso inexistente: {permission_code}")
+        
+        role_perm = (await db.execute(
+            select(RolePermission).where(
                 and_(
                     RolePermission.role_id == role_id,
-                    RolePermission.granted == False
+                    RolePermission.permission_id == permission_id
                 )
             )
-        )
+        )).scalar_one_or_none()
         
-        for perm in result.scalars().all():
-            permissions.discard(perm.code)
+        if role_perm:
+            role_perm.granted = granted
+        else:
+            db.add(RolePermission(
+                role_id=role_id,
+                permission_id=permission_id,
+                granted=granted
+            ))
         
-        return permissions
+        await db.commit()
+        await role_permission_cache.bump()
     
     @staticmethod
-    async def get_user_permissions(
-        db: AsyncSession,
-        user_id: UUID
-    ) -> Set[str]:
-        """Obtiene todos los permisos de un usuario"""
-        result = await db.execute(
-            select(Usuario).where(Usuario.id == user_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user or not user.role_id:
-            return set()
-        
-        return await PermissionService.get_role_permissions(db, user.role_id)
+    async def invalidate_cache() -> None:
+        """Llamar después de editar roles, jerarquía o permisos"""
+        await role_permission_cache.bump()
     
     @staticmethod
     async def initialize_system_permissions(db: AsyncSession):
@@ -129,6 +294,7 @@ class PermissionService:
                 db.add(perm)
         
         await db.commit()
+        await role_permission_cache.bump()
     
     @staticmethod
     async def initialize_system_roles(db: AsyncSession, tienda_id: Optional[UUID] = None):
@@ -171,10 +337,11 @@ class PermissionService:
                         db.add(role_perm)
         
         await db.commit()
+        await role_permission_cache.bump()
 
 
 # Dependency para verificar permisos
-async def require_permission(permission_code: str):
+def require_permission(permission_code: str):
     """
     Dependency para rutas que requieren un permiso específico
     
@@ -186,12 +353,12 @@ async def require_permission(permission_code: str):
     ):
     """
     from fastapi import Depends, HTTPException, status
-    from core.database import get_session
-    from core.auth import get_current_user
+    from core.db import get_session
+    from api.deps import get_current_user
     
     async def permission_checker(
         db: AsyncSession = Depends(get_session),
-        current_user: Usuario = Depends(get_current_user)
+        current_user: User = Depends(get_current_user)
     ):
         has_permission = await PermissionService.user_has_permission(
             db, current_user.id, permission_code
@@ -0,0 +1,347 @@
+"""
+Índice de Promociones - Nexus POS
+Compila las promociones de una tienda a un índice de reglas en memoria
+
+⚡ Las reglas JSON Logic se parsean UNA vez (al armar el índice) a closures
+Python, y las promos con alcance (productos, categorías, colecciones) se
+indexan por clave: al evaluar un carrito solo se miran las promos que tocan
+alguna de sus líneas, no el catálogo completo de promociones.
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from schemas_models.promo_models import Promocion
+
+
+logger = logging.getLogger(__name__)
+
+Rule = Callable[[Dict[str, Any]], Any]
+
+
+# =====================================================
+# COMPILADOR JSON LOGIC
+# =====================================================
+
+def _var(path: Any, default: Any = None) -> Rule:
+    keys = [] if path in (None, "") else str(path).split(".")
+
+    def var(ctx: Dict[str, Any]) -> Any:
+        value: Any = ctx
+        for key in keys:
+            if isinstance(value, dict) and key in value:
+                value = value[key]
+            elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+                value = value[int(key)]
+            else:
+                return default
+        return value
+
+    return var
+
+
+def _and(args: List[Rule]) -> Rule:
+    def rule(ctx):
+        value: Any = True
+        for arg in args:
+            value = arg(ctx)
+            if not value:
+                return value
+        return value
+    return rule
+
+
+def _or(args: List[Rule]) -> Rule:
+    def rule(ctx):
+        value: Any = False
+        for arg in args:
+            value = arg(ctx)
+            if value:
+                return value
+        return value
+    return rule
+
+
+def _compare(op: Callable[[Any, Any], bool], args: List[Rule]) -> Rule:
+    if len(args) == 3:
+        # Between: {"<": [1, {"var": "x"}, 10]}
+        low, mid, high = args
+
+        def between(ctx):
+            value = mid(ctx)
+            return op(low(ctx), value) and op(value, high(ctx))
+        return between
+
+    left, right = args[0], args[1]
+    return lambda ctx: op(left(ctx), right(ctx))
+
+
+def _in(args: List[Rule]) -> Rule:
+    needle, haystack = args[0], args[1]
+
+    def rule(ctx):
+        container = haystack(ctx)
+        if container is None:
+            return False
+        return needle(ctx) in container
+    return rule
+
+
+def _fallback(rule: Dict[str, Any]) -> Rule:
+    """Operadores no compilados: se delegan a json_logic (import perezoso)"""
+    import json_logic
+
+    return lambda ctx: json_logic.jsonLogic(rule, ctx)
+
+
+_COMPARATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": lambda a, b: a == b,
+    "===": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "!==": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+def compile_rule(rule: Any) -> Rule:
+    """
+    Compila una regla JSON Logic a una closure `ctx -> valor`
+
+    Soporta var, and, or, !, !!, in y comparaciones (incluido el "between"
+    de < y <=). Cualquier otro operador se evalúa con json_logic.
+    """
+    if isinstance(rule, list):
+        items = [compile_rule(item) for item in rule]
+        return lambda ctx: [item(ctx) for item in items]
+
+    if not isinstance(rule, dict) or len(rule) != 1:
+        return lambda ctx: rule
+
+    op, raw_args = next(iter(rule.items()))
+    if op == "var":
+        raw = raw_args if isinstance(raw_args, list) else [raw_args]
+        return _var(*raw[:2])
+
+    args = [compile_rule(arg) for arg in (raw_args if isinstance(raw_args, list) else [raw_args])]
+
+    if op == "and":
+        return _and(args)
+    if op == "or":
+        return _or(args)
+    if op == "!":
+        return lambda ctx: not args[0](ctx)
+    if op == "!!":
+        return lambda ctx: bool(args[0](ctx))
+    if op == "in" and len(args) == 2:
+        return _in(args)
+    if op in _COMPARATORS and len(args) in (2, 3):
+        return _compare(_COMPARATORS[op], args)
+
+    return _fallback(rule)
+
+
+# =====================================================
+# PROMO COMPILADA
+# =====================================================
+
+def _as_set(values: Optional[Iterable[Any]]) -> Optional[FrozenSet[str]]:
+    """Lista JSONB → frozenset de strings (None si está vacía = sin restricción)"""
+    if not values:
+        return None
+    return frozenset(str(v) for v in values)
+
+
+class CompiledPromo:
+    """
+    Promoción con todas sus condiciones pre-parseadas
+
+    Mantiene una referencia a la `Promocion` original para la acción,
+    el nombre y el tipo (lo que consume `_apply_promotions`).
+    """
+
+    __slots__ = (
+        "promo", "id", "codigo", "prioridad", "es_acumulable",
+        "fecha_inicio", "fecha_fin", "dias_semana", "hora_inicio", "hora_fin",
+        "canales", "formas_pago", "monto_minimo", "cantidad_minima",
+        "usos_maximos", "usos_actuales", "usos_maximos_por_cliente",
+        "productos", "categorias", "colecciones", "predicate",
+    )
+
+    def __init__(self, promo: Promocion):
+        self.promo = promo
+        self.id = promo.id
+        self.codigo = promo.codigo_promocional
+        self.prioridad = promo.prioridad or 0
+        self.es_acumulable = promo.es_acumulable
+
+        self.fecha_inicio = promo.fecha_inicio
+        self.fecha_fin = promo.fecha_fin
+        self.dias_semana = frozenset(promo.dias_semana) if promo.dias_semana else None
+        self.hora_inicio = promo.hora_inicio
+        self.hora_fin = promo.hora_fin
+
+        self.canales = _as_set(promo.canales_aplicables) or frozenset()
+        self.formas_pago = _as_set(promo.formas_pago_aplicables)
+        self.monto_minimo = promo.monto_minimo_compra
+        self.cantidad_minima = promo.cantidad_minima_items
+
+        self.usos_maximos = promo.usos_maximos
+        self.usos_actuales = promo.usos_actuales or 0
+        self.usos_maximos_por_cliente = promo.usos_maximos_por_cliente
+
+        self.productos = _as_set(promo.productos_aplicables)
+        self.categorias = _as_set(promo.categorias_aplicables)
+        self.colecciones = _as_set(promo.colecciones_aplicables)
+
+        self.predicate = compile_rule(promo.reglas) if promo.reglas else None
+
+    @property
+    def is_scoped(self) -> bool:
+        """True si la promo solo aplica a ciertos productos/categorías/colecciones"""
+        return bool(self.productos or self.categorias or self.colecciones)
+
+    def is_live(self, now: datetime) -> bool:
+        """Vigencia por fecha, día de semana (1=Lun, 7=Dom) y franja horaria"""
+        if not (self.fecha_inicio <= now <= self.fecha_fin):
+            return False
+        if self.dias_semana and now.isoweekday() not in self.dias_semana:
+            return False
+        if self.hora_inicio and self.hora_fin:
+            if not (self.hora_inicio <= now.strftime("%H:%M") <= self.hora_fin):
+                return False
+        return True
+
+    def matches_line(self, item: Dict[str, Any]) -> bool:
+        """¿La línea del carrito entra en el alcance de la promo?"""
+        if not self.is_scoped:
+            return True
+        if self.productos and (
+            str(item.get("product_id")) in self.productos
+            or str(item.get("variant_id")) in self.productos
+        ):
+            return True
+        if self.categorias and item.get("categoria") in self.categorias:
+            return True
+        if self.colecciones and str(item.get("coleccion_id")) in self.colecciones:
+            return True
+        return False
+
+    def matches_cart(self, carrito: Dict[str, Any], context: Dict[str, Any]) -> bool:
+        """Condiciones que no dependen del cliente: canal, pago, mínimos y reglas"""
+        if carrito.get("canal") not in self.canales:
+            return False
+        if self.formas_pago and carrito.get("forma_pago") not in self.formas_pago:
+            return False
+        if self.usos_maximos and self.usos_actuales >= self.usos_maximos:
+            return False
+        if self.monto_minimo and context["total"] < self.monto_minimo:
+            return False
+        if self.cantidad_minima and context["cantidad_items"] < self.cantidad_minima:
+            return False
+
+        if self.predicate is not None:
+            try:
+                if not self.predicate(context):
+                    return False
+            except Exception as e:
+                logger.warning(f"Error evaluando reglas de {self.promo.nombre}: {e}")
+                return False
+
+        return True
+
+
+# =====================================================
+# ÍNDICE POR TIENDA
+# =====================================================
+
+class PromoIndex:
+    """
+    Índice de promociones de una tienda
+
+    - `general`: promos sin código ni alcance (se evalúan siempre)
+    - `by_code`: promos con código promocional (solo si se ingresa el código)
+    - `by_product` / `by_category` / `by_collection`: promos con alcance,
+      indexadas por cada product_id/variant_id, categoría y colección
+    """
+
+    def __init__(self, promos: Iterable[Promocion], version: Optional[str] = None):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.size = 0
+
+        self.general: List[CompiledPromo] = []
+        self.by_code: Dict[str, List[CompiledPromo]] = {}
+        self.by_product: Dict[str, List[CompiledPromo]] = defaultdict(list)
+        self.by_category: Dict[str, List[CompiledPromo]] = defaultdict(list)
+        self.by_collection: Dict[str, List[CompiledPromo]] = defaultdict(list)
+
+        for promo in promos:
+            try:
+                compiled = CompiledPromo(promo)
+            except Exception as e:
+                logger.error(f"Promoción {promo.id} no compilable, se omite: {e}")
+                continue
+            self.size += 1
+
+            if compiled.codigo:
+                self.by_code.setdefault(compiled.codigo, []).append(compiled)
+            elif not compiled.is_scoped:
+                self.general.append(compiled)
+            else:
+                for key in compiled.productos or ():
+                    self.by_product[key].append(compiled)
+                for key in compiled.categorias or ():
+                    self.by_category[key].append(compiled)
+                for key in compiled.colecciones or ():
+                    self.by_collection[key].append(compiled)
+
+        # Sin defaultdict al consultar: un lookup no debe crear claves nuevas
+        self.by_product = dict(self.by_product)
+        self.by_category = dict(self.by_category)
+        self.by_collection = dict(self.by_collection)
+
+    def candidates(
+        self,
+        items: List[Dict[str, Any]],
+        codigo_promocional: Optional[str] = None
+    ) -> Tuple[List[CompiledPromo], Dict[Any, Set[int]]]:
+        """
+        Promos potencialmente aplicables al carrito, de mayor a menor prioridad
+
+        Costo proporcional a las líneas del carrito + las promos que las tocan,
+        independiente del total de promociones de la tienda.
+
+        Returns:
+            (promos, lineas): `lineas[promo.id]` son los índices de las líneas
+            del carrito que entran en el alcance de cada promo con alcance
+        """
+        seen: Dict[Any, CompiledPromo] = {promo.id: promo for promo in self.general}
+        lineas: Dict[Any, Set[int]] = defaultdict(set)
+
+        if codigo_promocional:
+            for promo in self.by_code.get(codigo_promocional, ()):
+                seen[promo.id] = promo
+                if promo.is_scoped:
+                    # Pocas promos con código: el alcance se resuelve línea a línea
+                    lineas[promo.id].update(
+                        i for i, item in enumerate(items) if promo.matches_line(item)
+                    )
+
+        for i, item in enumerate(items):
+            hits = (
+                self.by_product.get(str(item.get("product_id")), ()),
+                self.by_product.get(str(item.get("variant_id")), ()),
+                self.by_category.get(item.get("categoria"), ()),
+                self.by_collection.get(str(item.get("coleccion_id")), ()),
+            )
+            for bucket in hits:
+                for promo in bucket:
+                    seen[promo.id] = promo
+                    lineas[promo.id].add(i)
+
+        return sorted(seen.values(), key=lambda p: p.prioridad, reverse=True), lineas
@@ -1,32 +1,87 @@
 """
 Promotion Service - Motor de Evaluación de Reglas
 Evalúa reglas de promociones y calcula descuentos
+
+⚡ Las promociones de cada tienda se compilan a un `PromoIndex` (ver
+services/promo_index.py) que se cachea en memoria por proceso. Un contador
+de versión en Redis permite invalidarlo en todos los workers cuando
+cambian las promos; los usos por cliente se llevan en contadores Redis.
 """
-from typing import List, Dict, Any, Optional
+import logging
+import time
+from typing import List, Dict, Any, Optional, Set
 from uuid import UUID
 from datetime import datetime
-from sqlmodel import select
+from sqlalchemy import select, update, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_, or_
-import json_logic
 
+from core.config import settings
 from schemas_models.promo_models import (
     Promocion,
     PromocionUso,
     DescuentoCalculado,
     TipoPromo
 )
+from services.cache_service import get_redis_client
+from services.promo_index import CompiledPromo, PromoIndex
+
+
+logger = logging.getLogger(__name__)
+
+# Índices compilados por tienda (cache local del proceso)
+_indices: Dict[UUID, PromoIndex] = {}
+
+# INCR solo si la key ya existe: una key ausente se siembra desde la DB
+INCR_IF_EXISTS_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('INCR', key)
+        redis.call('EXPIRE', key, ARGV[1])
+    end
+end
+return 1
+"""
+
+
+def _version_key(tienda_id: UUID) -> str:
+    return f"promo:index:version:{tienda_id}"
+
+
+def _usos_key(promocion_id: UUID, cliente_id: Optional[UUID] = None) -> str:
+    if cliente_id is None:
+        return f"promo:usos:{promocion_id}"
+    return f"promo:usos:{promocion_id}:{cliente_id}"
+
+
+async def invalidate_promotion_index(tienda_id: UUID) -> None:
+    """
+    Invalida el índice de promociones de una tienda
+
+    Llamar después de crear/editar/desactivar una promoción. Descarta el
+    índice local e incrementa la versión en Redis para que el resto de los
+    workers lo reconstruya en su próxima evaluación.
+    """
+    _indices.pop(tienda_id, None)
+    try:
+        client = await get_redis_client()
+        await client.incr(_version_key(tienda_id))
+    except Exception as e:
+        # Sin Redis, los otros workers lo reconstruyen al vencer PROMO_INDEX_TTL
+        logger.warning(f"No se pudo publicar la invalidación de promos de {tienda_id}: {e}")
 
 
 class PromotionEngine:
     """
     Motor de evaluación de promociones
     
-    Usa JSON Logic para evalular reglas complejas sin hardcodear lógica
+    Usa JSON Logic para evalular reglas complejas sin hardcodear lógica.
+    Las reglas se compilan una vez por índice, no en cada carrito.
     """
     
     def __init__(self, session: AsyncSession):
         self.session = session
+        # Incrementos de contadores pendientes hasta el commit de la venta
+        self._usos_pendientes: List[str] = []
     
     async def calcular_descuentos(
         self,
@@ -58,124 +113,230 @@ class PromotionEngine:
         Returns:
             DescuentoCalculado con todas las promos aplicables
         """
-        # 1. Obtener promociones activas
-        promociones = await self._get_active_promotions(
-            tienda_id,
-            codigo_promocional
-        )
+        now = datetime.utcnow()
+        context = self._build_context(carrito)
         
-        # 2. Filtrar promociones aplicables
-        promociones_aplicables = []
-        for promo in promociones:
-            if await self._is_promotion_applicable(promo, carrito, cliente_id):
-                promociones_aplicables.append(promo)
+        # 1. Candidatas: solo las promos que tocan alguna línea del carrito
+        index = await self._get_index(tienda_id)
+        candidatas, lineas = index.candidates(carrito.get("items", []), codigo_promocional)
         
-        # 3. Ordenar por prioridad (mayor primero)
-        promociones_aplicables.sort(key=lambda p: p.prioridad, reverse=True)
+        # 2. Filtrar por vigencia y condiciones del carrito (reglas pre-compiladas)
+        promociones_aplicables = [
+            promo for promo in candidatas
+            if promo.is_live(now) and promo.matches_cart(carrito, context)
+        ]
+        
+        # 3. Límites de uso (una sola ida a Redis para todas las promos)
+        promociones_aplicables = await self._filter_usage_limits(
+            promociones_aplicables,
+            cliente_id
+        )
         
-        # 4. Aplicar promociones
+        # 4. Aplicar promociones (ya ordenadas por prioridad, mayor primero)
         resultado = await self._apply_promotions(
             promociones_aplicables,
             carrito,
-            cliente_id
+            cliente_id,
+            lineas
         )
         
         return resultado
     
-    async def _get_active_promotions(
-        self,
-        tienda_id: UUID,
-        codigo_promocional: Optional[str] = None
-    ) -> List[Promocion]:
+    async def _get_index(self, tienda_id: UUID) -> PromoIndex:
         """
-        Obtiene promociones activas
+        Índice compilado de la tienda
+
+        Se reutiliza mientras la versión en Redis no cambie y no venza
+        PROMO_INDEX_TTL (que también acota la deriva de `usos_actuales`
+        y de las promos que entran en vigencia).
         """
-        now = datetime.utcnow()
-        
-        conditions = [
-            Promocion.tienda_id == tienda_id,
-            Promocion.is_active == True,
-            Promocion.fecha_inicio <= now,
-            Promocion.fecha_fin >= now
-        ]
-        
-        # Si hay código, filtrar por código
-        if codigo_promocional:
-            conditions.append(
-                or_(
-                    Promocion.codigo_promocional == codigo_promocional,
-                    Promocion.codigo_promocional.is_(None)  # Promos sin código
-                )
+        version = await self._get_index_version(tienda_id)
+        cached = _indices.get(tienda_id)
+        if (
+            cached is not None
+            and cached.version == version
+            and time.monotonic() - cached.built_at < settings.PROMO_INDEX_TTL
+        ):
+            return cached
+        
+        promociones = await self._get_active_promotions(tienda_id)
+        index = PromoIndex(promociones, version=version)
+        _indices[tienda_id] = index
+        
+        logger.info(f"Índice de promociones de {tienda_id} compilado: {index.size} promos")
+        return index
+    
+    async def _get_index_version(self, tienda_id: UUID) -> Optional[str]:
+        """Versión publicada del índice (None si Redis no está disponible)"""
+        try:
+            client = await get_redis_client()
+            return await client.get(_version_key(tienda_id))
+        except Exception as e:
+            logger.debug(f"Versión de índice de promos no disponible: {e}")
+            return None
+    
+    async def _get_active_promotions(self, tienda_id: UUID) -> List[Promocion]:
+        """
+        Obtiene promociones activas y no vencidas (con y sin código)
+
+        El filtro por fecha de inicio, día de semana y hora se hace al
+        evaluar: el índice sobrevive a los cambios de franja horaria.
+        """
+        result = await self.session.execute(
+            select(Promocion).where(
+                Promocion.tienda_id == tienda_id,
+                Promocion.is_active == True,
+                Promocion.fecha_fin >= datetime.utcnow()
             )
-        else:
-            # Solo promos sin código
-            conditions.append(Promocion.codigo_promocional.is_(None))
-        
-        # Verificar día de la semana
-        dia_semana = now.isoweekday()  # 1=Lun, 7=Dom
-        
-        result = await self.session.exec(
-            select(Promocion).where(and_(*conditions))
         )
+        return list(result.scalars().all())
+    
+    async def _filter_usage_limits(
+        self,
+        promociones: List[CompiledPromo],
+        cliente_id: Optional[UUID]
+    ) -> List[CompiledPromo]:
+        """
+        Descarta promos que alcanzaron su límite global o por cliente
+
+        Los contadores viven en Redis; los que faltan se siembran desde la
+        DB con SET NX (sin pisar un contador que otro worker ya sembró).
+        """
+        keys: Dict[str, tuple] = {}
+        for promo in promociones:
+            if promo.usos_maximos:
+                keys[_usos_key(promo.id)] = (promo.id, None)
+            if promo.usos_maximos_por_cliente and cliente_id:
+                keys[_usos_key(promo.id, cliente_id)] = (promo.id, cliente_id)
+        if not keys:
+            return promociones
         
-        promociones = result.all()
+        usos = await self._get_usage_counts(keys, cliente_id)
         
-        # Filtrar por día de semana y hora
-        filtered = []
+        aplicables = []
         for promo in promociones:
-            # Día de semana
-            if promo.dias_semana and dia_semana not in promo.dias_semana:
+            if promo.usos_maximos and usos[_usos_key(promo.id)] >= promo.usos_maximos:
                 continue
-            
-            # Hora (solo para POS físico)
-            if promo.hora_inicio and promo.hora_fin:
-                hora_actual = now.strftime("%H:%M")
-                if not (promo.hora_inicio <= hora_actual <= promo.hora_fin):
-                    continue
-            
-            filtered.append(promo)
+            if (
+                promo.usos_maximos_por_cliente and cliente_id
+                and usos[_usos_key(promo.id, cliente_id)] >= promo.usos_maximos_por_cliente
+            ):
+                continue
+            aplicables.append(promo)
+        return aplicables
+    
+    async def _get_usage_counts(
+        self,
+        keys: Dict[str, tuple],
+        cliente_id: Optional[UUID]
+    ) -> Dict[str, int]:
+        """Contadores de uso: MGET en Redis + siembra desde la DB de los faltantes"""
+        client = None
+        usos: Dict[str, int] = {}
+        try:
+            client = await get_redis_client()
+            valores = await client.mget(list(keys))
+            for key, valor in zip(keys, valores):
+                if valor is not None:
+                    usos[key] = int(valor)
+        except Exception as e:
+            logger.warning(f"Contadores de promos no disponibles en Redis, se usa la DB: {e}")
+            client = None
+        
+        faltantes = {key: ref for key, ref in keys.items() if key not in usos}
+        if not faltantes:
+            return usos
+        
+        sembrados = await self._count_uses(faltantes, cliente_id)
+        usos.update(sembrados)
+        
+        if client is not None:
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    for key, valor in sembrados.items():
+                        pipe.set(key, valor, nx=True, ex=settings.PROMO_USAGE_COUNTER_TTL)
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"No se pudieron sembrar contadores de promos: {e}")
         
-        return filtered
+        return usos
     
-    async def _is_promotion_applicable(
+    async def _count_uses(
         self,
-        promo: Promocion,
-        carrito: Dict,
+        keys: Dict[str, tuple],
         cliente_id: Optional[UUID]
-    ) -> bool:
+    ) -> Dict[str, int]:
         """
-        Verifica si una promoción aplica al carrito
+        Cuenta usos en la DB para las keys pedidas (máx. 2 queries agrupadas)
         """
-        # 1. Verificar canal
-        if carrito.get("canal") not in promo.canales_aplicables:
-            return False
-        
-        # 2. Verificar forma de pago
-        if promo.formas_pago_aplicables:
-            if carrito.get("forma_pago") not in promo.formas_pago_aplicables:
-                return False
-        
-        # 3. Verificar límites de uso
-        if promo.usos_maximos and promo.usos_actuales >= promo.usos_maximos:
-            return False
-        
-        if promo.usos_maximos_por_cliente and cliente_id:
-            usos_cliente = await self._count_customer_uses(promo.id, cliente_id)
-            if usos_cliente >= promo.usos_maximos_por_cliente:
-                return False
-        
-        # 4. Evaluar reglas JSON Logic
-        if promo.reglas:
-            context = self._build_context(carrito)
-            try:
-                cumple_reglas = json_logic.jsonLogic(promo.reglas, context)
-                if not cumple_reglas:
-                    return False
-            except Exception as e:
-                print(f"Error evaluando reglas de {promo.nombre}: {e}")
-                return False
+        globales = [promo_id for promo_id, cliente in keys.values() if cliente is None]
+        por_cliente = [promo_id for promo_id, cliente in keys.values() if cliente is not None]
+        conteos: Dict[str, int] = {key: 0 for key in keys}
+        
+        if globales:
+            result = await self.session.execute(
+                select(Promocion.id, Promocion.usos_actuales)
+                .where(Promocion.id.in_(globales))
+            )
+            for promo_id, usos_actuales in result.all():
+                conteos[_usos_key(promo_id)] = usos_actuales or 0
+        
+        if por_cliente:
+            result = await self.session.execute(
+                select(PromocionUso.promocion_id, func.count(PromocionUso.id))
+                .where(
+                    PromocionUso.promocion_id.in_(por_cliente),
+                    PromocionUso.cliente_id == cliente_id
+                )
+                .group_by(PromocionUso.promocion_id)
+            )
+            for promo_id, cantidad in result.all():
+                conteos[_usos_key(promo_id, cliente_id)] = cantidad
+        
+        return conteos
+    
+    async def registrar_uso(
+        self,
+        promocion_id: UUID,
+        venta_id: UUID,
+        descuento_aplicado: float,
+        cliente_id: Optional[UUID] = None
+    ) -> None:
+        """
+        Registra el uso de una promo en la venta (no hace commit)
+
+        Los contadores de Redis se actualizan recién en `confirmar_usos()`,
+        después del commit, para no contar ventas que hicieron rollback.
+        """
+        self.session.add(PromocionUso(
+            promocion_id=promocion_id,
+            cliente_id=cliente_id,
+            venta_id=venta_id,
+            descuento_aplicado=descuento_aplicado
+        ))
+        await self.session.execute(
+            update(Promocion)
+            .where(Promocion.id == promocion_id)
+            .values(usos_actuales=Promocion.usos_actuales + 1)
+        )
         
-        return True
+        self._usos_pendientes.append(_usos_key(promocion_id))
+        if cliente_id:
+            self._usos_pendientes.append(_usos_key(promocion_id, cliente_id))
+    
+    async def confirmar_usos(self) -> None:
+        """Incrementa en Redis los contadores de los usos ya commiteados"""
+        if not self._usos_pendientes:
+            return
+        keys, self._usos_pendientes = self._usos_pendientes, []
+        try:
+            client = await get_redis_client()
+            await client.eval(
+                INCR_IF_EXISTS_SCRIPT, len(keys), *keys, settings.PROMO_USAGE_COUNTER_TTL
+            )
+        except Exception as e:
+            # Las keys vencen y se vuelven a sembrar desde la DB
+            logger.warning(f"No se pudieron incrementar contadores de promos: {e}")
     
     def _build_context(self, carrito: Dict) -> Dict:
         """
@@ -204,9 +365,10 @@ class PromotionEngine:
     
     async def _apply_promotions(
         self,
-        promociones: List[Promocion],
+        promociones: List[CompiledPromo],
         carrito: Dict,
-        cliente_id: Optional[UUID]
+        cliente_id: Optional[UUID],
+        lineas: Optional[Dict[UUID, Set[int]]] = None
     ) -> DescuentoCalculado:
         """
         Aplica promociones al carrito
@@ -229,7 +391,7 @@ class PromotionEngine:
             mejor_descuento = 0.0
             
             for promo in promociones:
-                desc = self._calcular_descuento_promo(promo, carrito)
+                desc = self._calcular_descuento_promo(promo, carrito, lineas)
                 if desc > mejor_descuento:
                     mejor_descuento = desc
                     mejor_promo = promo
@@ -237,8 +399,9 @@ class PromotionEngine:
             if mejor_promo:
                 descuento_total = mejor_descuento
                 promociones_aplicadas.append({
-                    "nombre": mejor_promo.nombre,
-                    "tipo": mejor_promo.tipo,
+                    "promocion_id": str(mejor_promo.id),
+                    "nombre": mejor_promo.promo.nombre,
+                    "tipo": mejor_promo.promo.tipo,
                     "descuento": mejor_descuento
                 })
         
@@ -246,19 +409,20 @@ class PromotionEngine:
             # Aplicar todas las acumulables
             for promo in promociones:
                 if promo.es_acumulable:
-                    desc = self._calcular_descuento_promo(promo, carrito)
+                    desc = self._calcular_descuento_promo(promo, carrito, lineas)
                     descuento_total += desc
                     
                     if desc > 0:
                         promociones_aplicadas.append({
-                            "nombre": promo.nombre,
-                            "tipo": promo.tipo,
+                            "promocion_id": str(promo.id),
+                            "nombre": promo.promo.nombre,
+                            "tipo": promo.promo.tipo,
                             "descuento": desc
                         })
                     
                     # Manejar regalos
-                    if promo.tipo == TipoPromo.REGALO:
-                        regalo = self._get_regalo(promo)
+                    if promo.promo.tipo == TipoPromo.REGALO:
+                        regalo = self._get_regalo(promo.promo)
                         if regalo:
                             items_regalo.append(regalo)
         
@@ -291,17 +455,31 @@ class PromotionEngine:
     
     def _calcular_descuento_promo(
         self,
-        promo: Promocion,
-        carrito: Dict
+        promo: CompiledPromo,
+        carrito: Dict,
+        lineas: Optional[Dict[UUID, Set[int]]] = None
     ) -> float:
         """
         Calcula el descuento de una promoción específica
+
+        Las promos con alcance (productos/categorías/colecciones) descuentan
+        solo sobre las líneas que entran en su alcance (`lineas`, resueltas
+        por el índice).
         """
-        accion = promo.accion
+        accion = promo.promo.accion
         tipo_accion = accion.get("tipo")
         
-        total = carrito["total"]
         items = carrito["items"]
+        if promo.is_scoped:
+            if lineas is not None:
+                items = [items[i] for i in lineas.get(promo.id, ())]
+            else:
+                items = [item for item in items if promo.matches_line(item)]
+            if not items:
+                return 0.0
+            total = sum(item["precio_unitario"] * item["cantidad"] for item in items)
+        else:
+            total = carrito["total"]
         
         if tipo_accion == "descuento_porcentaje":
             porcentaje = accion.get("valor", 0)
@@ -346,25 +524,3 @@ class PromotionEngine:
                 "promo_nombre": promo.nombre
             }
         return None
-    
-    async def _count_customer_uses(
-        self,
-        promocion_id: UUID,
-        cliente_id: UUID
-    ) -> int:
-        """
-        Cuenta cuántas veces usó el cliente esta promo
-        """
-        result = await self.session.exec(
-            select(func.count(PromocionUso.id))
-            .where(
-                and_(
-                    PromocionUso.promocion_id == promocion_id,
-                    PromocionUso.cliente_id == cliente_id
-                )
-            )
-        )
-        return result.first() or 0
-
-
-from sqlalchemy import func
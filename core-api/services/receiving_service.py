@@ -0,0 +1,222 @@
+"""
+Servicio de Recepción de Mercadería - Nexus POS
+Recepción total o parcial de órdenes de compra en pocas sentencias set-based
+
+⚡ Sin importar la cantidad de líneas de la orden:
+1. Lock de la orden y de sus detalles (1 SELECT ... FOR UPDATE, orden por id)
+2. Lock de variantes y productos legacy afectados (orden determinístico por PK)
+3. UPDATE ... FROM (VALUES ...) para costos, stock legacy y cantidades recibidas
+4. 1 INSERT multi-fila de entradas PURCHASE en el ledger
+
+Bloquear siempre en el mismo orden (PK ascendente) evita deadlocks cuando
+dos recepciones concurrentes comparten variantes.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import Float, Uuid, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import DetalleOrden, InventoryLedger, Location, OrdenCompra, Producto, ProductVariant
+from utils.sql import values_table
+
+
+logger = logging.getLogger(__name__)
+
+# Estados desde los que se puede recibir mercadería
+ESTADOS_RECIBIBLES = ("PENDIENTE", "PARCIAL")
+
+# Tolerancia para comparar cantidades float
+EPSILON = 1e-9
+
+
+class ReceivingService:
+    """Recepción de órdenes de compra con ledger y actualización de costos"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def receive(
+        self,
+        orden_id: UUID,
+        tienda_id: UUID,
+        user_id: Optional[UUID] = None,
+        cantidades: Optional[Dict[UUID, float]] = None,
+        location_id: Optional[UUID] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Recibe una orden de compra (total o parcial). No hace commit.
+
+        Args:
+            orden_id: ID de la orden
+            tienda_id: ID de la tienda
+            user_id: Usuario que recibe (queda en el ledger)
+            cantidades: {detalle_id: cantidad} a recibir. Si es None se recibe
+                todo lo pendiente de cada línea.
+            location_id: Ubicación de destino (por defecto, la default de la tienda)
+
+        Returns:
+            Resumen de la recepción, o None si la orden no existe
+
+        Raises:
+            ValueError: Estado inválido, cantidades fuera de rango o ubicación inexistente
+        """
+        # 1. Orden + detalles bloqueados (orden determinístico)
+        orden = (await self.db.execute(
+            select(OrdenCompra)
+            .where(OrdenCompra.id == orden_id, OrdenCompra.tienda_id == tienda_id)
+            .with_for_update()
+        )).scalar_one_or_none()
+        if orden is None:
+            return None
+        if orden.estado not in ESTADOS_RECIBIBLES:
+            raise ValueError(f"La orden no admite recepción. Estado actual: {orden.estado}")
+
+        detalles = (await self.db.execute(
+            select(DetalleOrden)
+            .where(DetalleOrden.orden_id == orden_id)
+            .order_by(DetalleOrden.id)
+            .with_for_update()
+        )).scalars().all()
+
+        # 2. Cantidad a recibir por línea
+        por_id = {detalle.id: detalle for detalle in detalles}
+        if cantidades is not None:
+            desconocidos = set(cantidades) - set(por_id)
+            if desconocidos:
+                raise ValueError(f"Detalles que no pertenecen a la orden: {sorted(map(str, desconocidos))}")
+
+        lineas = []  # (detalle, cantidad)
+        for detalle in detalles:
+            pendiente = detalle.cantidad - (detalle.cantidad_recibida or 0.0)
+            cantidad = pendiente if cantidades is None else cantidades.get(detalle.id, 0.0)
+            if cantidad < 0 or cantidad > pendiente + EPSILON:
+                raise ValueError(
+                    f"Cantidad inválida para el detalle {detalle.id}: {cantidad} (pendiente {pendiente})"
+                )
+            if cantidad > EPSILON:
+                lineas.append((detalle, cantidad))
+
+        if not lineas:
+            raise ValueError("No hay cantidades pendientes para recibir")
+
+        variant_lineas = [(d, q) for d, q in lineas if d.variant_id is not None]
+        legacy_lineas = [(d, q) for d, q in lineas if d.variant_id is None]
+
+        if variant_lineas:
+            location_id = await self._resolve_location(tienda_id, location_id)
+
+        # 3. Lock de filas afectadas en orden de PK + UPDATE ... FROM (VALUES ...)
+        if variant_lineas:
+            variant_ids = sorted({d.variant_id for d, _ in variant_lineas})
+            bloqueadas = (await self.db.execute(
+                select(ProductVariant.variant_id)
+                .where(ProductVariant.variant_id.in_(variant_ids), ProductVariant.tienda_id == tienda_id)
+                .order_by(ProductVariant.variant_id)
+                .with_for_update()
+            )).scalars().all()
+            faltantes = set(variant_ids) - set(bloqueadas)
+            if faltantes:
+                raise ValueError(f"Variantes no encontradas: {sorted(map(str, faltantes))}")
+
+            # Último precio: una fila por variante (la última línea de la orden gana)
+            costos = {d.variant_id: d.precio_costo_unitario for d, _ in variant_lineas}
+            v = values_table("v", list(costos.items()), variant_id=Uuid(), cost=Float())
+            await self.db.execute(
+                update(ProductVariant)
+                .where(ProductVariant.variant_id == v.c.variant_id)
+                .values(cost_price=v.c.cost)
+                .execution_options(synchronize_session=False)
+            )
+
+        if legacy_lineas:
+            producto_ids = sorted({d.producto_id for d, _ in legacy_lineas})
+            bloqueados = (await self.db.execute(
+                select(Producto.id)
+                .where(Producto.id.in_(producto_ids), Producto.tienda_id == tienda_id)
+                .order_by(Producto.id)
+                .with_for_update()
+            )).scalars().all()
+            faltantes = set(producto_ids) - set(bloqueados)
+            if faltantes:
+                raise ValueError(f"Productos no encontrados: {sorted(map(str, faltantes))}")
+
+            # Productos legacy: sin ledger por variante, se mantiene stock_actual
+            agregados: Dict[UUID, List[float]] = {}
+            for d, q in legacy_lineas:
+                fila = agregados.setdefault(d.producto_id, [0.0, 0.0])
+                fila[0] += q
+                fila[1] = d.precio_costo_unitario
+            p = values_table(
+                "p", [(pid, qty, cost) for pid, (qty, cost) in agregados.items()],
+                producto_id=Uuid(), qty=Float(), cost=Float()
+            )
+            await self.db.execute(
+                update(Producto)
+                .where(Producto.id == p.c.producto_id)
+                .values(stock_actual=Producto.stock_actual + p.c.qty, precio_costo=p.c.cost)
+                .execution_options(synchronize_session=False)
+            )
+
+        r = values_table("r", [(d.id, q) for d, q in lineas], detalle_id=Uuid(), qty=Float())
+        await self.db.execute(
+            update(DetalleOrden)
+            .where(DetalleOrden.id == r.c.detalle_id)
+            .values(cantidad_recibida=DetalleOrden.cantidad_recibida + r.c.qty)
+            .execution_options(synchronize_session=False)
+        )
+
+        # 4. Entradas al ledger en un solo INSERT multi-fila
+        ahora = datetime.now(timezone.utc)
+        if variant_lineas:
+            await self.db.execute(insert(InventoryLedger), [
+                {
+                    "transaction_id": uuid4(),
+                    "tienda_id": tienda_id,
+                    "variant_id": d.variant_id,
+                    "location_id": location_id,
+                    "delta": q,
+                    "transaction_type": "PURCHASE",
+                    "reference_doc": str(orden_id),
+                    "notes": f"Recepción OC {orden_id}",
+                    "occurred_at": ahora,
+                    "created_by": user_id,
+                }
+                for d, q in variant_lineas
+            ])
+
+        # 5. Estado de la orden
+        recibido = {d.id: q for d, q in lineas}
+        completa = all(
+            (d.cantidad_recibida or 0.0) + recibido.get(d.id, 0.0) >= d.cantidad - EPSILON
+            for d in detalles
+        )
+        orden.estado = "RECIBIDA" if completa else "PARCIAL"
+        self.db.add(orden)
+
+        logger.info(
+            f"Recepción OC {orden_id}: {len(lineas)} líneas "
+            f"({len(variant_lineas)} variantes, {len(legacy_lineas)} legacy), estado {orden.estado}"
+        )
+
+        return {
+            "orden_id": orden.id,
+            "estado": orden.estado,
+            "lineas_recibidas": len(lineas),
+            "unidades_recibidas": float(sum(q for _, q in lineas)),
+            "location_id": location_id,
+        }
+
+    async def _resolve_location(self, tienda_id: UUID, location_id: Optional[UUID]) -> UUID:
+        """Ubicación de destino validada (o la default de la tienda)"""
+        condicion = (
+            Location.location_id == location_id if location_id else Location.is_default == True
+        )
+        resolved = (await self.db.execute(
+            select(Location.location_id).where(Location.tienda_id == tienda_id, condicion)
+        )).scalar_one_or_none()
+        if resolved is None:
+            raise ValueError("Ubicación de destino no encontrada")
+        return resolved
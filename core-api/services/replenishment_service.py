@@ -0,0 +1,225 @@
+"""
+Servicio de Reposición Automática - Nexus POS
+Genera órdenes de compra borrador agrupadas por proveedor a partir de puntos de reorden
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, Any, List
+from uuid import UUID, uuid4
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import select, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import ProductVariant, InventoryLedger, Proveedor, OrdenCompra, DetalleOrden
+from core.config import settings
+from services.demand_forecast import forecast_restock, window_start
+from services.retail_analytics_service import RetailAnalyticsService
+
+
+logger = logging.getLogger(__name__)
+
+# Órdenes que ya cuentan como mercadería "en camino"
+ESTADOS_ABIERTOS = ("BORRADOR", "PENDIENTE", "PARCIAL")
+
+
+def order_quantities(need: np.ndarray, min_order_qty: np.ndarray, pack_size: np.ndarray) -> np.ndarray:
+    """
+    Aplica MOQ y tamaño de bulto a las cantidades necesarias (vectorizado)
+
+    - Si se necesita algo, se compra al menos el MOQ
+    - La cantidad final se redondea hacia arriba al múltiplo del bulto
+    - Valores NaN en MOQ/bulto = sin restricción
+    """
+    need = np.maximum(need, 0.0)
+    moq = np.nan_to_num(min_order_qty, nan=0.0)
+    pack = np.nan_to_num(pack_size, nan=1.0)
+    pack = np.where(pack > 0, pack, 1.0)
+
+    qty = np.where(need > 0, np.maximum(need, moq), 0.0)
+    return np.ceil(np.round(qty / pack, 6)) * pack
+
+
+class ReplenishmentService:
+    """
+    Evalúa el punto de reorden de TODAS las variantes de la tienda en un solo batch
+
+    ⚡ 3 queries agregadas + cálculo NumPy + 2 INSERT multi-fila, sin importar
+    la cantidad de SKUs o proveedores:
+    1. Variantes con proveedor, condiciones de compra y stock actual
+    2. Cantidades pendientes de recibir en órdenes abiertas
+    3. Matriz de ventas diarias (pronóstico de demanda)
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def generate_purchase_orders(
+        self,
+        tienda_id: UUID,
+        days_lookback: int = 30,
+        dry_run: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Genera órdenes de compra BORRADOR agrupadas por proveedor
+
+        No hace commit: el llamador confirma la transacción.
+
+        Args:
+            tienda_id: ID de la tienda
+            days_lookback: Días de historia para el pronóstico de demanda
+            dry_run: Si es True, calcula las órdenes sin insertarlas
+
+        Returns:
+            Resumen con las órdenes generadas por proveedor
+        """
+        hoy = datetime.now(timezone.utc).date()
+        desde = window_start(hoy, days_lookback)
+
+        # Query 1: variantes con proveedor activo + stock actual
+        variants_stmt = (
+            select(
+                ProductVariant.variant_id,
+                ProductVariant.proveedor_id,
+                ProductVariant.reorder_point,
+                ProductVariant.cost_price,
+                ProductVariant.min_order_qty,
+                ProductVariant.pack_size,
+                Proveedor.lead_time_dias,
+                func.coalesce(func.sum(InventoryLedger.delta), 0).label("stock")
+            )
+            .join(Proveedor, Proveedor.id == ProductVariant.proveedor_id)
+            .outerjoin(InventoryLedger, InventoryLedger.variant_id == ProductVariant.variant_id)
+            .where(
+                ProductVariant.tienda_id == tienda_id,
+                ProductVariant.is_active == True,
+                Proveedor.tienda_id == tienda_id,
+                Proveedor.is_active == True
+            )
+            .group_by(ProductVariant.variant_id, Proveedor.id)
+        )
+        rows = (await self.db.execute(variants_stmt)).all()
+
+        resumen = {
+            "variantes_evaluadas": len(rows),
+            "variantes_a_reponer": 0,
+            "ordenes_creadas": 0,
+            "dry_run": dry_run,
+            "ordenes": []
+        }
+        if not rows:
+            return resumen
+
+        variant_ids = [row[0] for row in rows]
+        variant_index = {variant_id: i for i, variant_id in enumerate(variant_ids)}
+
+        def _column(pos: int, default: float = np.nan) -> np.ndarray:
+            return np.fromiter(
+                (default if row[pos] is None else float(row[pos]) for row in rows),
+                dtype=np.float64,
+                count=len(rows)
+            )
+
+        explicit_rop = _column(2)
+        cost = _column(3, 0.0)  # Sin costo cargado: se completa al revisar el borrador
+        moq = _column(4)
+        pack = _column(5)
+        lead = _column(6, float(settings.RESTOCK_LEAD_TIME_DAYS)).astype(np.int64)
+        stock = _column(7, 0.0)
+
+        # Query 2: mercadería ya pedida (posición = stock + en camino)
+        on_order_stmt = (
+            select(
+                DetalleOrden.variant_id,
+                func.sum(DetalleOrden.cantidad - DetalleOrden.cantidad_recibida)
+            )
+            .join(OrdenCompra, OrdenCompra.id == DetalleOrden.orden_id)
+            .where(
+                OrdenCompra.tienda_id == tienda_id,
+                OrdenCompra.estado.in_(ESTADOS_ABIERTOS),
+                DetalleOrden.variant_id.is_not(None)
+            )
+            .group_by(DetalleOrden.variant_id)
+        )
+        on_order = np.zeros(len(rows), dtype=np.float64)
+        for variant_id, cantidad in (await self.db.execute(on_order_stmt)).all():
+            i = variant_index.get(variant_id)
+            if i is not None:
+                on_order[i] = float(cantidad or 0)
+        position = stock + on_order
+
+        # Query 3: pronóstico de demanda con el lead time de cada proveedor
+        sales = await RetailAnalyticsService(self.db).get_daily_sales_matrix(
+            tienda_id, variant_index, desde, days_lookback
+        )
+        forecast = forecast_restock(
+            sales,
+            position,
+            start_date=desde,
+            lead_time_days=lead,
+            coverage_days=settings.RESTOCK_COVERAGE_DAYS,
+            alpha=settings.FORECAST_EWMA_ALPHA,
+            service_z=settings.RESTOCK_SERVICE_LEVEL_Z
+        )
+
+        # Punto de reorden: el configurado en la variante o el pronosticado
+        reorder_point = np.where(np.isnan(explicit_rop), forecast.reorder_point, explicit_rop)
+        need = np.fmax(forecast.suggested_qty, np.ceil(explicit_rop - position))
+        need = np.where(position <= reorder_point, need, 0.0)
+        qty = order_quantities(need, moq, pack)
+
+        seleccion = np.flatnonzero(qty > 0)
+        resumen["variantes_a_reponer"] = int(seleccion.size)
+        if seleccion.size == 0:
+            return resumen
+
+        # Agrupar por proveedor: una orden por proveedor
+        por_proveedor: Dict[UUID, List[int]] = defaultdict(list)
+        for i in seleccion:
+            por_proveedor[rows[i][1]].append(int(i))
+
+        ordenes_rows = []
+        detalles_rows = []
+        for proveedor_id, indices in por_proveedor.items():
+            orden_id = uuid4()
+            total = 0.0
+            for i in indices:
+                subtotal = float(qty[i] * cost[i])
+                total += subtotal
+                detalles_rows.append({
+                    "id": uuid4(),
+                    "orden_id": orden_id,
+                    "variant_id": variant_ids[i],
+                    "cantidad": float(qty[i]),
+                    "precio_costo_unitario": float(cost[i]),
+                    "subtotal": subtotal
+                })
+            ordenes_rows.append({
+                "id": orden_id,
+                "proveedor_id": proveedor_id,
+                "tienda_id": tienda_id,
+                "estado": "BORRADOR",
+                "total": total,
+                "observaciones": f"Reposición automática {hoy.isoformat()} ({len(indices)} variantes)"
+            })
+            resumen["ordenes"].append({
+                "orden_id": str(orden_id),
+                "proveedor_id": str(proveedor_id),
+                "items": len(indices),
+                "unidades": float(qty[indices].sum()),
+                "total": round(total, 2)
+            })
+
+        if not dry_run:
+            # ⚡ 2 INSERT multi-fila (cabeceras + detalles)
+            await self.db.execute(insert(OrdenCompra), ordenes_rows)
+            await self.db.execute(insert(DetalleOrden), detalles_rows)
+            resumen["ordenes_creadas"] = len(ordenes_rows)
+
+        logger.info(
+            f"Reposición tienda {tienda_id}: {len(rows)} variantes evaluadas, "
+            f"{seleccion.size} a reponer en {len(ordenes_rows)} órdenes"
+        )
+
+        return resumen
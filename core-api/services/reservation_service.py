@@ -0,0 +1,250 @@
+"""
+Servicio de Reservas de Stock - Nexus POS
+Retenciones con vencimiento para ventas con pago online (Mercado Pago)
+
+El checkout online descuenta el stock en Redis al crear la reserva, pero
+la venta recién se publica cuando el webhook aprueba el pago:
+- Aprobado: la reserva pasa a confirmed y se publica sales.created
+- Rechazado / cancelado: se devuelve el stock
+- Abandonado: el barrido (sweep_expired) la libera al vencer
+
+Cada transición es 1 script Lua sobre la reserva, el ZSET de vencimientos,
+las reservas en vuelo y las stock keys: un webhook y el barrido en paralelo
+nunca devuelven el stock dos veces.
+
+⚡ El barrido lee el ZSET por rango de score y trae las reservas vencidas
+en 1 pipeline por lote: su costo no depende de cuántas reservas haya vivas.
+"""
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+import redis.asyncio as redis
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.exceptions import NexusPOSException, VentaInvalidaException
+from core.redis_scripts import (
+    CONFIRM_RESERVATION_SCRIPT,
+    CREATE_RESERVATION_SCRIPT,
+    RELEASE_RESERVATION_SCRIPT,
+    RESERVATION_EXPIRY_KEY,
+    generate_reservation_key,
+    generate_stock_key,
+)
+from services.cache_service import get_redis_client
+from services.stock_cache_service import fill_missing, inflight_key
+
+
+logger = logging.getLogger(__name__)
+
+# Resultados de CONFIRM_RESERVATION_SCRIPT
+CONFIRM_MISSING = -1
+CONFIRM_REPEATED = 0
+CONFIRM_OK = 1
+CONFIRM_AFTER_RELEASE = 2
+
+
+def _holds(items: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Cantidad retenida por producto (un producto puede repetirse en la venta)"""
+    holds: Dict[str, float] = {}
+    for item in items:
+        holds[item['producto_id']] = holds.get(item['producto_id'], 0.0) + item['cantidad']
+    return holds
+
+
+def _keys(reservation_id: str, data: Dict[str, Any]) -> List[str]:
+    """KEYS de los scripts: reserva, vencimientos, en vuelo y stock keys"""
+    return [
+        generate_reservation_key(reservation_id),
+        RESERVATION_EXPIRY_KEY,
+        inflight_key(data['tienda_id']),
+        *(generate_stock_key(data['tienda_id'], producto_id) for producto_id in data['holds']),
+    ]
+
+
+def _inflight_entry(data: Dict[str, Any]) -> str:
+    return json.dumps({"ts": time.time(), "items": data['holds']})
+
+
+async def create_reservation(
+    client: redis.Redis,
+    db: AsyncSession,
+    tienda_id: UUID,
+    usuario_id: Optional[UUID],
+    metodo_pago: str,
+    items: List[Dict[str, Any]],
+    ttl: Optional[int] = None
+) -> Tuple[str, datetime]:
+    """
+    Retiene el stock de una venta hasta que se confirme o venza el pago
+
+    Args:
+        items: Items validados del checkout (producto_id, cantidad, precios...)
+        ttl: Segundos hasta el vencimiento (default RESERVATION_TTL_SECONDS)
+
+    Returns:
+        (reservation_id, vencimiento)
+
+    Raises:
+        VentaInvalidaException: Stock insuficiente (400)
+        NexusPOSException: Stock no cacheado tras el read-through (503)
+    """
+    ttl = ttl or settings.RESERVATION_TTL_SECONDS
+    reservation_id = str(uuid4())
+    deadline = time.time() + ttl
+    data = {
+        'tienda_id': str(tienda_id),
+        'usuario_id': str(usuario_id) if usuario_id else None,
+        'metodo_pago': metodo_pago,
+        'total': sum(item['subtotal'] for item in items),
+        'items': items,
+        'holds': _holds(items),
+    }
+    keys = _keys(reservation_id, data)
+    args = [
+        reservation_id,
+        deadline,
+        ttl + settings.RESERVATION_KEY_GRACE,
+        settings.STOCK_CACHE_TTL,
+        json.dumps(data),
+        _inflight_entry(data),
+        *data['holds'].values(),
+    ]
+
+    codigo, indice = await client.eval(CREATE_RESERVATION_SCRIPT, len(keys), *keys, *args)
+    if codigo == -2:
+        # Cache miss: read-through de todos los productos y 1 reintento
+        await fill_missing(client, db, tienda_id, [UUID(p) for p in data['holds']])
+        codigo, indice = await client.eval(CREATE_RESERVATION_SCRIPT, len(keys), *keys, *args)
+
+    if codigo != 1:
+        producto_id = list(data['holds'])[indice - 1]
+        nombre = next(item.get('producto_nombre', producto_id) for item in items if item['producto_id'] == producto_id)
+        if codigo == -1:
+            raise VentaInvalidaException(f"Stock insuficiente para '{nombre}'")
+        raise NexusPOSException(
+            f"Stock no cacheado para '{nombre}'. Reintente.",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    logger.info(f"Reserva {reservation_id} tienda {tienda_id}: {len(data['holds'])} productos, vence en {ttl}s")
+    return reservation_id, datetime.fromtimestamp(deadline, tz=timezone.utc)
+
+
+async def load_reservation(client: redis.Redis, reservation_id: str) -> Optional[Dict[str, Any]]:
+    """Datos de la reserva con su estado, o None si no existe"""
+    raw = await client.hgetall(generate_reservation_key(reservation_id))
+    if not raw:
+        return None
+    return {**json.loads(raw['data']), 'state': raw['state']}
+
+
+async def release_reservation(
+    client: redis.Redis,
+    reservation_id: str,
+    data: Optional[Dict[str, Any]] = None
+) -> bool:
+    """
+    Devuelve el stock retenido (pago rechazado, cancelado o vencido)
+
+    Returns:
+        True si la liberó; False si ya estaba confirmada, liberada o no existe
+    """
+    data = data or await load_reservation(client, reservation_id)
+    if data is None:
+        await client.zrem(RESERVATION_EXPIRY_KEY, reservation_id)
+        return False
+    keys = _keys(reservation_id, data)
+    liberada = await client.eval(
+        RELEASE_RESERVATION_SCRIPT, len(keys), *keys,
+        reservation_id, settings.STOCK_CACHE_TTL, *data['holds'].values()
+    )
+    return bool(liberada)
+
+
+async def confirm_reservation(
+    client: redis.Redis,
+    reservation_id: str
+) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """
+    Confirma la reserva de un pago aprobado
+
+    Un pago aprobado después de liberar la reserva vuelve a descontar el
+    stock sin validar saldo: la venta ya ocurrió (como las ventas offline).
+
+    Returns:
+        (CONFIRM_*, datos de la reserva o None si no existe)
+    """
+    data = await load_reservation(client, reservation_id)
+    if data is None:
+        return CONFIRM_MISSING, None
+    keys = _keys(reservation_id, data)
+    codigo = await client.eval(
+        CONFIRM_RESERVATION_SCRIPT, len(keys), *keys,
+        reservation_id, settings.STOCK_CACHE_TTL, _inflight_entry(data), *data['holds'].values()
+    )
+    return codigo, data
+
+
+def build_sale_event(reservation_id: str, data: Dict[str, Any], payment_id: str) -> Dict[str, Any]:
+    """
+    Evento sales.created de una reserva confirmada
+
+    event_id y venta_id son el id de la reserva: reenviar el evento (webhook
+    repetido) no duplica la venta y el pago queda asociado a ella.
+    """
+    return {
+        'event_id': reservation_id,
+        'venta_id': reservation_id,
+        'tienda_id': data['tienda_id'],
+        'usuario_id': data['usuario_id'],
+        'total': data['total'],
+        'metodo_pago': data['metodo_pago'],
+        'items': data['items'],
+        'status_pago': 'pagado',
+        'payment_id': payment_id,
+        'timestamp': datetime.utcnow().isoformat(),
+    }
+
+
+async def sweep_expired(now: Optional[float] = None, batch_size: Optional[int] = None) -> int:
+    """
+    Libera las reservas vencidas, en lotes
+
+    Seguro con varios barredores en paralelo: el script solo libera
+    reservas en estado held.
+
+    Returns:
+        Reservas liberadas
+    """
+    client = await get_redis_client()
+    now = now or time.time()
+    batch_size = batch_size or settings.RESERVATION_SWEEP_BATCH
+    liberadas = 0
+
+    while True:
+        vencidas = await client.zrangebyscore(RESERVATION_EXPIRY_KEY, "-inf", now, start=0, num=batch_size)
+        if not vencidas:
+            break
+
+        async with client.pipeline(transaction=False) as pipe:
+            for reservation_id in vencidas:
+                pipe.hgetall(generate_reservation_key(reservation_id))
+            reservas = await pipe.execute()
+
+        for reservation_id, raw in zip(vencidas, reservas):
+            data = {**json.loads(raw['data']), 'state': raw['state']} if raw else None
+            # También saca del ZSET a las que no existen o ya se resolvieron
+            liberadas += int(await release_reservation(client, reservation_id, data))
+
+        if len(vencidas) < batch_size:
+            break
+
+    if liberadas:
+        logger.info(f"Barrido de reservas: {liberadas} vencidas liberadas")
+    return liberadas
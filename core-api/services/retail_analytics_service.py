@@ -5,9 +5,9 @@ Reportes específicos para retail de ropa
 
 from typing import Dict, Any, List, Optional
 from uuid import UUID
-from datetime import datetime, timedelta, timezone
-from sqlalchemy import func, desc, and_
-from sqlalchemy.orm import aliased
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import func, desc, and_, cast, Date
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
@@ -16,6 +16,13 @@ from models import (
     Size, Color, InventoryLedger
 )
 from schemas_models.retail_models import ProductCategory
+from core.cache import cache_manager
+from core.config import settings
+from services.demand_forecast import forecast_restock, sales_matrix, window_start
+
+
+# Historia que se carga para el pronóstico (máximo de days_lookback en los endpoints)
+FORECAST_MAX_LOOKBACK_DAYS = 90
 
 
 class RetailAnalyticsService:
@@ -251,18 +258,165 @@ class RetailAnalyticsService:
         
         return {row.name: int(row.units_sold) for row in rows}
     
+    async def get_demand_forecast(
+        self,
+        tienda_id: UUID,
+        days_lookback: int = 30,
+        lead_time_days: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Pronóstico de demanda de todas las variantes activas de la tienda
+        
+        ⚡ Stock actual (1 query por request) + matriz de ventas cacheada por
+        tienda (_sales_history) + cálculo NumPy vectorizado (ver
+        demand_forecast). Lookback y lead time se aplican por request sobre
+        la matriz cacheada.
+        
+        Returns:
+            {
+                "variants": [(variant_id, sku, product_name), ...],
+                "stock": np.ndarray,
+                "forecast": ForecastResult
+            }
+        """
+        lead = lead_time_days or settings.RESTOCK_LEAD_TIME_DAYS
+        hoy = datetime.now(timezone.utc).date()
+        
+        # Query 1: variantes activas con stock actual (sin caché: recepciones,
+        # ajustes y ventas de hoy se ven en la próxima consulta)
+        stock_stmt = (
+            select(
+                ProductVariant.variant_id,
+                ProductVariant.sku,
+                Product.name,
+                func.coalesce(func.sum(InventoryLedger.delta), 0).label("stock")
+            )
+            .join(Product, Product.product_id == ProductVariant.product_id)
+            .outerjoin(InventoryLedger, InventoryLedger.variant_id == ProductVariant.variant_id)
+            .where(
+                Product.tienda_id == tienda_id,
+                ProductVariant.is_active == True
+            )
+            .group_by(ProductVariant.variant_id, ProductVariant.sku, Product.name)
+            .order_by(ProductVariant.variant_id)
+        )
+        variant_rows = (await self.db.execute(stock_stmt)).all()
+        variants = [(row[0], row[1], row[2]) for row in variant_rows]
+        stock = np.fromiter(
+            (float(row[3]) for row in variant_rows), dtype=np.float64, count=len(variant_rows)
+        )
+        sales = await self._sales_history(tienda_id, [row[0] for row in variants], hoy, days_lookback)
+        
+        # Últimas `days_lookback` columnas: la ventana termina ayer
+        forecast = forecast_restock(
+            sales[:, -days_lookback:],
+            stock,
+            start_date=window_start(hoy, days_lookback),
+            lead_time_days=lead,
+            coverage_days=settings.RESTOCK_COVERAGE_DAYS,
+            alpha=settings.FORECAST_EWMA_ALPHA,
+            service_z=settings.RESTOCK_SERVICE_LEVEL_Z
+        )
+        
+        return {
+            "variants": variants,
+            "stock": stock,
+            "forecast": forecast
+        }
+    
+    async def _sales_history(
+        self,
+        tienda_id: UUID,
+        variant_ids: List[UUID],
+        hoy: date,
+        days_lookback: int
+    ) -> np.ndarray:
+        """
+        Matriz de ventas diarias de las variantes, alineada con `variant_ids`
+        
+        Una sola entrada de caché por tienda (variantes + matriz de los
+        últimos FORECAST_MAX_LOOKBACK_DAYS días): la de ayer se reemplaza (no
+        queda una entrada por día ni por combinación de parámetros). Las
+        ventas de hoy no entran a la ventana: estable hasta medianoche (UTC)
+        salvo que cambien las variantes activas.
+        """
+        cache_key = f"restock:{tienda_id}"
+        cached = cache_manager.get(cache_key)
+        if (
+            cached is not None
+            and cached["fecha"] == hoy
+            and cached["variant_ids"] == variant_ids
+            and cached["sales"].shape[1] >= days_lookback
+        ):
+            return cached["sales"]
+        
+        # Query 2: matriz de ventas diarias
+        n_days = max(days_lookback, FORECAST_MAX_LOOKBACK_DAYS)
+        variant_index = {variant_id: i for i, variant_id in enumerate(variant_ids)}
+        sales = await self.get_daily_sales_matrix(
+            tienda_id, variant_index, window_start(hoy, n_days), n_days
+        )
+        
+        # Expira a medianoche UTC (nuevo día = nueva ventana)
+        manana = datetime.combine(hoy + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        ttl = max(int((manana - datetime.now(timezone.utc)).total_seconds()), 1)
+        cache_manager.set(cache_key, {"fecha": hoy, "variant_ids": variant_ids, "sales": sales}, ttl)
+        
+        return sales
+    
+    async def get_daily_sales_matrix(
+        self,
+        tienda_id: UUID,
+        variant_index: Dict[UUID, int],
+        desde: date,
+        n_days: int
+    ) -> np.ndarray:
+        """
+        Matriz (variantes × días) de unidades vendidas, desde las salidas SALE del ledger
+        
+        Args:
+            variant_index: variant_id → fila de la matriz
+            desde: Fecha de la primera columna
+            n_days: Cantidad de días (columnas)
+        """
+        hasta = desde + timedelta(days=n_days)
+        dia = cast(InventoryLedger.occurred_at, Date).label("dia")
+        sales_stmt = (
+            select(
+                InventoryLedger.variant_id,
+                dia,
+                func.sum(-InventoryLedger.delta).label("unidades")
+            )
+            .where(
+                InventoryLedger.tienda_id == tienda_id,
+                InventoryLedger.transaction_type == "SALE",
+                InventoryLedger.occurred_at >= desde,
+                InventoryLedger.occurred_at < hasta
+            )
+            .group_by(InventoryLedger.variant_id, dia)
+        )
+        sales_rows = (await self.db.execute(sales_stmt)).all()
+        
+        return sales_matrix(sales_rows, variant_index, desde, n_days)
+    
     async def get_restock_suggestions(
         self,
         tienda_id: UUID,
         days_lookback: int = 30,
-        min_sales_velocity: int = 5
+        min_sales_velocity: int = 5,
+        lead_time_days: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
-        Sugerencias de restock basadas en velocidad de ventas
+        Sugerencias de restock basadas en pronóstico de demanda
+        
+        Demanda EWMA con estacionalidad semanal, stock de seguridad por
+        variabilidad y lead time del proveedor. Se sugiere reponer cuando el
+        stock está en o por debajo del punto de reorden.
         
         Args:
-            days_lookback: Días hacia atrás para calcular velocidad
+            days_lookback: Días de historia para el pronóstico
             min_sales_velocity: Ventas mínimas por día para considerar
+            lead_time_days: Días de reposición (default: RESTOCK_LEAD_TIME_DAYS)
         
         Returns:
             [
@@ -272,86 +426,44 @@ class RetailAnalyticsService:
                     "current_stock": 5,
                     "daily_velocity": 8.5,
                     "days_until_stockout": 0.6,
+                    "safety_stock": 12.4,
+                    "reorder_point": 71.9,
                     "suggested_restock": 255
                 },
                 ...
             ]
         """
-        fecha_desde = datetime.now(timezone.utc) - timedelta(days=days_lookback)
-        
-        # Subconsulta: ventas por variante
-        sales_subq = (
-            select(
-                VentaItem.product_variant_id,
-                func.sum(VentaItem.cantidad).label("total_sold")
-            )
-            .join(Venta, Venta.id == VentaItem.venta_id)
-            .where(Venta.fecha >= fecha_desde)
-            .group_by(VentaItem.product_variant_id)
-            .subquery()
+        data = await self.get_demand_forecast(
+            tienda_id=tienda_id,
+            days_lookback=days_lookback,
+            lead_time_days=lead_time_days
         )
-        
-        # Subconsulta: stock actual
-        stock_subq = (
-            select(
-                InventoryLedger.product_variant_id,
-                func.max(InventoryLedger.created_at).label("latest_date")
-            )
-            .group_by(InventoryLedger.product_variant_id)
-            .subquery()
+        forecast = data["forecast"]
+        stock = data["stock"]
+        
+        # Filtro y orden vectorizados (menor días hasta stockout = más urgente)
+        mask = (
+            (forecast.daily_forecast >= min_sales_velocity)
+            & (stock <= forecast.reorder_point)
+            & (forecast.suggested_qty > 0)
         )
+        indices = np.flatnonzero(mask)
+        indices = indices[np.argsort(forecast.days_to_stockout[indices], kind="stable")]
         
-        LatestStock = aliased(InventoryLedger)
-        
-        stmt = (
-            select(
-                Product.name.label("product_name"),
-                ProductVariant.sku,
-                LatestStock.stock_after.label("current_stock"),
-                sales_subq.c.total_sold
-            )
-            .join(ProductVariant, ProductVariant.product_id == Product.id)
-            .join(sales_subq, sales_subq.c.product_variant_id == ProductVariant.id)
-            .join(stock_subq, stock_subq.c.product_variant_id == ProductVariant.id)
-            .join(
-                LatestStock,
-                and_(
-                    LatestStock.product_variant_id == ProductVariant.id,
-                    LatestStock.created_at == stock_subq.c.latest_date
-                )
-            )
-            .where(Product.tienda_id == tienda_id)
-        )
-        
-        result = await self.db.execute(stmt)
-        rows = result.all()
-        
-        suggestions = []
-        for row in rows:
-            daily_velocity = row.total_sold / days_lookback
-            
-            if daily_velocity < min_sales_velocity:
-                continue
-            
-            days_until_stockout = row.current_stock / daily_velocity if daily_velocity > 0 else 999
-            
-            # Sugerir restock si quedan menos de 7 días
-            if days_until_stockout < 7:
-                suggested_restock = int(daily_velocity * 30)  # 1 mes de stock
-                
-                suggestions.append({
-                    "product_name": row.product_name,
-                    "sku": row.sku,
-                    "current_stock": row.current_stock,
-                    "daily_velocity": round(daily_velocity, 1),
-                    "days_until_stockout": round(days_until_stockout, 1),
-                    "suggested_restock": suggested_restock
-                })
-        
-        # Ordenar por urgencia (menor días hasta stockout)
-        suggestions.sort(key=lambda x: x["days_until_stockout"])
-        
-        return suggestions
+        variants = data["variants"]
+        return [
+            {
+                "product_name": variants[i][2],
+                "sku": variants[i][1],
+                "current_stock": float(stock[i]),
+                "daily_velocity": round(float(forecast.daily_forecast[i]), 1),
+                "days_until_stockout": round(float(forecast.days_to_stockout[i]), 1),
+                "safety_stock": round(float(forecast.safety_stock[i]), 1),
+                "reorder_point": round(float(forecast.reorder_point[i]), 1),
+                "suggested_restock": int(forecast.suggested_qty[i])
+            }
+            for i in indices
+        ]
     
     async def get_color_preferences(
         self,
@@ -3,11 +3,11 @@ RFID Service - Checkout Masivo e Inventario Rápido
 Integración con lectores RFID UHF
 """
 from typing import List, Dict, Optional
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime
-from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_, func
+from sqlalchemy import select, insert, update, and_, func, distinct, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from schemas_models.rfid_models import (
     RFIDTag,
@@ -16,7 +16,14 @@ from schemas_models.rfid_models import (
     RFIDReader,
     RFIDInventoryDiscrepancy
 )
-from models import ProductVariant, InventoryLedger
+from models import ProductVariant, Product, Size, Color, InventoryLedger
+from core.cache import cache_manager
+from core.config import settings
+
+
+def _variant_cache_key(variant_id: UUID) -> str:
+    """Clave de la descripción de una variante (producto, talle, color) en memoria"""
+    return f"rfid:variant:{variant_id}"
 
 
 class RFIDService:
@@ -70,10 +77,18 @@ class RFIDService:
         """
         Procesa escaneo masivo de tags
         
+        ⚡ Round-trips constantes sin importar la cantidad de tags:
+        1. Resolución de todos los EPCs en un solo JOIN (`epc = ANY(:epcs)`)
+           contra los tags activos: el estado del tag se consulta siempre,
+           un tag vendido o dado de baja deja de resolverse en el acto
+        2. Descripciones de variante (producto, talle, color) cacheadas en
+           memoria por variant_id: solo las que faltan van a una 2ª query
+        3. Un INSERT multi-fila para todos los RFIDScanItem
+        
         Args:
             session_id: ID de la sesión de escaneo
             epc_list: Lista de EPCs detectados
-            rssi_values: Valores de señal (opcional)
+            rssi_values: Valores de señal (opcional, alineados con epc_list)
         
         Returns:
             Resumen con items detectados y totales
@@ -82,56 +97,53 @@ class RFIDService:
         if not session_obj:
             raise ValueError("Sesión no encontrada")
         
-        # Eliminar duplicados
-        epc_unique = list(set(epc_list))
+        # Eliminar duplicados conservando la mejor señal de cada tag
+        rssi_por_epc: Dict[str, Optional[int]] = {}
+        for i, epc in enumerate(epc_list):
+            rssi = rssi_values[i] if rssi_values and i < len(rssi_values) else None
+            previo = rssi_por_epc.get(epc)
+            if epc not in rssi_por_epc or (rssi is not None and (previo is None or rssi > previo)):
+                rssi_por_epc[epc] = rssi
+        epc_unique = list(rssi_por_epc)
+        
+        resueltos = await self._resolve_epcs(session_obj.tienda_id, epc_unique)
         
+        detectado_en = datetime.utcnow()
         items_detectados = []
+        scan_rows = []
         total_precio = 0.0
         tags_no_encontrados = []
         
-        for i, epc in enumerate(epc_unique):
-            rssi = rssi_values[i] if rssi_values and i < len(rssi_values) else None
-            
-            # Buscar tag en BD
-            result = await self.session.exec(
-                select(RFIDTag)
-                .where(
-                    and_(
-                        RFIDTag.epc == epc,
-                        RFIDTag.estado == "active"
-                    )
-                )
-            )
-            tag = result.first()
-            
-            if not tag:
+        for epc in epc_unique:
+            info = resueltos.get(epc)
+            if info is None:
                 tags_no_encontrados.append(epc)
                 continue
             
-            # Registrar item escaneado
-            scan_item = RFIDScanItem(
-                session_id=session_id,
-                epc=epc,
-                variant_id=tag.variant_id,
-                rssi=rssi,
-                detectado_en=datetime.utcnow()
-            )
-            self.session.add(scan_item)
-            
-            # Obtener variante y precio
-            variant = await self.session.get(ProductVariant, tag.variant_id)
-            if variant:
-                items_detectados.append({
-                    "epc": epc,
-                    "variant_id": str(tag.variant_id),
-                    "sku": variant.sku,
-                    "product_name": variant.product.name if variant.product else "Unknown",
-                    "size": variant.size.name if variant.size else None,
-                    "color": variant.color.name if variant.color else None,
-                    "price": variant.price,
-                    "rssi": rssi
-                })
-                total_precio += variant.price
+            rssi = rssi_por_epc[epc]
+            scan_rows.append({
+                "id": uuid4(),
+                "session_id": session_id,
+                "epc": epc,
+                "variant_id": info["variant_id"],
+                "rssi": rssi,
+                "detectado_en": detectado_en
+            })
+            items_detectados.append({
+                "epc": epc,
+                "variant_id": str(info["variant_id"]),
+                "sku": info["sku"],
+                "product_name": info["product_name"] or "Unknown",
+                "size": info["size"],
+                "color": info["color"],
+                "price": info["price"],
+                "rssi": rssi
+            })
+            total_precio += info["price"]
+        
+        # Registrar items escaneados (INSERT multi-fila)
+        if scan_rows:
+            await self.session.execute(insert(RFIDScanItem), scan_rows)
         
         # Actualizar estadísticas de la sesión
         session_obj.tags_escaneados = len(epc_list)
@@ -150,6 +162,72 @@ class RFIDService:
             "scan_time_ms": len(epc_list) * 50  # Estimado: 50ms por tag
         }
     
+    async def _resolve_epcs(
+        self,
+        tienda_id: UUID,
+        epcs: List[str]
+    ) -> Dict[str, Dict]:
+        """
+        Resuelve EPCs activos → variante, producto, talle y color
+        
+        El estado del tag se consulta siempre (vendido/dado de baja en otro
+        worker no puede resolverse desde memoria): un JOIN tag → variante con
+        `epc = ANY(:epcs)` (un solo parámetro array, el plan se reutiliza sin
+        importar cuántos tags haya). Solo la descripción de la variante, que
+        no depende del tag, se cachea por variant_id; las que faltan se
+        buscan en una segunda query.
+        """
+        result = await self.session.execute(
+            select(
+                RFIDTag.epc,
+                RFIDTag.variant_id,
+                ProductVariant.sku,
+                ProductVariant.price
+            )
+            .join(ProductVariant, ProductVariant.variant_id == RFIDTag.variant_id)
+            .where(
+                and_(
+                    RFIDTag.tienda_id == tienda_id,
+                    RFIDTag.estado == "active",
+                    RFIDTag.epc == any_(bindparam("epcs", epcs, type_=ARRAY(String)))
+                )
+            )
+        )
+        tags = result.all()
+        
+        descripciones: Dict[UUID, Dict] = {}
+        faltantes = set()
+        for _, variant_id, _, _ in tags:
+            info = cache_manager.get(_variant_cache_key(variant_id))
+            if info is None:
+                faltantes.add(variant_id)
+            else:
+                descripciones[variant_id] = info
+        
+        if faltantes:
+            result = await self.session.execute(
+                select(ProductVariant.variant_id, Product.name, Size.name, Color.name)
+                .join(Product, Product.product_id == ProductVariant.product_id)
+                .outerjoin(Size, Size.id == ProductVariant.size_id)
+                .outerjoin(Color, Color.id == ProductVariant.color_id)
+                .where(ProductVariant.variant_id.in_(faltantes))
+            )
+            for variant_id, product_name, size, color in result.all():
+                info = {"product_name": product_name, "size": size, "color": color}
+                descripciones[variant_id] = info
+                cache_manager.set(_variant_cache_key(variant_id), info, settings.RFID_VARIANT_CACHE_TTL)
+        
+        resueltos: Dict[str, Dict] = {}
+        for epc, variant_id, sku, price in tags:
+            resueltos[epc] = {
+                "variant_id": variant_id,
+                "sku": sku,
+                "price": price,
+                **descripciones.get(variant_id, {"product_name": None, "size": None, "color": None})
+            }
+        
+        return resueltos
+    
     async def complete_checkout_session(
         self,
         session_id: UUID,
@@ -168,23 +246,18 @@ class RFIDService:
             session_obj.fin - session_obj.inicio
         ).total_seconds()
         
-        # Marcar todos los tags como vendidos
-        result = await self.session.exec(
-            select(RFIDScanItem)
-            .where(RFIDScanItem.session_id == session_id)
-        )
-        scan_items = result.all()
-        
-        for scan_item in scan_items:
-            tag = await self.session.exec(
-                select(RFIDTag)
-                .where(RFIDTag.epc == scan_item.epc)
+        # Marcar todos los tags como vendidos (un solo UPDATE)
+        epcs_sesion = select(RFIDScanItem.epc).where(RFIDScanItem.session_id == session_id)
+        await self.session.execute(
+            update(RFIDTag)
+            .where(
+                and_(
+                    RFIDTag.tienda_id == session_obj.tienda_id,
+                    RFIDTag.epc.in_(epcs_sesion)
+                )
             )
-            tag_obj = tag.first()
-            if tag_obj:
-                tag_obj.estado = "sold"
-                tag_obj.venta_id = venta_id
-                tag_obj.fecha_venta = datetime.utcnow()
+            .values(estado="sold", venta_id=venta_id, fecha_venta=datetime.utcnow())
+        )
         
         await self.session.commit()
     
@@ -227,6 +300,9 @@ class RFIDService:
         """
         Analiza discrepancias entre RFID y sistema
         
+        ⚡ Set-based: conteo físico y stock del sistema en una query cada
+        uno, discrepancias registradas con un INSERT multi-fila.
+        
         Returns:
             Lista de discrepancias detectadas
         """
@@ -237,78 +313,96 @@ class RFIDService:
         if not session_obj.location_id:
             raise ValueError("Sesión de inventario debe tener location_id")
         
-        # 1. Obtener todos los tags escaneados
-        result = await self.session.exec(
-            select(RFIDScanItem)
-            .where(RFIDScanItem.session_id == session_id)
+        # 1. Conteo físico por variante (tags distintos) con datos del producto
+        result = await self.session.execute(
+            select(
+                RFIDScanItem.variant_id,
+                func.count(distinct(RFIDScanItem.epc)),
+                ProductVariant.sku,
+                Product.name
+            )
+            .join(ProductVariant, ProductVariant.variant_id == RFIDScanItem.variant_id)
+            .join(Product, Product.product_id == ProductVariant.product_id)
+            .where(
+                and_(
+                    RFIDScanItem.session_id == session_id,
+                    RFIDScanItem.variant_id.is_not(None)
+                )
+            )
+            .group_by(RFIDScanItem.variant_id, ProductVariant.sku, Product.name)
         )
-        scan_items = result.all()
+        scanned = result.all()
         
-        # Contar por variante
-        scanned_counts = {}
-        for item in scan_items:
-            if item.variant_id:
-                scanned_counts[item.variant_id] = scanned_counts.get(item.variant_id, 0) + 1
+        # 2. Stock del sistema para todas las variantes escaneadas
+        system_stock = await self._get_system_stock(
+            [row[0] for row in scanned],
+            session_obj.location_id
+        )
         
-        # 2. Comparar con inventory ledger
         discrepancies = []
+        discrepancy_rows = []
+        detected_at = datetime.utcnow()
         
-        for variant_id, qty_fisica in scanned_counts.items():
-            # Obtener cantidad del sistema
-            qty_sistema = await self._get_system_stock(
-                variant_id,
-                session_obj.location_id
-            )
+        for variant_id, qty_fisica, sku, product_name in scanned:
+            qty_sistema = system_stock.get(variant_id, 0)
             
             # Si hay diferencia, registrar
             if qty_sistema != qty_fisica:
-                discrepancy = RFIDInventoryDiscrepancy(
-                    tienda_id=session_obj.tienda_id,
-                    session_id=session_id,
-                    variant_id=variant_id,
-                    location_id=session_obj.location_id,
-                    cantidad_sistema=qty_sistema,
-                    cantidad_fisica=qty_fisica,
-                    diferencia=qty_fisica - qty_sistema
-                )
-                self.session.add(discrepancy)
-                
-                # Obtener variante para el reporte
-                variant = await self.session.get(ProductVariant, variant_id)
-                
+                discrepancy_rows.append({
+                    "id": uuid4(),
+                    "tienda_id": session_obj.tienda_id,
+                    "session_id": session_id,
+                    "variant_id": variant_id,
+                    "location_id": session_obj.location_id,
+                    "cantidad_sistema": qty_sistema,
+                    "cantidad_fisica": qty_fisica,
+                    "diferencia": qty_fisica - qty_sistema,
+                    "resuelto": False,
+                    "detected_at": detected_at
+                })
                 discrepancies.append({
                     "variant_id": str(variant_id),
-                    "sku": variant.sku if variant else "Unknown",
-                    "product_name": variant.product.name if variant and variant.product else "Unknown",
+                    "sku": sku or "Unknown",
+                    "product_name": product_name or "Unknown",
                     "cantidad_sistema": qty_sistema,
                     "cantidad_fisica": qty_fisica,
                     "diferencia": qty_fisica - qty_sistema,
                     "tipo": "faltante" if qty_fisica < qty_sistema else "sobrante"
                 })
         
+        # 3. Registrar discrepancias (INSERT multi-fila)
+        if discrepancy_rows:
+            await self.session.execute(insert(RFIDInventoryDiscrepancy), discrepancy_rows)
+        
         await self.session.commit()
         
         return discrepancies
     
     async def _get_system_stock(
         self,
-        variant_id: UUID,
+        variant_ids: List[UUID],
         location_id: UUID
-    ) -> int:
+    ) -> Dict[UUID, int]:
         """
-        Obtiene stock del sistema para una variante en una ubicación
+        Obtiene stock del sistema para varias variantes en una ubicación (una query)
         """
-        result = await self.session.exec(
-            select(func.sum(InventoryLedger.delta))
+        if not variant_ids:
+            return {}
+        
+        result = await self.session.execute(
+            select(InventoryLedger.variant_id, func.sum(InventoryLedger.delta))
             .where(
                 and_(
-                    InventoryLedger.variant_id == variant_id,
+                    InventoryLedger.variant_id.in_(variant_ids),
                     InventoryLedger.location_id == location_id
                 )
             )
+            .group_by(InventoryLedger.variant_id)
         )
-        stock = result.first()
-        return int(stock) if stock else 0
+        return {
+            variant_id: int(stock) if stock else 0
+            for variant_id, stock in result.all()
+        }
     
     async def encode_tag(
         self,
@@ -0,0 +1,47 @@
+"""
+Escrituras de ventas por lote - Nexus POS
+Compartidas por la sincronización offline y el worker de ventas
+
+⚡ El stock de N líneas se descuenta con un lock ordenado y un solo
+UPDATE ... FROM (VALUES ...), en lugar de SELECT + UPDATE por línea.
+"""
+from typing import Any, Dict, List
+from uuid import UUID
+
+from sqlalchemy import Float, Uuid, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Producto
+from utils.sql import values_table
+
+
+def cantidades_por_producto(detalles: List[Dict[str, Any]]) -> Dict[UUID, float]:
+    """Suma las cantidades de las líneas por producto"""
+    cantidades: Dict[UUID, float] = {}
+    for detalle in detalles:
+        cantidades[detalle["producto_id"]] = cantidades.get(detalle["producto_id"], 0.0) + detalle["cantidad"]
+    return cantidades
+
+
+async def descontar_stock(db: AsyncSession, cantidades: Dict[UUID, float]) -> None:
+    """
+    Descuenta stock_actual de varios productos (no hace commit)
+
+    Bloquea las filas en orden de PK antes del UPDATE: dos lotes
+    concurrentes que comparten productos no pueden hacer deadlock.
+    """
+    if not cantidades:
+        return
+    await db.execute(
+        select(Producto.id)
+        .where(Producto.id.in_(sorted(cantidades)))
+        .order_by(Producto.id)
+        .with_for_update()
+    )
+    v = values_table("v", list(cantidades.items()), producto_id=Uuid(), qty=Float())
+    await db.execute(
+        update(Producto)
+        .where(Producto.id == v.c.producto_id)
+        .values(stock_actual=Producto.stock_actual - v.c.qty)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,171 @@
+"""
+Servicio de Alertas de Stock - Nexus POS
+Detección edge-triggered de cruces del punto de reorden en cada escritura del ledger
+"""
+import hashlib
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+from uuid import UUID
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import BigInteger, bindparam, select, func, text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from models import InventoryLedger, ProductVariant, Product
+from core.config import settings
+from core.event_bus import publish_event
+from core.websockets import manager as ws_manager
+
+
+logger = logging.getLogger(__name__)
+
+# (variant_id, location_id, delta)
+Movement = Tuple[UUID, UUID, float]
+
+# Locks en orden de clave: dos transacciones con los mismos pares no se bloquean en cruz
+_LOCK_PAIRS = text(
+    "SELECT pg_advisory_xact_lock(k) FROM unnest(:keys) AS k ORDER BY k"
+).bindparams(bindparam("keys", type_=ARRAY(BigInteger)))
+
+
+def _pair_lock_key(variant_id: UUID, location_id: UUID) -> int:
+    """Clave bigint estable del advisory lock de un par (variante, ubicación)"""
+    digest = hashlib.blake2b(f"stock_alert:{variant_id}:{location_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class StockAlertService:
+    """
+    Emite UNA alerta `stock_alert` cuando un movimiento lleva el saldo de un
+    par (variante, ubicación) desde arriba del punto de reorden hasta o por
+    debajo de él. Mientras el saldo siga bajo, no se repite la alerta.
+
+    ⚡ Costo O(items tocados): solo se consultan los pares afectados por la
+    transacción, nunca el catálogo completo (reemplaza los scans periódicos).
+
+    Uso (dos fases):
+    1. `detect_crossings` DESPUÉS de flush y ANTES de commit (mismo snapshot)
+    2. `emit` DESPUÉS de commit (no se notifica nada si hubo rollback)
+
+    Concurrencia: cada par con salida neta toma un advisory lock de
+    transacción antes de leer el saldo. Dos ventas simultáneas del mismo SKU
+    se serializan hasta el commit de la primera, y la segunda ve su
+    movimiento: el cruce se detecta una sola vez.
+    """
+
+    EVENT_ROUTING_KEY = "stock.alert"
+    WS_EVENT_TYPE = "stock_alert"
+
+    async def detect_crossings(
+        self,
+        session: AsyncSession,
+        tienda_id: UUID,
+        movements: Iterable[Movement]
+    ) -> List[dict]:
+        """
+        Detecta cruces descendentes del punto de reorden para los movimientos dados
+
+        Args:
+            session: Sesión con los movimientos ya flusheados
+            tienda_id: ID de la tienda
+            movements: Tuplas (variant_id, location_id, delta) de la transacción
+
+        Returns:
+            Lista de alertas (dicts serializables) a emitir tras el commit
+        """
+        # Agrupar deltas por par: una venta con 2 líneas del mismo SKU cuenta una vez
+        deltas: Dict[Tuple[UUID, UUID], float] = defaultdict(float)
+        for variant_id, location_id, delta in movements:
+            deltas[(variant_id, location_id)] += delta
+
+        # Solo las salidas netas pueden cruzar hacia abajo
+        pares = [par for par, delta in deltas.items() if delta < 0]
+        if not pares:
+            return []
+
+        # Sentencia aparte: en READ COMMITTED la query de saldos toma su
+        # snapshot después de obtener los locks
+        await session.execute(_LOCK_PAIRS, {"keys": sorted(_pair_lock_key(*par) for par in pares)})
+
+        saldos = (
+            select(
+                InventoryLedger.variant_id,
+                InventoryLedger.location_id,
+                func.sum(InventoryLedger.delta).label("saldo")
+            )
+            .where(
+                InventoryLedger.tienda_id == tienda_id,
+                tuple_(InventoryLedger.variant_id, InventoryLedger.location_id).in_(pares)
+            )
+            .group_by(InventoryLedger.variant_id, InventoryLedger.location_id)
+            .subquery()
+        )
+
+        query = (
+            select(
+                saldos.c.variant_id,
+                saldos.c.location_id,
+                saldos.c.saldo,
+                ProductVariant.sku,
+                ProductVariant.reorder_point,
+                Product.name
+            )
+            .join(ProductVariant, ProductVariant.variant_id == saldos.c.variant_id)
+            .join(Product, Product.product_id == ProductVariant.product_id)
+        )
+
+        result = await session.execute(query)
+
+        alertas = []
+        for variant_id, location_id, saldo, sku, reorder_point, product_name in result.all():
+            punto = (
+                reorder_point
+                if reorder_point is not None
+                else settings.STOCK_REORDER_POINT_DEFAULT
+            )
+            despues = float(saldo or 0)
+            antes = despues - deltas[(variant_id, location_id)]
+
+            # Edge-trigger: estaba por encima y quedó en o por debajo
+            if antes > punto >= despues:
+                alertas.append({
+                    "tienda_id": str(tienda_id),
+                    "variant_id": str(variant_id),
+                    "location_id": str(location_id),
+                    "sku": sku,
+                    "product_name": product_name,
+                    "stock_anterior": antes,
+                    "stock_actual": despues,
+                    "reorder_point": float(punto),
+                    "nivel": "critico" if despues <= 0 else "bajo",
+                    "detected_at": datetime.utcnow().isoformat()
+                })
+
+        return alertas
+
+    async def emit(self, tienda_id: UUID, alertas: List[dict]) -> None:
+        """
+        Publica las alertas en el event bus y las empuja por WebSocket
+
+        Nunca rompe el flujo principal: la transacción ya está confirmada.
+        """
+        for alerta in alertas:
+            try:
+                await publish_event(self.EVENT_ROUTING_KEY, alerta)
+            except Exception as e:
+                logger.error(f"Error publicando stock_alert: {e}")
+
+            try:
+                await ws_manager.send_to_tienda(
+                    tienda_id=str(tienda_id),
+                    message={"type": self.WS_EVENT_TYPE, **alerta}
+                )
+            except Exception as e:
+                logger.error(f"Error enviando stock_alert por WebSocket: {e}")
+
+        if alertas:
+            logger.info(f"⚠️ {len(alertas)} alertas de stock emitidas para tienda {tienda_id}")
+
+
+# Instancia global
+stock_alert_service = StockAlertService()
@@ -0,0 +1,206 @@
+"""
+Servicio de Caché de Stock - Nexus POS
+Saldos de stock en Redis para las reservas atómicas del checkout
+
+⚡ Read-through: si la reserva da cache miss, el checkout carga los saldos
+de la venta desde PostgreSQL (1 query), los escribe con SET NX y reintenta
+en el mismo request, en lugar de responder 503.
+
+⚡ Warmup por lotes: los saldos de la tienda salen de 1 query y se
+escriben con SET NX EX en pipeline, STOCK_WARMUP_CHUNK keys por round trip.
+
+SET NX en ambos casos: nunca se pisa una key existente, que puede tener
+reservas en curso que la DB todavía no refleja.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.redis_scripts import generate_stock_key
+from models import Producto, Tienda
+from services.cache_service import get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+# Solo un proceso hace el warmup de arranque (los demás lo saltean)
+WARMUP_LOCK_KEY = "stock:warmup:lock"
+WARMUP_LOCK_TTL = 300
+
+
+async def load_balances(
+    db: AsyncSession,
+    tienda_id: UUID,
+    producto_ids: Optional[Iterable[UUID]] = None
+) -> Dict[UUID, float]:
+    """
+    Saldos de stock desde PostgreSQL en 1 query
+
+    Args:
+        producto_ids: Productos a cargar; None = todos los activos de la tienda
+    """
+    statement = select(Producto.id, Producto.stock_actual).where(Producto.tienda_id == tienda_id)
+    if producto_ids is None:
+        statement = statement.where(Producto.is_active == True)
+    else:
+        statement = statement.where(Producto.id.in_(list(producto_ids)))
+    return {producto_id: float(stock) for producto_id, stock in (await db.execute(statement)).all()}
+
+
+async def write_balances(
+    client: redis.Redis,
+    tienda_id: UUID,
+    balances: Dict[UUID, float],
+    chunk_size: Optional[int] = None
+) -> int:
+    """
+    Escribe saldos con SET NX EX en pipeline (sin MULTI)
+
+    Returns:
+        Keys creadas (las existentes no se tocan)
+    """
+    chunk_size = chunk_size or settings.STOCK_WARMUP_CHUNK
+    items = list(balances.items())
+    creadas = 0
+    for start in range(0, len(items), chunk_size):
+        async with client.pipeline(transaction=False) as pipe:
+            for producto_id, stock in items[start:start + chunk_size]:
+                pipe.set(
+                    generate_stock_key(str(tienda_id), str(producto_id)),
+                    stock,
+                    nx=True,
+                    ex=settings.STOCK_CACHE_TTL
+                )
+            creadas += sum(1 for ok in await pipe.execute() if ok)
+    return creadas
+
+
+async def fill_missing(
+    client: redis.Redis,
+    db: AsyncSession,
+    tienda_id: UUID,
+    producto_ids: Iterable[UUID]
+) -> int:
+    """Read-through: carga desde la DB las keys de estos productos (SET NX)"""
+    balances = await load_balances(db, tienda_id, producto_ids)
+    return await write_balances(client, tienda_id, balances)
+
+
+async def warmup_tienda(client: redis.Redis, db: AsyncSession, tienda_id: UUID) -> int:
+    """Precarga el stock de todos los productos activos de una tienda"""
+    balances = await load_balances(db, tienda_id)
+    creadas = await write_balances(client, tienda_id, balances)
+    logger.info(f"Warmup de stock tienda {tienda_id}: {creadas}/{len(balances)} keys nuevas")
+    return creadas
+
+
+async def warmup_all_tiendas(max_concurrency: Optional[int] = None) -> Dict[str, Optional[int]]:
+    """
+    Warmup de todas las tiendas activas (tarea de arranque)
+
+    Un lock en Redis evita que cada worker de uvicorn repita el trabajo.
+    Cada tienda usa su propia sesión; el semáforo limita las conexiones.
+
+    Returns:
+        {tienda_id: keys creadas | None si falló}; vacío si otro proceso lo hace
+    """
+    from core.db import BackgroundSessionLocal
+
+    client = await get_redis_client()
+    if not await client.set(WARMUP_LOCK_KEY, "1", nx=True, ex=WARMUP_LOCK_TTL):
+        logger.info("Warmup de stock en curso en otro proceso, se omite")
+        return {}
+
+    async with BackgroundSessionLocal() as session:
+        tienda_ids = (await session.execute(
+            select(Tienda.id).where(Tienda.is_active == True)
+        )).scalars().all()
+
+    semaforo = asyncio.Semaphore(max_concurrency or settings.STOCK_WARMUP_CONCURRENCY)
+
+    async def _warmup(tienda_id: UUID):
+        async with semaforo:
+            async with BackgroundSessionLocal() as session:
+                try:
+                    return tienda_id, await warmup_tienda(client, session, tienda_id)
+                except Exception as e:
+                    logger.error(f"Error en warmup de stock de tienda {tienda_id}: {e}")
+                    return tienda_id, None
+
+    resultados = await asyncio.gather(*(_warmup(t) for t in tienda_ids))
+    logger.info(f"Warmup de stock: {len(tienda_ids)} tiendas")
+    return {str(tienda_id): creadas for tienda_id, creadas in resultados}
+
+
+# =====================================================
+# RESERVAS EN VUELO
+# =====================================================
+# Una venta reservada en Redis tarda en llegar a la DB (cola + worker).
+# Mientras tanto, `stock:inflight:{tienda}` guarda {event_id: items} para
+# que la reconciliación no tome esa diferencia por un desvío.
+
+def inflight_key(tienda_id: Any) -> str:
+    return f"stock:inflight:{tienda_id}"
+
+
+async def track_inflight(
+    client: redis.Redis,
+    tienda_id: Any,
+    event_id: str,
+    cantidades: Dict[str, float]
+) -> None:
+    """Registra las cantidades reservadas por un evento aún no escrito en la DB"""
+    await client.hset(
+        inflight_key(tienda_id),
+        event_id,
+        json.dumps({"ts": time.time(), "items": cantidades})
+    )
+
+
+async def clear_inflight(client: redis.Redis, eventos: Dict[str, List[str]]) -> None:
+    """
+    Quita eventos ya escritos (o descartados) de las reservas en vuelo
+
+    Args:
+        eventos: {tienda_id: [event_id, ...]}
+    """
+    async with client.pipeline(transaction=False) as pipe:
+        for tienda_id, event_ids in eventos.items():
+            if event_ids:
+                pipe.hdel(inflight_key(tienda_id), *event_ids)
+        await pipe.execute()
+
+
+async def load_inflight(
+    client: redis.Redis,
+    tienda_id: Any,
+    max_age: float
+) -> Tuple[Dict[str, float], List[str]]:
+    """
+    Cantidades en vuelo por producto y eventos vencidos
+
+    Un evento más viejo que max_age no va a llegar (DLQ o mensaje vencido):
+    se informa como perdido y ya no se descuenta.
+
+    Returns:
+        ({producto_id: cantidad}, [event_id vencidos])
+    """
+    limite = time.time() - max_age
+    cantidades: Dict[str, float] = {}
+    vencidos: List[str] = []
+    for event_id, raw in (await client.hgetall(inflight_key(tienda_id))).items():
+        entry = json.loads(raw)
+        if entry["ts"] < limite:
+            vencidos.append(event_id)
+            continue
+        for producto_id, cantidad in entry["items"].items():
+            cantidades[producto_id] = cantidades.get(producto_id, 0.0) + cantidad
+    return cantidades, vencidos
@@ -0,0 +1,242 @@
+"""
+Servicio de Reconciliación de Stock - Nexus POS
+Detecta y corrige desvíos entre los saldos de Redis y PostgreSQL
+
+Redis es la fuente de las reservas del checkout y la DB la fuente de
+verdad; un crash entre reserva y publicación, un evento en la DLQ o un
+ajuste manual en la DB los separan sin que nadie se entere.
+
+Por tienda, en lotes de STOCK_RECONCILE_BATCH keys:
+1. SCAN `stock:{tienda}:*` + 1 MGET de los valores
+2. 1 SELECT de los saldos de esos productos
+3. esperado = saldo DB - reservas en vuelo (ventas aún no escritas)
+
+⚡ Sin impacto en el checkout: SCAN (nunca KEYS), pausas entre lotes para
+no pasar de STOCK_RECONCILE_KEYS_PER_SECOND y correcciones con un CAS en
+Lua que no pisa una key que cambió desde que se leyó.
+
+Un desvío se corrige recién cuando se repite igual en dos pasadas: la
+diferencia transitoria entre una reserva y su registro en vuelo no alcanza.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from models import Tienda
+from services.cache_service import get_redis_client
+from services.stock_cache_service import clear_inflight, load_balances, load_inflight
+
+
+logger = logging.getLogger(__name__)
+
+REPORT_TTL = 86400
+# Desvíos detallados por reporte (el resto solo se cuenta)
+REPORT_MAX_DESVIOS = 100
+
+# Corrige la key solo si sigue teniendo el valor observado (conserva el TTL)
+CAS_SET_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'KEEPTTL')
+    return 1
+end
+return 0
+"""
+
+
+def report_key(tienda_id: Any) -> str:
+    return f"stock:reconcile:report:{tienda_id}"
+
+
+def _producto_id(key: str) -> Optional[UUID]:
+    """producto_id de una key legacy `stock:{tienda}:{producto}`; None si no lo es"""
+    partes = key.split(":")
+    if len(partes) != 3:
+        return None  # Variante por ubicación: no la reserva el checkout
+    try:
+        return UUID(partes[2])
+    except ValueError:
+        return None
+
+
+class StockReconciler:
+    """
+    Reconciliador incremental Redis ↔ PostgreSQL
+
+    Guarda entre pasadas los desvíos sospechosos ({key: (valor redis, esperado)})
+    para confirmarlos en la siguiente; por eso vive mientras vive el proceso.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        keys_per_second: Optional[float] = None,
+        tolerance: Optional[float] = None,
+        correct: Optional[bool] = None
+    ):
+        self.batch_size = batch_size or settings.STOCK_RECONCILE_BATCH
+        self.keys_per_second = keys_per_second or settings.STOCK_RECONCILE_KEYS_PER_SECOND
+        self.tolerance = settings.STOCK_RECONCILE_TOLERANCE if tolerance is None else tolerance
+        self.correct = settings.STOCK_RECONCILE_CORRECT if correct is None else correct
+        self._sospechosos: Dict[str, Tuple[str, float]] = {}
+        self.stats = {
+            "pasadas": 0,
+            "keys_revisadas": 0,
+            "desvios_detectados": 0,
+            "desvios_corregidos": 0,
+            "huerfanas": 0,
+            "eventos_perdidos": 0,
+            "ultima_pasada": None,
+            "ultima_duracion_s": None,
+        }
+
+    async def reconcile_tienda(
+        self,
+        client: redis.Redis,
+        db: AsyncSession,
+        tienda_id: UUID
+    ) -> Dict[str, Any]:
+        """
+        Una pasada sobre las keys de stock de una tienda
+
+        Returns:
+            Reporte de la pasada (también queda en Redis, ver report_key)
+        """
+        reporte: Dict[str, Any] = {
+            "tienda_id": str(tienda_id),
+            "ts": time.time(),
+            "keys_revisadas": 0,
+            "desvios": [],
+            "desvios_detectados": 0,
+            "desvios_corregidos": 0,
+            "huerfanas": 0,
+            "eventos_perdidos": 0,
+        }
+
+        en_vuelo, vencidos = await load_inflight(client, tienda_id, settings.STOCK_INFLIGHT_MAX_AGE)
+        if vencidos:
+            # Nunca van a llegar a la DB: dejan de descontarse y se informan
+            await clear_inflight(client, {str(tienda_id): vencidos})
+            reporte["eventos_perdidos"] = len(vencidos)
+            logger.warning(f"⚠️ Tienda {tienda_id}: {len(vencidos)} ventas reservadas nunca escritas en la DB")
+
+        lote: List[str] = []
+        async for key in client.scan_iter(match=f"stock:{tienda_id}:*", count=self.batch_size):
+            lote.append(key)
+            if len(lote) >= self.batch_size:
+                await self._reconcile_lote(client, db, tienda_id, lote, en_vuelo, reporte)
+                lote = []
+        if lote:
+            await self._reconcile_lote(client, db, tienda_id, lote, en_vuelo, reporte)
+
+        await client.set(report_key(tienda_id), json.dumps(reporte, default=str), ex=REPORT_TTL)
+
+        for campo in ("keys_revisadas", "desvios_detectados", "desvios_corregidos", "huerfanas", "eventos_perdidos"):
+            self.stats[campo] += reporte[campo]
+        return reporte
+
+    async def _reconcile_lote(
+        self,
+        client: redis.Redis,
+        db: AsyncSession,
+        tienda_id: UUID,
+        keys: List[str],
+        en_vuelo: Dict[str, float],
+        reporte: Dict[str, Any]
+    ) -> None:
+        """Compara un lote de keys: 1 MGET + 1 SELECT, correcciones con CAS"""
+        productos = {key: _producto_id(key) for key in keys}
+        productos = {key: producto_id for key, producto_id in productos.items() if producto_id}
+        if not productos:
+            return
+
+        valores = dict(zip(productos, await client.mget(list(productos))))
+        saldos = await load_balances(db, tienda_id, productos.values())
+        reporte["keys_revisadas"] += len(productos)
+
+        for key, producto_id in productos.items():
+            observado = valores[key]
+            if observado is None:
+                continue  # Expiró entre el SCAN y el MGET
+            if producto_id not in saldos:
+                reporte["huerfanas"] += 1
+                continue
+
+            esperado = saldos[producto_id] - en_vuelo.get(str(producto_id), 0.0)
+            if abs(float(observado) - esperado) <= self.tolerance:
+                self._sospechosos.pop(key, None)
+                continue
+
+            # Primera vez (o cambió desde la pasada anterior): solo se anota
+            if self._sospechosos.get(key) != (observado, esperado):
+                self._sospechosos[key] = (observado, esperado)
+                continue
+
+            del self._sospechosos[key]
+            corregido = False
+            if self.correct:
+                corregido = bool(await client.eval(CAS_SET_SCRIPT, 1, key, observado, esperado))
+            reporte["desvios_detectados"] += 1
+            reporte["desvios_corregidos"] += int(corregido)
+            if len(reporte["desvios"]) < REPORT_MAX_DESVIOS:
+                reporte["desvios"].append({
+                    "producto_id": str(producto_id),
+                    "redis": float(observado),
+                    "esperado": esperado,
+                    "corregido": corregido,
+                })
+            logger.warning(
+                f"⚠️ Desvío de stock {key}: redis={observado} esperado={esperado}"
+                + (" (corregido)" if corregido else "")
+            )
+
+        # Rate limit: el checkout comparte Redis y el pool de la DB
+        await asyncio.sleep(len(keys) / self.keys_per_second)
+
+    async def run_once(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Pasada sobre todas las tiendas activas, de a una
+
+        Returns:
+            {tienda_id: reporte | None si falló}
+        """
+        from core.db import BackgroundSessionLocal
+
+        inicio = time.monotonic()
+        client = await get_redis_client()
+        async with BackgroundSessionLocal() as session:
+            tienda_ids = (await session.execute(
+                select(Tienda.id).where(Tienda.is_active == True)
+            )).scalars().all()
+
+        resultados: Dict[str, Optional[Dict[str, Any]]] = {}
+        for tienda_id in tienda_ids:
+            async with BackgroundSessionLocal() as session:
+                try:
+                    resultados[str(tienda_id)] = await self.reconcile_tienda(client, session, tienda_id)
+                except Exception as e:
+                    logger.error(f"Error reconciliando stock de tienda {tienda_id}: {e}")
+                    resultados[str(tienda_id)] = None
+
+        self.stats["pasadas"] += 1
+        self.stats["ultima_pasada"] = time.time()
+        self.stats["ultima_duracion_s"] = round(time.monotonic() - inicio, 3)
+        return resultados
+
+    def get_stats(self) -> dict:
+        """Contadores acumulados desde que arrancó el proceso"""
+        return {**self.stats, "sospechosos": len(self._sospechosos)}
+
+
+async def get_report(tienda_id: Any) -> Optional[Dict[str, Any]]:
+    """Último reporte de reconciliación de la tienda (None si no hubo pasada)"""
+    client = await get_redis_client()
+    raw = await client.get(report_key(tienda_id))
+    return json.loads(raw) if raw else None
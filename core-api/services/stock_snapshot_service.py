@@ -0,0 +1,196 @@
+"""
+Servicio de Snapshots de Stock - Nexus POS
+Checkpoints periódicos del ledger y stock a una fecha
+
+El stock es SUM(delta) del ledger: "¿cuánto había al cierre del mes
+pasado?" (valorización, auditorías, mermas) sumaba toda la historia.
+
+⚡ Con checkpoints: stock a la fecha T = saldo del snapshot más cercano
+<= T + deltas del ledger en (snapshot, T]. El costo depende de los
+movimientos de la ventana, no del tamaño del historial (el rango usa
+ix_inventory_ledger_tienda_occurred y solo toca las particiones del rango).
+
+- Checkpoints alineados a medianoche UTC cada STOCK_SNAPSHOT_INTERVAL_HOURS
+- Cada snapshot se construye desde el anterior (incremental): nunca vuelve
+  a recorrer el historial salvo el primero de cada tienda
+- Se toma recién STOCK_SNAPSHOT_SETTLE_SECONDS después del checkpoint:
+  occurred_at se fija al crear la fila, una transacción en vuelo puede
+  confirmar movimientos anteriores al checkpoint unos segundos después
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from models import InventoryLedger, StockSnapshot, Tienda
+
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def checkpoint_floor(value: datetime, interval_hours: Optional[int] = None) -> datetime:
+    """Último checkpoint <= value (UTC, alineado a medianoche)"""
+    interval = (interval_hours or settings.STOCK_SNAPSHOT_INTERVAL_HOURS) * 3600
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    segundos = int((value - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=segundos - segundos % interval)
+
+
+def last_settled_checkpoint(now: Optional[datetime] = None) -> datetime:
+    """Checkpoint más reciente cuyas transacciones en vuelo ya confirmaron"""
+    now = now or datetime.now(timezone.utc)
+    return checkpoint_floor(now - timedelta(seconds=settings.STOCK_SNAPSHOT_SETTLE_SECONDS))
+
+
+async def nearest_snapshot_at(
+    db: AsyncSession,
+    tienda_id: UUID,
+    at: datetime,
+    inclusive: bool = True
+) -> Optional[datetime]:
+    """Snapshot más cercano anterior a `at` (None si la tienda no tiene)"""
+    limite = StockSnapshot.snapshot_at <= at if inclusive else StockSnapshot.snapshot_at < at
+    return (await db.execute(
+        select(func.max(StockSnapshot.snapshot_at)).where(StockSnapshot.tienda_id == tienda_id, limite)
+    )).scalar()
+
+
+def _balances(
+    tienda_id: UUID,
+    at: datetime,
+    base: Optional[datetime],
+    variant_id: Optional[UUID] = None,
+    location_id: Optional[UUID] = None
+):
+    """SELECT variant_id, location_id, quantity: saldo del snapshot base + deltas en (base, at]"""
+    deltas = select(
+        InventoryLedger.variant_id,
+        InventoryLedger.location_id,
+        InventoryLedger.delta.label("quantity"),
+    ).where(InventoryLedger.tienda_id == tienda_id, InventoryLedger.occurred_at <= at)
+    if variant_id:
+        deltas = deltas.where(InventoryLedger.variant_id == variant_id)
+    if location_id:
+        deltas = deltas.where(InventoryLedger.location_id == location_id)
+
+    if base is None:
+        movimientos = deltas.subquery()
+    else:
+        saldo_base = select(
+            StockSnapshot.variant_id,
+            StockSnapshot.location_id,
+            StockSnapshot.quantity,
+        ).where(StockSnapshot.tienda_id == tienda_id, StockSnapshot.snapshot_at == base)
+        if variant_id:
+            saldo_base = saldo_base.where(StockSnapshot.variant_id == variant_id)
+        if location_id:
+            saldo_base = saldo_base.where(StockSnapshot.location_id == location_id)
+        movimientos = union_all(
+            saldo_base,
+            deltas.where(InventoryLedger.occurred_at > base)
+        ).subquery()
+
+    return (
+        select(
+            movimientos.c.variant_id,
+            movimientos.c.location_id,
+            func.sum(movimientos.c.quantity).label("quantity"),
+        )
+        .group_by(movimientos.c.variant_id, movimientos.c.location_id)
+    )
+
+
+async def stock_as_of(
+    db: AsyncSession,
+    tienda_id: UUID,
+    at: datetime,
+    variant_id: Optional[UUID] = None,
+    location_id: Optional[UUID] = None
+) -> Tuple[Optional[datetime], List[Any]]:
+    """
+    Stock por (variante, ubicación) al instante `at`
+
+    Returns:
+        (snapshot usado como base | None si se sumó el historial completo,
+         filas con variant_id, location_id, quantity)
+    """
+    base = await nearest_snapshot_at(db, tienda_id, at)
+    rows = (await db.execute(
+        _balances(tienda_id, at, base, variant_id, location_id)
+        .order_by("variant_id", "location_id")
+    )).all()
+    return base, rows
+
+
+async def write_snapshot(db: AsyncSession, tienda_id: UUID, at: datetime) -> Optional[int]:
+    """
+    Escribe el checkpoint `at` de la tienda a partir del anterior
+
+    Un solo INSERT ... SELECT: el checkpoint aparece completo o no aparece.
+
+    Returns:
+        Filas escritas, None si el checkpoint ya existía
+    """
+    existe = (await db.execute(
+        select(StockSnapshot.snapshot_at)
+        .where(StockSnapshot.tienda_id == tienda_id, StockSnapshot.snapshot_at == at)
+        .limit(1)
+    )).first()
+    if existe:
+        return None
+
+    base = await nearest_snapshot_at(db, tienda_id, at, inclusive=False)
+    saldos = _balances(tienda_id, at, base).subquery()
+    columnas = StockSnapshot.__table__.c
+
+    result = await db.execute(
+        insert(StockSnapshot)
+        .from_select(
+            ["snapshot_at", "variant_id", "location_id", "tienda_id", "quantity"],
+            select(
+                literal(at, columnas.snapshot_at.type),
+                saldos.c.variant_id,
+                saldos.c.location_id,
+                literal(tienda_id, columnas.tienda_id.type),
+                saldos.c.quantity,
+            )
+        )
+        .on_conflict_do_nothing()
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def take_snapshots(at: Optional[datetime] = None) -> Dict[str, Optional[int]]:
+    """
+    Checkpoint `at` (por defecto el último asentado) de todas las tiendas activas
+
+    Returns:
+        {tienda_id: filas escritas | None si ya existía o falló}
+    """
+    from core.db import BackgroundSessionLocal
+
+    at = at or last_settled_checkpoint()
+    async with BackgroundSessionLocal() as session:
+        tienda_ids = (await session.execute(
+            select(Tienda.id).where(Tienda.is_active == True)
+        )).scalars().all()
+
+    resultados: Dict[str, Optional[int]] = {}
+    for tienda_id in tienda_ids:
+        async with BackgroundSessionLocal() as session:
+            try:
+                resultados[str(tienda_id)] = await write_snapshot(session, tienda_id, at)
+            except Exception as e:
+                logger.error(f"Error escribiendo snapshot {at.isoformat()} de tienda {tienda_id}: {e}")
+                resultados[str(tienda_id)] = None
+
+    return resultados
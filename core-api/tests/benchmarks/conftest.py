@@ -0,0 +1,27 @@
+"""
+Micro-benchmarks - Nexus POS
+Rutas calientes medidas con pytest-benchmark, sin servicios externos
+
+Redis es fakeredis (con Lua), las sesiones de DB son fakes que devuelven
+filas armadas en memoria: mide el código de la app, no la red.
+
+Correr y comparar contra la baseline con scripts/benchmarks.py.
+"""
+import asyncio
+import importlib.util
+
+import pytest
+
+
+# Sin pytest-benchmark (o sin fakeredis) la suite no se colecta
+collect_ignore_glob = [] if all(
+    importlib.util.find_spec(name) for name in ("pytest_benchmark", "fakeredis", "lupa")
+) else ["test_*.py"]
+
+
+@pytest.fixture
+def run():
+    """Ejecuta una corrutina en un loop propio (el fixture benchmark es sync)"""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
@@ -0,0 +1,67 @@
+"""
+Benchmarks del caché en memoria y del rate limiter
+Se ejecutan en cada request: lecturas con hit/miss y chequeo de límite
+"""
+import pytest
+
+from core.cache import CacheManager
+from core.rate_limit import RateLimiter
+
+
+pytestmark = pytest.mark.benchmark(group="cache-rate-limit")
+
+N_KEYS = 1_000
+
+
+@pytest.fixture
+def cache():
+    manager = CacheManager()
+    for i in range(N_KEYS):
+        manager.set(f"productos:tienda:{i}", {"id": i, "nombre": f"Producto {i}"}, ttl_seconds=300)
+    return manager
+
+
+def test_cache_get_hits_and_misses(benchmark, cache):
+    keys = [f"productos:tienda:{i}" for i in range(0, 2 * N_KEYS, 2)]
+
+    hits = benchmark(lambda: sum(cache.get(key) is not None for key in keys))
+
+    assert hits == N_KEYS // 2
+
+
+def test_cache_set_1000(benchmark, cache):
+    benchmark(lambda: [cache.set(f"reportes:{i}", i, ttl_seconds=60) for i in range(N_KEYS)])
+
+    assert cache.get("reportes:999") == 999
+
+
+def test_cache_invalidate_pattern(benchmark, cache):
+    """Invalidación por patrón recorre todas las keys (caso peor: nada coincide)"""
+    benchmark(cache.invalidate_pattern, "ventas:")
+
+    assert cache.get("productos:tienda:0") is not None
+
+
+def test_rate_limiter_1000_clients(benchmark):
+    limiter = RateLimiter()
+    clientes = [f"ip:10.0.{i // 256}.{i % 256}" for i in range(N_KEYS)]
+
+    def ronda():
+        permitidos = 0
+        for cliente in clientes:
+            permitidos += limiter.is_allowed(cliente, max_requests=100, window_seconds=60)[0]
+            limiter.reset(cliente)
+        return permitidos
+
+    assert benchmark(ronda) == N_KEYS
+
+
+def test_rate_limiter_window_at_limit(benchmark):
+    """Un cliente con la ventana llena: cada chequeo filtra 100 timestamps"""
+    limiter = RateLimiter()
+    for _ in range(100):
+        limiter.is_allowed("login:10.0.0.1", max_requests=100, window_seconds=60)
+
+    permitido, retry_after = benchmark(limiter.is_allowed, "login:10.0.0.1", 100, 60)
+
+    assert not permitido and retry_after is not None
@@ -0,0 +1,47 @@
+"""
+Benchmarks de generación de SKU y EAN-13
+Alta masiva de variantes: un SKU y un código de barras por variante
+"""
+import random
+from uuid import UUID
+
+import pytest
+
+from utils.sku_generator import BarcodeGenerator, SKUGenerator
+
+
+pytestmark = pytest.mark.benchmark(group="generadores")
+
+rng = random.Random(42)
+COLORES = ["Rojo Intenso", "Azul Marino", "Verde Agua", "Ñandú Café", "Blanco Roto"]
+TALLES = ["XS", "S", "M", "L", "XL", "42", "UNICO"]
+VARIANTES = [
+    (f"REM-{i:03d}", rng.choice(COLORES), rng.choice(TALLES)) for i in range(1_000)
+]
+VARIANT_IDS = [UUID(int=rng.getrandbits(128)) for _ in range(1_000)]
+
+
+def test_variant_skus_1000(benchmark):
+    skus = benchmark(lambda: [SKUGenerator.generate_variant_sku(*v) for v in VARIANTES])
+
+    assert skus[0].startswith("REM-000-")
+
+
+def test_base_skus_1000(benchmark):
+    skus = benchmark(lambda: [SKUGenerator.generate_base_sku("Pantalones Cargo", i) for i in range(1_000)])
+
+    assert skus[45] == "PANT-045"
+
+
+def test_ean13_from_uuid_1000(benchmark):
+    codigos = benchmark(lambda: [BarcodeGenerator.generate_ean13_from_uuid(v, "0001") for v in VARIANT_IDS])
+
+    assert all(BarcodeGenerator.validate_ean13(c) for c in codigos)
+
+
+def test_validate_ean13_1000(benchmark):
+    codigos = [BarcodeGenerator.generate_ean13_sequential("0001", i) for i in range(1_000)]
+
+    validos = benchmark(lambda: sum(BarcodeGenerator.validate_ean13(c) for c in codigos))
+
+    assert validos == 1_000
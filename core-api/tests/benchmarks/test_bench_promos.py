@@ -0,0 +1,107 @@
+"""
+Benchmarks del motor de promociones
+1.000 promos (generales, por SKU, por categoría, por colección y con
+código, reglas compuestas) contra carritos de 50 líneas: compilación del
+índice y re-cálculo del carrito en cada escaneo del POS
+"""
+import random
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from schemas_models.promo_models import Promocion, TipoPromo
+from services import promo_service
+from services.promo_index import PromoIndex
+from services.promo_service import PromotionEngine
+
+
+pytestmark = pytest.mark.benchmark(group="promociones")
+
+N_PROMOS = 1_000
+N_LINES = 50
+N_SKUS = 5_000
+CATEGORIAS = [f"cat-{i}" for i in range(40)]
+COLECCIONES = [str(uuid4()) for _ in range(20)]
+
+
+def _promos(rng, tienda_id, skus):
+    ahora = datetime.utcnow()
+    promos = []
+    for i in range(N_PROMOS):
+        alcance = {}
+        tipo = i % 10
+        if tipo < 5:
+            alcance["productos_aplicables"] = [str(s) for s in rng.sample(skus, 3)]
+        elif tipo < 7:
+            alcance["categorias_aplicables"] = [rng.choice(CATEGORIAS)]
+        elif tipo == 7:
+            alcance["colecciones_aplicables"] = [rng.choice(COLECCIONES)]
+        elif tipo == 8:
+            alcance["codigo_promocional"] = f"CUPON{i}"
+        promos.append(Promocion(
+            tienda_id=tienda_id,
+            nombre=f"Promo {i}",
+            tipo=TipoPromo.DESCUENTO_PORCENTAJE,
+            reglas={"and": [
+                {">=": [{"var": "total"}, rng.randint(0, 50_000)]},
+                {"in": [{"var": "forma_pago"}, ["efectivo", "debito"]]},
+            ]},
+            accion={"tipo": "descuento_porcentaje", "valor": rng.randint(5, 30)},
+            fecha_inicio=ahora - timedelta(days=1),
+            fecha_fin=ahora + timedelta(days=30),
+            canales_aplicables=["pos"],
+            es_acumulable=bool(i % 3),
+            prioridad=rng.randint(0, 100),
+            **alcance,
+        ))
+    return promos
+
+
+def _carrito(rng, skus):
+    items = [
+        {
+            "variant_id": sku,
+            "product_id": sku,
+            "cantidad": rng.randint(1, 3),
+            "precio_unitario": float(rng.randint(1_000, 20_000)),
+            "categoria": rng.choice(CATEGORIAS),
+            "coleccion_id": rng.choice(COLECCIONES),
+        }
+        for sku in rng.sample(skus, N_LINES)
+    ]
+    return {
+        "items": items,
+        "canal": "pos",
+        "forma_pago": "efectivo",
+        "total": sum(i["precio_unitario"] * i["cantidad"] for i in items),
+    }
+
+
+@pytest.fixture
+def escenario(use_fake_redis):
+    use_fake_redis(promo_service)
+    promo_service._indices.clear()
+    rng = random.Random(42)
+    tienda_id = uuid4()
+    skus = [uuid4() for _ in range(N_SKUS)]
+    yield tienda_id, _promos(rng, tienda_id, skus), _carrito(rng, skus)
+    promo_service._indices.clear()
+
+
+def test_compile_index_1000_promos(benchmark, escenario):
+    _, promos, _ = escenario
+
+    index = benchmark(PromoIndex, promos)
+
+    assert len(index.candidates([])[0]) > 0
+
+
+def test_cart_50_lines_1000_promos(benchmark, run, escenario, scripted_session):
+    tienda_id, promos, carrito = escenario
+    motor = PromotionEngine(scripted_session(promos, repeat=True))
+    run(motor.calcular_descuentos(carrito, tienda_id))  # Compila el índice fuera de la medición
+
+    resultado = benchmark(lambda: run(motor.calcular_descuentos(carrito, tienda_id)))
+
+    assert resultado.total_final <= resultado.total_original
@@ -0,0 +1,66 @@
+"""
+Benchmarks del scoring de SmartRoutingService
+Lote de 200 órdenes × 30 ubicaciones: distancia, costo, score y
+asignación greedy (las queries son filas armadas en memoria)
+"""
+import itertools
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from services.oms_service import SmartRoutingService
+
+
+pytestmark = pytest.mark.benchmark(group="routing")
+
+N_ORDENES = 200
+N_UBICACIONES = 30
+N_VARIANTES = 100
+
+
+def _escenario(rng, scripted_session):
+    tienda_id = uuid4()
+    ubicaciones = [
+        (uuid4(), f"Sucursal {j}", SimpleNamespace(
+            latitud=-34.6 + rng.uniform(-0.5, 0.5), longitud=-58.4 + rng.uniform(-0.5, 0.5),
+            prioridad=rng.randint(1, 10), costo_picking=rng.uniform(200, 800),
+            costo_packing=rng.uniform(100, 500), soporta_standard=True,
+            soporta_express=rng.random() < 0.5, soporta_same_day=rng.random() < 0.2,
+            puede_recibir_pickup=True,
+        ))
+        for j in range(N_UBICACIONES)
+    ]
+    variantes = [uuid4() for _ in range(N_VARIANTES)]
+    ordenes = [
+        SimpleNamespace(
+            id=uuid4(), tienda_id=tienda_id,
+            created_at=datetime(2026, 1, 5) + timedelta(minutes=i),
+            shipping_address={"lat": -34.6 + rng.uniform(-0.3, 0.3), "lng": -58.4 + rng.uniform(-0.3, 0.3)},
+            shipping_method=rng.choice(["standard", "standard", "express"]),
+        )
+        for i in range(N_ORDENES)
+    ]
+    items = [
+        (orden.id, variant_id, rng.randint(1, 3))
+        for orden in ordenes for variant_id in rng.sample(variantes, 3)
+    ]
+    stock = [
+        (variant_id, location_id, float(rng.randint(0, 40)))
+        for variant_id in variantes for location_id, _, _ in ubicaciones
+    ]
+    # Mismas filas en cada corrida, en el orden de las queries de assign_batch
+    filas = itertools.cycle([ubicaciones, items, stock, []])
+    return ordenes, scripted_session(responder=lambda sql, params: next(filas))
+
+
+def test_assign_batch_200_orders_30_locations(benchmark, run, scripted_session):
+    ordenes, session = _escenario(random.Random(42), scripted_session)
+    service = SmartRoutingService(session)
+
+    decisiones = benchmark(lambda: run(service.assign_batch(ordenes)))
+
+    assert len(decisiones) == N_ORDENES
+    assert any(decision is not None for decision in decisiones.values())
@@ -0,0 +1,107 @@
+"""
+Benchmarks de serialización de respuestas
+Listados (ProductRead, VentaListRead) y reportes grandes por el mismo
+camino que FastAPI: response_model -> jsonable_encoder -> JSONResponse
+"""
+import random
+from datetime import datetime, timedelta
+from typing import List
+from uuid import uuid4
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from api.routes.reportes import VentaDetalle
+from schemas_models.inventory_ledger import ProductRead
+from schemas_models.ventas import VentaListRead
+
+
+pytestmark = pytest.mark.benchmark(group="serializacion")
+
+rng = random.Random(42)
+AHORA = datetime(2026, 3, 1, 12, 0)
+
+
+def _productos(n=500):
+    tienda_id = uuid4()
+    return [
+        {
+            "product_id": uuid4(), "tienda_id": tienda_id, "name": f"Remera Lisa {i}",
+            "base_sku": f"REM-{i:04d}", "description": "Algodón peinado 24/1", "category": "Remeras",
+            "is_active": True, "created_at": AHORA, "updated_at": AHORA, "variants_count": 6,
+            "variants": [{"variant_id": str(uuid4()), "sku": f"REM-{i:04d}-NEGRO-M", "stock_total": 12.0}],
+        }
+        for i in range(n)
+    ]
+
+
+def _ventas(n=1_000):
+    return [
+        {
+            "id": uuid4(), "fecha": AHORA - timedelta(minutes=i), "total": rng.uniform(1_000, 90_000),
+            "metodo_pago": rng.choice(["efectivo", "tarjeta_debito", "mercadopago"]),
+            "created_at": AHORA - timedelta(minutes=i), "cantidad_items": rng.randint(1, 12),
+            "factura": {
+                "id": uuid4(), "tipo_factura": "B", "punto_venta": 3, "numero_comprobante": 10_000 + i,
+                "cae": "74123456789012", "vencimiento_cae": AHORA + timedelta(days=10),
+                "cliente_doc_tipo": "DNI", "cliente_doc_nro": "30123456", "monto_total": 15_000.0,
+            } if i % 2 else None,
+        }
+        for i in range(n)
+    ]
+
+
+def _reporte_ventas_detalle(n=2_000, items=5):
+    return [
+        VentaDetalle(
+            venta_id=str(uuid4()), fecha=AHORA - timedelta(minutes=i), total=rng.uniform(1_000, 90_000),
+            metodo_pago="efectivo", estado="completada",
+            items=[
+                {"producto": f"Producto {j}", "sku": f"SKU-{j:05d}", "cantidad": 2.0,
+                 "precio_unitario": 1_500.0, "subtotal": 3_000.0}
+                for j in range(items)
+            ],
+        )
+        for i in range(n)
+    ]
+
+
+def _render(contenido) -> bytes:
+    """Lo que hace FastAPI con el valor ya validado por el response_model"""
+    return JSONResponse(jsonable_encoder(contenido)).body
+
+
+def test_product_list_500(benchmark):
+    filas = _productos()
+
+    body = benchmark(lambda: _render([ProductRead.model_validate(f) for f in filas]))
+
+    assert body.startswith(b'[{"product_id"')
+
+
+def test_venta_list_1000(benchmark):
+    filas = _ventas()
+
+    body = benchmark(lambda: _render([VentaListRead.model_validate(f) for f in filas]))
+
+    assert b'"cantidad_items"' in body
+
+
+def test_report_ventas_detalle_2000_jsonable_encoder(benchmark):
+    reporte = _reporte_ventas_detalle()
+
+    body = benchmark(_render, reporte)
+
+    assert len(body) > 1_000_000
+
+
+def test_report_ventas_detalle_2000_dump_json(benchmark):
+    """Mismo reporte serializado directo por pydantic-core (referencia)"""
+    reporte = _reporte_ventas_detalle()
+    adapter = TypeAdapter(List[VentaDetalle])
+
+    body = benchmark(adapter.dump_json, reporte)
+
+    assert len(body) > 1_000_000
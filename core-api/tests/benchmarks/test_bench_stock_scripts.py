@@ -0,0 +1,66 @@
+"""
+Benchmarks de los scripts Lua de stock contra fakeredis
+Mismas llamadas que el checkout (EVAL por item) sobre un Redis en proceso
+"""
+from uuid import uuid4
+
+import fakeredis
+import pytest
+
+from core.redis_scripts import (
+    MULTI_RESERVE_SCRIPT,
+    RESERVE_STOCK_SCRIPT,
+    ROLLBACK_STOCK_SCRIPT,
+    generate_stock_key,
+)
+
+
+pytestmark = pytest.mark.benchmark(group="stock-lua")
+
+N_ITEMS = 10
+TTL = 3600
+
+
+@pytest.fixture
+def redis():
+    client = fakeredis.FakeRedis()
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def stock_keys(redis):
+    tienda_id = str(uuid4())
+    keys = [generate_stock_key(tienda_id, str(uuid4())) for _ in range(N_ITEMS)]
+    for key in keys:
+        redis.set(key, 1_000_000)
+    return keys
+
+
+def test_reserve_and_rollback_10_items(benchmark, redis, stock_keys):
+    """Venta de 10 líneas: reserva por item y rollback (deja el stock igual)"""
+    def venta():
+        for key in stock_keys:
+            assert redis.eval(RESERVE_STOCK_SCRIPT, 1, key, 2, TTL) == 1
+        for key in stock_keys:
+            redis.eval(ROLLBACK_STOCK_SCRIPT, 1, key, 2, TTL)
+
+    benchmark(venta)
+
+    assert float(redis.get(stock_keys[0])) == 1_000_000
+
+
+def test_multi_reserve_10_items(benchmark, redis, stock_keys):
+    """Reserva atómica de las 10 líneas en un solo EVAL"""
+    cantidades = [1] * N_ITEMS
+
+    resultado = benchmark(lambda: redis.eval(MULTI_RESERVE_SCRIPT, N_ITEMS, *stock_keys, *cantidades))
+
+    assert resultado == 1
+
+
+def test_reserve_insufficient_stock(benchmark, redis, stock_keys):
+    """Rechazo por stock insuficiente (hot sale agotado)"""
+    resultado = benchmark(lambda: redis.eval(RESERVE_STOCK_SCRIPT, 1, stock_keys[0], 2_000_000, TTL))
+
+    assert resultado == -1
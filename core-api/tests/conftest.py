@@ -4,8 +4,10 @@ Configuración global de tests
 """
 import pytest
 import asyncio
+import inspect
 from typing import AsyncGenerator, Generator
 from httpx import AsyncClient
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import NullPool
 from sqlmodel import SQLModel
@@ -13,7 +15,7 @@ from uuid import uuid4
 
 from main import app
 from core.config import settings
-from core.db import get_session
+from core.db import get_read_session, get_session
 from models import Tienda, User, Producto
 from core.security import get_password_hash
 
@@ -93,6 +95,7 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
         yield db_session
     
     app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_read_session] = override_get_session
     
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
@@ -233,3 +236,198 @@ async def test_productos_list(db_session: AsyncSession, test_tienda: Tienda) ->
         await db_session.refresh(producto)
     
     return productos
+
+
+# =====================================================
+# DOBLES DE PRUEBA (tests unitarios, sin DB ni Redis)
+# =====================================================
+
+class FakeResult:
+    """
+    Resultado de execute(): cada accesor devuelve el valor guionado tal cual
+    (filas para all(), una fila para one()/first(), un valor para scalar()...)
+    """
+
+    def __init__(self, value=None):
+        self.value = value
+        self.rowcount = value if isinstance(value, int) else 0
+
+    def all(self):
+        return [] if self.value is None else self.value
+
+    def one(self):
+        return self.value
+
+    first = scalar = scalar_one = scalar_one_or_none = one_or_none = one
+
+    def scalars(self):
+        return self
+
+    def mappings(self):
+        return self
+
+
+class ScriptedSession:
+    """
+    AsyncSession falsa
+
+    - results: lo que devuelve cada execute(), en orden. Agotados devuelve
+      None; con repeat=True repite el último
+    - responder(sql, params): para fakes con lógica, responde según el SQL
+      en lugar de `results`
+    - objects: {pk: objeto} para get()
+
+    Registra `statements` (SQL compilado para Postgres), `params`, `bulk`
+    (tabla, filas) de los execute con lista de filas, `added`, `commits`
+    y `rollbacks`.
+    """
+
+    def __init__(self, *results, repeat=False, responder=None, objects=None):
+        self.results = list(results)
+        self.repeat = repeat
+        self.responder = responder
+        self.objects = dict(objects or {})
+        self.statements = []
+        self.params = []
+        self.bulk = []
+        self.added = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    @property
+    def executes(self) -> int:
+        """Round-trips sin contar los INSERT en bloque"""
+        return len(self.statements)
+
+    async def execute(self, statement, params=None, **kwargs):
+        if isinstance(params, list):
+            self.bulk.append((statement.table.name, params))
+            return FakeResult(params)
+
+        compiled = statement.compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        bound = {**compiled.params, **(params or {})}
+        self.statements.append(sql)
+        self.params.append(bound)
+
+        if self.responder is not None:
+            return FakeResult(self.responder(sql, bound))
+        if len(self.results) > 1 or (self.results and not self.repeat):
+            return FakeResult(self.results.pop(0))
+        return FakeResult(self.results[0] if self.results else None)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return (await self.execute(statement, params)).scalars()
+
+    async def get(self, model, pk):
+        return self.objects.get(pk)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def add_all(self, objs):
+        self.added.extend(objs)
+
+    async def flush(self):
+        pass
+
+    async def refresh(self, obj):
+        pass
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class RecordingRedis:
+    """
+    fakeredis async (con Lua) que registra los comandos enviados
+
+    - calls: nombre de cada comando en orden; un pipeline cuenta una vez
+      como "pipeline" (un round-trip)
+    - emulate(script, fn): reemplaza un script Lua que fakeredis no puede
+      correr (ej: usa cjson) por fn(keys, argv), sync o async
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._emulated = {}
+        self.calls = []
+
+    @property
+    def round_trips(self) -> int:
+        return len(self.calls)
+
+    def emulate(self, script, fn):
+        self._emulated[script] = fn
+
+    async def eval(self, script, numkeys, *args):
+        self.calls.append("eval")
+        if script in self._emulated:
+            result = self._emulated[script](list(args[:numkeys]), list(args[numkeys:]))
+            return await result if inspect.isawaitable(result) else result
+        return await self._client.eval(script, numkeys, *args)
+
+    def pipeline(self, transaction=True):
+        pipe = self._client.pipeline(transaction=transaction)
+        execute = pipe.execute
+
+        async def recorded(*args, **kwargs):
+            self.calls.append("pipeline")
+            return await execute(*args, **kwargs)
+
+        pipe.execute = recorded
+        return pipe
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def recorded(*args, **kwargs):
+            self.calls.append(name)
+            return attr(*args, **kwargs)
+
+        return recorded
+
+
+@pytest.fixture
+def scripted_session():
+    """Fábrica de ScriptedSession: scripted_session(*results, repeat=, responder=, objects=)"""
+    return ScriptedSession
+
+
+@pytest.fixture
+def fake_redis():
+    """
+    Redis en proceso (fakeredis con Lua, decode_responses como la app)
+    Servidor propio por test: vacío al empezar y usable desde el loop del
+    test o el de los benchmarks (conecta en el primer comando)
+    """
+    import fakeredis
+    import fakeredis.aioredis
+
+    client = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    return RecordingRedis(client)
+
+
+@pytest.fixture
+def use_fake_redis(monkeypatch, fake_redis):
+    """use_fake_redis(modulo, ...): el get_redis_client de esos módulos devuelve fake_redis"""
+    def _use(*modules):
+        async def get_client():
+            return fake_redis
+
+        for module in modules:
+            monkeypatch.setattr(module, "get_redis_client", get_client)
+        return fake_redis
+
+    return _use
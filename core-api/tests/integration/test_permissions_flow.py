@@ -0,0 +1,44 @@
+"""
+Integration Tests - Permisos RBAC
+Un usuario con rol por código (users.rol) resuelve los permisos de su rol
+del sistema sembrado en la DB
+"""
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.security import get_password_hash
+from models import Tienda, User
+from models_rbac import SYSTEM_ROLES
+from services import permission_service
+from services.permission_service import PermissionService, RolePermissionCache
+
+
+@pytest.mark.asyncio
+class TestUserPermissionsFlow:
+
+    async def test_seeded_cajero_user_gets_cajero_permissions(self, db_session: AsyncSession, use_fake_redis, monkeypatch):
+        use_fake_redis(permission_service)
+        monkeypatch.setattr(permission_service, "role_permission_cache", RolePermissionCache())
+
+        tienda = Tienda(nombre="Test Store", rubro="general")
+        db_session.add(tienda)
+        await db_session.commit()
+
+        await PermissionService.initialize_system_permissions(db_session)
+        await PermissionService.initialize_system_roles(db_session)
+
+        cajero = User(
+            email="cajero@test.com",
+            hashed_password=get_password_hash("testpassword"),
+            full_name="Cajero Test",
+            rol="cajero",
+            tienda_id=tienda.id,
+        )
+        db_session.add(cajero)
+        await db_session.commit()
+
+        perms = await PermissionService.get_user_permissions(db_session, cajero.id)
+
+        assert perms == set(SYSTEM_ROLES["cajero"]["permissions"])
+        assert await PermissionService.user_has_permission(db_session, cajero.id, "caja.abrir")
+        assert not await PermissionService.user_has_permission(db_session, cajero.id, "stock.ajustar")
@@ -0,0 +1,92 @@
+"""
+Benchmark: historial del ledger, página 1 vs página 1.000
+
+200k movimientos de una tienda, páginas de 100. Con keyset la página 1.000
+cuesta lo mismo que la primera (un rango sobre el índice compuesto); con
+OFFSET la misma página lee y descarta 99.900 filas. Requiere PostgreSQL
+(fixture db_session).
+"""
+import statistics
+import time
+
+import pytest
+from sqlalchemy import text
+
+from models import Location, Product, ProductVariant, Tienda
+from services.ledger_history_service import ledger_page
+from utils.pagination import encode_cursor
+
+
+N_ROWS = 200_000
+PAGE = 100
+TARGET_PAGE = 1_000
+RUNS = 15
+
+
+async def _seed(session) -> Tienda:
+    tienda = Tienda(nombre="Bench Ledger", rubro="ropa")
+    session.add(tienda)
+    await session.flush()
+    product = Product(tienda_id=tienda.id, name="Remera", base_sku="REM")
+    session.add(product)
+    await session.flush()
+    variant = ProductVariant(product_id=product.product_id, tienda_id=tienda.id, sku="REM-M", price=1000.0)
+    location = Location(tienda_id=tienda.id, name="Local", type="STORE")
+    session.add_all([variant, location])
+    await session.flush()
+
+    await session.execute(text("""
+        INSERT INTO inventory_ledger
+            (transaction_id, tienda_id, variant_id, location_id, delta, transaction_type, occurred_at)
+        SELECT gen_random_uuid(), :tienda_id, :variant_id, :location_id, -1, 'SALE',
+               now() - (g * interval '1 second')
+        FROM generate_series(1, :n) AS g
+    """), {
+        "tienda_id": tienda.id,
+        "variant_id": variant.variant_id,
+        "location_id": location.location_id,
+        "n": N_ROWS,
+    })
+    await session.execute(text("ANALYZE inventory_ledger"))
+    return tienda
+
+
+async def _median_ms(fn) -> float:
+    tiempos = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        await fn()
+        tiempos.append((time.perf_counter() - started) * 1000)
+    return statistics.median(tiempos)
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+async def test_deep_keyset_page_costs_like_first_page(db_session):
+    """Página 1.000 por keyset < 3× la página 1 (OFFSET solo se informa)"""
+    tienda = await _seed(db_session)
+
+    # Cursor de la última fila de la página 999 (una sola vez, para el setup)
+    ultimo = (await db_session.execute(text("""
+        SELECT occurred_at, transaction_id FROM inventory_ledger
+        WHERE tienda_id = :tienda_id
+        ORDER BY occurred_at DESC, transaction_id DESC
+        OFFSET :offset LIMIT 1
+    """), {"tienda_id": tienda.id, "offset": (TARGET_PAGE - 1) * PAGE - 1})).one()
+    cursor = encode_cursor(ultimo.occurred_at, ultimo.transaction_id)
+
+    primera = await _median_ms(lambda: ledger_page(db_session, tienda.id, limit=PAGE))
+    profunda = await _median_ms(lambda: ledger_page(db_session, tienda.id, cursor=cursor, limit=PAGE))
+    offset = await _median_ms(lambda: db_session.execute(text("""
+        SELECT * FROM inventory_ledger WHERE tienda_id = :tienda_id
+        ORDER BY occurred_at DESC, transaction_id DESC LIMIT :limit OFFSET :offset
+    """), {"tienda_id": tienda.id, "limit": PAGE, "offset": (TARGET_PAGE - 1) * PAGE}))
+
+    filas, _ = await ledger_page(db_session, tienda.id, cursor=cursor, limit=PAGE)
+    print(
+        f"\nledger {N_ROWS} filas: página 1 {primera:.2f}ms, "
+        f"página {TARGET_PAGE} keyset {profunda:.2f}ms, OFFSET {offset:.2f}ms"
+    )
+
+    assert len(filas) == PAGE
+    assert profunda < primera * 3 + 2.0
@@ -0,0 +1,76 @@
+"""
+Benchmark: latencia de checkout durante un aluvión de logins
+
+50 cajeros inician sesión a la vez (cambio de turno) mientras el mismo
+worker atiende checkouts. Con bcrypt en el pool de hashing, la latencia de
+los checkouts (simulados como tareas cortas del event loop) se mantiene
+plana; con bcrypt síncrono cada login congelaba el loop ~100-250ms.
+"""
+import asyncio
+import statistics
+import time
+
+import bcrypt
+import pytest
+
+from core import security
+from core.security import verify_password, verify_password_async
+
+
+N_LOGINS = 50
+ROUNDS = 10  # ~50-100ms por verificación: mismo orden que producción
+CHECKOUT_WORK_S = 0.002
+
+
+async def _checkouts(stop: asyncio.Event) -> list:
+    """Checkouts continuos: latencia = tiempo real vs. trabajo esperado"""
+    latencias = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(CHECKOUT_WORK_S)
+        latencias.append(time.perf_counter() - started - CHECKOUT_WORK_S)
+    return latencias
+
+
+async def _storm(verify, n_logins: int) -> tuple:
+    hashed = bcrypt.hashpw(b"turno-tarde", bcrypt.gensalt(rounds=ROUNDS)).decode()
+    stop = asyncio.Event()
+    checkouts = asyncio.create_task(_checkouts(stop))
+
+    started = time.perf_counter()
+    resultados = await asyncio.gather(*(verify("turno-tarde", hashed) for _ in range(n_logins)))
+    duracion = time.perf_counter() - started
+
+    stop.set()
+    latencias = await checkouts
+    assert all(resultados)
+    return duracion, latencias
+
+
+def _p99(values: list) -> float:
+    return statistics.quantiles(values, n=100)[98] if len(values) >= 2 else max(values, default=0.0)
+
+
+@pytest.mark.slow
+async def test_checkout_latency_flat_during_login_storm(monkeypatch):
+    """p99 de latencia extra de checkout < 50ms con 50 logins concurrentes"""
+    monkeypatch.setattr(security.settings, "BCRYPT_ROUNDS", ROUNDS)
+
+    duracion, latencias = await _storm(verify_password_async, N_LOGINS)
+
+    # Referencia: bcrypt síncrono dentro del loop (solo 5 logins, para no demorar)
+    async def _blocking(password, hashed):
+        return verify_password(password, hashed)
+
+    _, latencias_bloqueantes = await _storm(_blocking, 5)
+
+    p99_ms = _p99(latencias) * 1000
+    print(
+        f"\nlogin storm: {N_LOGINS} logins en {duracion:.2f}s "
+        f"({N_LOGINS / duracion:.1f} logins/s), {len(latencias)} checkouts, "
+        f"latencia extra p50={statistics.median(latencias) * 1000:.1f}ms p99={p99_ms:.1f}ms "
+        f"(bcrypt síncrono: máx {max(latencias_bloqueantes, default=0.0) * 1000:.0f}ms)"
+    )
+
+    assert len(latencias) > N_LOGINS
+    assert p99_ms < 50.0
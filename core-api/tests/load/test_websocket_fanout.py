@@ -0,0 +1,240 @@
+"""
+Load Test - Fan-out WebSocket multi-worker
+Miles de sockets simulados repartidos en varios workers que comparten un broker Pub/Sub
+"""
+import asyncio
+import time
+import pytest
+from core.config import settings
+from core.websockets import ConnectionManager, tienda_channel
+
+
+# =====================================================
+# DOBLES DE PRUEBA
+# =====================================================
+
+class FakeWebSocket:
+    """Socket simulado: registra lo recibido y puede ser lento"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received: list[str] = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, payload: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(payload)
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+
+class FakeBroker:
+    """Redis Pub/Sub en memoria compartido entre 'workers'"""
+
+    def __init__(self):
+        self.subscribers: list["FakePubSub"] = []
+        self.published = 0
+
+    async def publish(self, channel: str, data: str) -> int:
+        self.published += 1
+        for sub in self.subscribers:
+            sub.deliver(channel, data)
+        return len(self.subscribers)
+
+    def pubsub(self) -> "FakePubSub":
+        sub = FakePubSub(self)
+        self.subscribers.append(sub)
+        return sub
+
+
+class FakePubSub:
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.patterns: list[str] = []
+        self.channels: list[str] = []
+
+    async def psubscribe(self, pattern: str):
+        self.patterns.append(pattern.rstrip("*"))
+
+    async def subscribe(self, channel: str):
+        self.channels.append(channel)
+
+    def deliver(self, channel: str, data: str):
+        if channel in self.channels:
+            self.queue.put_nowait({"type": "message", "channel": channel, "data": data})
+        elif any(channel.startswith(p) for p in self.patterns):
+            self.queue.put_nowait({"type": "pmessage", "channel": channel, "data": data})
+
+    def drop(self):
+        """Simula un corte de la conexión a Redis"""
+        self.queue.put_nowait(ConnectionError("connection reset"))
+
+    async def listen(self):
+        while True:
+            item = await self.queue.get()
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def aclose(self):
+        if self in self.broker.subscribers:
+            self.broker.subscribers.remove(self)
+
+
+async def _drain(managers, timeout: float = 5.0):
+    """Espera a que se vacíen las colas de todos los workers"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+        if all(
+            client.queue.empty()
+            for m in managers
+            for client in m._clients.values()
+        ):
+            await asyncio.sleep(0.01)
+            return
+
+
+# =====================================================
+# TESTS
+# =====================================================
+
+@pytest.mark.slow
+class TestWebSocketFanout:
+
+    async def test_fanout_reaches_every_worker(self):
+        """Un evento publicado en un worker llega a los sockets de todos los workers"""
+        broker = FakeBroker()
+        workers = [ConnectionManager() for _ in range(4)]
+        for w in workers:
+            await w.start(redis_client=broker)
+
+        tiendas = [f"tienda-{i}" for i in range(5)]
+        sockets: dict[str, list[FakeWebSocket]] = {t: [] for t in tiendas}
+
+        # 4 workers x 5 tiendas x 150 sockets = 3000 sockets
+        for w in workers:
+            for t in tiendas:
+                for _ in range(150):
+                    ws = FakeWebSocket()
+                    await w.connect(ws, t)
+                    sockets[t].append(ws)
+
+        await workers[0].send_to_tienda("tienda-3", {"type": "sale_completed", "total": 100})
+        await _drain(workers)
+
+        # Una sola publicación en el broker, serializada una vez
+        assert broker.published == 1
+        for ws in sockets["tienda-3"]:
+            assert len(ws.received) == 2  # bienvenida + evento
+            assert '"sale_completed"' in ws.received[-1]
+        for ws in sockets["tienda-0"]:
+            assert len(ws.received) == 1
+
+        for w in workers:
+            await w.stop()
+
+    async def test_slow_consumer_does_not_stall_store(self):
+        """Un socket lento no frena al resto de la tienda y se descarta por lentitud"""
+        manager = ConnectionManager(queue_size=8, send_timeout=5.0, max_dropped=16)
+
+        fast = [FakeWebSocket() for _ in range(2000)]
+        slow = FakeWebSocket(delay=10)
+        for ws in fast:
+            await manager.connect(ws, "tienda-1")
+        await manager.connect(slow, "tienda-1")
+
+        broadcast_time = 0.0
+        for i in range(50):
+            start = time.perf_counter()
+            await manager.send_to_tienda("tienda-1", {"type": "stock_alert", "seq": i})
+            broadcast_time += time.perf_counter() - start
+            await asyncio.sleep(0)  # Eventos espaciados, como llegan desde Redis
+        await _drain([manager])
+
+        # Encolar 50 mensajes x 2001 sockets no espera a ningún socket
+        assert broadcast_time < 1.0
+        assert all(len(ws.received) == 51 for ws in fast)
+        assert slow not in manager.active_connections["tienda-1"]
+        assert manager.get_stats()["slow_consumers_dropped"] == 1
+
+        await manager.stop()
+
+    async def test_exclude_connection_across_workers(self):
+        """El socket excluido no recibe su propio evento"""
+        broker = FakeBroker()
+        a, b = ConnectionManager(), ConnectionManager()
+        await a.start(redis_client=broker)
+        await b.start(redis_client=broker)
+
+        origin, other = FakeWebSocket(), FakeWebSocket()
+        await a.connect(origin, "t")
+        await b.connect(other, "t")
+
+        await a.send_to_tienda("t", {"type": "ping"}, exclude=origin)
+        await _drain([a, b])
+
+        assert len(origin.received) == 1
+        assert len(other.received) == 2
+
+        await a.stop()
+        await b.stop()
+
+    async def test_worker_ids_unique(self):
+        """Los IDs de worker no dependen de la dirección del objeto (se repite entre procesos)"""
+        ids = {ConnectionManager()._worker_id for _ in range(20)}
+        assert len(ids) == 20
+
+    async def test_resubscribes_after_redis_drop(self, monkeypatch):
+        """Tras un corte el worker entrega localmente y vuelve a suscribirse"""
+        monkeypatch.setattr(settings, "WS_REDIS_RECONNECT_MIN_DELAY", 0.05)
+        broker = FakeBroker()
+        a, b = ConnectionManager(), ConnectionManager()
+        await a.start(redis_client=broker)
+        await b.start(redis_client=broker)
+        ws_a, ws_b = FakeWebSocket(), FakeWebSocket()
+        await a.connect(ws_a, "t")
+        await b.connect(ws_b, "t")
+
+        a._pubsub.drop()
+        await asyncio.sleep(0.01)
+        assert not a.fanout_enabled
+
+        # Desconectado: publica para los demás y entrega localmente
+        await a.send_to_tienda("t", {"type": "ping"})
+        await _drain([a, b])
+        assert len(ws_a.received) == 2
+        assert len(ws_b.received) == 2
+
+        deadline = time.perf_counter() + 2
+        while not a.fanout_enabled and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        assert a.get_stats()["redis_reconnects"] == 1
+
+        await b.send_to_tienda("t", {"type": "pong"})
+        await _drain([a, b])
+        assert len(ws_a.received) == 3
+        assert len(ws_b.received) == 3
+
+        await a.stop()
+        await b.stop()
+
+    async def test_local_fallback_without_redis(self):
+        """Sin Redis el manager entrega localmente"""
+        manager = ConnectionManager()
+        ws = FakeWebSocket()
+        await manager.connect(ws, "t")
+
+        await manager.send_to_tienda("t", {"type": "payment_received"})
+        await _drain([manager])
+
+        assert not manager.fanout_enabled
+        assert len(ws.received) == 2
+        assert tienda_channel("t") == "ws:tienda:t"
+        await manager.stop()
@@ -0,0 +1,37 @@
+"""
+Tests unitarios para la comparación de micro-benchmarks contra la baseline
+"""
+import json
+
+from scripts.benchmarks import compare, load, write_baseline
+
+
+def _resultado(path, medianas):
+    """JSON con el formato de --benchmark-json de pytest-benchmark"""
+    path.write_text(json.dumps({
+        "machine_info": {"cpu": {"brand_raw": "CPU X"}, "python_version": "3.11.7", "system": "Linux"},
+        "benchmarks": [
+            {"fullname": name, "stats": {"median": m, "mean": m, "stddev": 0.0, "rounds": 10}}
+            for name, m in medianas.items()
+        ],
+    }))
+    return path
+
+
+class TestBenchmarkCompare:
+
+    def test_baseline_keeps_only_stats(self, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        write_baseline(_resultado(tmp_path / "run.json", {"b::uno": 0.002}), baseline)
+
+        benchmarks, machine = load(baseline)
+        assert benchmarks == {"b::uno": {"median": 0.002, "mean": 0.002, "stddev": 0.0, "rounds": 10}}
+        assert machine["cpu"] == "CPU X"
+
+    def test_flags_only_slowdowns_above_threshold(self, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        write_baseline(_resultado(tmp_path / "base.json", {"lento": 1.0, "ruido": 1.0, "rapido": 1.0}), baseline)
+        actual = _resultado(tmp_path / "actual.json", {"lento": 1.3, "ruido": 1.1, "rapido": 0.5, "nuevo": 1.0})
+
+        assert compare(actual, baseline, threshold=15) == 1
+        assert compare(actual, baseline, threshold=40) == 0
@@ -0,0 +1,75 @@
+"""
+Tests unitarios para CajaService
+Verifica los totales acumulados y la reconciliación contra filas crudas
+"""
+from uuid import uuid4
+
+from models import SesionCaja
+from services.caja_service import CajaService, monto_esperado
+
+
+def _sesion(**totales) -> SesionCaja:
+    return SesionCaja(
+        id=uuid4(),
+        monto_inicial=1000.0,
+        estado="abierta",
+        usuario_id=uuid4(),
+        tienda_id=uuid4(),
+        **totales
+    )
+
+
+class TestTotales:
+
+    def test_monto_esperado_only_counts_cash(self):
+        sesion = _sesion(
+            total_ventas_efectivo=500.0,
+            total_ventas_otros=9999.0,
+            total_ingresos=200.0,
+            total_egresos=50.0
+        )
+        assert monto_esperado(sesion) == 1650.0
+
+    async def test_registrar_venta_is_single_atomic_update(self, scripted_session):
+        session = scripted_session()
+
+        await CajaService(session).registrar_venta(uuid4(), 150.0, "efectivo")
+
+        assert len(session.statements) == 1
+        sql = session.statements[0]
+        assert sql.startswith("UPDATE sesiones_caja SET")
+        assert "total_ventas_efectivo=(sesiones_caja.total_ventas_efectivo +" in sql
+        assert "cantidad_tickets=(sesiones_caja.cantidad_tickets +" in sql
+        assert "WHERE sesiones_caja.id =" in sql
+
+    async def test_otros_medios_go_to_their_own_total(self, scripted_session):
+        session = scripted_session()
+
+        await CajaService(session).registrar_venta(uuid4(), 150.0, "tarjeta_debito")
+
+        sql = session.statements[0]
+        assert "total_ventas_otros=" in sql
+        assert "total_ventas_efectivo=" not in sql
+
+
+class TestReconciliar:
+
+    async def test_matching_totals_are_ok(self, scripted_session):
+        sesion = _sesion(total_ventas_efectivo=500.0, cantidad_tickets=2, total_ingresos=100.0)
+        session = scripted_session((500.0, 0.0, 2), (100.0, 0.0))
+
+        resultado = await CajaService(session).reconciliar(sesion)
+
+        assert resultado["ok"]
+        assert len(session.statements) == 2
+
+    async def test_drift_is_reported_and_fixed(self, scripted_session):
+        sesion = _sesion(total_ventas_efectivo=450.0, cantidad_tickets=1)
+        session = scripted_session((500.0, 0.0, 2), (0.0, 0.0))
+
+        resultado = await CajaService(session).reconciliar(sesion, corregir=True)
+
+        assert not resultado["ok"]
+        assert resultado["diferencias"]["total_ventas_efectivo"] == {"acumulado": 450.0, "real": 500.0}
+        assert set(resultado["diferencias"]) == {"total_ventas_efectivo", "cantidad_tickets"}
+        assert session.statements[-1].startswith("UPDATE sesiones_caja SET")
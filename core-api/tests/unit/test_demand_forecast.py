@@ -0,0 +1,80 @@
+"""
+Tests unitarios para el motor de pronóstico de demanda
+"""
+import numpy as np
+from datetime import date
+from uuid import uuid4
+from services.demand_forecast import (
+    forecast_restock, sales_matrix, weekday_index, NO_STOCKOUT_DAYS
+)
+
+
+# Lunes 2026-01-05: la columna 0 es lunes
+LUNES = date(2026, 1, 5)
+
+
+class TestForecastRestock:
+
+    def test_constant_demand(self):
+        """Demanda constante de 10/día: sin desvío, reorden = lead time × 10"""
+        sales = np.full((1, 28), 10.0)
+
+        result = forecast_restock(sales, np.array([100.0]), LUNES, lead_time_days=7, coverage_days=30)
+
+        assert np.isclose(result.daily_forecast[0], 10.0)
+        assert np.isclose(result.safety_stock[0], 0.0)
+        assert np.isclose(result.reorder_point[0], 70.0)
+        assert result.days_to_stockout[0] == 9  # día 10 (índice 9) acumula 100
+        assert result.suggested_qty[0] == 270  # (7 + 30) × 10 − 100
+
+    def test_weekday_seasonality(self):
+        """Solo se vende los sábados: índice 7× en sábado, 0 el resto"""
+        sales = np.zeros((1, 28))
+        sales[0, 5::7] = 7.0
+
+        index = weekday_index(sales, (LUNES.weekday() + np.arange(28)) % 7)
+
+        assert np.isclose(index[0, 5], 7.0)
+        assert np.isclose(index[0, [0, 1, 2, 3, 4, 6]], 0.0).all()
+
+    def test_no_sales_never_stocks_out(self):
+        """Sin ventas: sin quiebre proyectado y sin sugerencia"""
+        result = forecast_restock(np.zeros((1, 14)), np.array([5.0]), LUNES)
+
+        assert result.days_to_stockout[0] == NO_STOCKOUT_DAYS
+        assert result.suggested_qty[0] == 0
+
+    def test_per_variant_lead_time(self):
+        """Lead time por variante escala la demanda durante la reposición"""
+        sales = np.full((2, 14), 4.0)
+
+        result = forecast_restock(sales, np.zeros(2), LUNES, lead_time_days=np.array([2, 10]))
+
+        assert np.allclose(result.lead_time_demand, [8.0, 40.0])
+
+
+    def test_store_without_variants_returns_empty_result(self):
+        result = forecast_restock(np.zeros((0, 28)), np.zeros(0), LUNES, lead_time_days=7)
+
+        assert result.daily_forecast.shape == (0,)
+        assert result.suggested_qty.shape == (0,)
+
+
+class TestSalesMatrix:
+
+    def test_rows_outside_window_are_dropped(self):
+        """Filas fuera de ventana o de variantes desconocidas se ignoran"""
+        v1, v2 = uuid4(), uuid4()
+        rows = [
+            (v1, date(2026, 1, 5), 3),
+            (v1, date(2026, 1, 5), 2),
+            (v2, date(2026, 1, 7), 1),
+            (v2, date(2026, 2, 1), 9),
+            (uuid4(), date(2026, 1, 6), 4),
+        ]
+
+        matrix = sales_matrix(rows, {v1: 0, v2: 1}, LUNES, 7)
+
+        assert matrix[0, 0] == 5
+        assert matrix[1, 2] == 1
+        assert matrix.sum() == 6
@@ -0,0 +1,57 @@
+"""
+Tests unitarios de las rutas que llaman a servicios externos (AFIP, Mercado Pago)
+Verifica que la llamada ocurre sin transacción abierta: una respuesta lenta
+no puede disparar idle_in_transaction_session_timeout
+"""
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+from api.routes import payments, ventas
+from api.routes.ventas import FacturarVentaRequest
+
+
+def _venta(status_pago="pagado"):
+    return SimpleNamespace(id=uuid4(), total=1210.0, fecha=datetime(2026, 10, 19), status_pago=status_pago)
+
+
+class TestExternalCallsOutsideTransaction:
+
+    async def test_afip_called_after_read_transaction_is_closed(self, scripted_session, monkeypatch):
+        venta = _venta()
+        session = scripted_session(venta, None)  # Venta, sin factura previa
+        llamadas = []
+
+        class FakeAfip:
+            async def emitir_factura(self, **kwargs):
+                llamadas.append((session.commits, list(session.added)))
+                return {"cae": "74123456789012", "vto": "2026-10-29", "numero_comprobante": 1, "punto_venta": 1}
+
+        monkeypatch.setattr(ventas, "AfipService", FakeAfip)
+
+        respuesta = await ventas.facturar_venta(
+            venta.id, FacturarVentaRequest(tipo_factura="B", cliente_doc_nro="20123456789"),
+            SimpleNamespace(id=uuid4()), session
+        )
+
+        # La transacción de lectura se cerró antes de AFIP; la factura va en otra
+        assert llamadas == [(1, [])]
+        assert session.commits == 2
+        assert respuesta.cae == "74123456789012"
+
+    async def test_mercadopago_called_after_read_transaction_is_closed(self, scripted_session, monkeypatch):
+        venta = _venta(status_pago="pendiente")
+        detalle = SimpleNamespace(producto_id=uuid4(), cantidad=1.0, precio_unitario=1210.0, subtotal=1210.0)
+        session = scripted_session(venta, [detalle])
+        commits_al_llamar = []
+
+        def create_preference(**kwargs):
+            commits_al_llamar.append(session.commits)
+            return {"preference_id": "pref-1", "init_point": "https://mp/pref-1"}
+
+        monkeypatch.setattr(payments.payment_service, "create_preference", create_preference)
+
+        respuesta = await payments.generar_pago(venta.id, SimpleNamespace(id=uuid4()), session)
+
+        assert commits_al_llamar == [1]
+        assert respuesta["preference_id"] == "pref-1"
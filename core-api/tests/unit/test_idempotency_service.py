@@ -0,0 +1,99 @@
+"""
+Tests unitarios para IdempotencyStore
+Verifica replay con 1 GET, colapso de duplicados concurrentes y conflictos
+"""
+import asyncio
+import json
+
+import pytest
+
+from core.config import settings
+from core.exceptions import IdempotencyConflictException
+from services import idempotency_service
+from services.idempotency_service import RELEASE_SCRIPT, IdempotencyStore, request_fingerprint
+
+
+@pytest.fixture
+def redis(use_fake_redis, fake_redis):
+    use_fake_redis(idempotency_service)
+
+    async def release(keys, argv):
+        # RELEASE_SCRIPT (usa cjson): borra solo el marcador pending propio
+        entry = json.loads(await fake_redis.get(keys[0]) or "null")
+        if entry and entry["state"] == "pending" and entry["token"] == argv[0]:
+            return await fake_redis.delete(keys[0])
+        return 0
+
+    fake_redis.emulate(RELEASE_SCRIPT, release)
+    return fake_redis
+
+
+FINGERPRINT = request_fingerprint({"items": [{"producto_id": "p1", "cantidad": 1}], "metodo_pago": "efectivo"})
+
+
+class TestIdempotencyStore:
+
+    def test_fingerprint_ignores_key_order(self):
+        assert request_fingerprint({"a": 1, "b": 2}) == request_fingerprint({"b": 2, "a": 1})
+        assert request_fingerprint({"a": 1}) != request_fingerprint({"a": 2})
+
+    async def test_completed_request_is_replayed_with_one_get(self, redis):
+        store = IdempotencyStore("checkout")
+        claim, replay = await store.begin("t1", "key-1", FINGERPRINT)
+        assert claim is not None and replay is None
+        await store.complete(claim, {"total": 100.0})
+        await store.release(claim)  # no-op tras completar
+
+        redis.calls.clear()
+        claim, replay = await store.begin("t1", "key-1", FINGERPRINT)
+
+        assert claim is None
+        assert replay == {"total": 100.0}
+        assert redis.calls == ["get"]
+
+    async def test_concurrent_duplicate_waits_for_original(self, redis):
+        store = IdempotencyStore("checkout")
+        claim, _ = await store.begin("t1", "key-1", FINGERPRINT)
+
+        duplicado = asyncio.create_task(store.begin("t1", "key-1", FINGERPRINT))
+        await asyncio.sleep(0.05)
+        assert not duplicado.done()
+
+        await store.complete(claim, {"total": 100.0})
+        claim_dup, replay = await asyncio.wait_for(duplicado, timeout=1)
+
+        assert claim_dup is None
+        assert replay == {"total": 100.0}
+
+    async def test_failed_request_releases_key_for_retry(self, redis):
+        store = IdempotencyStore("checkout")
+        claim, _ = await store.begin("t1", "key-1", FINGERPRINT)
+        await store.release(claim)
+
+        retry, replay = await store.begin("t1", "key-1", FINGERPRINT)
+        assert retry is not None and replay is None
+
+    async def test_reused_key_with_other_body_is_rejected(self, redis):
+        store = IdempotencyStore("checkout")
+        claim, _ = await store.begin("t1", "key-1", FINGERPRINT)
+        await store.complete(claim, {"total": 100.0})
+
+        with pytest.raises(IdempotencyConflictException) as exc:
+            await store.begin("t1", "key-1", request_fingerprint({"otro": True}))
+        assert exc.value.status_code == 422
+
+    async def test_original_still_running_after_wait_is_conflict(self, redis, monkeypatch):
+        monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.05)
+        store = IdempotencyStore("checkout")
+        await store.begin("t1", "key-1", FINGERPRINT)
+
+        with pytest.raises(IdempotencyConflictException) as exc:
+            await store.begin("t1", "key-1", FINGERPRINT)
+        assert exc.value.status_code == 409
+
+    async def test_keys_are_scoped(self, redis):
+        store = IdempotencyStore("checkout")
+        await store.begin("t1", "key-1", FINGERPRINT)
+
+        claim, replay = await store.begin("t2", "key-1", FINGERPRINT)
+        assert claim is not None and replay is None
@@ -0,0 +1,42 @@
+"""
+Tests unitarios para InsightService
+Verifica que la generación sea set-based (round-trips constantes)
+"""
+from types import SimpleNamespace
+from uuid import uuid4
+from services.insight_service import InsightService
+
+
+def _producto(stock: float):
+    return SimpleNamespace(id=uuid4(), nombre="Remera", sku="REM-001", stock_actual=stock)
+
+
+class TestStockAlerts:
+
+    async def test_one_select_and_one_insert_for_whole_catalog(self, scripted_session):
+        """5000 productos candidatos = 1 SELECT + 1 INSERT multi-fila"""
+        session = scripted_session([_producto(5) for _ in range(5000)])
+
+        creados = await InsightService().generate_stock_alerts(uuid4(), session)
+
+        assert session.executes == 1
+        assert len(session.bulk) == 1
+        assert len(creados) == 5000
+
+    async def test_urgency_levels(self, scripted_session):
+        """El nivel de urgencia depende del stock"""
+        session = scripted_session([_producto(2), _producto(4), _producto(8)])
+
+        creados = await InsightService().generate_stock_alerts(uuid4(), session, umbral=10)
+
+        assert [row["nivel_urgencia"] for row in creados] == ["CRITICA", "ALTA", "MEDIA"]
+        assert all(row["is_active"] for row in creados)
+
+    async def test_no_candidates_no_insert(self, scripted_session):
+        """Sin candidatos no se ejecuta el INSERT"""
+        session = scripted_session([])
+
+        creados = await InsightService().generate_out_of_stock_alerts(uuid4(), session)
+
+        assert creados == []
+        assert session.bulk == []
@@ -0,0 +1,57 @@
+"""
+Tests unitarios para el historial del ledger paginado por keyset
+Verifica el SQL generado y el cursor opaco
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from services.ledger_history_service import ledger_page
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def _rows(n):
+    inicio = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    return [
+        SimpleNamespace(InventoryLedger=SimpleNamespace(
+            occurred_at=inicio - timedelta(minutes=i), transaction_id=uuid4()
+        ))
+        for i in range(n)
+    ]
+
+
+class TestLedgerHistory:
+
+    async def test_keyset_filters_on_ledger_tenant_without_offset(self, scripted_session):
+        session = scripted_session(_rows(3))
+        cursor = encode_cursor(datetime(2026, 10, 19, tzinfo=timezone.utc), uuid4())
+
+        await ledger_page(session, uuid4(), variant_id=uuid4(), transaction_type="sale", cursor=cursor, limit=50)
+
+        sql, params = session.statements[0], session.params[0]
+        assert "inventory_ledger.tienda_id =" in sql
+        assert "(inventory_ledger.occurred_at, inventory_ledger.transaction_id) <" in sql
+        assert "ORDER BY inventory_ledger.occurred_at DESC, inventory_ledger.transaction_id DESC" in sql
+        assert "OFFSET" not in sql
+        assert "SALE" in params.values()
+        assert 51 in params.values()  # limit + 1
+
+    async def test_next_cursor_points_at_last_row(self, scripted_session):
+        rows = _rows(11)
+        filas, next_cursor = await ledger_page(scripted_session(rows), uuid4(), limit=10)
+
+        assert len(filas) == 10
+        ultimo = rows[9].InventoryLedger
+        assert decode_cursor(next_cursor) == (ultimo.occurred_at, ultimo.transaction_id)
+
+    async def test_last_page_has_no_cursor(self, scripted_session):
+        filas, next_cursor = await ledger_page(scripted_session(_rows(4)), uuid4(), limit=10)
+
+        assert len(filas) == 4
+        assert next_cursor is None
+
+    async def test_invalid_cursor_is_rejected(self, scripted_session):
+        with pytest.raises(ValueError):
+            await ledger_page(scripted_session([]), uuid4(), cursor="no-es-un-cursor")
@@ -0,0 +1,133 @@
+"""
+Tests unitarios para OfflineSalesService
+Verifica deduplicación por clave, rechazos por venta y escrituras por lote
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+from schemas_models.ventas import VentaOfflineInput
+from services.offline_sales_service import OfflineSalesService
+
+
+def _offline_session(scripted_session, existentes=None, productos=(), sesion_id=None, robadas=None):
+    """
+    Sesión para la ingesta offline
+
+    - `existentes`: {clave: venta_id} ya presentes en la DB
+    - `productos`: filas de Producto visibles para la tienda
+    - `robadas`: claves que un reintento concurrente insertó primero
+    """
+    existentes, robadas = dict(existentes or {}), dict(robadas or {})
+
+    def responder(sql, params):
+        if sql.startswith("INSERT INTO ventas"):
+            claves = [v for k, v in params.items() if k.startswith("idempotency_key")]
+            entraron = [c for c in claves if c not in robadas]
+            existentes.update(robadas)
+            return entraron
+        if sql.startswith("SELECT ventas.idempotency_key"):
+            return list(existentes.items())
+        if sql.startswith("SELECT productos.id, productos.nombre"):
+            return list(productos)
+        if sql.startswith("SELECT sesiones_caja.id"):
+            return sesion_id
+        return None
+
+    return scripted_session(responder=responder)
+
+
+def _producto(tipo="unidad", precio=100.0):
+    return SimpleNamespace(id=uuid4(), nombre="Remera", precio_venta=precio, tipo=tipo)
+
+
+def _venta(producto, clave=None, cantidad=1.0, fecha=None, **item):
+    return VentaOfflineInput(
+        idempotency_key=clave or str(uuid4()),
+        fecha=fecha or datetime.now(timezone.utc) - timedelta(hours=2),
+        items=[{"producto_id": producto.id, "cantidad": cantidad, **item}],
+        metodo_pago="efectivo"
+    )
+
+
+class TestIngest:
+
+    async def test_batch_is_written_in_constant_statements(self, scripted_session):
+        """200 ventas = mismas sentencias que 1: un INSERT por tabla y un UPDATE de stock"""
+        productos = [_producto() for _ in range(5)]
+        ventas = [_venta(productos[i % 5]) for i in range(200)]
+        session = _offline_session(scripted_session, productos=productos, sesion_id=uuid4())
+
+        resultados = await OfflineSalesService(session).ingest(uuid4(), uuid4(), ventas)
+
+        assert [r["status"] for r in resultados] == ["created"] * 200
+        assert [r["idempotency_key"] for r in resultados] == [v.idempotency_key for v in ventas]
+        assert [tabla for tabla, _ in session.bulk] == ["detalles_venta"]
+        assert len(session.bulk[0][1]) == 200
+        # Cada detalle lleva la fecha de su venta (clave de partición de ambas tablas)
+        assert session.bulk[0][1][0]["fecha"] == ventas[0].fecha
+
+        inserts = [sql for sql in session.statements if sql.startswith("INSERT INTO ventas")]
+        assert len(inserts) == 1 and "ON CONFLICT (tienda_id, idempotency_key, fecha) DO NOTHING" in inserts[0]
+        stock = [sql for sql in session.statements if sql.startswith("UPDATE productos")]
+        assert len(stock) == 1 and "FROM (VALUES" in stock[0]
+        assert any(sql.startswith("UPDATE sesiones_caja") for sql in session.statements)
+        assert len(session.statements) == 7
+
+    async def test_replayed_keys_are_returned_as_duplicates(self, scripted_session):
+        producto = _producto()
+        previa = _venta(producto)
+        nueva = _venta(producto)
+        venta_id = uuid4()
+        session = _offline_session(scripted_session, existentes={previa.idempotency_key: venta_id}, productos=[producto])
+
+        resultados = await OfflineSalesService(session).ingest(uuid4(), None, [previa, nueva, nueva])
+
+        assert resultados[0] == {
+            "idempotency_key": previa.idempotency_key, "status": "duplicate",
+            "venta_id": venta_id, "detalle": None
+        }
+        assert resultados[1]["status"] == "created"
+        assert resultados[2]["status"] == "duplicate"
+        assert resultados[2]["venta_id"] == resultados[1]["venta_id"]
+        assert len(session.bulk[0][1]) == 1
+
+    async def test_full_replay_writes_nothing(self, scripted_session):
+        producto = _producto()
+        ventas = [_venta(producto) for _ in range(3)]
+        session = _offline_session(scripted_session, existentes={v.idempotency_key: uuid4() for v in ventas})
+
+        resultados = await OfflineSalesService(session).ingest(uuid4(), uuid4(), ventas)
+
+        assert {r["status"] for r in resultados} == {"duplicate"}
+        assert len(session.statements) == 1
+        assert session.bulk == []
+
+    async def test_invalid_sales_are_rejected_individually(self, scripted_session):
+        producto = _producto()
+        vieja = _venta(producto, fecha=datetime.now(timezone.utc) - timedelta(days=30))
+        decimal = _venta(producto, cantidad=1.5)
+        desconocida = _venta(_producto())
+        valida = _venta(producto, precio_unitario=80.0, cantidad=2)
+        session = _offline_session(scripted_session, productos=[producto])
+
+        resultados = await OfflineSalesService(session).ingest(
+            uuid4(), None, [vieja, decimal, desconocida, valida]
+        )
+
+        assert [r["status"] for r in resultados] == ["rejected", "rejected", "rejected", "created"]
+        assert "antigua" in resultados[0]["detalle"]
+        detalle = session.bulk[0][1][0]
+        assert detalle["precio_unitario"] == 80.0 and detalle["subtotal"] == 160.0
+
+    async def test_concurrent_retry_loses_race_as_duplicate(self, scripted_session):
+        producto = _producto()
+        venta = _venta(producto)
+        ganadora = uuid4()
+        session = _offline_session(scripted_session, productos=[producto], robadas={venta.idempotency_key: ganadora})
+
+        resultados = await OfflineSalesService(session).ingest(uuid4(), None, [venta])
+
+        assert resultados[0]["status"] == "duplicate"
+        assert resultados[0]["venta_id"] == ganadora
+        assert session.bulk == []
@@ -0,0 +1,83 @@
+"""
+Tests unitarios para el routing batch de SmartRoutingService
+Verifica asignación greedy con descuento de disponibilidad en memoria
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+from services.oms_service import SmartRoutingService
+
+
+def _capability(lat, lng, **kwargs):
+    defaults = dict(
+        latitud=lat, longitud=lng, prioridad=5, costo_picking=500.0, costo_packing=300.0,
+        soporta_standard=True, soporta_express=True, soporta_same_day=False,
+        puede_recibir_pickup=True
+    )
+    defaults.update(kwargs)
+    return SimpleNamespace(**defaults)
+
+
+def _orden(tienda_id, minutos, method="standard"):
+    return SimpleNamespace(
+        id=uuid4(),
+        tienda_id=tienda_id,
+        created_at=datetime(2026, 1, 5) + timedelta(minutes=minutos),
+        shipping_address={"lat": -34.60, "lng": -58.38},
+        shipping_method=method
+    )
+
+
+class TestAssignBatch:
+
+    async def test_two_orders_do_not_claim_same_units(self, scripted_session):
+        """La tienda cercana tiene 1 unidad: la orden más antigua la toma, la otra va a la lejana"""
+        tienda_id, variant_id = uuid4(), uuid4()
+        cerca, lejos = uuid4(), uuid4()
+        primera, segunda = _orden(tienda_id, 0), _orden(tienda_id, 5)
+
+        session = scripted_session(
+            [(cerca, "Centro", _capability(-34.61, -58.39)), (lejos, "Norte", _capability(-34.40, -58.60))],
+            [(primera.id, variant_id, 1), (segunda.id, variant_id, 1)],
+            [(variant_id, cerca, 1.0), (variant_id, lejos, 5.0)],
+            []
+        )
+
+        decisions = await SmartRoutingService(session).assign_batch([segunda, primera])
+
+        assert decisions[primera.id][0] == cerca
+        assert decisions[segunda.id][0] == lejos
+        assert session.executes == 4
+
+    async def test_no_stock_and_unsupported_method(self, scripted_session):
+        """Sin stock suficiente o sin soporte para same_day no hay asignación"""
+        tienda_id, variant_id, location_id = uuid4(), uuid4(), uuid4()
+        sin_stock, same_day = _orden(tienda_id, 0), _orden(tienda_id, 1, method="same_day")
+
+        session = scripted_session(
+            [(location_id, "Centro", _capability(-34.61, -58.39))],
+            [(sin_stock.id, variant_id, 10), (same_day.id, variant_id, 1)],
+            [(variant_id, location_id, 3.0)],
+            []
+        )
+
+        decisions = await SmartRoutingService(session).assign_batch([sin_stock, same_day])
+
+        assert decisions[sin_stock.id] is None
+        assert decisions[same_day.id] is None
+
+    async def test_committed_units_are_not_available(self, scripted_session):
+        """El stock comprometido por órdenes ya asignadas se descuenta"""
+        tienda_id, variant_id, location_id = uuid4(), uuid4(), uuid4()
+        orden = _orden(tienda_id, 0)
+
+        session = scripted_session(
+            [(location_id, "Centro", _capability(None, None))],
+            [(orden.id, variant_id, 2)],
+            [(variant_id, location_id, 3.0)],
+            [(variant_id, location_id, 2.0)]
+        )
+
+        decisions = await SmartRoutingService(session).assign_batch([orden])
+
+        assert decisions[orden.id] is None
@@ -0,0 +1,90 @@
+"""
+Tests unitarios para el mantenimiento de particiones mensuales
+Verifica el DDL generado sin PostgreSQL (conexión falsa)
+"""
+from datetime import date
+
+from services.partition_service import (
+    add_months,
+    archive_partitions,
+    create_partition_sql,
+    ensure_future_partitions,
+)
+
+
+def _connection(scripted_session, partitions, partitioned=("inventory_ledger", "audit_logs")):
+    """Responde a los catálogos de Postgres y registra el DDL ejecutado"""
+
+    def responder(sql, params):
+        if "pg_partitioned_table" in sql:
+            return 1 if params["table"] in partitioned else None
+        if "pg_inherits" in sql:
+            return partitions.get(params["table"], [])
+        return None
+
+    return scripted_session(responder=responder)
+
+
+def _ddl(conn):
+    return [sql for sql in conn.statements if "pg_partitioned_table" not in sql and "pg_inherits" not in sql]
+
+
+def _bound(desde: str, hasta: str) -> str:
+    return f"FOR VALUES FROM ('{desde} 00:00:00+00') TO ('{hasta} 00:00:00+00')"
+
+
+class TestPartitionService:
+
+    def test_add_months_crosses_year(self):
+        assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+        assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+    def test_create_partition_sql_covers_one_month(self):
+        sql = create_partition_sql("inventory_ledger", date(2026, 12, 1))
+
+        assert "inventory_ledger_p2026_12 PARTITION OF inventory_ledger" in sql
+        assert "FROM ('2026-12-01') TO ('2027-01-01')" in sql
+
+    async def test_ensure_future_creates_only_missing_months(self, scripted_session):
+        conn = _connection(
+            scripted_session,
+            {"inventory_ledger": [("inventory_ledger_p2026_10", _bound("2026-10-01", "2026-11-01"))]},
+            partitioned=("inventory_ledger",),
+        )
+
+        creadas = await ensure_future_partitions(conn, months_ahead=2, today=date(2026, 10, 19))
+
+        assert creadas == ["inventory_ledger_p2026_11", "inventory_ledger_p2026_12"]
+        assert all("audit_logs" not in sql for sql in _ddl(conn))
+
+    async def test_ensure_future_keeps_ventas_and_detalles_aligned(self, scripted_session):
+        conn = _connection(scripted_session, {}, partitioned=("ventas", "detalles_venta"))
+
+        creadas = await ensure_future_partitions(conn, months_ahead=1, today=date(2026, 10, 19))
+
+        assert creadas == [
+            "ventas_p2026_10", "ventas_p2026_11", "detalles_venta_p2026_10", "detalles_venta_p2026_11",
+        ]
+
+    async def test_archive_detaches_only_months_before_cutoff(self, scripted_session):
+        conn = _connection(scripted_session, {
+            "audit_logs": [
+                ("audit_logs_p2024_08", _bound("2024-08-01", "2024-09-01")),
+                ("audit_logs_p2024_10", _bound("2024-10-01", "2024-11-01")),
+                ("audit_logs_p_historico", "FOR VALUES FROM (MINVALUE) TO ('2024-08-01 00:00:00+00')"),
+            ],
+        })
+
+        archivadas = await archive_partitions(conn, older_than_months=24, today=date(2026, 10, 19))
+
+        assert archivadas == ["audit_logs_p2024_08", "audit_logs_p_historico"]
+        assert "DETACH PARTITION audit_logs_p2024_08 CONCURRENTLY" in _ddl(conn)[1]
+        assert not any("p2024_10" in sql for sql in _ddl(conn))
+
+    async def test_archive_never_detaches_ledger_months(self, scripted_session):
+        conn = _connection(scripted_session, {
+            "inventory_ledger": [("inventory_ledger_p2020_01", _bound("2020-01-01", "2020-02-01"))],
+        })
+
+        assert await archive_partitions(conn, older_than_months=24, today=date(2026, 10, 19)) == []
+        assert not any("DETACH" in sql for sql in _ddl(conn))
@@ -0,0 +1,49 @@
+"""
+Tests unitarios para el hashing de passwords fuera del event loop
+"""
+import bcrypt
+import pytest
+
+from core import security
+from core.security import (
+    get_password_hash,
+    get_password_hash_async,
+    password_needs_rehash,
+    verify_and_update_password,
+    verify_password_async,
+)
+
+
+@pytest.fixture(autouse=True)
+def low_cost(monkeypatch):
+    """Costo mínimo de bcrypt para que los tests sean rápidos"""
+    monkeypatch.setattr(security.settings, "BCRYPT_ROUNDS", 4)
+
+
+class TestPasswordHashing:
+
+    async def test_async_hash_roundtrip(self):
+        hashed = await get_password_hash_async("secreto")
+
+        assert await verify_password_async("secreto", hashed)
+        assert not await verify_password_async("otro", hashed)
+
+    def test_needs_rehash_when_cost_changes(self):
+        assert not password_needs_rehash(get_password_hash("secreto"))
+        viejo = bcrypt.hashpw(b"secreto", bcrypt.gensalt(rounds=5)).decode()
+        assert password_needs_rehash(viejo)
+        assert password_needs_rehash("no-es-bcrypt")
+
+    async def test_verify_and_update_rehashes_old_cost(self):
+        viejo = bcrypt.hashpw(b"secreto", bcrypt.gensalt(rounds=5)).decode()
+
+        valido, nuevo = await verify_and_update_password("secreto", viejo)
+
+        assert valido
+        assert nuevo is not None and nuevo.startswith("$2b$04$")
+        assert await verify_password_async("secreto", nuevo)
+
+    async def test_verify_and_update_rejects_wrong_password(self):
+        viejo = bcrypt.hashpw(b"secreto", bcrypt.gensalt(rounds=5)).decode()
+
+        assert await verify_and_update_password("otro", viejo) == (False, None)
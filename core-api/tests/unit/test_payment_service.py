@@ -0,0 +1,19 @@
+"""
+Tests unitarios para el armado de items de Mercado Pago
+"""
+from services.payment_service import item_mercadopago
+
+
+class TestItemMercadoPago:
+
+    def test_whole_quantity_keeps_unit_price(self):
+        item = item_mercadopago("Remera", 3.0, 1000.0, 3000.0)
+
+        assert (item["quantity"], item["unit_price"]) == (3, 1000.0)
+
+    def test_weighed_line_is_one_unit_at_subtotal(self):
+        """0.75 kg no se trunca a 0: 1 unidad a precio = subtotal"""
+        item = item_mercadopago("Queso", 0.75, 8000.0, 6000.0)
+
+        assert (item["quantity"], item["unit_price"]) == (1, 6000.0)
+        assert item["quantity"] * item["unit_price"] == 0.75 * 8000.0
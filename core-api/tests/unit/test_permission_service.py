@@ -0,0 +1,103 @@
+"""
+Tests unitarios para PermissionService
+Verifica la resolución de herencia/denegaciones y el cache por versión
+"""
+import pytest
+from uuid import uuid4
+
+from models_rbac import SYSTEM_ROLES, system_role_names
+from services import permission_service
+from services.permission_service import (
+    PermissionService,
+    RolePermissionCache,
+    resolve_role_permissions,
+)
+
+
+def _role_session(scripted_session, roles, permisos):
+    """Responde la jerarquía de roles o los permisos por rol según la query"""
+    return scripted_session(responder=lambda sql, params: roles if "parent_role_id" in sql else permisos)
+
+
+@pytest.fixture
+def cache(monkeypatch, use_fake_redis):
+    use_fake_redis(permission_service)
+    monkeypatch.setattr(permission_service.settings, "RBAC_VERSION_CHECK_SECONDS", 0)
+    fresh = RolePermissionCache()
+    monkeypatch.setattr(permission_service, "role_permission_cache", fresh)
+    return fresh
+
+
+class TestResolveRolePermissions:
+
+    def test_inherits_and_applies_denies(self):
+        admin, encargado, vendedor = uuid4(), uuid4(), uuid4()
+        sets = resolve_role_permissions(
+            parents={admin: None, encargado: admin, vendedor: encargado},
+            grants={admin: {"ventas.ver", "ventas.anular"}, vendedor: {"ventas.crear"}},
+            denies={encargado: {"ventas.anular"}},
+        )
+
+        assert sets[admin] == {"ventas.ver", "ventas.anular"}
+        assert sets[encargado] == {"ventas.ver"}
+        assert sets[vendedor] == {"ventas.ver", "ventas.crear"}
+        assert isinstance(sets[vendedor], frozenset)
+
+    def test_cycle_does_not_recurse_forever(self):
+        a, b = uuid4(), uuid4()
+        sets = resolve_role_permissions(
+            parents={a: b, b: a},
+            grants={a: {"x"}, b: {"y"}},
+            denies={},
+        )
+        assert sets[a] == {"x", "y"}
+
+
+class TestRolePermissionCache:
+
+    async def test_cached_until_version_bump(self, cache, scripted_session):
+        padre, hijo = uuid4(), uuid4()
+        session = _role_session(
+            scripted_session,
+            roles=[(padre, None), (hijo, padre)],
+            permisos=[(padre, "stock.ver", True), (hijo, "stock.ajustar", True)],
+        )
+
+        perms = await PermissionService.get_role_permissions(session, hijo)
+        assert perms == {"stock.ver", "stock.ajustar"}
+        # El padre quedó resuelto en la misma carga
+        await PermissionService.get_role_permissions(session, padre)
+        assert session.executes == 2
+
+        await PermissionService.invalidate_cache()
+        await PermissionService.get_role_permissions(session, hijo)
+        assert session.executes == 4
+
+
+class TestUserPermissions:
+
+    def test_user_rol_codes_map_to_system_role_names(self):
+        nombres = dict(system_role_names())
+
+        assert nombres["cajero"] == SYSTEM_ROLES["cajero"]["name"] == "Cajero"
+        assert nombres["owner"] == nombres["admin"] == "Administrador de Tienda"
+
+    async def test_cajero_resolves_to_its_permissions(self, cache, scripted_session):
+        """users.rol = 'cajero' -> rol 'Cajero' de la tienda o global, sus permisos"""
+        cajero = uuid4()
+
+        def responder(sql, params):
+            if "rol_nombres" in sql:
+                return cajero
+            if "parent_role_id" in sql:
+                return [(cajero, None)]
+            return [(cajero, code, True) for code in SYSTEM_ROLES["cajero"]["permissions"]]
+
+        session = scripted_session(responder=responder)
+
+        perms = await PermissionService.get_user_permissions(session, uuid4())
+
+        assert perms == set(SYSTEM_ROLES["cajero"]["permissions"])
+        sql, params = session.statements[0], session.params[0]
+        assert "roles.tienda_id = users.tienda_id OR roles.tienda_id IS NULL" in sql
+        assert {"cajero", "Cajero"} <= set(params.values())
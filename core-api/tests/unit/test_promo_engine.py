@@ -0,0 +1,141 @@
+"""
+Tests unitarios para el índice compilado de promociones y PromotionEngine
+"""
+import pytest
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from schemas_models.promo_models import Promocion, TipoPromo
+from services import promo_service
+from services.promo_index import PromoIndex, compile_rule
+from services.promo_service import PromotionEngine, invalidate_promotion_index
+
+
+def _promo(**kwargs) -> Promocion:
+    data = dict(
+        tienda_id=uuid4(),
+        nombre="Promo",
+        tipo=TipoPromo.DESCUENTO_PORCENTAJE,
+        reglas=None,
+        accion={"tipo": "descuento_porcentaje", "valor": 10},
+        fecha_inicio=datetime.utcnow() - timedelta(days=1),
+        fecha_fin=datetime.utcnow() + timedelta(days=1),
+        canales_aplicables=["pos", "online"],
+    )
+    data.update(kwargs)
+    return Promocion(**data)
+
+
+def _carrito(*items, total=None):
+    lineas = [
+        {
+            "variant_id": uuid4(),
+            "product_id": uuid4(),
+            "cantidad": 1,
+            "precio_unitario": 1000.0,
+            "categoria": "remeras",
+            "coleccion_id": None,
+            **item,
+        }
+        for item in items
+    ]
+    return {
+        "items": lineas,
+        "canal": "pos",
+        "forma_pago": "efectivo",
+        "total": total if total is not None else sum(i["precio_unitario"] * i["cantidad"] for i in lineas),
+    }
+
+
+@pytest.fixture
+def promo_redis(use_fake_redis):
+    redis = use_fake_redis(promo_service)
+    promo_service._indices.clear()
+    yield redis
+    promo_service._indices.clear()
+
+
+class TestCompileRule:
+
+    def test_comparisons_and_logic(self):
+        rule = compile_rule({"and": [
+            {">=": [{"var": "total"}, 30000]},
+            {"in": [{"var": "forma_pago"}, ["tarjeta_galicia", "efectivo"]]},
+        ]})
+        assert rule({"total": 35000, "forma_pago": "efectivo"})
+        assert not rule({"total": 20000, "forma_pago": "efectivo"})
+        assert not rule({"total": 35000, "forma_pago": "qr"})
+
+    def test_membership_in_list_var_and_between(self):
+        assert compile_rule({"in": ["remeras", {"var": "categorias"}]})({"categorias": ["remeras"]})
+        assert not compile_rule({"!": {"var": "canal"}})({"canal": "pos"})
+        assert compile_rule({"<=": [3, {"var": "cantidad_items"}, 6]})({"cantidad_items": 4})
+
+    def test_missing_var_uses_default(self):
+        assert compile_rule({"var": ["cliente.tier", "bronze"]})({}) == "bronze"
+
+
+class TestPromoIndex:
+
+    def test_only_promos_touching_cart_are_candidates(self):
+        sku = uuid4()
+        general = _promo(nombre="General")
+        por_sku = _promo(nombre="SKU", productos_aplicables=[str(sku)])
+        otra_categoria = _promo(nombre="Jeans", categorias_aplicables=["jeans"])
+        con_codigo = _promo(nombre="Cupón", codigo_promocional="VERANO20")
+
+        index = PromoIndex([general, por_sku, otra_categoria, con_codigo])
+        promos, lineas = index.candidates([{"variant_id": sku, "categoria": "remeras"}])
+
+        assert {p.promo.nombre for p in promos} == {"General", "SKU"}
+        assert lineas[por_sku.id] == {0}
+        con_cupon, _ = index.candidates([{"variant_id": sku}], "VERANO20")
+        assert "Cupón" in {p.promo.nombre for p in con_cupon}
+
+    def test_candidates_sorted_by_priority(self):
+        index = PromoIndex([_promo(prioridad=1), _promo(prioridad=50), _promo(prioridad=10)])
+        promos, _ = index.candidates([])
+        assert [p.prioridad for p in promos] == [50, 10, 1]
+
+
+class TestPromotionEngine:
+
+    async def test_index_reused_until_invalidated(self, promo_redis, scripted_session):
+        tienda_id = uuid4()
+        session = scripted_session([_promo(tienda_id=tienda_id)])
+        engine = PromotionEngine(session)
+
+        await engine.calcular_descuentos(_carrito({}), tienda_id)
+        await engine.calcular_descuentos(_carrito({}), tienda_id)
+        assert session.executes == 1
+
+        await invalidate_promotion_index(tienda_id)
+        session.statements.clear()
+        await engine.calcular_descuentos(_carrito({}), tienda_id)
+        assert session.executes == 1
+
+    async def test_scoped_discount_uses_matching_lines_only(self, promo_redis, scripted_session):
+        tienda_id = uuid4()
+        promo = _promo(tienda_id=tienda_id, categorias_aplicables=["jeans"])
+        engine = PromotionEngine(scripted_session([promo]))
+
+        resultado = await engine.calcular_descuentos(
+            _carrito({"categoria": "jeans", "precio_unitario": 2000.0}, {}), tienda_id
+        )
+
+        assert resultado.descuento_total == 200.0
+
+    async def test_customer_limit_from_redis_counter(self, promo_redis, scripted_session):
+        tienda_id, cliente_id = uuid4(), uuid4()
+        promo = _promo(tienda_id=tienda_id, usos_maximos_por_cliente=1)
+        session = scripted_session([promo], [(promo.id, 1)])
+        engine = PromotionEngine(session)
+
+        resultado = await engine.calcular_descuentos(_carrito({}), tienda_id, cliente_id)
+        assert resultado.descuento_total == 0
+        assert await promo_redis.get(f"promo:usos:{promo.id}:{cliente_id}") == "1"
+
+        # Segunda evaluación: el contador sembrado evita volver a la DB
+        session.statements.clear()
+        await engine.calcular_descuentos(_carrito({}), tienda_id, cliente_id)
+        assert session.executes == 0
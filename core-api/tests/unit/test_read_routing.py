@@ -0,0 +1,89 @@
+"""
+Tests unitarios para el ruteo de lecturas a réplicas
+Verifica lag, fallback al primario y read-your-writes sin bases reales
+"""
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+import services.cache_service as cache_service
+from core.read_routing import ReplicaRouter, mark_write, must_read_primary
+
+
+class FakeReplica:
+    """Session factory que responde la consulta de lag"""
+
+    def __init__(self, lag=0.0, fails=False):
+        self.lag = lag
+        self.fails = fails
+        self.checks = 0
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        if self.fails:
+            raise ConnectionError("réplica caída")
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        self.checks += 1
+        return SimpleNamespace(scalar=lambda: self.lag)
+
+
+def _request(method="GET", headers=None):
+    return Request({
+        "type": "http",
+        "method": method,
+        "path": "/",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    })
+
+
+class TestReplicaRouter:
+
+    async def test_round_robin_between_healthy_replicas(self):
+        a, b = FakeReplica(), FakeReplica()
+        router = ReplicaRouter([("a", a), ("b", b)], max_lag=5, check_interval=60)
+
+        assert [await router.pick() for _ in range(3)] == [a, b, a]
+        # Lag medido una vez por réplica dentro del intervalo
+        assert (a.checks, b.checks) == (1, 1)
+
+    async def test_stale_or_down_replicas_are_skipped(self):
+        atrasada, caida, sana = FakeReplica(lag=30), FakeReplica(fails=True), FakeReplica(lag=1)
+        router = ReplicaRouter([("atrasada", atrasada), ("caida", caida), ("sana", sana)], max_lag=5)
+
+        assert await router.pick() is sana
+        stats = router.get_stats()
+        assert stats["replicas"]["atrasada"] == {"lag_s": 30.0, "sana": False}
+        assert stats["replicas"]["caida"] == {"lag_s": None, "sana": False}
+
+    async def test_falls_back_to_primary_when_all_lag(self):
+        router = ReplicaRouter([("a", FakeReplica(lag=60))], max_lag=5)
+
+        assert await router.pick() is None
+        assert router.stats["lecturas_primario_fallback"] == 1
+
+
+class TestReadYourWrites:
+
+    @pytest.fixture(autouse=True)
+    def redis(self, use_fake_redis):
+        return use_fake_redis(cache_service)
+
+    async def test_recent_write_forces_primary_for_same_token(self, redis):
+        escritura = _request("POST", {"Authorization": "Bearer uno"})
+        await mark_write(escritura)
+
+        assert await must_read_primary(_request(headers={"Authorization": "Bearer uno"}))
+        assert not await must_read_primary(_request(headers={"Authorization": "Bearer otro"}))
+        assert all("uno" not in key for key in await redis.keys())
+
+    async def test_header_forces_primary(self):
+        assert await must_read_primary(_request(headers={"X-Read-Primary": "1"}))
+        assert not await must_read_primary(_request())
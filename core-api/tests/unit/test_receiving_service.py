@@ -0,0 +1,77 @@
+"""
+Tests unitarios para ReceivingService
+Verifica recepción total/parcial con sentencias set-based y locks ordenados
+"""
+import pytest
+from uuid import uuid4
+
+from models import DetalleOrden, OrdenCompra
+from services.receiving_service import ReceivingService
+
+
+def _orden(tienda_id, estado="PENDIENTE"):
+    return OrdenCompra(id=uuid4(), proveedor_id=uuid4(), tienda_id=tienda_id, estado=estado, total=0)
+
+
+def _detalle(orden, variant_id, cantidad, recibida=0.0):
+    return DetalleOrden(
+        id=uuid4(), orden_id=orden.id, variant_id=variant_id, cantidad=cantidad,
+        precio_costo_unitario=100.0, subtotal=cantidad * 100.0, cantidad_recibida=recibida
+    )
+
+
+class TestReceive:
+
+    async def test_full_receipt_is_set_based(self, scripted_session):
+        """N líneas = 1 lock de variantes + UPDATE FROM VALUES + 1 INSERT al ledger"""
+        tienda_id, location_id = uuid4(), uuid4()
+        orden = _orden(tienda_id)
+        variantes = sorted(uuid4() for _ in range(3))
+        detalles = [_detalle(orden, v, 5.0) for v in variantes]
+        session = scripted_session(orden, detalles, location_id, variantes)
+
+        resultado = await ReceivingService(session).receive(orden.id, tienda_id)
+
+        assert resultado["estado"] == "RECIBIDA"
+        assert resultado["unidades_recibidas"] == 15.0
+        assert [tabla for tabla, _ in session.bulk] == ["inventory_ledger"]
+        ledger = session.bulk[0][1]
+        assert {row["transaction_type"] for row in ledger} == {"PURCHASE"}
+        assert all(row["location_id"] == location_id for row in ledger)
+
+        sqls = session.statements
+        lock = next(sql for sql in sqls if "FROM product_variants" in sql)
+        assert "ORDER BY product_variants.variant_id" in lock and "FOR UPDATE" in lock
+        costos = next(sql for sql in sqls if sql.startswith("UPDATE product_variants"))
+        assert "FROM (VALUES" in costos
+        assert len(sqls) == 6  # orden, detalles, ubicación, lock, costos, recibidas
+
+    async def test_partial_receipt_leaves_order_partial(self, scripted_session):
+        tienda_id = uuid4()
+        orden = _orden(tienda_id)
+        variant_id = uuid4()
+        detalle = _detalle(orden, variant_id, 10.0)
+        session = scripted_session(orden, [detalle], uuid4(), [variant_id])
+
+        resultado = await ReceivingService(session).receive(
+            orden.id, tienda_id, cantidades={detalle.id: 4.0}
+        )
+
+        assert resultado["estado"] == "PARCIAL"
+        assert session.bulk[0][1][0]["delta"] == 4.0
+
+    async def test_rejects_more_than_pending(self, scripted_session):
+        tienda_id = uuid4()
+        orden = _orden(tienda_id, estado="PARCIAL")
+        detalle = _detalle(orden, uuid4(), 10.0, recibida=8.0)
+        session = scripted_session(orden, [detalle])
+
+        with pytest.raises(ValueError):
+            await ReceivingService(session).receive(orden.id, tienda_id, cantidades={detalle.id: 3.0})
+
+    async def test_received_order_cannot_be_received_again(self, scripted_session):
+        tienda_id = uuid4()
+        session = scripted_session(_orden(tienda_id, estado="RECIBIDA"))
+
+        with pytest.raises(ValueError):
+            await ReceivingService(session).receive(uuid4(), tienda_id)
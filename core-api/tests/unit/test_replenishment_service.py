@@ -0,0 +1,69 @@
+"""
+Tests unitarios para ReplenishmentService
+Verifica MOQ/bulto y agrupamiento por proveedor con inserts en bloque
+"""
+import numpy as np
+from uuid import uuid4
+from services.replenishment_service import ReplenishmentService, order_quantities
+
+
+class TestOrderQuantities:
+
+    def test_moq_and_pack_size(self):
+        """Se compra al menos el MOQ y en múltiplos del bulto"""
+        need = np.array([3.0, 13.0, 0.0, 7.0])
+        moq = np.array([10.0, 10.0, 10.0, np.nan])
+        pack = np.array([6.0, 6.0, 6.0, np.nan])
+
+        qty = order_quantities(need, moq, pack)
+
+        assert qty.tolist() == [12.0, 18.0, 0.0, 7.0]
+
+
+class TestGeneratePurchaseOrders:
+
+    async def test_one_order_per_supplier_with_bulk_inserts(self, scripted_session):
+        """3 variantes bajo reorden de 2 proveedores = 2 órdenes, 2 INSERT"""
+        prov_a, prov_b = uuid4(), uuid4()
+        # variant_id, proveedor_id, reorder_point, cost, moq, pack, lead_time, stock
+        variantes = [
+            (uuid4(), prov_a, 10.0, 100.0, None, None, 5, 2),
+            (uuid4(), prov_a, 10.0, 50.0, 12.0, 6.0, 5, 8),
+            (uuid4(), prov_b, 10.0, 80.0, None, None, None, 4),
+            (uuid4(), prov_b, 10.0, 80.0, None, None, None, 30),  # Sobre el reorden
+        ]
+        session = scripted_session(variantes, [], [])
+
+        resumen = await ReplenishmentService(session).generate_purchase_orders(uuid4())
+
+        assert resumen["variantes_evaluadas"] == 4
+        assert resumen["variantes_a_reponer"] == 3
+        assert resumen["ordenes_creadas"] == 2
+        assert [tabla for tabla, _ in session.bulk] == ["ordenes_compra", "detalles_orden"]
+
+        detalles = {row["variant_id"]: row["cantidad"] for row in session.bulk[1][1]}
+        assert detalles[variantes[0][0]] == 8.0
+        assert detalles[variantes[1][0]] == 12.0  # 2 necesarias → MOQ 12 (2 bultos)
+        assert detalles[variantes[2][0]] == 6.0
+
+    async def test_open_orders_count_as_stock(self, scripted_session):
+        """Lo ya pedido en órdenes abiertas no se vuelve a pedir"""
+        variant_id = uuid4()
+        variantes = [(variant_id, uuid4(), 10.0, 100.0, None, None, 5, 2)]
+        session = scripted_session(variantes, [(variant_id, 8.0)], [])
+
+        resumen = await ReplenishmentService(session).generate_purchase_orders(uuid4())
+
+        assert resumen["variantes_a_reponer"] == 0
+        assert session.bulk == []
+
+    async def test_dry_run_does_not_insert(self, scripted_session):
+        """dry_run calcula las órdenes sin insertarlas"""
+        variantes = [(uuid4(), uuid4(), 10.0, 100.0, None, None, 5, 2)]
+        session = scripted_session(variantes, [], [])
+
+        resumen = await ReplenishmentService(session).generate_purchase_orders(uuid4(), dry_run=True)
+
+        assert len(resumen["ordenes"]) == 1
+        assert resumen["ordenes_creadas"] == 0
+        assert session.bulk == []
@@ -0,0 +1,109 @@
+"""
+Tests unitarios para las reservas de stock de pagos online
+Verifica retención, barrido de vencidas y confirmación idempotente
+(los scripts Lua corren en fakeredis)
+"""
+import json
+from uuid import uuid4
+
+import pytest
+
+from core.exceptions import VentaInvalidaException
+from core.redis_scripts import (
+    RESERVATION_EXPIRY_KEY,
+    generate_stock_key,
+)
+from services import reservation_service
+from services.reservation_service import (
+    CONFIRM_AFTER_RELEASE,
+    CONFIRM_OK,
+    CONFIRM_REPEATED,
+    confirm_reservation,
+    create_reservation,
+    sweep_expired,
+)
+from services.stock_cache_service import inflight_key
+
+
+def _item(producto_id, cantidad):
+    return {
+        'producto_id': str(producto_id),
+        'producto_nombre': 'Yerba',
+        'cantidad': cantidad,
+        'precio_unitario': 100.0,
+        'subtotal': 100.0 * cantidad,
+    }
+
+
+@pytest.fixture
+def tienda(use_fake_redis):
+    use_fake_redis(reservation_service)
+    tienda_id, producto_id = uuid4(), uuid4()
+    return tienda_id, producto_id, generate_stock_key(str(tienda_id), str(producto_id))
+
+
+async def _stock(client, key) -> float:
+    return float(await client.get(key))
+
+
+class TestReservations:
+
+    async def test_create_holds_stock_and_indexes_expiry(self, tienda, fake_redis):
+        tienda_id, producto_id, key = tienda
+        client = fake_redis
+        await client.set(key, 10.0)
+
+        reserva_id, _ = await create_reservation(
+            client, None, tienda_id, None, "MERCADOPAGO",
+            [_item(producto_id, 2), _item(producto_id, 1)]  # Mismo producto dos veces
+        )
+
+        assert await _stock(client, key) == 7.0
+        assert await client.zscore(RESERVATION_EXPIRY_KEY, reserva_id) is not None
+        entrada = json.loads(await client.hget(inflight_key(tienda_id), reserva_id))
+        assert entrada["items"] == {str(producto_id): 3.0}
+
+    async def test_insufficient_stock_holds_nothing(self, tienda, fake_redis):
+        tienda_id, producto_id, key = tienda
+        client = fake_redis
+        await client.set(key, 1.0)
+
+        with pytest.raises(VentaInvalidaException):
+            await create_reservation(client, None, tienda_id, None, "MERCADOPAGO", [_item(producto_id, 2)])
+
+        assert await _stock(client, key) == 1.0
+        assert await client.zcard(RESERVATION_EXPIRY_KEY) == 0
+
+    async def test_sweep_releases_only_expired(self, tienda, fake_redis):
+        tienda_id, producto_id, key = tienda
+        client = fake_redis
+        await client.set(key, 10.0)
+
+        vencida, _ = await create_reservation(client, None, tienda_id, None, "MERCADOPAGO", [_item(producto_id, 2)], ttl=1)
+        viva, _ = await create_reservation(client, None, tienda_id, None, "MERCADOPAGO", [_item(producto_id, 3)], ttl=600)
+        ahora = await client.zscore(RESERVATION_EXPIRY_KEY, vencida) + 1
+
+        assert await sweep_expired(now=ahora, batch_size=1) == 1
+        assert await sweep_expired(now=ahora) == 0
+        assert await _stock(client, key) == 7.0
+        assert await client.zrange(RESERVATION_EXPIRY_KEY, 0, -1) == [viva]
+        assert not await client.hexists(inflight_key(tienda_id), vencida)
+
+    async def test_confirm_is_idempotent_and_survives_release(self, tienda, fake_redis):
+        tienda_id, producto_id, key = tienda
+        client = fake_redis
+        await client.set(key, 10.0)
+
+        confirmada, _ = await create_reservation(client, None, tienda_id, None, "MERCADOPAGO", [_item(producto_id, 2)])
+        assert (await confirm_reservation(client, confirmada))[0] == CONFIRM_OK
+        assert (await confirm_reservation(client, confirmada))[0] == CONFIRM_REPEATED
+        assert await _stock(client, key) == 8.0
+
+        # Pago aprobado después del vencimiento: se vuelve a descontar
+        tardia, _ = await create_reservation(client, None, tienda_id, None, "MERCADOPAGO", [_item(producto_id, 1)], ttl=1)
+        await sweep_expired(now=await client.zscore(RESERVATION_EXPIRY_KEY, tardia) + 1)
+        assert await _stock(client, key) == 8.0
+        assert (await confirm_reservation(client, tardia))[0] == CONFIRM_AFTER_RELEASE
+        assert await _stock(client, key) == 7.0
+        assert await client.hexists(inflight_key(tienda_id), tardia)
+
@@ -0,0 +1,80 @@
+"""
+Tests unitarios para el pronóstico de demanda de RetailAnalyticsService
+Verifica que la caché guarda una sola matriz por tienda
+"""
+from datetime import date, datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from core.cache import cache_manager
+from services.retail_analytics_service import FORECAST_MAX_LOOKBACK_DAYS, RetailAnalyticsService
+
+
+def _forecast_session(scripted_session, variant_id, ventas_por_dia, stock=None):
+    """Responde stock por variante o ventas diarias según la query"""
+    stock = stock if stock is not None else [40]
+
+    def responder(sql, params):
+        if "AS unidades" in sql:
+            return [(variant_id, dia, unidades) for dia, unidades in ventas_por_dia.items()]
+        return [(variant_id, "REM-001-ROJO-M", "Remera", stock[0])]
+
+    return scripted_session(responder=responder)
+
+
+class TestDemandForecastCache:
+
+    @pytest.fixture(autouse=True)
+    def clean(self):
+        cache_manager.clear()
+        yield
+        cache_manager.clear()
+
+    async def test_lookback_and_lead_time_share_one_cached_matrix(self, scripted_session):
+        hoy = datetime.now(timezone.utc).date()
+        variant_id, tienda_id = uuid4(), uuid4()
+        # 2 unidades por día la última semana, nada antes
+        session = _forecast_session(scripted_session, variant_id, {hoy - timedelta(days=d): 2 for d in range(1, 8)})
+        service = RetailAnalyticsService(session)
+
+        corto = await service.get_demand_forecast(tienda_id, days_lookback=7, lead_time_days=3)
+        largo = await service.get_demand_forecast(tienda_id, days_lookback=60, lead_time_days=30)
+
+        # Stock en cada request, ventas una sola vez
+        assert session.executes == 3
+        assert list(cache_manager._cache) == [f"restock:{tienda_id}"]
+        assert cache_manager.get(f"restock:{tienda_id}")["sales"].shape == (1, FORECAST_MAX_LOOKBACK_DAYS)
+        assert corto["forecast"].daily_forecast[0] > largo["forecast"].daily_forecast[0]
+        assert largo["forecast"].lead_time_demand[0] > corto["forecast"].lead_time_demand[0]
+
+    async def test_entry_from_previous_day_is_replaced(self, scripted_session):
+        tienda_id = uuid4()
+        session = _forecast_session(scripted_session, uuid4(), {})
+        service = RetailAnalyticsService(session)
+        await service.get_demand_forecast(tienda_id)
+
+        cache_manager.get(f"restock:{tienda_id}")["fecha"] = date(2020, 1, 1)
+        await service.get_demand_forecast(tienda_id)
+
+        assert session.executes == 4
+        assert len(cache_manager._cache) == 1
+
+    async def test_stock_is_current_on_every_request(self, scripted_session):
+        """Una recepción entre dos consultas se ve sin esperar a que venza la caché"""
+        tienda_id, stock = uuid4(), [40]
+        session = _forecast_session(scripted_session, uuid4(), {}, stock=stock)
+        service = RetailAnalyticsService(session)
+
+        antes = await service.get_demand_forecast(tienda_id)
+        stock[0] = 100
+        despues = await service.get_demand_forecast(tienda_id)
+
+        assert (antes["stock"][0], despues["stock"][0]) == (40, 100)
+        assert "stock" not in cache_manager.get(f"restock:{tienda_id}")
+
+    async def test_store_without_variants_has_no_suggestions(self, scripted_session):
+        """Tienda sin variantes activas: lista vacía, no un error 500"""
+        session = scripted_session(responder=lambda sql, params: [])
+
+        assert await RetailAnalyticsService(session).get_restock_suggestions(uuid4()) == []
@@ -0,0 +1,82 @@
+"""
+Tests unitarios para RFIDService
+Verifica resolución batch de EPCs e inserts en bloque
+"""
+from types import SimpleNamespace
+from uuid import uuid4
+from core.cache import cache_manager
+from services.rfid_service import RFIDService
+
+
+def _session(scripted_session, scan_session, rows):
+    """Devuelve tags activos o descripciones de variantes según la query"""
+    variants = {row[1]: (row[1], "Remera", "M", "Rojo") for row in rows}
+
+    def responder(sql, params):
+        return rows if "rfid_tags.epc" in sql else list(variants.values())
+
+    return scripted_session(responder=responder, objects={scan_session.id: scan_session})
+
+
+def _tag_row(epc, price=100.0, variant_id=None):
+    return (epc, variant_id or uuid4(), f"SKU-{epc}", price)
+
+
+class TestProcessBulkScan:
+
+    def setup_method(self):
+        cache_manager.clear()
+
+    async def test_300_tags_two_selects_one_insert(self, scripted_session):
+        """Portal de 300 prendas (con lecturas repetidas) = tags + variantes + 1 INSERT"""
+        epcs = [f"E{i:04d}" for i in range(300)]
+        scan_session = SimpleNamespace(id=uuid4(), tienda_id=uuid4())
+        session = _session(scripted_session, scan_session, [_tag_row(epc) for epc in epcs])
+
+        resumen = await RFIDService(session).process_bulk_scan(scan_session.id, epcs * 3)
+
+        assert session.executes == 2
+        assert len(session.bulk) == 1
+        assert len(session.bulk[0][1]) == 300
+        assert resumen["tags_unicos"] == 300
+        assert resumen["total_precio"] == 30000.0
+
+    async def test_variant_cache_skips_description_lookup(self, scripted_session):
+        """El segundo escaneo solo consulta el estado de los tags; EPCs desconocidos se reportan"""
+        scan_session = SimpleNamespace(id=uuid4(), tienda_id=uuid4())
+        rows = [_tag_row("E1")]
+        session = _session(scripted_session, scan_session, rows)
+        service = RFIDService(session)
+
+        primero = await service.process_bulk_scan(scan_session.id, ["E1", "E2"])
+        resumen = await service.process_bulk_scan(scan_session.id, ["E1"])
+
+        assert primero["tags_no_encontrados"] == ["E2"]
+        assert session.executes == 3
+        assert resumen["total_items"] == 1
+        assert resumen["items_detectados"][0]["product_name"] == "Remera"
+
+    async def test_sold_tag_not_resolved_from_cache(self, scripted_session):
+        """Un tag vendido (en cualquier worker) deja de resolverse aunque su variante esté en memoria"""
+        scan_session = SimpleNamespace(id=uuid4(), tienda_id=uuid4())
+        rows = [_tag_row("E1")]
+        session = _session(scripted_session, scan_session, rows)
+        service = RFIDService(session)
+
+        await service.process_bulk_scan(scan_session.id, ["E1"])
+        rows.clear()  # estado = 'sold': ya no sale en la query de tags activos
+        resumen = await service.process_bulk_scan(scan_session.id, ["E1"])
+
+        assert resumen["total_items"] == 0
+
+    async def test_rssi_keeps_strongest_read(self, scripted_session):
+        """Con lecturas repetidas se conserva la señal más fuerte"""
+        scan_session = SimpleNamespace(id=uuid4(), tienda_id=uuid4())
+        rows = [_tag_row("E1")]
+        session = _session(scripted_session, scan_session, rows)
+
+        resumen = await RFIDService(session).process_bulk_scan(
+            scan_session.id, ["E1", "E1"], rssi_values=[-70, -40]
+        )
+
+        assert resumen["items_detectados"][0]["rssi"] == -40
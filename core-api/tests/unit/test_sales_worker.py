@@ -0,0 +1,128 @@
+"""
+Tests unitarios del worker de ventas
+Verifica deduplicación por event_id en micro-lotes y particionado por tienda
+"""
+import json
+from uuid import UUID, uuid4
+
+from core.event_bus import SyncEventPublisher, event_id_for, partition_for
+from workers import sales_worker
+
+
+def _worker_session(scripted_session, monkeypatch, procesados=()):
+    """Sesión del worker: `procesados` simula la tabla processed_events"""
+    procesados = set(procesados)
+
+    def responder(sql, params):
+        if not sql.startswith("INSERT INTO processed_events"):
+            return None
+        ids = [v for k, v in params.items() if k.startswith("event_id")]
+        nuevos = [i for i in ids if i not in procesados]
+        procesados.update(nuevos)
+        return nuevos
+
+    session = scripted_session(responder=responder)
+    monkeypatch.setattr(sales_worker, "async_session_maker", lambda: session)
+    return session
+
+
+def _event(tienda_id=None, producto_id=None):
+    return {
+        "event_id": str(uuid4()),
+        "tienda_id": str(tienda_id or uuid4()),
+        "total": 200.0,
+        "metodo_pago": "efectivo",
+        "timestamp": "2026-10-19T10:00:00",
+        "items": [{
+            "producto_id": str(producto_id or uuid4()), "cantidad": 2.0,
+            "precio_unitario": 100.0, "subtotal": 200.0,
+        }],
+    }
+
+
+class TestProcessSaleBatch:
+
+    async def test_batch_dedups_in_one_statement_and_writes_in_bulk(self, monkeypatch, scripted_session):
+        session = _worker_session(scripted_session, monkeypatch)
+        producto_id = uuid4()
+        events = [_event(producto_id=producto_id) for _ in range(20)]
+
+        escritas = await sales_worker.process_sale_batch(events + events[:5])
+
+        assert escritas == 20
+        assert sum(sql.startswith("INSERT INTO processed_events") for sql in session.statements) == 1
+        assert [tabla for tabla, _ in session.bulk] == ["ventas", "detalles_venta"]
+        assert len(session.bulk[0][1]) == 20
+        stock = [sql for sql in session.statements if sql.startswith("UPDATE productos")]
+        assert len(stock) == 1
+        assert session.commits == 1
+
+    async def test_redelivered_batch_is_a_noop(self, monkeypatch, scripted_session):
+        events = [_event() for _ in range(3)]
+        session = _worker_session(
+            scripted_session, monkeypatch, procesados={UUID(e["event_id"]) for e in events}
+        )
+
+        escritas = await sales_worker.process_sale_batch(events)
+
+        assert escritas == 0
+        assert session.bulk == []
+        assert len(session.statements) == 1
+
+    async def test_sales_credit_the_session_from_checkout(self, monkeypatch, scripted_session):
+        """Cada venta suma en la sesión resuelta al cobrar, un UPDATE por sesión"""
+        session = _worker_session(scripted_session, monkeypatch)
+        sesion_a, sesion_b = uuid4(), uuid4()
+        events = [_event() for _ in range(3)]
+        for event, sesion in zip(events, (sesion_a, sesion_a, sesion_b)):
+            event["usuario_id"] = str(uuid4())
+            event["sesion_caja_id"] = str(sesion)
+
+        await sales_worker.process_sale_batch(events)
+
+        cajas = [sql for sql in session.statements if sql.startswith("UPDATE sesiones_caja")]
+        assert len(cajas) == 2
+        assert all("WHERE sesiones_caja.id =" in sql for sql in cajas)
+        assert not any(sql.startswith("SELECT sesiones_caja") for sql in session.statements)
+        assert [v["sesion_caja_id"] for v in session.bulk[0][1]] == [sesion_a, sesion_a, sesion_b]
+
+    def test_legacy_events_get_stable_id_from_body(self):
+        body = json.dumps({"tienda_id": str(uuid4()), "total": 1}).encode()
+
+        assert sales_worker.parse_event(body)["event_id"] == sales_worker.parse_event(body)["event_id"]
+
+
+class TestPartitioning:
+
+    def test_partition_is_stable_and_in_range(self):
+        tiendas = [uuid4() for _ in range(200)]
+
+        particiones = [partition_for(t, 8) for t in tiendas]
+
+        assert particiones == [partition_for(str(t), 8) for t in tiendas]
+        assert set(particiones) <= set(range(8))
+        assert len(set(particiones)) > 1
+
+    def test_sale_event_is_routed_to_store_partition_with_event_id(self):
+        publicados = []
+        publisher = object.__new__(SyncEventPublisher)
+        publisher.publish = lambda routing_key, payload: publicados.append((routing_key, payload))
+        tienda_id = str(uuid4())
+
+        publisher.publish_sale_created({"tienda_id": tienda_id, "idempotency_key": "k-1"})
+        publisher.publish_sale_created({"tienda_id": tienda_id, "idempotency_key": "k-1"})
+        publisher.publish_sale_created({"tienda_id": tienda_id})
+
+        routing_keys = {key for key, _ in publicados}
+        assert routing_keys == {f"sales.created.{partition_for(tienda_id)}"}
+        # Mismo Idempotency-Key ⇒ mismo event_id; sin clave ⇒ uno nuevo
+        ids = [payload["event_id"] for _, payload in publicados]
+        assert ids[0] == ids[1] != ids[2]
+
+    def test_event_id_is_scoped_per_user_like_idempotency_cache(self):
+        tienda_id = str(uuid4())
+        cajero_a = {"tienda_id": tienda_id, "usuario_id": str(uuid4()), "idempotency_key": "k-1"}
+        cajero_b = {**cajero_a, "usuario_id": str(uuid4())}
+
+        assert event_id_for(cajero_a) == event_id_for(dict(cajero_a))
+        assert event_id_for(cajero_a) != event_id_for(cajero_b)
@@ -0,0 +1,71 @@
+"""
+Tests unitarios para la instrumentación SQL
+Verifica normalización, conteo por request, N+1 y Server-Timing sin base real
+"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from core import sql_instrumentation
+from core.config import settings
+from core.sql_instrumentation import (
+    SQLInstrumentationMiddleware,
+    get_route_stats,
+    normalize_sql,
+    reset_route_stats,
+)
+
+
+def _execute(statement: str, times: int = 1) -> None:
+    """Simula los eventos del engine para una query"""
+    conn = SimpleNamespace(info={})
+    for _ in range(times):
+        sql_instrumentation._before_cursor_execute(conn, None, statement, None, None, False)
+        sql_instrumentation._after_cursor_execute(conn, None, statement, None, None, False)
+
+
+app = FastAPI()
+app.add_middleware(SQLInstrumentationMiddleware)
+
+
+@app.get("/ventas/{venta_id}")
+async def detalle(venta_id: int):
+    _execute("SELECT * FROM ventas WHERE id = $1")
+    _execute("SELECT * FROM detalles_venta WHERE venta_id = $1 AND producto_id = $2", times=12)
+    return {"ok": True}
+
+
+class TestSQLInstrumentation:
+
+    @pytest.fixture(autouse=True)
+    def clean(self, monkeypatch):
+        monkeypatch.setattr(settings, "SQL_SERVER_TIMING", True)
+        reset_route_stats()
+        yield
+        reset_route_stats()
+
+    def test_normalize_strips_values_and_in_lists(self):
+        a = normalize_sql("SELECT * FROM p WHERE id IN ($1, $2, $3) AND nombre = 'x'  AND n > 10")
+        b = normalize_sql("SELECT * FROM p WHERE id IN ($1, $2) AND nombre = 'otro' AND n > 99")
+
+        assert a == b == "SELECT * FROM p WHERE id IN (?, ...) AND nombre = ? AND n > ?"
+        assert normalize_sql("SELECT fecha::date FROM ventas") == "SELECT fecha::date FROM ventas"
+
+    async def test_request_counts_flags_n_plus_one_and_aggregates_route(self):
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.get("/ventas/1")
+            await client.get("/ventas/2")
+
+        assert response.headers["Server-Timing"].endswith('desc="13 queries"')
+        [ruta] = get_route_stats()
+        assert ruta["ruta"] == "GET /ventas/{venta_id}"
+        assert ruta["requests"] == 2
+        assert ruta["queries_promedio"] == 13
+        assert ruta["n_plus_one"] == 2
+
+    def test_queries_outside_requests_are_not_aggregated(self):
+        _execute("SELECT 1", times=3)
+
+        assert get_route_stats() == []
@@ -0,0 +1,22 @@
+"""
+Tests unitarios para los helpers de SQL compartidos
+"""
+from uuid import uuid4
+
+from sqlalchemy import Float, Uuid, select
+from sqlalchemy.dialects import postgresql
+
+from utils.sql import values_table
+
+
+class TestValuesTable:
+
+    def test_typed_columns_and_alias(self):
+        producto_id = uuid4()
+        v = values_table("v", [(producto_id, 2.5)], producto_id=Uuid(), qty=Float())
+
+        sql = str(select(v.c.producto_id, v.c.qty).compile(dialect=postgresql.dialect()))
+
+        assert "(VALUES (%(param_1)s::UUID, %(param_2)s)) AS v (producto_id, qty)" in sql
+        assert isinstance(v.c.producto_id.type, Uuid)
+        assert isinstance(v.c.qty.type, Float)
@@ -0,0 +1,72 @@
+"""
+Tests unitarios para StockAlertService
+Verifica la detección edge-triggered del punto de reorden
+"""
+from uuid import uuid4
+from services.stock_alert_service import StockAlertService
+
+
+class TestDetectCrossings:
+
+    async def test_crossing_emits_single_alert(self, scripted_session):
+        """11 → 9 con punto de reorden 10 genera una alerta"""
+        variant_id, location_id = uuid4(), uuid4()
+        session = scripted_session([(variant_id, location_id, 9, "REM-001", 10, "Remera")], repeat=True)
+
+        alertas = await StockAlertService().detect_crossings(
+            session, uuid4(), [(variant_id, location_id, -2)]
+        )
+
+        assert len(alertas) == 1
+        assert alertas[0]["stock_anterior"] == 11
+        assert alertas[0]["stock_actual"] == 9
+        assert alertas[0]["nivel"] == "bajo"
+
+    async def test_already_below_does_not_repeat(self, scripted_session):
+        """9 → 7 ya estaba bajo: sin alerta nueva"""
+        variant_id, location_id = uuid4(), uuid4()
+        session = scripted_session([(variant_id, location_id, 7, "REM-001", 10, "Remera")], repeat=True)
+
+        alertas = await StockAlertService().detect_crossings(
+            session, uuid4(), [(variant_id, location_id, -2)]
+        )
+
+        assert alertas == []
+
+    async def test_default_reorder_point_when_not_configured(self, scripted_session):
+        """Sin reorder_point se usa el default de settings (10)"""
+        variant_id, location_id = uuid4(), uuid4()
+        session = scripted_session([(variant_id, location_id, 0, "REM-001", None, "Remera")], repeat=True)
+
+        alertas = await StockAlertService().detect_crossings(
+            session, uuid4(), [(variant_id, location_id, -12)]
+        )
+
+        assert alertas[0]["reorder_point"] == 10
+        assert alertas[0]["nivel"] == "critico"
+
+    async def test_inbound_movements_skip_query(self, scripted_session):
+        """Solo entradas: no puede haber cruce descendente, no se consulta la DB"""
+        session = scripted_session([], repeat=True)
+
+        alertas = await StockAlertService().detect_crossings(
+            session, uuid4(), [(uuid4(), uuid4(), 5)]
+        )
+
+        assert alertas == []
+        assert session.executes == 0
+
+    async def test_pairs_locked_before_reading_balances(self, scripted_session):
+        """Advisory lock por par (en orden) antes de la query de saldos: sin alertas duplicadas"""
+        pares = [(uuid4(), uuid4()) for _ in range(3)]
+        session = scripted_session([], repeat=True)
+
+        await StockAlertService().detect_crossings(
+            session, uuid4(), [(v, l, -1) for v, l in pares] + [(uuid4(), uuid4(), 4)]
+        )
+
+        assert session.executes == 2
+        lock_sql, params = session.statements[0], session.params[0]
+        assert "pg_advisory_xact_lock" in lock_sql
+        assert len(params["keys"]) == 3
+        assert params["keys"] == sorted(params["keys"])
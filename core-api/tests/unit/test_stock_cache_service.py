@@ -0,0 +1,51 @@
+"""
+Tests unitarios para el caché de stock en Redis
+Verifica warmup en pipeline por lotes y read-through con SET NX
+"""
+from uuid import uuid4
+
+from core.redis_scripts import generate_stock_key
+from services.stock_cache_service import fill_missing, warmup_tienda, write_balances
+
+
+class TestStockCache:
+
+    async def test_warmup_loads_in_one_query_and_pipelines_in_chunks(self, fake_redis, scripted_session):
+        tienda_id = uuid4()
+        rows = [(uuid4(), float(i)) for i in range(5000)]
+        session = scripted_session(rows)
+
+        creadas = await warmup_tienda(fake_redis, session, tienda_id)
+
+        assert creadas == 5000
+        assert len(session.statements) == 1
+        assert "productos.is_active" in session.statements[0]
+        assert fake_redis.round_trips == 3  # STOCK_WARMUP_CHUNK = 2000
+        producto_id, stock = rows[42]
+        assert float(await fake_redis.get(generate_stock_key(str(tienda_id), str(producto_id)))) == stock
+
+    async def test_existing_keys_are_not_overwritten(self, fake_redis):
+        tienda_id, producto_id = uuid4(), uuid4()
+        key = generate_stock_key(str(tienda_id), str(producto_id))
+        await fake_redis.set(key, "3")  # Reservas en curso ya descontadas
+
+        creadas = await write_balances(fake_redis, tienda_id, {producto_id: 10.0, uuid4(): 5.0})
+
+        assert creadas == 1
+        assert await fake_redis.get(key) == "3"
+
+    async def test_read_through_fills_only_requested_products(self, fake_redis, scripted_session):
+        tienda_id = uuid4()
+        producto_ids = [uuid4(), uuid4()]
+        session = scripted_session([(producto_ids[0], 7.0), (producto_ids[1], 0.0)])
+
+        await fill_missing(fake_redis, session, tienda_id, producto_ids)
+
+        assert "productos.id IN" in session.statements[0]
+        assert "is_active" not in session.statements[0]
+        assert fake_redis.round_trips == 1
+        assert float(await fake_redis.get(generate_stock_key(str(tienda_id), str(producto_ids[1])))) == 0.0
+
+    def test_legacy_key_has_no_location(self):
+        assert generate_stock_key("t", "p") == "stock:t:p"
+        assert generate_stock_key("t", "v", "l") == "stock:t:v:l"
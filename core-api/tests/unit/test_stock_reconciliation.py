@@ -0,0 +1,101 @@
+"""
+Tests unitarios para la reconciliación de stock Redis ↔ DB
+Verifica confirmación en dos pasadas, reservas en vuelo y corrección con CAS
+"""
+import json
+import time
+from uuid import uuid4
+
+import pytest
+
+from core.redis_scripts import generate_stock_key
+from services.stock_cache_service import inflight_key, track_inflight
+from services.stock_reconciliation_service import StockReconciler, report_key
+
+
+def _reconciler(**kwargs):
+    return StockReconciler(batch_size=100, keys_per_second=1e9, tolerance=0.001, **kwargs)
+
+
+@pytest.fixture
+def stock(fake_redis, scripted_session):
+    """Key de stock en Redis = 7 y saldo en la DB = 10"""
+    tienda_id, producto_id = uuid4(), uuid4()
+    key = generate_stock_key(str(tienda_id), str(producto_id))
+    session = scripted_session([(producto_id, 10.0)], repeat=True)
+    return tienda_id, producto_id, key, session
+
+
+async def _cargar(fake_redis, key):
+    await fake_redis.set(key, "7")
+
+
+class TestStockReconciler:
+
+    async def test_drift_is_corrected_only_when_confirmed_twice(self, fake_redis, stock):
+        tienda_id, producto_id, key, session = stock
+        client = fake_redis
+        await _cargar(client, key)
+        reconciler = _reconciler(correct=True)
+
+        primera = await reconciler.reconcile_tienda(client, session, tienda_id)
+        assert primera["desvios_detectados"] == 0
+        assert await client.get(key) == "7"
+
+        segunda = await reconciler.reconcile_tienda(client, session, tienda_id)
+        assert segunda["desvios_detectados"] == 1
+        assert segunda["desvios_corregidos"] == 1
+        assert float(await client.get(key)) == 10.0
+        assert json.loads(await client.get(report_key(tienda_id)))["desvios"][0]["redis"] == 7.0
+
+    async def test_inflight_sales_are_not_drift(self, fake_redis, stock):
+        tienda_id, producto_id, key, session = stock
+        client = fake_redis
+        await _cargar(client, key)
+        await track_inflight(client, tienda_id, "evt-1", {str(producto_id): 3.0})
+        reconciler = _reconciler(correct=True)
+
+        for _ in range(2):
+            reporte = await reconciler.reconcile_tienda(client, session, tienda_id)
+
+        assert reporte["desvios_detectados"] == 0
+        assert reconciler.get_stats()["sospechosos"] == 0
+
+    async def test_stale_inflight_is_dropped_and_reported(self, fake_redis, stock):
+        tienda_id, producto_id, key, session = stock
+        client = fake_redis
+        await _cargar(client, key)
+        await client.hset(inflight_key(tienda_id), "viejo", json.dumps(
+            {"ts": time.time() - 10 ** 6, "items": {str(producto_id): 3.0}}
+        ))
+
+        reporte = await _reconciler().reconcile_tienda(client, session, tienda_id)
+
+        assert reporte["eventos_perdidos"] == 1
+        assert await client.hgetall(inflight_key(tienda_id)) == {}
+
+    async def test_changed_value_restarts_confirmation(self, fake_redis, stock):
+        tienda_id, producto_id, key, session = stock
+        client = fake_redis
+        await _cargar(client, key)
+        reconciler = _reconciler(correct=True)
+
+        await reconciler.reconcile_tienda(client, session, tienda_id)
+        await client.set(key, "6")  # Hubo una reserva entre pasadas
+        reporte = await reconciler.reconcile_tienda(client, session, tienda_id)
+
+        assert reporte["desvios_detectados"] == 0
+        assert await client.get(key) == "6"
+
+    async def test_report_only_mode_does_not_write(self, fake_redis, stock):
+        tienda_id, producto_id, key, session = stock
+        client = fake_redis
+        await _cargar(client, key)
+        reconciler = _reconciler(correct=False)
+
+        await reconciler.reconcile_tienda(client, session, tienda_id)
+        reporte = await reconciler.reconcile_tienda(client, session, tienda_id)
+
+        assert reporte["desvios_detectados"] == 1
+        assert reporte["desvios_corregidos"] == 0
+        assert await client.get(key) == "7"
@@ -0,0 +1,65 @@
+"""
+Tests unitarios para los snapshots de stock y el stock a una fecha
+Verifica el SQL generado (snapshot + deltas de la ventana) sin PostgreSQL
+"""
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from services.stock_snapshot_service import (
+    checkpoint_floor,
+    last_settled_checkpoint,
+    stock_as_of,
+    write_snapshot,
+)
+
+
+AT = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+class TestStockSnapshots:
+
+    def test_checkpoint_floor_aligns_to_utc_midnight(self):
+        assert checkpoint_floor(datetime(2026, 10, 19, 15, 30, tzinfo=timezone.utc), 24) == \
+            datetime(2026, 10, 19, tzinfo=timezone.utc)
+        assert checkpoint_floor(datetime(2026, 10, 19, 15, 30, tzinfo=timezone.utc), 6) == \
+            datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+
+    def test_checkpoint_waits_for_settle_window(self):
+        # 00:02 UTC: el cierre de anoche todavía puede recibir transacciones en vuelo
+        assert last_settled_checkpoint(datetime(2026, 10, 19, 0, 2, tzinfo=timezone.utc)) == \
+            datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+    async def test_as_of_sums_only_deltas_after_snapshot(self, scripted_session):
+        base = datetime(2026, 9, 30, tzinfo=timezone.utc)
+        session = scripted_session(base, [])
+
+        snapshot_at, _ = await stock_as_of(session, uuid4(), AT, variant_id=uuid4())
+
+        sql = session.statements[1]
+        assert snapshot_at == base
+        assert "UNION ALL" in sql
+        assert "stock_snapshots.snapshot_at =" in sql
+        assert "inventory_ledger.occurred_at >" in sql
+        assert "inventory_ledger.occurred_at <=" in sql
+        assert "stock_snapshots.variant_id =" in sql
+
+    async def test_as_of_without_snapshot_sums_history(self, scripted_session):
+        session = scripted_session(None, [])
+
+        snapshot_at, _ = await stock_as_of(session, uuid4(), AT)
+
+        assert snapshot_at is None
+        assert "stock_snapshots" not in session.statements[1]
+
+    async def test_write_snapshot_is_incremental_and_idempotent(self, scripted_session):
+        session = scripted_session(None, datetime(2026, 9, 30, tzinfo=timezone.utc), 42)
+
+        assert await write_snapshot(session, uuid4(), AT) == 42
+        assert "stock_snapshots.snapshot_at <" in session.statements[1]
+        assert "INSERT INTO stock_snapshots" in session.statements[2]
+        assert "ON CONFLICT DO NOTHING" in session.statements[2]
+        assert session.commits == 1
+
+        ya_escrito = scripted_session((AT,))
+        assert await write_snapshot(ya_escrito, uuid4(), AT) is None
+        assert len(ya_escrito.statements) == 1
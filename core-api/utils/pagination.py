@@ -2,6 +2,7 @@
 Paginación Cursor-Based para mejor performance
 Más eficiente que offset/limit para datasets grandes
 """
+import base64
 from typing import TypeVar, Generic, Optional, List
 from pydantic import BaseModel
 from datetime import datetime
@@ -20,7 +21,7 @@ class CursorPaginationParams(BaseModel):
     class Config:
         json_schema_extra = {
             "example": {
-                "cursor": "2025-12-03T10:30:00|uuid-here",
+                "cursor": "MjAyNS0xMi0wM1QxMDozMDowMHx1dWlk",
                 "limit": 50,
                 "direction": "forward"
             }
@@ -40,8 +41,8 @@ class CursorPage(BaseModel, Generic[T]):
         json_schema_extra = {
             "example": {
                 "items": [...],
-                "next_cursor": "2025-12-03T11:00:00|uuid-next",
-                "prev_cursor": "2025-12-03T09:00:00|uuid-prev",
+                "next_cursor": "MjAyNS0xMi0wM1QxMTowMDowMHx1dWlk",
+                "prev_cursor": "MjAyNS0xMi0wM1QwOTowMDowMHx1dWlk",
                 "has_next": True,
                 "has_prev": True,
                 "total_count": 1523
@@ -51,10 +52,13 @@ class CursorPage(BaseModel, Generic[T]):
 
 def encode_cursor(timestamp: datetime, id: UUID) -> str:
     """
-    Codifica timestamp + ID como cursor
-    Formato: "2025-12-03T10:30:00|uuid"
+    Codifica timestamp + ID como cursor opaco
+    Formato: base64url de "2025-12-03T10:30:00+00:00|uuid" (sin padding)
+    
+    El cliente no debe interpretarlo: solo lo devuelve en el próximo request
     """
-    return f"{timestamp.isoformat()}|{str(id)}"
+    raw = f"{timestamp.isoformat()}|{str(id)}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
 
 def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
@@ -62,11 +66,12 @@ def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
     Decodifica cursor a timestamp + ID
     """
     try:
-        timestamp_str, id_str = cursor.split("|")
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp_str, id_str = raw.split("|")
         timestamp = datetime.fromisoformat(timestamp_str)
         id = UUID(id_str)
         return timestamp, id
-    except (ValueError, AttributeError) as e:
+    except (ValueError, AttributeError, UnicodeDecodeError) as e:
         raise ValueError(f"Invalid cursor format: {cursor}") from e
 
 
@@ -0,0 +1,24 @@
+"""
+Helpers de SQL compartidos por los servicios
+"""
+from typing import Any, Sequence
+
+from sqlalchemy import column, values
+from sqlalchemy.sql.expression import Values
+from sqlalchemy.types import TypeEngine
+
+
+def values_table(name: str, rows: Sequence[tuple], **columnas: TypeEngine[Any]) -> Values:
+    """
+    Construye una tabla `(VALUES ...) AS name(col, ...)` tipada
+
+    ⚡ Para UPDATE ... FROM (VALUES ...): N filas en una sola sentencia.
+    Los tipos explícitos hacen que Postgres castee los parámetros (uuid,
+    float) en lugar de compararlos como text.
+
+    Args:
+        name: Alias de la tabla
+        rows: Filas, en el orden de `columnas`
+        columnas: nombre -> tipo SQLAlchemy (ej: producto_id=Uuid(), qty=Float())
+    """
+    return values(*(column(col, tipo) for col, tipo in columnas.items()), name=name).data(list(rows))
@@ -170,6 +170,7 @@ class AFIPWorker:
                 if not factura:
                     factura = Factura(
                         venta_id=venta_id,
+                        venta_fecha=venta.fecha,
                         tienda_id=tienda_id,
                         tipo_comprobante="B",
                         punto_venta=1,
@@ -230,6 +231,7 @@ class AFIPWorker:
         # Crear factura con CAEA
         factura = Factura(
             venta_id=venta.id,
+            venta_fecha=venta.fecha,
             tienda_id=venta.tienda_id,
             tipo_comprobante="B",
             punto_venta=1,
@@ -0,0 +1,100 @@
+"""
+Scheduler de Insights - Nexus POS
+Genera alertas e insights para todas las tiendas fuera del request
+
+El endpoint /insights/refresh solo lee; la generación (set-based) corre acá
+con concurrencia acotada entre tiendas para no agotar el pool de conexiones.
+"""
+import asyncio
+import logging
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from core.config import settings
+from services.insight_service import insight_service
+
+
+logger = logging.getLogger(__name__)
+
+
+class InsightsScheduler:
+    """
+    Scheduler para la generación periódica de insights
+    """
+    
+    def __init__(self):
+        self.scheduler = AsyncIOScheduler()
+    
+    def start(self):
+        """Iniciar scheduler"""
+        logger.info("🕐 Iniciando Insights Scheduler...")
+        
+        self.scheduler.add_job(
+            self._generar_insights,
+            trigger="interval",
+            minutes=settings.INSIGHTS_REFRESH_MINUTES,
+            id="generar_insights",
+            name="Generar insights de todas las tiendas",
+            replace_existing=True,
+            max_instances=1,  # Nunca solapar corridas
+            coalesce=True
+        )
+        
+        self.scheduler.start()
+        logger.info("✅ Scheduler iniciado correctamente")
+    
+    def stop(self):
+        """Detener scheduler"""
+        logger.info("🛑 Deteniendo scheduler...")
+        self.scheduler.shutdown()
+        logger.info("✅ Scheduler detenido")
+    
+    async def _generar_insights(self):
+        """Genera insights para todas las tiendas activas"""
+        logger.info("📊 Ejecutando: Generar insights")
+        
+        resultados = await insight_service.generate_for_all_tenants(
+            max_concurrency=settings.INSIGHTS_MAX_CONCURRENCY
+        )
+        
+        fallidas = [tienda_id for tienda_id, r in resultados.items() if r is None]
+        total = sum(r["total"] for r in resultados.values() if r)
+        
+        logger.info(
+            f"✅ Insights generados: {total} en {len(resultados)} tiendas "
+            f"({len(fallidas)} con error)"
+        )
+
+
+# =====================================================
+# CLI para ejecutar scheduler
+# =====================================================
+
+async def main():
+    """Entry point"""
+    scheduler = InsightsScheduler()
+    scheduler.start()
+    
+    # Primera corrida inmediata
+    await scheduler._generar_insights()
+    
+    logger.info("⏳ Scheduler corriendo... (Ctrl+C para salir)")
+    
+    try:
+        # Mantener vivo
+        await asyncio.Future()
+    except KeyboardInterrupt:
+        logger.info("👋 Scheduler detenido por usuario")
+    finally:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    import sys
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    
+    asyncio.run(main())
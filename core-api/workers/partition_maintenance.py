@@ -0,0 +1,96 @@
+"""
+Mantenimiento de Particiones - Nexus POS
+Crea las particiones mensuales futuras y archiva las viejas
+
+Uso:
+    python -m workers.partition_maintenance                          # scheduler diario
+    python -m workers.partition_maintenance --once                   # crear particiones y salir
+    python -m workers.partition_maintenance --archive-older-than 24  # archivar y salir
+
+El archivado nunca corre solo: desenganchar meses es una decisión del
+operador (retención, backups del schema de archivo). Solo aplica a
+audit_logs; el ledger se queda entero porque el stock es su suma.
+"""
+import argparse
+import asyncio
+import logging
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from core.db import engines
+from services.partition_service import archive_partitions, ensure_future_partitions
+
+
+logger = logging.getLogger(__name__)
+
+
+async def crear_particiones():
+    """Particiones del mes actual y los siguientes (idempotente)"""
+    async with engines["background"].connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        creadas = await ensure_future_partitions(conn)
+    logger.info(f"✅ Particiones al día ({len(creadas)} nuevas)")
+
+
+async def archivar(older_than_months: int):
+    """Desengancha y archiva los meses anteriores al corte"""
+    async with engines["background"].connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        archivadas = await archive_partitions(conn, older_than_months)
+    logger.info(f"✅ {len(archivadas)} particiones archivadas")
+
+
+# =====================================================
+# CLI para ejecutar scheduler
+# =====================================================
+
+async def main(args: argparse.Namespace):
+    """Entry point"""
+    if args.archive_older_than:
+        await archivar(args.archive_older_than)
+        return
+
+    await crear_particiones()
+    if args.once:
+        return
+
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        crear_particiones,
+        trigger="interval",
+        days=1,
+        id="crear_particiones",
+        name="Crear particiones mensuales futuras",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.start()
+    logger.info("⏳ Mantenimiento de particiones corriendo... (Ctrl+C para salir)")
+
+    try:
+        await asyncio.Future()
+    except KeyboardInterrupt:
+        logger.info("👋 Mantenimiento detenido por usuario")
+    finally:
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    import sys
+
+    parser = argparse.ArgumentParser(description="Mantenimiento de particiones mensuales")
+    parser.add_argument("--once", action="store_true", help="Crear particiones futuras y salir")
+    parser.add_argument(
+        "--archive-older-than",
+        type=int,
+        metavar="MESES",
+        help="Archivar particiones anteriores a N meses y salir"
+    )
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+    asyncio.run(main(parser.parse_args()))
@@ -2,29 +2,51 @@
 🐰 WORKER DE VENTAS - MÓDULO 3: SISTEMA NERVIOSO
 
 RESPONSABILIDADES:
-1. Consumir eventos 'sales.created' desde RabbitMQ
+1. Consumir eventos 'sales.created.{partición}' desde RabbitMQ
 2. Escribir en PostgreSQL (Venta + DetalleVenta)
 3. Actualizar stock en tabla productos
-4. Registrar movimiento en inventory_ledger
+4. Acumular la venta en la sesión de caja del cajero
 
 FLUJO:
-- Checkout endpoint reserva en Redis y publica evento
-- Este worker escucha RabbitMQ
-- Procesa async sin bloquear el POS
-- Si falla, reintenta con dead letter queue
+- Checkout endpoint reserva en Redis y publica evento (con event_id)
+- Este worker escucha las particiones asignadas
+- Procesa en micro-lotes sin bloquear el POS
+- Si falla, reintenta evento por evento y manda a DLQ solo el que falla
+
+GARANTÍAS:
+- Deduplicación: cada event_id se registra en processed_events en la misma
+  transacción que la venta. Un INSERT ... ON CONFLICT DO NOTHING por lote
+  hace el chequeo y el registro: una reentrega es un no-op barato.
+- Orden: los eventos se particionan por tienda y cada partición tiene un
+  solo consumer activo (x-single-active-consumer). Se pueden levantar
+  varios workers (failover o repartiendo --partitions) sin reordenar las
+  ventas de una tienda.
 """
 
-import json
+import argparse
 import asyncio
-from uuid import UUID
-from datetime import datetime
-from typing import Dict, Any
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import NAMESPACE_URL, UUID, uuid4, uuid5
+
+from sqlalchemy import delete, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select
 from core.config import settings
-from core.event_bus import EventConsumer
-from models import Venta, DetalleVenta, Producto, InventoryLedger
+from core.event_bus import EventConsumer, SALES_CREATED
+from models import DetalleVenta, ProcessedEvent, Venta
+from services.caja_service import CajaService
+from services.cache_service import get_redis_client
+from services.sales_writer import cantidades_por_producto, descontar_stock
+from services.stock_cache_service import clear_inflight
+
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_NAME = "sales_worker"
 
 
 # =============================================================================
@@ -46,150 +68,314 @@ async_session_maker = sessionmaker(
 
 
 # =============================================================================
-# HANDLER: PROCESAR VENTA DESDE EVENTO
+# DEDUPLICACIÓN
+# =============================================================================
+def parse_event(body: bytes) -> Dict[str, Any]:
+    """
+    Decodifica el mensaje. Los eventos publicados antes de que existiera
+    event_id reciben uno derivado del cuerpo: una reentrega del mismo
+    mensaje sigue deduplicándose.
+    """
+    event = json.loads(body)
+    if not event.get('event_id'):
+        event['event_id'] = str(uuid5(NAMESPACE_URL, body.decode() if isinstance(body, bytes) else body))
+    return event
+
+
+async def claim_events(session: AsyncSession, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Registra los event_id del lote y devuelve los eventos nuevos, en orden
+
+    Un solo INSERT ... ON CONFLICT DO NOTHING RETURNING: las filas que ya
+    existían (reentregas) no vuelven. Si la transacción hace rollback, el
+    registro también se deshace y el evento se puede reprocesar.
+    """
+    filas = {}
+    for event in events:
+        filas.setdefault(UUID(event['event_id']), event)  # Duplicados dentro del lote
+
+    nuevos = set((await session.execute(
+        pg_insert(ProcessedEvent)
+        .values([
+            {
+                "consumer": CONSUMER_NAME,
+                "event_id": event_id,
+                "tienda_id": UUID(event['tienda_id']),
+                "processed_at": datetime.now(timezone.utc),
+            }
+            for event_id, event in filas.items()
+        ])
+        .on_conflict_do_nothing(index_elements=["consumer", "event_id"])
+        .returning(ProcessedEvent.event_id)
+    )).scalars().all())
+
+    return [event for event_id, event in filas.items() if event_id in nuevos]
+
+
+async def purge_processed_events(session: AsyncSession) -> int:
+    """Borra registros más viejos que la retención (ya no pueden reentregarse)"""
+    limite = datetime.now(timezone.utc) - timedelta(days=settings.PROCESSED_EVENTS_RETENTION_DAYS)
+    result = await session.execute(
+        delete(ProcessedEvent).where(
+            ProcessedEvent.consumer == CONSUMER_NAME,
+            ProcessedEvent.processed_at < limite
+        )
+    )
+    return result.rowcount
+
+
+# =============================================================================
+# HANDLER: PROCESAR LOTE DE VENTAS
 # =============================================================================
-async def process_sale_event(event_data: Dict[str, Any]) -> None:
+async def _sesion_caja(caja: CajaService, event: Dict[str, Any], tienda_id: UUID) -> Optional[UUID]:
+    """
+    Sesión de caja en la que se cobró la venta (resuelta en el checkout)
+
+    Los eventos publicados antes de que el checkout la incluyera no traen la
+    clave: para esos se usa la sesión abierta del cajero al procesar.
     """
-    Procesa un evento de venta:
-    1. Crea registro en tabla Venta
-    2. Crea registros en DetalleVenta
-    3. Actualiza stock en tabla Producto
-    4. Registra movimientos en InventoryLedger
+    if 'sesion_caja_id' in event:
+        return UUID(event['sesion_caja_id']) if event['sesion_caja_id'] else None
+    if event.get('usuario_id'):
+        return await caja.sesion_abierta_id(tienda_id, UUID(event['usuario_id']))
+    return None
+
+
+async def write_sales(session: AsyncSession, events: List[Dict[str, Any]]) -> None:
+    """
+    Escribe las ventas de los eventos (ya deduplicados), sin commit:
+    1. 1 INSERT multi-fila de ventas y 1 de detalles
+    2. Acumula las ventas en la sesión de caja resuelta en el checkout
+       (1 UPDATE por sesión del lote)
+    3. Descuenta el stock de todos los productos con un solo UPDATE
+    """
+    caja = CajaService(session)
+    ventas = []
+    detalles = []
+    por_sesion: Dict[UUID, List[Tuple[float, str]]] = {}
+
+    for event in events:
+        # Las ventas de pagos online traen su id (el de la reserva) y ya están pagadas
+        venta_id = UUID(event['venta_id']) if event.get('venta_id') else uuid4()
+        tienda_id = UUID(event['tienda_id'])
+        fecha = datetime.fromisoformat(event['timestamp'])
+        sesion_id = await _sesion_caja(caja, event, tienda_id)
+        if sesion_id:
+            por_sesion.setdefault(sesion_id, []).append((event['total'], event['metodo_pago']))
+
+        ventas.append({
+            "id": venta_id,
+            "tienda_id": tienda_id,
+            "total": event['total'],
+            "metodo_pago": event['metodo_pago'],
+            "fecha": fecha,
+            "status_pago": event.get('status_pago', "pendiente"),
+            "payment_id": event.get('payment_id'),
+            "sesion_caja_id": sesion_id,
+        })
+        detalles.extend(
+            {
+                "id": uuid4(),
+                "venta_id": venta_id,
+                "fecha": fecha,
+                "producto_id": UUID(item['producto_id']),
+                "cantidad": item['cantidad'],
+                "precio_unitario": item['precio_unitario'],
+                "subtotal": item['subtotal'],
+            }
+            for item in event['items']
+        )
+
+    await session.execute(insert(Venta), ventas)
+    for sesion_id, cobros in por_sesion.items():
+        await caja.registrar_ventas(sesion_id, cobros)
+    if detalles:
+        await session.execute(insert(DetalleVenta), detalles)
+        await descontar_stock(session, cantidades_por_producto(detalles))
+
+
+async def process_sale_batch(events: List[Dict[str, Any]]) -> int:
+    """
+    Procesa un micro-lote en una sola transacción
+
+    Returns:
+        Cantidad de ventas escritas (el resto eran reentregas)
     """
     async with async_session_maker() as session:
         try:
-            # =========================================================
-            # PASO 1: CREAR VENTA (CABECERA)
-            # =========================================================
-            nueva_venta = Venta(
-                tienda_id=UUID(event_data['tienda_id']),
-                total=event_data['total'],
-                metodo_pago=event_data['metodo_pago'],
-                fecha=datetime.fromisoformat(event_data['timestamp'])
-            )
-            
-            session.add(nueva_venta)
-            await session.flush()  # Obtener ID de venta
-            
-            # =========================================================
-            # PASO 2: CREAR DETALLES Y ACTUALIZAR STOCK
-            # =========================================================
-            for item in event_data['items']:
-                # Crear detalle de venta
-                detalle = DetalleVenta(
-                    venta_id=nueva_venta.id,
-                    producto_id=UUID(item['producto_id']),
-                    cantidad=item['cantidad'],
-                    precio_unitario=item['precio_unitario'],
-                    subtotal=item['subtotal']
-                )
-                session.add(detalle)
-                
-                # Actualizar stock en tabla productos
-                statement = select(Producto).where(
-                    Producto.id == UUID(item['producto_id'])
-                )
-                result = await session.execute(statement)
-                producto = result.scalar_one_or_none()
-                
-                if producto:
-                    stock_anterior = producto.stock_actual
-                    producto.stock_actual -= item['cantidad']
-                    session.add(producto)
-                    
-                    # =====================================================
-                    # PASO 3: REGISTRAR EN INVENTORY LEDGER
-                    # =====================================================
-                    ledger_entry = InventoryLedger(
-                        producto_id=producto.id,
-                        tienda_id=nueva_venta.tienda_id,
-                        tipo_movimiento='VENTA',
-                        cantidad=-item['cantidad'],  # Negativo porque es salida
-                        stock_anterior=stock_anterior,
-                        stock_nuevo=producto.stock_actual,
-                        referencia_tipo='VENTA',
-                        referencia_id=str(nueva_venta.id),
-                        descripcion=f"Venta #{nueva_venta.id} - {item['producto_nombre']} (SKU: {item['producto_sku']})"
-                    )
-                    session.add(ledger_entry)
-            
-            # =========================================================
-            # PASO 4: COMMIT TRANSACCIÓN
-            # =========================================================
+            nuevos = await claim_events(session, events)
+            if nuevos:
+                await write_sales(session, nuevos)
             await session.commit()
-            
-            print(f"✅ Venta {nueva_venta.id} procesada exitosamente desde evento")
-            print(f"   📊 Total: ${nueva_venta.total:.2f}")
-            print(f"   📦 Items: {len(event_data['items'])}")
-            print(f"   💳 Método: {nueva_venta.metodo_pago}")
-        
-        except Exception as e:
+        except Exception:
             await session.rollback()
-            print(f"❌ Error procesando venta: {e}")
-            raise  # Esto hará que RabbitMQ reintente o envíe a DLQ
+            raise
+
+    # Ya están en la DB (o eran reentregas): dejan de estar en vuelo
+    await _clear_inflight(events)
+
+    duplicados = len(events) - len(nuevos)
+    logger.info(
+        f"✅ Lote procesado: {len(nuevos)} ventas"
+        + (f", {duplicados} reentregas descartadas" if duplicados else "")
+    )
+    return len(nuevos)
+
+
+async def _clear_inflight(events: List[Dict[str, Any]]) -> None:
+    """Un error de Redis no falla el lote: la reconciliación vence las entradas viejas"""
+    por_tienda: Dict[str, List[str]] = {}
+    for event in events:
+        por_tienda.setdefault(event['tienda_id'], []).append(event['event_id'])
+    try:
+        await clear_inflight(await get_redis_client(), por_tienda)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudieron limpiar reservas en vuelo: {e}")
+
+
+async def process_sale_event(event_data: Dict[str, Any]) -> int:
+    """Procesa un único evento de venta (lote de 1)"""
+    return await process_sale_batch([event_data])
 
 
 # =============================================================================
-# CALLBACK DE RABBITMQ
+# MICRO-LOTES SOBRE EL CONSUMER DE RABBITMQ
 # =============================================================================
-def handle_sale_created(ch, method, properties, body):
+class SaleBatcher:
     """
-    Callback síncrono de Pika - ejecuta handler async
+    Acumula mensajes y los procesa en lote al llegar a SALES_WORKER_BATCH_SIZE
+    o tras SALES_WORKER_BATCH_WAIT segundos desde el primero
+
+    ACK después del commit. Si el lote falla, se reintenta evento por evento
+    (en orden) y solo el que falla va a la DLQ.
     """
-    try:
-        event_data = json.loads(body)
-        print(f"\n🔔 Evento recibido: sales.created")
-        print(f"   Tienda: {event_data.get('tienda_id')}")
-        print(f"   Total: ${event_data.get('total', 0):.2f}")
-        
-        # Ejecutar handler async en event loop
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(process_sale_event(event_data))
-        loop.close()
-        
-        # ACK manual después de procesar exitosamente
-        ch.basic_ack(delivery_tag=method.delivery_tag)
-        
-    except Exception as e:
-        print(f"❌ Error en handler: {e}")
-        # NACK para que RabbitMQ reintente o envíe a DLQ
-        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+
+    def __init__(self, consumer: EventConsumer, loop: asyncio.AbstractEventLoop):
+        self.consumer = consumer
+        self.loop = loop
+        self.buffer: List[tuple] = []  # (channel, delivery_tag, event)
+        self.timer = None
+        self.last_purge: Optional[datetime] = None
+
+    def on_message(self, ch, method, properties, body):
+        """Callback de Pika"""
+        try:
+            event = parse_event(body)
+        except Exception as e:
+            logger.error(f"❌ Mensaje inválido, a DLQ: {e}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            return
+
+        self.buffer.append((ch, method.delivery_tag, event))
+        if len(self.buffer) >= settings.SALES_WORKER_BATCH_SIZE:
+            self.flush()
+        elif self.timer is None:
+            self.timer = self.consumer.connection.call_later(settings.SALES_WORKER_BATCH_WAIT, self.flush)
+
+    def flush(self):
+        """Procesa el lote acumulado"""
+        if self.timer is not None:
+            self.consumer.connection.remove_timeout(self.timer)
+            self.timer = None
+        batch, self.buffer = self.buffer, []
+        if not batch:
+            return
+
+        try:
+            self.loop.run_until_complete(process_sale_batch([event for _, _, event in batch]))
+            for ch, tag, _ in batch:
+                ch.basic_ack(delivery_tag=tag)
+        except Exception as e:
+            logger.warning(f"⚠️ Lote de {len(batch)} falló ({e}), reintentando de a uno")
+            for ch, tag, event in batch:
+                try:
+                    self.loop.run_until_complete(process_sale_event(event))
+                    ch.basic_ack(delivery_tag=tag)
+                except Exception as e:
+                    logger.error(f"❌ Evento {event.get('event_id')} a DLQ: {e}")
+                    ch.basic_nack(delivery_tag=tag, requeue=False)
+
+        self._maybe_purge()
+
+    def _maybe_purge(self):
+        """Purga de processed_events, como mucho una vez por hora"""
+        ahora = datetime.now(timezone.utc)
+        if self.last_purge and ahora - self.last_purge < timedelta(hours=1):
+            return
+        self.last_purge = ahora
+        try:
+            self.loop.run_until_complete(self._purge())
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo purgar processed_events: {e}")
+
+    async def _purge(self):
+        async with async_session_maker() as session:
+            borrados = await purge_processed_events(session)
+            await session.commit()
+        if borrados:
+            logger.info(f"🧹 processed_events: {borrados} registros purgados")
 
 
 # =============================================================================
 # MAIN: INICIAR WORKER
 # =============================================================================
+def parse_partitions(value: Optional[str]) -> Optional[List[int]]:
+    """'0,1,5' → [0, 1, 5]; None = todas las particiones"""
+    if not value:
+        return None
+    partitions = sorted({int(p) for p in value.split(",")})
+    if any(p < 0 or p >= settings.SALES_EVENT_PARTITIONS for p in partitions):
+        raise ValueError(f"Particiones válidas: 0..{settings.SALES_EVENT_PARTITIONS - 1}")
+    return partitions
+
+
 def main():
     """
     Inicia el worker y escucha eventos de RabbitMQ
     """
+    parser = argparse.ArgumentParser(description="Worker de ventas (sales.created)")
+    parser.add_argument("--partitions", help="Particiones a consumir, ej: 0,1,2,3 (default: todas)")
+    parser.add_argument(
+        "--drain-legacy", action="store_true",
+        help="Consumir también la cola sin particionar 'sales.created' (migración)"
+    )
+    args = parser.parse_args()
+    partitions = parse_partitions(args.partitions)
+
     print("\n" + "="*70)
     print("🐰 SALES WORKER - Sistema Nervioso Blend POS")
     print("="*70)
     print(f"📡 Conectando a RabbitMQ: {settings.RABBITMQ_URL}")
     print(f"💾 Conectando a PostgreSQL: {settings.DATABASE_URL.split('@')[1]}")
-    print("🎯 Escuchando eventos: sales.created")
+    print(f"🎯 Escuchando eventos: {SALES_CREATED} (particiones: {partitions or 'todas'})")
     print("="*70 + "\n")
-    
-    # Crear consumer de eventos
-    consumer = EventConsumer()
-    
-    # Configurar subscripción
-    consumer.subscribe(
-        event_type='sales.created',
-        callback=handle_sale_created
-    )
-    
+
+    # Un solo event loop para todo el worker
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    # Crear consumer de eventos (prefetch = tamaño de lote)
+    consumer = EventConsumer(prefetch_count=settings.SALES_WORKER_BATCH_SIZE)
+    batcher = SaleBatcher(consumer, loop)
+
+    # Configurar subscripción por partición
+    consumer.subscribe_partitions(SALES_CREATED, batcher.on_message, partitions=partitions)
+    if args.drain_legacy:
+        consumer.subscribe(SALES_CREATED, batcher.on_message)
+
     print("✅ Worker iniciado - Presiona Ctrl+C para detener\n")
-    
+
     try:
         # Iniciar consumo (blocking)
         consumer.start()
     except KeyboardInterrupt:
         print("\n\n⏹️  Deteniendo worker...")
+        batcher.flush()
         consumer.stop()
         print("✅ Worker detenido correctamente")
+    finally:
+        loop.run_until_complete(engine.dispose())
+        loop.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+"""
+Reconciliador de Stock - Nexus POS
+Compara periódicamente los saldos de Redis con PostgreSQL y libera las
+reservas de pagos online vencidas
+
+Corre en su propio proceso: una pasada lenta (rate limit) nunca compite
+con los workers de la API. El estado de los desvíos sospechosos vive en
+el proceso, así que debe haber una sola instancia.
+"""
+import asyncio
+import logging
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from core.config import settings
+from services.reservation_service import sweep_expired
+from services.stock_reconciliation_service import StockReconciler
+
+
+logger = logging.getLogger(__name__)
+
+
+class StockReconcilerScheduler:
+    """
+    Scheduler para la reconciliación periódica de stock
+    """
+
+    def __init__(self):
+        self.scheduler = AsyncIOScheduler()
+        self.reconciler = StockReconciler()
+
+    def start(self):
+        """Iniciar scheduler"""
+        logger.info("🕐 Iniciando Stock Reconciler...")
+
+        self.scheduler.add_job(
+            self._reconciliar,
+            trigger="interval",
+            minutes=settings.STOCK_RECONCILE_INTERVAL_MINUTES,
+            id="reconciliar_stock",
+            name="Reconciliar stock Redis vs DB",
+            replace_existing=True,
+            max_instances=1,  # Nunca solapar corridas
+            coalesce=True
+        )
+
+        self.scheduler.add_job(
+            sweep_expired,
+            trigger="interval",
+            seconds=settings.RESERVATION_SWEEP_SECONDS,
+            id="barrer_reservas",
+            name="Liberar reservas de stock vencidas",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
+        self.scheduler.start()
+        logger.info("✅ Scheduler iniciado correctamente")
+
+    def stop(self):
+        """Detener scheduler"""
+        logger.info("🛑 Deteniendo scheduler...")
+        self.scheduler.shutdown()
+        logger.info("✅ Scheduler detenido")
+
+    async def _reconciliar(self):
+        """Una pasada sobre todas las tiendas activas"""
+        logger.info("🔍 Ejecutando: Reconciliar stock")
+
+        resultados = await self.reconciler.run_once()
+
+        fallidas = [tienda_id for tienda_id, r in resultados.items() if r is None]
+        stats = self.reconciler.get_stats()
+
+        logger.info(
+            f"✅ Reconciliación: {len(resultados)} tiendas ({len(fallidas)} con error) en "
+            f"{stats['ultima_duracion_s']}s; acumulado {stats['desvios_detectados']} desvíos, "
+            f"{stats['desvios_corregidos']} corregidos, {stats['sospechosos']} en observación"
+        )
+
+
+# =====================================================
+# CLI para ejecutar scheduler
+# =====================================================
+
+async def main():
+    """Entry point"""
+    scheduler = StockReconcilerScheduler()
+    scheduler.start()
+
+    # Primera corrida inmediata
+    await scheduler._reconciliar()
+
+    logger.info("⏳ Reconciliador corriendo... (Ctrl+C para salir)")
+
+    try:
+        # Mantener vivo
+        await asyncio.Future()
+    except KeyboardInterrupt:
+        logger.info("👋 Reconciliador detenido por usuario")
+    finally:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+    asyncio.run(main())
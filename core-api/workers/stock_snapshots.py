@@ -0,0 +1,101 @@
+"""
+Snapshots de Stock - Nexus POS
+Escribe los checkpoints del ledger (cierre diario por defecto)
+
+Uso:
+    python -m workers.stock_snapshots                 # scheduler (revisa cada hora)
+    python -m workers.stock_snapshots --once          # último checkpoint y salir
+    python -m workers.stock_snapshots --backfill 90   # checkpoints de los últimos 90 días y salir
+
+Idempotente: un checkpoint ya escrito se saltea, así que correr de más o
+reiniciar el proceso no duplica nada.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import timedelta
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from core.config import settings
+from services.stock_snapshot_service import last_settled_checkpoint, take_snapshots
+
+
+logger = logging.getLogger(__name__)
+
+
+async def tomar_snapshots(at=None):
+    """Checkpoint de todas las tiendas activas"""
+    at = at or last_settled_checkpoint()
+    resultados = await take_snapshots(at)
+    escritos = [r for r in resultados.values() if r is not None]
+    logger.info(
+        f"✅ Snapshot {at.isoformat()}: {len(escritos)}/{len(resultados)} tiendas nuevas, "
+        f"{sum(escritos)} saldos"
+    )
+
+
+async def backfill(dias: int):
+    """Checkpoints de los últimos N días, del más viejo al más nuevo (cada uno parte del anterior)"""
+    ultimo = last_settled_checkpoint()
+    paso = timedelta(hours=settings.STOCK_SNAPSHOT_INTERVAL_HOURS)
+    at = ultimo - paso * (timedelta(days=dias) // paso)
+    while at <= ultimo:
+        await tomar_snapshots(at)
+        at += paso
+
+
+# =====================================================
+# CLI para ejecutar scheduler
+# =====================================================
+
+async def main(args: argparse.Namespace):
+    """Entry point"""
+    if args.backfill:
+        await backfill(args.backfill)
+        return
+
+    await tomar_snapshots()
+    if args.once:
+        return
+
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        tomar_snapshots,
+        trigger="interval",
+        hours=1,
+        id="snapshots_stock",
+        name="Checkpoints de stock del ledger",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.start()
+    logger.info("⏳ Snapshots de stock corriendo... (Ctrl+C para salir)")
+
+    try:
+        await asyncio.Future()
+    except KeyboardInterrupt:
+        logger.info("👋 Snapshots detenidos por usuario")
+    finally:
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    import sys
+
+    parser = argparse.ArgumentParser(description="Checkpoints de stock del ledger")
+    parser.add_argument("--once", action="store_true", help="Escribir el último checkpoint y salir")
+    parser.add_argument(
+        "--backfill",
+        type=int,
+        metavar="DIAS",
+        help="Escribir los checkpoints de los últimos N días y salir"
+    )
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+    asyncio.run(main(parser.parse_args()))
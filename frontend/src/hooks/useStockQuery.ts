@@ -50,7 +50,7 @@ export function useTransactions(filters?: {
   location_id?: string;
   reference_type?: string;
   limit?: number;
-  offset?: number;
+  cursor?: string;
 }) {
   return useQuery({
     queryKey: stockKeys.transactions(filters),
@@ -15,7 +15,13 @@ export interface InventoryTransaction {
   reference_id: string | null;
   notes: string | null;
   created_at: string;
-  created_by: string;
+  created_by: string | null;
+}
+
+export interface InventoryTransactionPage {
+  items: InventoryTransaction[];
+  next_cursor: string | null;  // Pasar como `cursor` para la página siguiente
+  has_next: boolean;
 }
 
 export interface ProductVariantStock {
@@ -84,9 +90,9 @@ class StockService {
     location_id?: string;
     reference_type?: string;
     limit?: number;
-    offset?: number;
+    cursor?: string;
   }) {
-    const { data } = await apiClient.get<InventoryTransaction[]>('/stock/transactions', { params });
+    const { data } = await apiClient.get<InventoryTransactionPage>('/stock/transactions', { params });
     return data;
   }
 